@@ -126,8 +126,8 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     dp.message.middleware(blacklist_middleware)
     dp.callback_query.middleware(blacklist_middleware)
     dp.pre_checkout_query.middleware(blacklist_middleware)
-    dp.message.middleware(ThrottlingMiddleware())
-    dp.callback_query.middleware(ThrottlingMiddleware())
+    dp.message.middleware(ThrottlingMiddleware(scope='message'))
+    dp.callback_query.middleware(ThrottlingMiddleware(scope='callback'))
 
     # Middleware для автоматического логирования кликов по кнопкам
     if settings.MENU_LAYOUT_ENABLED:
@@ -149,6 +149,13 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     dp.pre_checkout_query.middleware(AuthMiddleware())
     dp.message.middleware(SubscriptionStatusMiddleware())
     dp.callback_query.middleware(SubscriptionStatusMiddleware())
+
+    if settings.METRICS_ENABLED:
+        from app.middlewares.metrics import instrument_dispatcher
+
+        instrument_dispatcher(dp)
+        logger.info('📈 Метрики middleware и обработки update включены')
+
     start.register_handlers(dp)
     menu.register_handlers(dp)
     subscription.register_handlers(dp)
@@ -1,5 +1,6 @@
 """JWT token handling for cabinet authentication."""
 
+import uuid
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
@@ -30,6 +31,7 @@ def create_access_token(user_id: int, telegram_id: int | None = None) -> str:
         'type': 'access',
         'exp': expires,
         'iat': datetime.now(UTC),
+        'jti': uuid.uuid4().hex,
     }
 
     # Добавляем telegram_id только если он есть
@@ -1,10 +1,12 @@
 """FastAPI dependencies for cabinet module."""
 
 import asyncio
+from functools import lru_cache
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network, ip_address, ip_network
 
 import structlog
 from aiogram import Bot
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -12,10 +14,16 @@ from app.config import settings
 from app.database.crud.user import get_user_by_id
 from app.database.database import AsyncSessionLocal
 from app.database.models import User
-from app.services.blacklist_service import blacklist_service
 from app.services.maintenance_service import maintenance_service
 
 from .auth.jwt_handler import get_token_payload
+from .services.principal_cache import (
+    CabinetPrincipal,
+    build_principal,
+    get_cached_principal,
+    get_token_id,
+    store_principal,
+)
 
 
 logger = structlog.get_logger(__name__)
@@ -34,6 +42,50 @@ def _get_channel_check_bot() -> Bot:
     return _channel_check_bot
 
 
+@lru_cache(maxsize=8)
+def _parse_trusted_proxy_networks(networks: tuple[str, ...]) -> tuple[IPv4Network | IPv6Network, ...]:
+    parsed = []
+    for network in networks:
+        try:
+            parsed.append(ip_network(network, strict=False))
+        except ValueError:
+            logger.warning('Invalid CABINET_TRUSTED_PROXY_NETWORKS entry', network=network)
+    return tuple(parsed)
+
+
+def _parse_ip(value: str | None) -> IPv4Address | IPv6Address | None:
+    try:
+        return ip_address(value.strip()) if value else None
+    except ValueError:
+        return None
+
+
+def get_client_ip(request: Request) -> str | None:
+    """Resolve the client IP, trusting forwarded headers only from CABINET_TRUSTED_PROXY_NETWORKS.
+
+    Returns None when the address cannot be trusted: a private or loopback peer
+    that is not a configured proxy is most likely an unconfigured reverse proxy,
+    and limits keyed by its address would apply to every user at once.
+    """
+    remote = _parse_ip(request.client.host if request.client else None)
+    if remote is None:
+        return None
+
+    trusted = _parse_trusted_proxy_networks(tuple(settings.get_cabinet_trusted_proxy_networks()))
+    if not any(remote in network for network in trusted):
+        return str(remote) if remote.is_global else None
+
+    forwarded = request.headers.get('X-Forwarded-For') or request.headers.get('X-Real-IP') or ''
+    # Right to left: the first hop that is not a trusted proxy is the client
+    for value in reversed(forwarded.split(',')):
+        hop = _parse_ip(value)
+        if hop is None:
+            return None
+        if not any(hop in network for network in trusted):
+            return str(hop)
+    return None
+
+
 async def get_cabinet_db() -> AsyncSession:
     """Get database session for cabinet operations."""
     async with AsyncSessionLocal() as session:
@@ -43,28 +95,8 @@ async def get_cabinet_db() -> AsyncSession:
             await session.close()
 
 
-async def get_current_cabinet_user(
-    credentials: HTTPAuthorizationCredentials | None = Depends(security),
-    db: AsyncSession = Depends(get_cabinet_db),
-) -> User:
-    """
-    Get current authenticated cabinet user from JWT token.
-
-    Args:
-        credentials: HTTP Bearer credentials
-        db: Database session
-
-    Returns:
-        Authenticated User object
-
-    Raises:
-        HTTPException: If token is invalid, expired, or user not found
-    """
-    # Check maintenance mode first (except for admins - checked later)
-    if maintenance_service.is_maintenance_active():
-        # We need to check token first to see if user is admin
-        pass  # Will check after getting user
-
+def _decode_access_token(credentials: HTTPAuthorizationCredentials | None) -> tuple[int, str]:
+    """Validate the bearer token and return the user ID and token ID from it."""
     if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -91,87 +123,149 @@ async def get_current_cabinet_user(
             headers={'WWW-Authenticate': 'Bearer'},
         )
 
-    user = await get_user_by_id(db, user_id)
+    return user_id, get_token_id(payload)
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='User not found',
-        )
 
-    if user.status != 'active':
+async def _ensure_principal_allowed(principal: CabinetPrincipal) -> None:
+    """Apply status, blacklist, maintenance and channel subscription checks."""
+    if not principal.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail='User account is not active',
         )
 
     # Check blacklist
-    if user.telegram_id is not None:
-        is_blacklisted, reason = await blacklist_service.is_user_blacklisted(user.telegram_id, user.username)
-        if is_blacklisted:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail={
-                    'code': 'blacklisted',
-                    'message': reason or 'Доступ запрещен',
-                },
-            )
+    if principal.is_blacklisted:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                'code': 'blacklisted',
+                'message': principal.blacklist_reason or 'Доступ запрещен',
+            },
+        )
 
     # Check maintenance mode (allow admins to pass)
-    if maintenance_service.is_maintenance_active():
-        # Проверяем админа по telegram_id ИЛИ email
-        is_admin = settings.is_admin(telegram_id=user.telegram_id, email=user.email if user.email_verified else None)
-        if not is_admin:
-            status_info = maintenance_service.get_status_info()
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail={
-                    'code': 'maintenance',
-                    'message': maintenance_service.get_maintenance_message() or 'Service is under maintenance',
-                    'reason': status_info.get('reason'),
-                },
-            )
+    if maintenance_service.is_maintenance_active() and not principal.is_admin:
+        status_info = maintenance_service.get_status_info()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                'code': 'maintenance',
+                'message': maintenance_service.get_maintenance_message() or 'Service is under maintenance',
+                'reason': status_info.get('reason'),
+            },
+        )
 
     # Check required channel subscription - ТОЛЬКО для Telegram юзеров
     if settings.CHANNEL_IS_REQUIRED_SUB and settings.CHANNEL_SUB_ID:
-        # Пропускаем проверку для email-only юзеров (нет telegram_id)
-        if user.telegram_id is not None:
-            # Проверяем админа по telegram_id ИЛИ email
-            is_admin = settings.is_admin(
-                telegram_id=user.telegram_id, email=user.email if user.email_verified else None
-            )
-            if not is_admin:
-                try:
-                    bot = _get_channel_check_bot()
-                    chat_member = await asyncio.wait_for(
-                        bot.get_chat_member(chat_id=settings.CHANNEL_SUB_ID, user_id=user.telegram_id),
-                        timeout=10.0,
-                    )
-                    # Не закрываем сессию - бот переиспользуется
-
-                    if chat_member.status not in ['member', 'administrator', 'creator']:
-                        raise HTTPException(
-                            status_code=status.HTTP_403_FORBIDDEN,
-                            detail={
-                                'code': 'channel_subscription_required',
-                                'message': 'Please subscribe to our channel to continue',
-                                'channel_link': settings.CHANNEL_LINK,
-                            },
-                        )
-                except HTTPException:
-                    raise
-                except TimeoutError:
-                    logger.warning('Timeout checking channel subscription for user', telegram_id=user.telegram_id)
-                    # Don't block user if check times out
-                except Exception as e:
-                    logger.warning(
-                        'Failed to check channel subscription for user', telegram_id=user.telegram_id, error=e
+        # Пропускаем проверку для email-only юзеров (нет telegram_id) и админов
+        if principal.telegram_id is not None and not principal.is_admin:
+            try:
+                bot = _get_channel_check_bot()
+                chat_member = await asyncio.wait_for(
+                    bot.get_chat_member(chat_id=settings.CHANNEL_SUB_ID, user_id=principal.telegram_id),
+                    timeout=10.0,
+                )
+                # Не закрываем сессию - бот переиспользуется
+
+                if chat_member.status not in ['member', 'administrator', 'creator']:
+                    raise HTTPException(
+                        status_code=status.HTTP_403_FORBIDDEN,
+                        detail={
+                            'code': 'channel_subscription_required',
+                            'message': 'Please subscribe to our channel to continue',
+                            'channel_link': settings.CHANNEL_LINK,
+                        },
                     )
-                    # Don't block user if check fails
+            except HTTPException:
+                raise
+            except TimeoutError:
+                logger.warning('Timeout checking channel subscription for user', telegram_id=principal.telegram_id)
+                # Don't block user if check times out
+            except Exception as e:
+                logger.warning(
+                    'Failed to check channel subscription for user', telegram_id=principal.telegram_id, error=e
+                )
+                # Don't block user if check fails
+
+
+async def get_current_cabinet_user(
+    credentials: HTTPAuthorizationCredentials | None = Depends(security),
+    db: AsyncSession = Depends(get_cabinet_db),
+) -> User:
+    """
+    Get current authenticated cabinet user from JWT token.
+
+    The user row is always loaded; the blacklist verdict and admin flag are
+    taken from the principal cache while the cached status matches the row.
+
+    Args:
+        credentials: HTTP Bearer credentials
+        db: Database session
+
+    Returns:
+        Authenticated User object
+
+    Raises:
+        HTTPException: If token is invalid, expired, or user not found
+    """
+    user_id, token_id = _decode_access_token(credentials)
+
+    user = await get_user_by_id(db, user_id)
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='User not found',
+        )
+
+    principal = await get_cached_principal(user_id, token_id)
+    if principal is None or principal.status != user.status:
+        principal = await build_principal(user)
+        await store_principal(principal, token_id)
+
+    await _ensure_principal_allowed(principal)
 
     return user
 
 
+async def get_current_cabinet_principal(
+    credentials: HTTPAuthorizationCredentials | None = Depends(security),
+    db: AsyncSession = Depends(get_cabinet_db),
+) -> CabinetPrincipal:
+    """
+    Get the authenticated cabinet principal without loading the user on a cache hit.
+
+    Use it for routes that only need the user identity (ID, admin flag).
+
+    Args:
+        credentials: HTTP Bearer credentials
+        db: Database session, used only on a cache miss
+
+    Returns:
+        Authenticated CabinetPrincipal
+
+    Raises:
+        HTTPException: If token is invalid, expired, or user not found
+    """
+    user_id, token_id = _decode_access_token(credentials)
+
+    principal = await get_cached_principal(user_id, token_id)
+    if principal is None:
+        user = await get_user_by_id(db, user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='User not found',
+            )
+        principal = await build_principal(user)
+        await store_principal(principal, token_id)
+
+    await _ensure_principal_allowed(principal)
+
+    return principal
+
+
 async def get_optional_cabinet_user(
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
     db: AsyncSession = Depends(get_cabinet_db),
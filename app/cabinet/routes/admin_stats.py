@@ -1,19 +1,22 @@
 """Admin routes for statistics dashboard in cabinet."""
 
+import asyncio
 import sys
 import time
+from collections.abc import Awaitable, Callable
 from datetime import UTC, datetime, timedelta
 
 import structlog
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from sqlalchemy import and_, func, select
+from sqlalchemy import and_, func, select, true
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.crud.campaign import get_campaign_statistics, get_campaigns_count, get_campaigns_list
 from app.database.crud.server_squad import get_server_statistics
 from app.database.crud.subscription import get_subscriptions_statistics
 from app.database.crud.transaction import get_revenue_by_period, get_transactions_statistics
+from app.database.database import AsyncSessionLocal
 from app.database.models import (
     ReferralEarning,
     Subscription,
@@ -33,6 +36,9 @@ logger = structlog.get_logger(__name__)
 
 _start_time = time.time()
 
+# Сводная статистика отдаётся из снимка, который обновляется в фоне не чаще раза в минуту
+DASHBOARD_SNAPSHOT_TTL_SECONDS = 60
+
 router = APIRouter(prefix='/admin/stats', tags=['Cabinet Admin Stats'])
 
 
@@ -247,75 +253,10 @@ class RecentPaymentsResponse(BaseModel):
 @router.get('/dashboard', response_model=DashboardStats)
 async def get_dashboard_stats(
     admin: User = Depends(get_current_admin_user),
-    db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Get complete dashboard statistics for admin panel."""
     try:
-        # Get nodes status from RemnaWave
-        nodes_data = await _get_nodes_overview()
-
-        # Get subscription statistics
-        sub_stats = await get_subscriptions_statistics(db)
-
-        # Get financial statistics
-        now = datetime.now(UTC)
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        trans_stats = await get_transactions_statistics(db, month_start, now)
-
-        # Get revenue chart data (last 30 days)
-        revenue_data = await get_revenue_by_period(db, days=30)
-
-        # Get server statistics
-        server_stats = await get_server_statistics(db)
-
-        # Get tariff statistics
-        tariff_stats = await _get_tariff_stats(db)
-
-        # Build response
-        return DashboardStats(
-            nodes=nodes_data,
-            subscriptions=SubscriptionStats(
-                total=sub_stats.get('total_subscriptions', 0),
-                active=sub_stats.get('active_subscriptions', 0),
-                trial=sub_stats.get('trial_subscriptions', 0),
-                paid=sub_stats.get('paid_subscriptions', 0),
-                expired=sub_stats.get('total_subscriptions', 0) - sub_stats.get('active_subscriptions', 0),
-                purchased_today=sub_stats.get('purchased_today', 0),
-                purchased_week=sub_stats.get('purchased_week', 0),
-                purchased_month=sub_stats.get('purchased_month', 0),
-                trial_to_paid_conversion=sub_stats.get('trial_to_paid_conversion', 0.0),
-            ),
-            financial=FinancialStats(
-                income_today_kopeks=trans_stats.get('today', {}).get('income_kopeks', 0),
-                income_today_rubles=trans_stats.get('today', {}).get('income_kopeks', 0) / 100,
-                income_month_kopeks=trans_stats.get('totals', {}).get('income_kopeks', 0),
-                income_month_rubles=trans_stats.get('totals', {}).get('income_kopeks', 0) / 100,
-                income_total_kopeks=trans_stats.get('totals', {}).get('income_kopeks', 0),
-                income_total_rubles=trans_stats.get('totals', {}).get('income_kopeks', 0) / 100,
-                subscription_income_kopeks=trans_stats.get('totals', {}).get('subscription_income_kopeks', 0),
-                subscription_income_rubles=trans_stats.get('totals', {}).get('subscription_income_kopeks', 0) / 100,
-            ),
-            servers=ServerStats(
-                total_servers=server_stats.get('total_servers', 0),
-                available_servers=server_stats.get('available_servers', 0),
-                servers_with_connections=server_stats.get('servers_with_connections', 0),
-                total_revenue_kopeks=server_stats.get('total_revenue_kopeks', 0),
-                total_revenue_rubles=server_stats.get('total_revenue_rubles', 0.0),
-            ),
-            revenue_chart=[
-                RevenueData(
-                    date=item.get('date', '').isoformat()
-                    if hasattr(item.get('date', ''), 'isoformat')
-                    else str(item.get('date', '')),
-                    amount_kopeks=item.get('amount_kopeks', 0),
-                    amount_rubles=item.get('amount_kopeks', 0) / 100,
-                )
-                for item in revenue_data
-            ],
-            tariff_stats=tariff_stats,
-        )
-
+        return await _dashboard_snapshot.get()
     except Exception as e:
         logger.error('Failed to get dashboard stats', error=e)
         raise HTTPException(
@@ -436,6 +377,119 @@ async def toggle_node(
         )
 
 
+class _StatsSnapshot[T]:
+    """Periodically refreshed result of an expensive statistics loader.
+
+    A fresh value is returned as is. A stale value is returned immediately
+    while a single background task reloads it; only the very first request
+    waits for the loader.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[T]], ttl_seconds: float):
+        self._loader = loader
+        self._ttl_seconds = ttl_seconds
+        self._value: T | None = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    def _is_fresh(self) -> bool:
+        return self._value is not None and time.monotonic() - self._loaded_at < self._ttl_seconds
+
+    async def get(self) -> T:
+        if self._is_fresh():
+            return self._value
+
+        if self._value is not None:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh_in_background())
+            return self._value
+
+        return await self._refresh()
+
+    async def _refresh(self) -> T:
+        async with self._lock:
+            if self._is_fresh():
+                return self._value
+            value = await self._loader()
+            self._value = value
+            self._loaded_at = time.monotonic()
+            return value
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            await self._refresh()
+        except Exception as e:
+            logger.error('Failed to refresh stats snapshot', loader=self._loader.__name__, error=e)
+
+    def invalidate(self) -> None:
+        self._value = None
+        self._loaded_at = 0.0
+
+
+async def _run_in_session[T](loader: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+    """Run a statistics query in its own session so several can run concurrently."""
+    async with AsyncSessionLocal() as session:
+        return await loader(session, *args, **kwargs)
+
+
+async def _load_dashboard_stats() -> DashboardStats:
+    now = datetime.now(UTC)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    nodes_data, sub_stats, trans_stats, revenue_data, server_stats, tariff_stats = await asyncio.gather(
+        _get_nodes_overview(),
+        _run_in_session(get_subscriptions_statistics),
+        _run_in_session(get_transactions_statistics, month_start, now),
+        _run_in_session(get_revenue_by_period, days=30),
+        _run_in_session(get_server_statistics),
+        _run_in_session(_get_tariff_stats),
+    )
+
+    return DashboardStats(
+        nodes=nodes_data,
+        subscriptions=SubscriptionStats(
+            total=sub_stats.get('total_subscriptions', 0),
+            active=sub_stats.get('active_subscriptions', 0),
+            trial=sub_stats.get('trial_subscriptions', 0),
+            paid=sub_stats.get('paid_subscriptions', 0),
+            expired=sub_stats.get('total_subscriptions', 0) - sub_stats.get('active_subscriptions', 0),
+            purchased_today=sub_stats.get('purchased_today', 0),
+            purchased_week=sub_stats.get('purchased_week', 0),
+            purchased_month=sub_stats.get('purchased_month', 0),
+            trial_to_paid_conversion=sub_stats.get('trial_to_paid_conversion', 0.0),
+        ),
+        financial=FinancialStats(
+            income_today_kopeks=trans_stats.get('today', {}).get('income_kopeks', 0),
+            income_today_rubles=trans_stats.get('today', {}).get('income_kopeks', 0) / 100,
+            income_month_kopeks=trans_stats.get('totals', {}).get('income_kopeks', 0),
+            income_month_rubles=trans_stats.get('totals', {}).get('income_kopeks', 0) / 100,
+            income_total_kopeks=trans_stats.get('totals', {}).get('income_kopeks', 0),
+            income_total_rubles=trans_stats.get('totals', {}).get('income_kopeks', 0) / 100,
+            subscription_income_kopeks=trans_stats.get('totals', {}).get('subscription_income_kopeks', 0),
+            subscription_income_rubles=trans_stats.get('totals', {}).get('subscription_income_kopeks', 0) / 100,
+        ),
+        servers=ServerStats(
+            total_servers=server_stats.get('total_servers', 0),
+            available_servers=server_stats.get('available_servers', 0),
+            servers_with_connections=server_stats.get('servers_with_connections', 0),
+            total_revenue_kopeks=server_stats.get('total_revenue_kopeks', 0),
+            total_revenue_rubles=server_stats.get('total_revenue_rubles', 0.0),
+        ),
+        revenue_chart=[
+            RevenueData(
+                date=item.get('date', '').isoformat()
+                if hasattr(item.get('date', ''), 'isoformat')
+                else str(item.get('date', '')),
+                amount_kopeks=item.get('amount_kopeks', 0),
+                amount_rubles=item.get('amount_kopeks', 0) / 100,
+            )
+            for item in revenue_data
+        ],
+        tariff_stats=tariff_stats,
+    )
+
+
 async def _get_nodes_overview() -> NodesOverview:
     """Get overview of all nodes."""
     try:
@@ -496,8 +550,8 @@ async def _get_tariff_stats(db: AsyncSession) -> TariffStats | None:
     """Get statistics for all tariffs."""
     try:
         # Получаем ВСЕ тарифы (включая неактивные) для статистики
-        tariffs_result = await db.execute(select(Tariff).order_by(Tariff.display_order))
-        tariffs = tariffs_result.scalars().all()
+        tariffs_result = await db.execute(select(Tariff.id, Tariff.name).order_by(Tariff.display_order))
+        tariffs = tariffs_result.all()
 
         if not tariffs:
             logger.info('📊 Нет тарифов в системе, пропускаем статистику')
@@ -508,71 +562,42 @@ async def _get_tariff_stats(db: AsyncSession) -> TariffStats | None:
         week_ago = now - timedelta(days=7)
         month_ago = now - timedelta(days=30)
 
+        is_active = Subscription.status == SubscriptionStatus.ACTIVE.value
+        is_paid = Subscription.is_trial == False
+
+        # Все счётчики по всем тарифам одним проходом по подпискам
+        counters_result = await db.execute(
+            select(
+                Subscription.tariff_id,
+                func.count(Subscription.id).filter(is_active).label('active'),
+                func.count(Subscription.id).filter(and_(is_active, Subscription.is_trial == True)).label('trial'),
+                func.count(Subscription.id)
+                .filter(and_(is_paid, Subscription.created_at >= today_start))
+                .label('today'),
+                func.count(Subscription.id).filter(and_(is_paid, Subscription.created_at >= week_ago)).label('week'),
+                func.count(Subscription.id).filter(and_(is_paid, Subscription.created_at >= month_ago)).label('month'),
+            )
+            .where(Subscription.tariff_id.isnot(None))
+            .group_by(Subscription.tariff_id)
+        )
+        counters = {row.tariff_id: row for row in counters_result}
+
         tariff_items = []
         total_tariff_subscriptions = 0
 
         for tariff in tariffs:
-            # Активные подписки на этом тарифе
-            active_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id, Subscription.status == SubscriptionStatus.ACTIVE.value
-                )
-            )
-            active_count = active_result.scalar() or 0
-
-            # Триальные подписки на этом тарифе
-            trial_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id,
-                    Subscription.status == SubscriptionStatus.ACTIVE.value,
-                    Subscription.is_trial == True,
-                )
-            )
-            trial_count = trial_result.scalar() or 0
-
-            # Куплено сегодня (не триальные)
-            today_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id,
-                    Subscription.created_at >= today_start,
-                    Subscription.is_trial == False,
-                )
-            )
-            purchased_today = today_result.scalar() or 0
-
-            # Куплено за неделю
-            week_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id,
-                    Subscription.created_at >= week_ago,
-                    Subscription.is_trial == False,
-                )
-            )
-            purchased_week = week_result.scalar() or 0
-
-            # Куплено за месяц
-            month_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id,
-                    Subscription.created_at >= month_ago,
-                    Subscription.is_trial == False,
-                )
-            )
-            purchased_month = month_result.scalar() or 0
-
-            logger.info(
-                '📊 Тариф активных=, триал', tariff_name=tariff.name, active_count=active_count, trial_count=trial_count
-            )
+            row = counters.get(tariff.id)
+            active_count = row.active if row else 0
 
             tariff_items.append(
                 TariffStatItem(
                     tariff_id=tariff.id,
                     tariff_name=tariff.name,
                     active_subscriptions=active_count,
-                    trial_subscriptions=trial_count,
-                    purchased_today=purchased_today,
-                    purchased_week=purchased_week,
-                    purchased_month=purchased_month,
+                    trial_subscriptions=row.trial if row else 0,
+                    purchased_today=row.today if row else 0,
+                    purchased_week=row.week if row else 0,
+                    purchased_month=row.month if row else 0,
                 )
             )
 
@@ -593,196 +618,148 @@ async def _get_tariff_stats(db: AsyncSession) -> TariffStats | None:
 # ============ Extended Stats Routes ============
 
 
-@router.get('/referrals/top', response_model=TopReferrersResponse)
-async def get_top_referrers(
-    limit: int = 20,
-    admin: User = Depends(get_current_admin_user),
-    db: AsyncSession = Depends(get_cabinet_db),
-):
-    """Get top referrers with earnings breakdown by period."""
-    try:
-        now = datetime.now(UTC)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_ago = now - timedelta(days=7)
-        month_ago = now - timedelta(days=30)
-
-        # Get all referrers with their stats
-        referrers_query = await db.execute(
-            select(User.referred_by_id.label('referrer_id'), func.count(User.id).label('total_invited'))
-            .where(User.referred_by_id.isnot(None))
-            .group_by(User.referred_by_id)
-        )
-        referrers_data = {row.referrer_id: {'total_invited': row.total_invited} for row in referrers_query}
-
-        # Get invited counts by period for each referrer
-        # Today
-        today_invited_query = await db.execute(
-            select(User.referred_by_id.label('referrer_id'), func.count(User.id).label('count'))
-            .where(and_(User.referred_by_id.isnot(None), User.created_at >= today_start))
-            .group_by(User.referred_by_id)
-        )
-        for row in today_invited_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['invited_today'] = row.count
-
-        # Week
-        week_invited_query = await db.execute(
-            select(User.referred_by_id.label('referrer_id'), func.count(User.id).label('count'))
-            .where(and_(User.referred_by_id.isnot(None), User.created_at >= week_ago))
-            .group_by(User.referred_by_id)
-        )
-        for row in week_invited_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['invited_week'] = row.count
-
-        # Month
-        month_invited_query = await db.execute(
-            select(User.referred_by_id.label('referrer_id'), func.count(User.id).label('count'))
-            .where(and_(User.referred_by_id.isnot(None), User.created_at >= month_ago))
-            .group_by(User.referred_by_id)
-        )
-        for row in month_invited_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['invited_month'] = row.count
-
+async def _get_referrer_invites(db: AsyncSession, today_start, week_ago, month_ago) -> dict[int, dict]:
+    result = await db.execute(
+        select(
+            User.referred_by_id.label('referrer_id'),
+            func.count(User.id).label('total_invited'),
+            func.count(User.id).filter(User.created_at >= today_start).label('invited_today'),
+            func.count(User.id).filter(User.created_at >= week_ago).label('invited_week'),
+            func.count(User.id).filter(User.created_at >= month_ago).label('invited_month'),
+        )
+        .where(User.referred_by_id.isnot(None))
+        .group_by(User.referred_by_id)
+    )
+    return {
+        row.referrer_id: {
+            'total_invited': row.total_invited,
+            'invited_today': row.invited_today,
+            'invited_week': row.invited_week,
+            'invited_month': row.invited_month,
+        }
+        for row in result
+    }
+
+
+async def _get_referrer_earnings(
+    db: AsyncSession, user_column, amount_column, created_column, condition, today_start, week_ago, month_ago
+) -> list:
+    amount = func.sum(amount_column)
+    result = await db.execute(
+        select(
+            user_column.label('referrer_id'),
+            func.coalesce(amount, 0).label('earnings_total'),
+            func.coalesce(amount.filter(created_column >= today_start), 0).label('earnings_today'),
+            func.coalesce(amount.filter(created_column >= week_ago), 0).label('earnings_week'),
+            func.coalesce(amount.filter(created_column >= month_ago), 0).label('earnings_month'),
+        )
+        .where(condition)
+        .group_by(user_column)
+    )
+    return result.all()
+
+
+async def _get_referrer_users(db: AsyncSession, referrer_ids: list[int]) -> dict:
+    if not referrer_ids:
+        return {}
+    result = await db.execute(
+        select(User.id, User.telegram_id, User.username, User.first_name, User.last_name, User.email).where(
+            User.id.in_(referrer_ids)
+        )
+    )
+    return {u.id: u for u in result}
+
+
+async def _load_top_referrers() -> list[TopReferrerItem]:
+    """Collect per-referrer invite and earning counters in three single-pass queries."""
+    now = datetime.now(UTC)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+    periods = (today_start, week_ago, month_ago)
+
+    referrers_data, earnings_rows, reward_rows = await asyncio.gather(
+        _run_in_session(_get_referrer_invites, *periods),
         # Get earnings from ReferralEarning table
-        # Total earnings
-        total_earnings_query = await db.execute(
-            select(
-                ReferralEarning.user_id.label('referrer_id'), func.sum(ReferralEarning.amount_kopeks).label('total')
-            ).group_by(ReferralEarning.user_id)
-        )
-        for row in total_earnings_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['earnings_total'] = row.total or 0
-
-        # Today earnings
-        today_earnings_query = await db.execute(
-            select(ReferralEarning.user_id.label('referrer_id'), func.sum(ReferralEarning.amount_kopeks).label('total'))
-            .where(ReferralEarning.created_at >= today_start)
-            .group_by(ReferralEarning.user_id)
-        )
-        for row in today_earnings_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['earnings_today'] = row.total or 0
-
-        # Week earnings
-        week_earnings_query = await db.execute(
-            select(ReferralEarning.user_id.label('referrer_id'), func.sum(ReferralEarning.amount_kopeks).label('total'))
-            .where(ReferralEarning.created_at >= week_ago)
-            .group_by(ReferralEarning.user_id)
-        )
-        for row in week_earnings_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['earnings_week'] = row.total or 0
-
-        # Month earnings
-        month_earnings_query = await db.execute(
-            select(ReferralEarning.user_id.label('referrer_id'), func.sum(ReferralEarning.amount_kopeks).label('total'))
-            .where(ReferralEarning.created_at >= month_ago)
-            .group_by(ReferralEarning.user_id)
-        )
-        for row in month_earnings_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['earnings_month'] = row.total or 0
-
+        _run_in_session(
+            _get_referrer_earnings,
+            ReferralEarning.user_id,
+            ReferralEarning.amount_kopeks,
+            ReferralEarning.created_at,
+            true(),
+            *periods,
+        ),
         # Also add REFERRAL_REWARD transactions
-        trans_total_query = await db.execute(
-            select(Transaction.user_id.label('referrer_id'), func.sum(Transaction.amount_kopeks).label('total'))
-            .where(Transaction.type == TransactionType.REFERRAL_REWARD.value)
-            .group_by(Transaction.user_id)
-        )
-        for row in trans_total_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['earnings_total'] = referrers_data[row.referrer_id].get(
-                    'earnings_total', 0
-                ) + (row.total or 0)
-
-        trans_today_query = await db.execute(
-            select(Transaction.user_id.label('referrer_id'), func.sum(Transaction.amount_kopeks).label('total'))
-            .where(
-                and_(Transaction.type == TransactionType.REFERRAL_REWARD.value, Transaction.created_at >= today_start)
+        _run_in_session(
+            _get_referrer_earnings,
+            Transaction.user_id,
+            Transaction.amount_kopeks,
+            Transaction.created_at,
+            Transaction.type == TransactionType.REFERRAL_REWARD.value,
+            *periods,
+        ),
+    )
+
+    for row in (*earnings_rows, *reward_rows):
+        data = referrers_data.get(row.referrer_id)
+        if data is None:
+            continue
+        for key in ('earnings_total', 'earnings_today', 'earnings_week', 'earnings_month'):
+            data[key] = data.get(key, 0) + (getattr(row, key) or 0)
+
+    # Get user info for all referrers
+    users_info = await _run_in_session(_get_referrer_users, list(referrers_data.keys()))
+
+    # Build referrer items
+    referrer_items = []
+    for referrer_id, data in referrers_data.items():
+        user = users_info.get(referrer_id)
+        if not user:
+            continue
+
+        display_name = ''
+        if user.first_name:
+            display_name = user.first_name
+            if user.last_name:
+                display_name += f' {user.last_name}'
+        elif user.username:
+            display_name = f'@{user.username}'
+        elif user.telegram_id:
+            display_name = f'ID{user.telegram_id}'
+        elif user.email:
+            display_name = user.email.split('@')[0]
+        else:
+            display_name = f'User#{user.id}'
+
+        referrer_items.append(
+            TopReferrerItem(
+                user_id=user.id,
+                telegram_id=user.telegram_id,
+                email=user.email,
+                username=user.username,
+                display_name=display_name,
+                invited_count=data.get('total_invited', 0),
+                invited_today=data.get('invited_today', 0),
+                invited_week=data.get('invited_week', 0),
+                invited_month=data.get('invited_month', 0),
+                earnings_today_kopeks=data.get('earnings_today', 0),
+                earnings_week_kopeks=data.get('earnings_week', 0),
+                earnings_month_kopeks=data.get('earnings_month', 0),
+                earnings_total_kopeks=data.get('earnings_total', 0),
             )
-            .group_by(Transaction.user_id)
-        )
-        for row in trans_today_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['earnings_today'] = referrers_data[row.referrer_id].get(
-                    'earnings_today', 0
-                ) + (row.total or 0)
-
-        trans_week_query = await db.execute(
-            select(Transaction.user_id.label('referrer_id'), func.sum(Transaction.amount_kopeks).label('total'))
-            .where(and_(Transaction.type == TransactionType.REFERRAL_REWARD.value, Transaction.created_at >= week_ago))
-            .group_by(Transaction.user_id)
         )
-        for row in trans_week_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['earnings_week'] = referrers_data[row.referrer_id].get(
-                    'earnings_week', 0
-                ) + (row.total or 0)
-
-        trans_month_query = await db.execute(
-            select(Transaction.user_id.label('referrer_id'), func.sum(Transaction.amount_kopeks).label('total'))
-            .where(and_(Transaction.type == TransactionType.REFERRAL_REWARD.value, Transaction.created_at >= month_ago))
-            .group_by(Transaction.user_id)
-        )
-        for row in trans_month_query:
-            if row.referrer_id in referrers_data:
-                referrers_data[row.referrer_id]['earnings_month'] = referrers_data[row.referrer_id].get(
-                    'earnings_month', 0
-                ) + (row.total or 0)
-
-        # Get user info for all referrers
-        referrer_ids = list(referrers_data.keys())
-        if referrer_ids:
-            users_query = await db.execute(
-                select(User.id, User.telegram_id, User.username, User.first_name, User.last_name, User.email).where(
-                    User.id.in_(referrer_ids)
-                )
-            )
-            users_info = {u.id: u for u in users_query}
-        else:
-            users_info = {}
 
-        # Build referrer items
-        referrer_items = []
-        for referrer_id, data in referrers_data.items():
-            user = users_info.get(referrer_id)
-            if not user:
-                continue
+    return referrer_items
 
-            display_name = ''
-            if user.first_name:
-                display_name = user.first_name
-                if user.last_name:
-                    display_name += f' {user.last_name}'
-            elif user.username:
-                display_name = f'@{user.username}'
-            elif user.telegram_id:
-                display_name = f'ID{user.telegram_id}'
-            elif user.email:
-                display_name = user.email.split('@')[0]
-            else:
-                display_name = f'User#{user.id}'
 
-            referrer_items.append(
-                TopReferrerItem(
-                    user_id=user.id,
-                    telegram_id=user.telegram_id,
-                    email=user.email,
-                    username=user.username,
-                    display_name=display_name,
-                    invited_count=data.get('total_invited', 0),
-                    invited_today=data.get('invited_today', 0),
-                    invited_week=data.get('invited_week', 0),
-                    invited_month=data.get('invited_month', 0),
-                    earnings_today_kopeks=data.get('earnings_today', 0),
-                    earnings_week_kopeks=data.get('earnings_week', 0),
-                    earnings_month_kopeks=data.get('earnings_month', 0),
-                    earnings_total_kopeks=data.get('earnings_total', 0),
-                )
-            )
+@router.get('/referrals/top', response_model=TopReferrersResponse)
+async def get_top_referrers(
+    limit: int = 20,
+    admin: User = Depends(get_current_admin_user),
+):
+    """Get top referrers with earnings breakdown by period."""
+    try:
+        referrer_items = await _top_referrers_snapshot.get()
 
         # Sort by earnings and by invited
         by_earnings = sorted(referrer_items, key=lambda x: x.earnings_total_kopeks, reverse=True)[:limit]
@@ -809,6 +786,10 @@ async def get_top_referrers(
         )
 
 
+_dashboard_snapshot = _StatsSnapshot(_load_dashboard_stats, DASHBOARD_SNAPSHOT_TTL_SECONDS)
+_top_referrers_snapshot = _StatsSnapshot(_load_top_referrers, DASHBOARD_SNAPSHOT_TTL_SECONDS)
+
+
 @router.get('/campaigns/top', response_model=TopCampaignsResponse)
 async def get_top_campaigns(
     limit: int = 20,
@@ -1,5 +1,6 @@
 """Admin routes for managing users in cabinet."""
 
+from dataclasses import asdict
 from datetime import UTC, datetime, timedelta
 
 import structlog
@@ -7,7 +8,6 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import Integer, and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.crud.campaign import get_campaign_registration_by_user
 from app.database.crud.subscription import (
     extend_subscription,
 )
@@ -35,6 +35,7 @@ from app.database.models import (
     User,
     UserStatus,
 )
+from app.services.admin_user_card_service import AdminUserCard, admin_user_card_service
 from app.utils.timezone import panel_datetime_to_utc
 
 from ..dependencies import get_cabinet_db, get_current_admin_user
@@ -165,24 +166,11 @@ def _build_subscription_info(subscription: Subscription, tariff_name: str | None
     )
 
 
-async def _build_subscription_info_async(db: AsyncSession, subscription: Subscription) -> UserSubscriptionInfo:
-    """Build UserSubscriptionInfo from Subscription model, fetching tariff name and traffic purchases."""
-    tariff_name = None
-    if subscription.tariff_id:
-        tariff = await get_tariff_by_id(db, subscription.tariff_id)
-        if tariff:
-            tariff_name = tariff.name
-
-    # Fetch traffic purchases
+def _build_subscription_info_with_purchases(
+    subscription: Subscription, tariff_name: str | None, purchases: list[TrafficPurchase]
+) -> UserSubscriptionInfo:
+    """Build UserSubscriptionInfo including traffic purchases."""
     now = datetime.now(UTC)
-    tp_query = (
-        select(TrafficPurchase)
-        .where(TrafficPurchase.subscription_id == subscription.id)
-        .order_by(TrafficPurchase.created_at.desc())
-    )
-    tp_result = await db.execute(tp_query)
-    purchases = tp_result.scalars().all()
-
     traffic_purchase_items = []
     for p in purchases:
         delta = p.expires_at - now
@@ -205,6 +193,30 @@ async def _build_subscription_info_async(db: AsyncSession, subscription: Subscri
     return info
 
 
+async def _build_subscription_info_async(db: AsyncSession, subscription: Subscription) -> UserSubscriptionInfo:
+    """Build UserSubscriptionInfo from Subscription model, fetching tariff name and traffic purchases."""
+    tariff_name = None
+    if subscription.tariff_id:
+        tariff = await get_tariff_by_id(db, subscription.tariff_id)
+        if tariff:
+            tariff_name = tariff.name
+
+    tp_query = (
+        select(TrafficPurchase)
+        .where(TrafficPurchase.subscription_id == subscription.id)
+        .order_by(TrafficPurchase.created_at.desc())
+    )
+    tp_result = await db.execute(tp_query)
+    return _build_subscription_info_with_purchases(subscription, tariff_name, list(tp_result.scalars().all()))
+
+
+def _build_subscription_info_from_card(card: AdminUserCard) -> UserSubscriptionInfo:
+    """Build UserSubscriptionInfo from a loaded admin user card (tariff and traffic purchases included)."""
+    subscription = card.subscription
+    tariff_name = subscription.tariff.name if subscription.tariff else None
+    return _build_subscription_info_with_purchases(subscription, tariff_name, card.traffic_purchases)
+
+
 async def _sync_subscription_to_panel(db: AsyncSession, user: User, subscription: Subscription) -> dict:
     """
     Sync user subscription to Remnawave panel.
@@ -513,21 +525,19 @@ async def get_user_detail(
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Get detailed user information by ID."""
-    user = await get_user_by_id(db, user_id)
-    if not user:
+    card = await admin_user_card_service.load(db, user_id, recent_transactions=20, include_traffic_purchases=True)
+    if not card:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='User not found',
         )
-
-    # Get spending stats
-    spending_stats = await get_users_spending_stats(db, [user.id])
-    user_stats = spending_stats.get(user.id, {'total_spent': 0, 'purchase_count': 0})
+    user = card.user
+    stats = card.stats
 
     # Build subscription info
     subscription_info = None
     if user.subscription:
-        subscription_info = await _build_subscription_info_async(db, user.subscription)
+        subscription_info = _build_subscription_info_from_card(card)
 
     # Build promo group info
     promo_group_info = None
@@ -538,43 +548,16 @@ async def get_user_detail(
             is_default=user.promo_group.is_default,
         )
 
-    # Get referrals count
-    referrals = await get_referrals(db, user.id)
-    referrals_count = len(referrals)
-
-    # Calculate total referral earnings
-    referral_earnings_q = select(func.sum(Transaction.amount_kopeks)).where(
-        Transaction.user_id == user.id,
-        Transaction.type == TransactionType.REFERRAL_REWARD.value,
-        Transaction.is_completed == True,
-    )
-    referral_earnings = (await db.execute(referral_earnings_q)).scalar() or 0
-
-    # Get referrer info
-    referred_by_username = None
-    if user.referred_by_id:
-        referrer_q = select(User).where(User.id == user.referred_by_id)
-        referrer_result = await db.execute(referrer_q)
-        referrer = referrer_result.scalar_one_or_none()
-        if referrer:
-            referred_by_username = referrer.username or referrer.full_name
-
+    referrer = card.referrer
     referral_info = UserReferralInfo(
         referral_code=user.referral_code or '',
-        referrals_count=referrals_count,
-        total_earnings_kopeks=referral_earnings,
+        referrals_count=stats.referrals_count,
+        total_earnings_kopeks=stats.referral_reward_kopeks,
         commission_percent=user.referral_commission_percent,
         referred_by_id=user.referred_by_id,
-        referred_by_username=referred_by_username,
+        referred_by_username=(referrer.username or referrer.full_name) if referrer else None,
     )
 
-    # Get recent transactions
-    transactions_q = (
-        select(Transaction).where(Transaction.user_id == user.id).order_by(Transaction.created_at.desc()).limit(20)
-    )
-    transactions_result = await db.execute(transactions_q)
-    transactions = transactions_result.scalars().all()
-
     recent_transactions = [
         UserTransactionItem(
             id=t.id,
@@ -586,17 +569,9 @@ async def get_user_detail(
             is_completed=t.is_completed,
             created_at=t.created_at,
         )
-        for t in transactions
+        for t in card.recent_transactions
     ]
 
-    # Get campaign info
-    campaign_name = None
-    campaign_id = None
-    campaign_reg = await get_campaign_registration_by_user(db, user.id)
-    if campaign_reg and campaign_reg.campaign:
-        campaign_name = campaign_reg.campaign.name
-        campaign_id = campaign_reg.campaign.id
-
     return UserDetailResponse(
         id=user.id,
         telegram_id=user.telegram_id,
@@ -617,13 +592,13 @@ async def get_user_detail(
         subscription=subscription_info,
         promo_group=promo_group_info,
         referral=referral_info,
-        total_spent_kopeks=user_stats.get('total_spent', 0),
-        purchase_count=user_stats.get('purchase_count', 0),
+        total_spent_kopeks=stats.total_spent_kopeks,
+        purchase_count=stats.purchase_count,
         used_promocodes=user.used_promocodes,
         has_had_paid_subscription=user.has_had_paid_subscription,
         lifetime_used_traffic_bytes=user.lifetime_used_traffic_bytes or 0,
-        campaign_name=campaign_name,
-        campaign_id=campaign_id,
+        campaign_name=stats.campaign_name,
+        campaign_id=stats.campaign_id,
         restriction_topup=user.restriction_topup,
         restriction_subscription=user.restriction_subscription,
         restriction_reason=user.restriction_reason,
@@ -668,68 +643,12 @@ async def get_user_panel_info(
             detail='User not found',
         )
 
-    try:
-        from app.services.remnawave_service import RemnaWaveService
-
-        service = RemnaWaveService()
-        if not service.is_configured:
-            return UserPanelInfoResponse(found=False)
-
-        async with service.get_api_client() as api:
-            panel_user = None
-
-            # Try by UUID first (works for all users including OAuth)
-            if user.remnawave_uuid:
-                panel_user = await api.get_user_by_uuid(user.remnawave_uuid)
-
-            # Fallback: search by telegram_id
-            if not panel_user and user.telegram_id:
-                panel_users = await api.get_user_by_telegram_id(user.telegram_id)
-                if panel_users:
-                    panel_user = panel_users[0]
-
-            # Fallback: search by email (OAuth users)
-            if not panel_user and user.email:
-                panel_users_by_email = await api.get_user_by_email(user.email)
-                if panel_users_by_email:
-                    panel_user = panel_users_by_email[0]
-
-            if not panel_user:
-                return UserPanelInfoResponse(found=False)
-
-            # Resolve last connected node name via accessible nodes (lighter than get_all_nodes)
-            last_node_name = None
-            last_node_uuid = None
-            if panel_user.user_traffic and panel_user.user_traffic.last_connected_node_uuid:
-                last_node_uuid = panel_user.user_traffic.last_connected_node_uuid
-                try:
-                    accessible = await api.get_user_accessible_nodes(panel_user.uuid)
-                    for node in accessible:
-                        if node.uuid == last_node_uuid:
-                            last_node_name = node.node_name
-                            break
-                except Exception:
-                    logger.warning('Failed to resolve node name for user', user_id=user_id)
-
-            return UserPanelInfoResponse(
-                found=True,
-                trojan_password=panel_user.trojan_password,
-                vless_uuid=panel_user.vless_uuid,
-                ss_password=panel_user.ss_password,
-                subscription_url=panel_user.subscription_url,
-                happ_link=panel_user.happ_link,
-                used_traffic_bytes=panel_user.used_traffic_bytes,
-                lifetime_used_traffic_bytes=panel_user.lifetime_used_traffic_bytes,
-                traffic_limit_bytes=panel_user.traffic_limit_bytes,
-                first_connected_at=panel_user.first_connected_at,
-                online_at=panel_user.online_at,
-                last_connected_node_uuid=last_node_uuid,
-                last_connected_node_name=last_node_name,
-            )
-
-    except Exception as e:
-        logger.error('Error getting panel info for user', user_id=user_id, error=e)
+    snapshot = await admin_user_card_service.get_panel_snapshot(
+        user.id, user.remnawave_uuid, user.telegram_id, user.email
+    )
+    if snapshot is None:
         return UserPanelInfoResponse(found=False)
+    return UserPanelInfoResponse(found=True, **asdict(snapshot))
 
 
 @router.get('/{user_id}/node-usage', response_model=UserNodeUsageResponse)
@@ -875,6 +794,7 @@ async def update_user_balance(
 
     # Refresh user
     await db.refresh(user)
+    admin_user_card_service.invalidate(user.id)
 
     logger.info(
         'Admin updated balance for user',
@@ -916,6 +836,19 @@ async def update_user_subscription(
     - **activate**: Activate subscription
     - **create**: Create new subscription if not exists
     """
+    try:
+        return await _apply_subscription_update(user_id, request, admin, db)
+    finally:
+        # Every action commits and syncs the panel on its own branch
+        admin_user_card_service.invalidate(user_id)
+
+
+async def _apply_subscription_update(
+    user_id: int,
+    request: UpdateSubscriptionRequest,
+    admin: User,
+    db: AsyncSession,
+) -> UpdateSubscriptionResponse:
     user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(
@@ -1391,6 +1324,7 @@ async def update_user_status(
     user.updated_at = datetime.now(UTC)
     await db.commit()
     await db.refresh(user)
+    admin_user_card_service.invalidate(user_id)
 
     action = f'{old_status} -> {new_status}'
     if request.reason:
@@ -1459,6 +1393,7 @@ async def update_user_restrictions(
     user.updated_at = datetime.now(UTC)
     await db.commit()
     await db.refresh(user)
+    admin_user_card_service.invalidate(user_id)
 
     logger.info(
         'Admin updated restrictions for user topup=, subscription',
@@ -1514,6 +1449,7 @@ async def update_user_promo_group(
     user.updated_at = datetime.now(UTC)
     await db.commit()
     await db.refresh(user)
+    admin_user_card_service.invalidate(user_id)
 
     logger.info(
         'Admin changed promo group for user',
@@ -1554,6 +1490,7 @@ async def update_user_referral_commission(
     user.referral_commission_percent = request.commission_percent
     user.updated_at = datetime.now(UTC)
     await db.commit()
+    admin_user_card_service.invalidate(user_id)
 
     logger.info(
         'Admin changed referral commission for user',
@@ -1650,6 +1587,7 @@ async def delete_user_device(
             success = await api.remove_device(user.remnawave_uuid, hwid)
 
         if success:
+            admin_user_card_service.invalidate(user_id)
             logger.info('Admin deleted device for user', admin_id=admin.id, hwid=hwid, user_id=user_id)
             return DeleteDeviceResponse(success=True, message='Device deleted', deleted_hwid=hwid)
         return DeleteDeviceResponse(success=False, message='Failed to delete device')
@@ -1695,6 +1633,7 @@ async def reset_user_devices(
                     except Exception:
                         pass
 
+        admin_user_card_service.invalidate(user_id)
         logger.info('Admin reset devices for user /', admin_id=admin.id, user_id=user_id, deleted=deleted, total=total)
         return ResetDevicesResponse(success=True, message=f'Deleted {deleted}/{total} devices', deleted_count=deleted)
 
@@ -1734,6 +1673,7 @@ async def delete_user(
         await db.delete(user)
         await db.commit()
         action = 'permanently deleted'
+    admin_user_card_service.invalidate(user_id)
 
     reason_text = f' (reason: {request.reason})' if request.reason else ''
     logger.info('Admin user', admin_id=admin.id, action=action, user_id=user_id, reason_text=reason_text)
@@ -1777,6 +1717,7 @@ async def full_delete_user(
     # UserService.delete_user_account handles both bot DB and Remnawave panel
     user_service = UserService()
     success = await user_service.delete_user_account(db, user_id, admin_id_val)
+    admin_user_card_service.invalidate(user_id)
 
     if success:
         deleted_from_panel = request.delete_from_panel and user.remnawave_uuid is not None
@@ -1843,6 +1784,7 @@ async def reset_user_trial(
     user.updated_at = datetime.now(UTC)
 
     await db.commit()
+    admin_user_card_service.invalidate(user_id)
 
     reason_text = f' (reason: {request.reason})' if request.reason else ''
     logger.info('Admin reset trial for user', admin_id=admin.id, user_id=user_id, reason_text=reason_text)
@@ -1912,6 +1854,7 @@ async def reset_user_subscription(
 
     user.updated_at = datetime.now(UTC)
     await db.commit()
+    admin_user_card_service.invalidate(user_id)
 
     reason_text = f' (reason: {request.reason})' if request.reason else ''
     logger.info('Admin reset subscription for user', admin_id=admin.id, user_id=user_id, reason_text=reason_text)
@@ -1976,6 +1919,7 @@ async def disable_user(
     user.status = UserStatus.BLOCKED.value
     user.updated_at = datetime.now(UTC)
     await db.commit()
+    admin_user_card_service.invalidate(user_id)
 
     reason_text = f' (reason: {request.reason})' if request.reason else ''
     logger.info('Admin disabled user', admin_id=admin.id, user_id=user_id, reason_text=reason_text)
@@ -2425,6 +2369,7 @@ async def sync_user_from_panel(
             user.updated_at = datetime.now(UTC)
 
             await db.commit()
+            admin_user_card_service.invalidate(user_id)
 
         logger.info(
             'Admin synced user from panel. Changes', admin_id=admin.id, user_id=user_id, value=list(changes.keys())
@@ -2618,6 +2563,7 @@ async def sync_user_to_panel(
             user.updated_at = datetime.now(UTC)
 
             await db.commit()
+            admin_user_card_service.invalidate(user_id)
 
         logger.info('Admin synced user to panel. Action', admin_id=admin.id, user_id=user_id, action=action)
 
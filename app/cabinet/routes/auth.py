@@ -5,7 +5,7 @@ import hashlib
 from datetime import UTC, datetime
 
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -30,6 +30,12 @@ from app.database.models import CabinetRefreshToken, User
 from app.services.campaign_service import AdvertisingCampaignService
 from app.services.disposable_email_service import disposable_email_service
 from app.services.referral_service import process_referral_registration
+from app.utils.rate_limiter import (
+    CABINET_LOGIN_FAILURES,
+    CABINET_LOGIN_IP_FAILURES,
+    CABINET_PASSWORD_RESET,
+    rate_limiter,
+)
 from app.utils.timezone import panel_datetime_to_utc
 
 from ..auth import (
@@ -51,7 +57,7 @@ from ..auth.email_verification import (
     is_token_expired,
 )
 from ..auth.jwt_handler import get_refresh_token_expires_at
-from ..dependencies import get_cabinet_db, get_current_cabinet_user
+from ..dependencies import get_cabinet_db, get_client_ip, get_current_cabinet_user
 from ..schemas.auth import (
     AuthResponse,
     CampaignBonusInfo,
@@ -73,6 +79,7 @@ from ..schemas.auth import (
 )
 from ..services.email_service import email_service
 from ..services.email_template_overrides import get_rendered_override
+from ..services.principal_cache import invalidate_cabinet_principal
 
 
 logger = structlog.get_logger(__name__)
@@ -850,15 +857,39 @@ async def resend_verification(
     return {'message': 'Verification email sent'}
 
 
+async def _record_login_failure(login_key: str, client_ip: str | None) -> None:
+    await rate_limiter.record(CABINET_LOGIN_FAILURES, login_key)
+    if client_ip is not None:
+        await rate_limiter.record(CABINET_LOGIN_IP_FAILURES, client_ip)
+
+
 @router.post('/email/login', response_model=AuthResponse)
 async def login_email(
     request: EmailLoginRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Login with email and password.
 
     Test email accounts (configured via TEST_EMAIL) bypass email verification.
+    Failed attempts are limited per email and client IP pair, so attempts from
+    other addresses cannot lock the owner out, and per client IP. Without a
+    trustworthy client IP (see CABINET_TRUSTED_PROXY_NETWORKS) only the
+    per-email limit applies.
     """
+    client_ip = get_client_ip(http_request)
+    login_key = f'{request.email.strip().lower()}:{client_ip or "unknown"}'
+    policies = [(CABINET_LOGIN_FAILURES, login_key)]
+    if client_ip is not None:
+        policies.append((CABINET_LOGIN_IP_FAILURES, client_ip))
+    for policy, key in policies:
+        login_limit = await rate_limiter.peek(policy, key)
+        if not login_limit.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f'Too many failed login attempts. Try again in {login_limit.retry_after} seconds',
+            )
+
     # Check if this is a test email login
     is_test_email = settings.is_test_email(request.email)
 
@@ -882,6 +913,7 @@ async def login_email(
             user.email_verified_at = datetime.now(UTC)
             await db.commit()
         else:
+            await _record_login_failure(login_key, client_ip)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail='Invalid email or password',
@@ -894,10 +926,12 @@ async def login_email(
         )
 
     if not verify_password(request.password, user.password_hash):
+        await _record_login_failure(login_key, client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Invalid email or password',
         )
+    await rate_limiter.reset(CABINET_LOGIN_FAILURES, login_key)
 
     # Test email bypasses verification check
     if not user.email_verified and not is_test_email:
@@ -1007,6 +1041,7 @@ async def logout(
     if token_record:
         token_record.revoked_at = datetime.now(UTC)
         await db.commit()
+        await invalidate_cabinet_principal(token_record.user_id)
 
     return {'message': 'Logged out successfully'}
 
@@ -1017,6 +1052,11 @@ async def forgot_password(
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Request password reset."""
+    # Same response when throttled, so the limit does not reveal whether the email exists
+    reset_limit = await rate_limiter.hit(CABINET_PASSWORD_RESET, request.email.strip().lower())
+    if not reset_limit.allowed:
+        return {'message': 'If the email exists, a password reset link has been sent'}
+
     result = await db.execute(select(User).where(User.email == request.email))
     user = result.scalar_one_or_none()
 
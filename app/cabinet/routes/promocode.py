@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.models import User
 from app.services.promocode_service import PromoCodeService
+from app.utils.promo_rate_limiter import promo_limiter
 
 from ..dependencies import get_cabinet_db, get_current_cabinet_user
 
@@ -48,11 +49,26 @@ async def activate_promocode(
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Activate a promo code for the current user."""
+    # Limits are shared with the bot and the mini app by Telegram ID; email-only users get their own key
+    limit_key = user.telegram_id or f'cabinet:{user.id}'
+    cooldown = await promo_limiter.get_block_cooldown(limit_key)
+    if cooldown:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f'Too many attempts, try again in {cooldown} seconds',
+        )
+    if not await promo_limiter.can_activate(limit_key):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail='Daily promo code activation limit reached',
+        )
+
     promocode_service = PromoCodeService()
 
     result = await promocode_service.activate_promocode(db=db, user_id=user.id, code=request.code.strip())
 
     if result['success']:
+        await promo_limiter.record_activation(limit_key)
         balance_before_rubles = result.get('balance_before_kopeks', 0) / 100
         balance_after_rubles = result.get('balance_after_kopeks', 0) / 100
 
@@ -77,6 +93,8 @@ async def activate_promocode(
     }
 
     error_code = result.get('error', 'server_error')
+    if error_code == 'not_found':
+        await promo_limiter.record_failed_attempt(limit_key)
     error_message = error_messages.get(error_code, 'Failed to activate promo code')
 
     raise HTTPException(
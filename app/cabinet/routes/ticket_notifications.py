@@ -10,7 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.crud.ticket_notification import TicketNotificationCRUD
 from app.database.models import User
 
-from ..dependencies import get_cabinet_db, get_current_admin_user, get_current_cabinet_user
+from ..dependencies import get_cabinet_db, get_current_admin_user, get_current_cabinet_principal
+from ..services.principal_cache import CabinetPrincipal
 
 
 logger = structlog.get_logger(__name__)
@@ -54,14 +55,14 @@ async def get_user_notifications(
     unread_only: bool = Query(False, description='Only return unread notifications'),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    user: User = Depends(get_current_cabinet_user),
+    principal: CabinetPrincipal = Depends(get_current_cabinet_principal),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Get ticket notifications for current user."""
     notifications = await TicketNotificationCRUD.get_user_notifications(
-        db, user.id, unread_only=unread_only, limit=limit, offset=offset
+        db, principal.user_id, unread_only=unread_only, limit=limit, offset=offset
     )
-    unread_count = await TicketNotificationCRUD.count_unread_user(db, user.id)
+    unread_count = await TicketNotificationCRUD.count_unread_user(db, principal.user_id)
 
     return TicketNotificationListResponse(
         items=[TicketNotificationResponse.model_validate(n) for n in notifications],
@@ -71,18 +72,18 @@ async def get_user_notifications(
 
 @router.get('/unread-count', response_model=UnreadCountResponse)
 async def get_user_unread_count(
-    user: User = Depends(get_current_cabinet_user),
+    principal: CabinetPrincipal = Depends(get_current_cabinet_principal),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Get unread notifications count for current user."""
-    count = await TicketNotificationCRUD.count_unread_user(db, user.id)
+    count = await TicketNotificationCRUD.count_unread_user(db, principal.user_id)
     return UnreadCountResponse(unread_count=count)
 
 
 @router.post('/{notification_id}/read')
 async def mark_notification_as_read(
     notification_id: int,
-    user: User = Depends(get_current_cabinet_user),
+    principal: CabinetPrincipal = Depends(get_current_cabinet_principal),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Mark a notification as read."""
@@ -95,7 +96,7 @@ async def mark_notification_as_read(
         )
 
     # Check ownership: notification must belong to user and not be an admin notification
-    if notification.user_id != user.id or notification.is_for_admin:
+    if notification.user_id != principal.user_id or notification.is_for_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to mark this notification as read",
@@ -107,22 +108,24 @@ async def mark_notification_as_read(
 
 @router.post('/read-all')
 async def mark_all_notifications_as_read(
-    user: User = Depends(get_current_cabinet_user),
+    principal: CabinetPrincipal = Depends(get_current_cabinet_principal),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Mark all notifications as read for current user."""
-    count = await TicketNotificationCRUD.mark_all_as_read_user(db, user.id)
+    count = await TicketNotificationCRUD.mark_all_as_read_user(db, principal.user_id)
     return {'success': True, 'marked_count': count}
 
 
 @router.post('/ticket/{ticket_id}/read')
 async def mark_ticket_notifications_as_read(
     ticket_id: int,
-    user: User = Depends(get_current_cabinet_user),
+    principal: CabinetPrincipal = Depends(get_current_cabinet_principal),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Mark all notifications for a specific ticket as read."""
-    count = await TicketNotificationCRUD.mark_ticket_notifications_as_read(db, ticket_id, user.id, is_admin=False)
+    count = await TicketNotificationCRUD.mark_ticket_notifications_as_read(
+        db, ticket_id, principal.user_id, is_admin=False
+    )
     return {'success': True, 'marked_count': count}
 
 
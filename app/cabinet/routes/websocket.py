@@ -9,6 +9,7 @@ import structlog
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 from app.cabinet.auth.jwt_handler import get_token_payload
+from app.cabinet.services.ws_delivery import LocalWSDeliveryBackend, RedisWSDeliveryBackend
 from app.config import settings
 from app.database.crud.user import get_user_by_id
 from app.database.database import AsyncSessionLocal
@@ -19,27 +20,117 @@ logger = structlog.get_logger(__name__)
 router = APIRouter()
 
 
+class _SocketSender:
+    """Очередь исходящих сообщений одного WebSocket с отдельной задачей отправки."""
+
+    __slots__ = ('_on_failure', '_queue', '_send_timeout', '_task', 'evicted', 'user_id', 'websocket')
+
+    def __init__(self, websocket: WebSocket, user_id: int, queue_size: int, send_timeout: float, on_failure):
+        self.websocket = websocket
+        self.user_id = user_id
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self._send_timeout = send_timeout
+        self._on_failure = on_failure
+        self._task: asyncio.Task | None = None
+        self.evicted = False
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, data: str) -> bool:
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            data = await self._queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(data), timeout=self._send_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('Failed to send to user', user_id=self.user_id, e=e)
+                self._on_failure(self, 'send_failed')
+                return
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done() and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
 class CabinetConnectionManager:
-    """Менеджер WebSocket подключений для кабинета."""
+    """Менеджер WebSocket подключений для кабинета.
+
+    Каждое подключение получает собственную очередь отправки, поэтому медленный
+    клиент не задерживает остальных: при переполнении очереди он отключается.
+    Доставка между репликами выполняется через подключаемый backend.
+    """
+
+    SLOW_CONSUMER_CLOSE_CODE = 1013
 
-    def __init__(self):
-        # user_id -> set of websocket connections
-        self._user_connections: dict[int, set[WebSocket]] = {}
+    def __init__(self, backend: LocalWSDeliveryBackend | None = None):
+        # user_id -> {websocket: sender}
+        self._user_connections: dict[int, dict[WebSocket, _SocketSender]] = {}
         # admin user_ids -> set of websocket connections
         self._admin_connections: dict[int, set[WebSocket]] = {}
         self._lock = asyncio.Lock()
+        self.evicted_count = 0
+        self._backend = LocalWSDeliveryBackend()
+        self._bind_backend(backend or self._backend)
+
+    def _bind_backend(self, backend: LocalWSDeliveryBackend) -> None:
+        backend.bind(self._deliver_to_user, self._deliver_to_admins, self.get_local_presence)
+        self._backend = backend
+
+    @property
+    def backend_name(self) -> str:
+        return self._backend.name
+
+    async def start(self) -> None:
+        """Запустить backend доставки согласно настройкам."""
+        if settings.get_cabinet_ws_delivery_backend() != 'redis':
+            return
+
+        backend = RedisWSDeliveryBackend(settings.REDIS_URL)
+        self._bind_backend(backend)
+        try:
+            await backend.start()
+        except Exception as e:
+            logger.error('Cabinet WS: Redis backend unavailable, falling back to local delivery', e=e)
+            await backend.stop()
+            self._bind_backend(LocalWSDeliveryBackend())
+
+    async def stop(self) -> None:
+        await self._backend.stop()
+        self._bind_backend(LocalWSDeliveryBackend())
 
     async def connect(self, websocket: WebSocket, user_id: int, is_admin: bool) -> None:
         """Зарегистрировать подключение."""
+        sender = _SocketSender(
+            websocket,
+            user_id,
+            queue_size=settings.get_cabinet_ws_send_queue_size(),
+            send_timeout=settings.get_cabinet_ws_send_timeout(),
+            on_failure=self._evict,
+        )
+        sender.start()
+
         async with self._lock:
-            if user_id not in self._user_connections:
-                self._user_connections[user_id] = set()
-            self._user_connections[user_id].add(websocket)
+            first_connection = user_id not in self._user_connections
+            self._user_connections.setdefault(user_id, {})[websocket] = sender
 
             if is_admin:
-                if user_id not in self._admin_connections:
-                    self._admin_connections[user_id] = set()
-                self._admin_connections[user_id].add(websocket)
+                self._admin_connections.setdefault(user_id, set()).add(websocket)
+
+        if first_connection:
+            await self._backend.on_user_connected(user_id)
 
         logger.debug(
             'Cabinet WS connected: user_id is_admin total_users',
@@ -50,72 +141,92 @@ class CabinetConnectionManager:
 
     async def disconnect(self, websocket: WebSocket, user_id: int) -> None:
         """Отменить регистрацию подключения."""
+        sender = None
+        last_connection = False
+
         async with self._lock:
-            if user_id in self._user_connections:
-                self._user_connections[user_id].discard(websocket)
-                if not self._user_connections[user_id]:
+            connections = self._user_connections.get(user_id)
+            if connections is not None:
+                sender = connections.pop(websocket, None)
+                if not connections:
                     del self._user_connections[user_id]
+                    last_connection = True
 
             if user_id in self._admin_connections:
                 self._admin_connections[user_id].discard(websocket)
                 if not self._admin_connections[user_id]:
                     del self._admin_connections[user_id]
 
-        logger.debug('Cabinet WS disconnected: user_id', user_id=user_id)
+        if sender:
+            await sender.stop()
 
-    async def send_to_user(self, user_id: int, message: dict) -> None:
-        """Отправить сообщение конкретному пользователю."""
-        # Snapshot connections under the lock to avoid mutation during iteration
-        async with self._lock:
-            connections = list(self._user_connections.get(user_id, set()))
-
-        if not connections:
-            return
+        if last_connection:
+            await self._backend.on_user_disconnected(user_id)
 
-        disconnected = set()
-        data = json.dumps(message, default=str, ensure_ascii=False)
+        logger.debug('Cabinet WS disconnected: user_id', user_id=user_id)
 
-        for ws in connections:
-            try:
-                await ws.send_text(data)
-            except Exception as e:
-                logger.warning('Failed to send to user', user_id=user_id, e=e)
-                disconnected.add(ws)
+    def _evict(self, sender: _SocketSender, reason: str) -> None:
+        if sender.evicted:
+            return
+        sender.evicted = True
+        self.evicted_count += 1
+        logger.warning('Cabinet WS: evicting connection', user_id=sender.user_id, reason=reason)
+        asyncio.create_task(self._close_evicted(sender))
+
+    async def _close_evicted(self, sender: _SocketSender) -> None:
+        await self.disconnect(sender.websocket, sender.user_id)
+        try:
+            await sender.websocket.close(code=self.SLOW_CONSUMER_CLOSE_CODE, reason='Slow consumer')
+        except Exception:
+            pass
+
+    def _enqueue(self, senders: list[_SocketSender], data: str) -> None:
+        for sender in senders:
+            if not sender.enqueue(data):
+                self._evict(sender, 'queue_full')
+
+    async def _deliver_to_user(self, user_id: int, data: str) -> None:
+        self._enqueue(list(self._user_connections.get(user_id, {}).values()), data)
+
+    async def _deliver_to_admins(self, data: str) -> None:
+        senders = []
+        for user_id, websockets in self._admin_connections.items():
+            user_senders = self._user_connections.get(user_id, {})
+            senders.extend(user_senders[ws] for ws in websockets if ws in user_senders)
+        self._enqueue(senders, data)
+
+    async def send_to_socket(self, websocket: WebSocket, user_id: int, message: dict) -> None:
+        """Отправить сообщение в конкретное подключение через его очередь."""
+        sender = self._user_connections.get(user_id, {}).get(websocket)
+        if sender:
+            self._enqueue([sender], json.dumps(message, default=str, ensure_ascii=False))
 
-        # Cleanup disconnected
-        if disconnected:
-            async with self._lock:
-                for ws in disconnected:
-                    self._user_connections.get(user_id, set()).discard(ws)
+    async def send_to_user(self, user_id: int, message: dict) -> None:
+        """Отправить сообщение конкретному пользователю."""
+        await self._backend.publish_to_user(user_id, json.dumps(message, default=str, ensure_ascii=False))
 
     async def send_to_admins(self, message: dict) -> None:
         """Отправить сообщение всем админам."""
-        # Snapshot connections under the lock to avoid mutation during iteration
-        async with self._lock:
-            if not self._admin_connections:
-                return
-            # Create a snapshot: list of (user_id, list of websockets)
-            admin_snapshot = [(user_id, list(connections)) for user_id, connections in self._admin_connections.items()]
-
-        data = json.dumps(message, default=str, ensure_ascii=False)
-        disconnected_by_user: dict[int, set[WebSocket]] = {}
-
-        for user_id, connections in admin_snapshot:
-            for ws in connections:
-                try:
-                    await ws.send_text(data)
-                except Exception as e:
-                    logger.warning('Failed to send to admin', user_id=user_id, e=e)
-                    if user_id not in disconnected_by_user:
-                        disconnected_by_user[user_id] = set()
-                    disconnected_by_user[user_id].add(ws)
-
-        # Cleanup disconnected
-        if disconnected_by_user:
-            async with self._lock:
-                for user_id, ws_set in disconnected_by_user.items():
-                    for ws in ws_set:
-                        self._admin_connections.get(user_id, set()).discard(ws)
+        await self._backend.publish_to_admins(json.dumps(message, default=str, ensure_ascii=False))
+
+    def get_local_presence(self) -> dict[int, int]:
+        """Количество подключений каждого пользователя в текущем процессе."""
+        return {user_id: len(connections) for user_id, connections in self._user_connections.items()}
+
+    async def get_presence_counts(self) -> dict[str, int]:
+        """Сводка присутствия по всем репликам."""
+        presence = await self._backend.get_presence()
+        return {
+            'users': sum(1 for count in presence.values() if count > 0),
+            'connections': sum(presence.values()),
+            'local_connections': sum(self.get_local_presence().values()),
+            'evicted': self.evicted_count,
+        }
+
+    async def is_user_online(self, user_id: int) -> bool:
+        if user_id in self._user_connections:
+            return True
+        return (await self._backend.get_presence()).get(user_id, 0) > 0
 
 
 # Глобальный менеджер подключений
@@ -194,12 +305,14 @@ async def cabinet_websocket_endpoint(websocket: WebSocket):
 
     try:
         # Приветственное сообщение
-        await websocket.send_json(
+        await cabinet_ws_manager.send_to_socket(
+            websocket,
+            user_id,
             {
                 'type': 'connected',
                 'user_id': user_id,
                 'is_admin': is_admin,
-            }
+            },
         )
 
         # Обрабатываем входящие сообщения
@@ -210,7 +323,7 @@ async def cabinet_websocket_endpoint(websocket: WebSocket):
 
                 # Ping/pong для keepalive
                 if message.get('type') == 'ping':
-                    await websocket.send_json({'type': 'pong'})
+                    await cabinet_ws_manager.send_to_socket(websocket, user_id, {'type': 'pong'})
 
             except json.JSONDecodeError:
                 logger.warning('Cabinet WS: Invalid JSON from user', user_id=user_id)
@@ -0,0 +1,169 @@
+"""Short-lived cache of authenticated cabinet principals.
+
+A principal is the identity part of a cabinet request: user status, admin
+flag and blacklist verdict, keyed by user ID and access token ID. Entries of
+one user live in a single Redis hash, so a ban, unban, status change or logout
+drops all of them with one delete.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import structlog
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import User
+from app.utils.cache import cache, cache_key
+
+
+logger = structlog.get_logger(__name__)
+
+PRINCIPAL_KEY_PREFIX = 'cabinet:principal'
+
+# Изменение любого из этих полей пользователя меняет вердикт авторизации
+_PRINCIPAL_FIELDS = ('status', 'telegram_id', 'username', 'email', 'email_verified')
+_SESSION_INFO_KEY = 'cabinet_principal_invalidate'
+
+_pending_invalidations: set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True, slots=True)
+class CabinetPrincipal:
+    """Identity of an authenticated cabinet user without the ORM object."""
+
+    user_id: int
+    telegram_id: int | None
+    username: str | None
+    email: str | None
+    status: str
+    is_admin: bool
+    is_blacklisted: bool
+    blacklist_reason: str | None
+    cached_at: float
+
+    @property
+    def is_active(self) -> bool:
+        return self.status == 'active'
+
+
+def _principal_key(user_id: int) -> str:
+    return cache_key(PRINCIPAL_KEY_PREFIX, user_id)
+
+
+def get_token_id(payload: dict[str, Any]) -> str:
+    """Return the token ID of an access token payload.
+
+    Tokens issued before ``jti`` was added fall back to their issue time.
+    """
+    return str(payload.get('jti') or payload.get('iat') or '')
+
+
+async def build_principal(user: User) -> CabinetPrincipal:
+    """Build a principal from a loaded user, resolving the blacklist verdict."""
+    from app.services.blacklist_service import blacklist_service
+
+    is_blacklisted, reason = False, None
+    if user.telegram_id is not None:
+        is_blacklisted, reason = await blacklist_service.is_user_blacklisted(user.telegram_id, user.username)
+
+    verified_email = user.email if user.email_verified else None
+    return CabinetPrincipal(
+        user_id=user.id,
+        telegram_id=user.telegram_id,
+        username=user.username,
+        email=verified_email,
+        status=user.status,
+        is_admin=settings.is_admin(telegram_id=user.telegram_id, email=verified_email),
+        is_blacklisted=is_blacklisted,
+        blacklist_reason=reason,
+        cached_at=time.time(),
+    )
+
+
+async def get_cached_principal(user_id: int, token_id: str) -> CabinetPrincipal | None:
+    """Return a fresh cached principal or None on miss, expiry or Redis outage."""
+    ttl = settings.get_cabinet_principal_cache_ttl()
+    if not ttl or not token_id:
+        return None
+
+    raw = await cache.get_hash(_principal_key(user_id), token_id)
+    if not raw:
+        return None
+
+    try:
+        principal = CabinetPrincipal(**json.loads(raw))
+    except (TypeError, ValueError) as e:
+        logger.debug('Cabinet principal cache: broken entry', user_id=user_id, error=e)
+        return None
+
+    if time.time() - principal.cached_at > ttl:
+        return None
+    return principal
+
+
+async def store_principal(principal: CabinetPrincipal, token_id: str) -> None:
+    ttl = settings.get_cabinet_principal_cache_ttl()
+    if not ttl or not token_id:
+        return
+    await cache.set_hash(
+        _principal_key(principal.user_id),
+        {token_id: json.dumps(asdict(principal))},
+        expire=ttl,
+    )
+
+
+async def invalidate_cabinet_principal(user_id: int) -> None:
+    """Drop every cached principal of a user."""
+    await cache.delete(_principal_key(user_id))
+
+
+async def invalidate_all_cabinet_principals() -> None:
+    """Drop all cached principals, e.g. after the blacklist was reloaded."""
+    await cache.delete_pattern(f'{PRINCIPAL_KEY_PREFIX}:*')
+
+
+async def _invalidate_many(user_ids: set[int]) -> None:
+    for user_id in user_ids:
+        await invalidate_cabinet_principal(user_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_principal_changes(session: Session, flush_context) -> None:
+    """Remember users whose auth-relevant fields were flushed in this transaction."""
+    changed: set[int] | None = None
+    for obj in (*session.dirty, *session.deleted):
+        if not isinstance(obj, User) or obj.id is None:
+            continue
+        state = inspect(obj)
+        if obj in session.deleted or any(state.attrs[field].history.has_changes() for field in _PRINCIPAL_FIELDS):
+            if changed is None:
+                changed = session.info.setdefault(_SESSION_INFO_KEY, set())
+            changed.add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session) -> None:
+    user_ids = session.info.pop(_SESSION_INFO_KEY, None)
+    if not user_ids:
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    task = loop.create_task(_invalidate_many(user_ids))
+    _pending_invalidations.add(task)
+    task.add_done_callback(_pending_invalidations.discard)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
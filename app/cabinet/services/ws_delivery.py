@@ -0,0 +1,224 @@
+"""Доставка WebSocket-уведомлений кабинета.
+
+Локальный backend передаёт сообщения сразу подключениям текущего процесса.
+Redis backend публикует их в pub/sub каналы пользователей и админов, и каждая
+реплика сама доставляет их в свои сокеты.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as redis
+import structlog
+
+
+logger = structlog.get_logger(__name__)
+
+UserDeliverer = Callable[[int, str], Awaitable[None]]
+AdminDeliverer = Callable[[str], Awaitable[None]]
+PresenceSource = Callable[[], dict[int, int]]
+
+
+class LocalWSDeliveryBackend:
+    """Доставка только в подключения текущего процесса."""
+
+    name = 'local'
+
+    def __init__(self):
+        self._deliver_to_user: UserDeliverer | None = None
+        self._deliver_to_admins: AdminDeliverer | None = None
+        self._presence_source: PresenceSource | None = None
+
+    def bind(
+        self,
+        deliver_to_user: UserDeliverer,
+        deliver_to_admins: AdminDeliverer,
+        presence_source: PresenceSource,
+    ) -> None:
+        self._deliver_to_user = deliver_to_user
+        self._deliver_to_admins = deliver_to_admins
+        self._presence_source = presence_source
+
+    async def start(self) -> None:
+        return None
+
+    async def stop(self) -> None:
+        return None
+
+    async def publish_to_user(self, user_id: int, data: str) -> None:
+        await self._deliver_to_user(user_id, data)
+
+    async def publish_to_admins(self, data: str) -> None:
+        await self._deliver_to_admins(data)
+
+    async def on_user_connected(self, user_id: int) -> None:
+        """Вызывается при первом локальном подключении пользователя."""
+
+    async def on_user_disconnected(self, user_id: int) -> None:
+        """Вызывается, когда закрыто последнее локальное подключение пользователя."""
+
+    async def get_presence(self) -> dict[int, int]:
+        return dict(self._presence_source()) if self._presence_source else {}
+
+
+class RedisWSDeliveryBackend(LocalWSDeliveryBackend):
+    """Рассылка сообщений всем репликам через Redis pub/sub.
+
+    Каждая реплика подписана на канал админов и на каналы пользователей, у
+    которых сейчас есть сокет на ней. Присутствие хранится по репликам в хешах с
+    TTL, поэтому счётчики упавшей реплики истекают сами.
+    """
+
+    name = 'redis'
+
+    USER_CHANNEL_PREFIX = 'cabinet:ws:user:'
+    ADMIN_CHANNEL = 'cabinet:ws:admins'
+    PRESENCE_KEY_PREFIX = 'cabinet:ws:presence:'
+    PRESENCE_TTL_SECONDS = 45
+    PRESENCE_REFRESH_SECONDS = 15
+
+    def __init__(self, redis_url: str):
+        super().__init__()
+        self._redis_url = redis_url
+        self._redis: redis.Redis | None = None
+        self._pubsub = None
+        self._listener_task: asyncio.Task | None = None
+        self._presence_task: asyncio.Task | None = None
+        self.instance_id = uuid.uuid4().hex[:12]
+
+    @property
+    def _presence_key(self) -> str:
+        return f'{self.PRESENCE_KEY_PREFIX}{self.instance_id}'
+
+    async def start(self) -> None:
+        self._redis = redis.from_url(self._redis_url)
+        await self._redis.ping()
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.ADMIN_CHANNEL)
+
+        if self._presence_source:
+            channels = [self._user_channel(user_id) for user_id in self._presence_source()]
+            if channels:
+                await self._pubsub.subscribe(*channels)
+
+        self._listener_task = asyncio.create_task(self._listen())
+        self._presence_task = asyncio.create_task(self._presence_loop())
+        logger.info('Cabinet WS: доставка через Redis pub/sub запущена', instance_id=self.instance_id)
+
+    async def stop(self) -> None:
+        for task in (self._listener_task, self._presence_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._listener_task = None
+        self._presence_task = None
+
+        if self._redis:
+            try:
+                await self._redis.delete(self._presence_key)
+            except Exception as e:
+                logger.debug('Cabinet WS: не удалось удалить ключ присутствия', error=e)
+
+        if self._pubsub:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.debug('Cabinet WS: не удалось закрыть pub/sub', error=e)
+            self._pubsub = None
+
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+
+    def _user_channel(self, user_id: int) -> str:
+        return f'{self.USER_CHANNEL_PREFIX}{user_id}'
+
+    async def publish_to_user(self, user_id: int, data: str) -> None:
+        try:
+            await self._redis.publish(self._user_channel(user_id), data)
+        except Exception as e:
+            logger.warning('Cabinet WS: ошибка публикации в Redis, доставляем локально', user_id=user_id, error=e)
+            await super().publish_to_user(user_id, data)
+
+    async def publish_to_admins(self, data: str) -> None:
+        try:
+            await self._redis.publish(self.ADMIN_CHANNEL, data)
+        except Exception as e:
+            logger.warning('Cabinet WS: ошибка публикации в Redis, доставляем локально', error=e)
+            await super().publish_to_admins(data)
+
+    async def on_user_connected(self, user_id: int) -> None:
+        try:
+            await self._pubsub.subscribe(self._user_channel(user_id))
+        except Exception as e:
+            logger.warning('Cabinet WS: не удалось подписаться на канал пользователя', user_id=user_id, error=e)
+
+    async def on_user_disconnected(self, user_id: int) -> None:
+        try:
+            await self._pubsub.unsubscribe(self._user_channel(user_id))
+        except Exception as e:
+            logger.debug('Cabinet WS: не удалось отписаться от канала пользователя', user_id=user_id, error=e)
+
+    async def get_presence(self) -> dict[int, int]:
+        presence: dict[int, int] = {}
+        try:
+            async for key in self._redis.scan_iter(match=f'{self.PRESENCE_KEY_PREFIX}*', count=100):
+                for raw_user_id, raw_count in (await self._redis.hgetall(key)).items():
+                    user_id = int(raw_user_id)
+                    presence[user_id] = presence.get(user_id, 0) + int(raw_count)
+        except Exception as e:
+            logger.warning('Cabinet WS: не удалось прочитать присутствие из Redis', error=e)
+            return await super().get_presence()
+        return presence
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('Cabinet WS: ошибка чтения Redis pub/sub', error=e)
+                await asyncio.sleep(1)
+                continue
+
+            if not message or message.get('type') != 'message':
+                continue
+
+            channel = message['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            data = message['data']
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+
+            try:
+                if channel == self.ADMIN_CHANNEL:
+                    await self._deliver_to_admins(data)
+                elif channel.startswith(self.USER_CHANNEL_PREFIX):
+                    await self._deliver_to_user(int(channel.removeprefix(self.USER_CHANNEL_PREFIX)), data)
+            except Exception as e:
+                logger.error('Cabinet WS: ошибка локальной доставки', channel=channel, error=e)
+
+    async def _presence_loop(self) -> None:
+        while True:
+            try:
+                counts = self._presence_source() if self._presence_source else {}
+                async with self._redis.pipeline(transaction=True) as pipe:
+                    pipe.delete(self._presence_key)
+                    if counts:
+                        pipe.hset(self._presence_key, mapping={str(k): v for k, v in counts.items()})
+                        pipe.expire(self._presence_key, self.PRESENCE_TTL_SECONDS)
+                    await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('Cabinet WS: не удалось обновить присутствие', error=e)
+
+            await asyncio.sleep(self.PRESENCE_REFRESH_SECONDS)
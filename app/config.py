@@ -11,7 +11,7 @@ from urllib.parse import urlparse
 from zoneinfo import ZoneInfo
 
 import structlog
-from pydantic import Field, field_validator
+from pydantic import Field, PrivateAttr, field_validator
 from pydantic_settings import BaseSettings
 
 
@@ -62,11 +62,17 @@ class Settings(BaseSettings):
     NALOGO_QUEUE_CHECK_INTERVAL: int = 300  # Интервал проверки очереди (секунды)
     NALOGO_QUEUE_RECEIPT_DELAY: int = 3  # Задержка между отправкой чеков (секунды)
     NALOGO_QUEUE_MAX_ATTEMPTS: int = 10  # Максимум попыток отправки чека
+    NALOGO_QUEUE_CONCURRENCY: int = 3  # Сколько чеков из очереди отправляется одновременно
+    NALOGO_QUEUE_BATCH_SIZE: int = 20  # Сколько чеков забирается из очереди за один проход
+    NALOGO_INCOME_INDEX_TTL: int = 600  # Время жизни загруженного списка чеков за день (секунды)
 
     ADMIN_REPORTS_ENABLED: bool = False
     ADMIN_REPORTS_CHAT_ID: str | None = None
     ADMIN_REPORTS_TOPIC_ID: int | None = None
     ADMIN_REPORTS_SEND_TIME: str | None = None
+    ADMIN_USER_CARD_CACHE_TTL_SECONDS: int = (
+        30  # сколько секунд кешировать счётчики и данные панели в карточке пользователя
+    )
 
     CHANNEL_SUB_ID: str | None = None
     CHANNEL_LINK: str | None = None
@@ -91,6 +97,9 @@ class Settings(BaseSettings):
 
     REDIS_URL: str = 'redis://localhost:6379/0'
     CART_TTL_SECONDS: int = 3600  # Время жизни корзины пользователя в Redis (1 час)
+    SETTINGS_BROADCAST_ENABLED: bool = True  # Рассылать изменения настроек из админки другим процессам
+    RATE_LIMIT_BACKEND: str = 'memory'  # memory - лимиты в каждом процессе, redis - общие для всех реплик
+    RATE_LIMIT_MAX_KEYS: int = 100000  # Максимум окон в памяти процесса, старые вытесняются
 
     REMNAWAVE_API_URL: str | None = None
     REMNAWAVE_API_KEY: str | None = None
@@ -111,6 +120,9 @@ class Settings(BaseSettings):
     REMNAWAVE_WEBHOOK_ENABLED: bool = False
     REMNAWAVE_WEBHOOK_PATH: str = '/remnawave-webhook'
     REMNAWAVE_WEBHOOK_SECRET: str | None = None  # HMAC-SHA256 shared secret (min 32 chars)
+    REMNAWAVE_WEBHOOK_WORKERS: int = 4  # concurrent per-user sequences processed from the inbox
+    REMNAWAVE_WEBHOOK_BATCH_SIZE: int = 100
+    REMNAWAVE_WEBHOOK_INBOX_RETENTION_HOURS: int = 72
 
     # Webhook user notification toggles (what Telegram messages users receive from webhook events)
     WEBHOOK_NOTIFY_USER_ENABLED: bool = True
@@ -145,6 +157,7 @@ class Settings(BaseSettings):
     NOTIFICATION_RETRY_ATTEMPTS: int = 3
 
     MONITORING_LOGS_RETENTION_DAYS: int = 30
+    SUPPORT_AUDIT_LOGS_RETENTION_DAYS: int = 365  # хранить аудит модераторов N дней (0 — бессрочно)
     NOTIFICATION_CACHE_HOURS: int = 24
 
     SERVER_STATUS_MODE: str = 'disabled'
@@ -180,6 +193,7 @@ class Settings(BaseSettings):
     TRAFFIC_PACKAGES_CONFIG: str = ''
 
     PRICE_PER_DEVICE: int = 5000
+    SERVER_SQUAD_CATALOG_TTL_SECONDS: int = 60  # как часто перечитывать цены серверов из БД (изменения других реплик)
     DEVICES_SELECTION_ENABLED: bool = True
     DEVICES_SELECTION_DISABLED_AMOUNT: int | None = None
 
@@ -227,6 +241,12 @@ class Settings(BaseSettings):
     REFERRAL_NOTIFICATIONS_ENABLED: bool = True
     REFERRAL_NOTIFICATION_RETRY_ATTEMPTS: int = 3
 
+    # Журнал переходов по реф-ссылкам (referral_click_events) для диагностики
+    REFERRAL_CLICK_FLUSH_INTERVAL_SECONDS: float = 5.0  # как часто буфер пишется в БД
+    REFERRAL_CLICK_BATCH_SIZE: int = 500  # записей в одной вставке; полный буфер пишется сразу
+    REFERRAL_CLICK_BUFFER_MAX_SIZE: int = 10000  # при недоступной БД самые старые записи вытесняются
+    REFERRAL_CLICK_RETENTION_DAYS: int = 180  # хранить переходы N дней (в PostgreSQL — помесячно)
+
     # Настройки вывода реферального баланса
     REFERRAL_WITHDRAWAL_ENABLED: bool = False  # Включить возможность вывода
     REFERRAL_WITHDRAWAL_MIN_AMOUNT_KOPEKS: int = 100000  # Мин. сумма вывода (1000₽)
@@ -249,6 +269,7 @@ class Settings(BaseSettings):
     CONTESTS_BUTTON_VISIBLE: bool = False
     # Для обратной совместимости со старыми конфигами
     REFERRAL_CONTESTS_ENABLED: bool = False
+    CONTESTS_LEADERBOARD_RECONCILE_MINUTES: int = 15  # Как часто лидерборд в Redis сверяется с БД
 
     BLACKLIST_CHECK_ENABLED: bool = False
     BLACKLIST_GITHUB_URL: str | None = None
@@ -294,6 +315,9 @@ class Settings(BaseSettings):
     TRAFFIC_CHECK_CONCURRENCY: int = 10  # Параллельных запросов
     TRAFFIC_NOTIFICATION_COOLDOWN_MINUTES: int = 60  # Кулдаун уведомлений (минуты)
     TRAFFIC_SNAPSHOT_TTL_HOURS: int = 24  # TTL для snapshot трафика в Redis (часы)
+    # Учёт трафика по вебхукам Remnawave: полный опрос панели остаётся редкой сверкой
+    TRAFFIC_WEBHOOK_TRACKING_ENABLED: bool = True
+    TRAFFIC_RECONCILE_INTERVAL_MINUTES: int = 60  # Интервал полной сверки при учёте по вебхукам
     # Настройки суточных подписок
     DAILY_SUBSCRIPTIONS_ENABLED: bool = True  # Включить автоматическое списание для суточных тарифов
     DAILY_SUBSCRIPTIONS_CHECK_INTERVAL_MINUTES: int = 30  # Интервал проверки в минутах
@@ -349,6 +373,12 @@ class Settings(BaseSettings):
     SUPPORT_TOPUP_ENABLED: bool = True
     PAYMENT_VERIFICATION_AUTO_CHECK_ENABLED: bool = False
     PAYMENT_VERIFICATION_AUTO_CHECK_INTERVAL_MINUTES: int = 10
+    # Очередь входящих платёжных callback-ов: ответ шлюзу сразу, зачисление в фоне
+    PAYMENT_WEBHOOK_INBOX_ENABLED: bool = True
+    PAYMENT_WEBHOOK_WORKERS: int = 4
+    PAYMENT_WEBHOOK_BATCH_SIZE: int = 50
+    PAYMENT_WEBHOOK_MAX_ATTEMPTS: int = 5
+    PAYMENT_WEBHOOK_INBOX_RETENTION_HOURS: int = 168
 
     NALOGO_ENABLED: bool = False
     NALOGO_INN: str | None = None
@@ -554,6 +584,11 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = 'INFO'
     LOG_FILE: str = 'logs/bot.log'
     LOG_COLORS: bool = True  # ANSI-цвета в консоли (false для plain-text вывода)
+    LOG_QUEUE_MAX_SIZE: int = 10000  # записей в очереди логов; при переполнении новые отбрасываются
+    LOG_QUEUE_BATCH_SIZE: int = 256  # сколько записей фоновый поток пишет за один сброс в файлы
+    LOG_TELEGRAM_DIGEST_WINDOW_SECONDS: float = 60.0  # раз в сколько секунд ошибки из логов уходят сводкой в чат
+    LOG_TELEGRAM_MAX_MESSAGES_PER_MINUTE: int = 2  # жёсткий предел сводок в минуту
+    LOG_TELEGRAM_DIGEST_MAX_ERRORS: int = 50  # разных ошибок в одной сводке; остальные только считаются
 
     # === Log Rotation Settings ===
     LOG_ROTATION_ENABLED: bool = False  # По умолчанию старое поведение
@@ -659,9 +694,16 @@ class Settings(BaseSettings):
     WEBHOOK_SECRET_TOKEN: str | None = None
     WEBHOOK_DROP_PENDING_UPDATES: bool = True
     WEBHOOK_MAX_QUEUE_SIZE: int = 1024
-    WEBHOOK_WORKERS: int = 4
+    WEBHOOK_WORKERS: int = 4  # Шарды обработки update, порядок сохраняется в пределах чата
     WEBHOOK_ENQUEUE_TIMEOUT: float = 0.1
     WEBHOOK_WORKER_SHUTDOWN_TIMEOUT: float = 30.0
+    WEBHOOK_INGRESS_MODE: str = 'queue'  # queue (очередь процесса) | redis_stream (общий стрим для реплик)
+    WEBHOOK_STREAM_KEY: str = 'telegram:updates'
+    WEBHOOK_STREAM_GROUP: str = 'bot-workers'
+    WEBHOOK_STREAM_MAXLEN: int = 100000
+    WEBHOOK_STREAM_BATCH_SIZE: int = 50
+    WEBHOOK_STREAM_CLAIM_IDLE_SECONDS: float = 60.0
+    WEBHOOK_STREAM_DEDUP_TTL_SECONDS: int = 86400
     BOT_RUN_MODE: str = 'polling'
 
     WEB_API_ENABLED: bool = False
@@ -678,6 +720,9 @@ class Settings(BaseSettings):
     WEB_API_TOKEN_HMAC_SECRET: str | None = None
     WEB_API_REQUEST_LOGGING: bool = True
 
+    METRICS_ENABLED: bool = False  # метрики Prometheus на /metrics единого веб-сервера
+    METRICS_TOKEN: str | None = None  # обязателен для /metrics: Authorization: Bearer <токен>
+
     APP_CONFIG_PATH: str = 'app-config.json'
     ENABLE_DEEP_LINKS: bool = True
     APP_CONFIG_CACHE_TTL: int = 3600
@@ -713,6 +758,11 @@ class Settings(BaseSettings):
     CABINET_EMAIL_CHANGE_CODE_EXPIRE_MINUTES: int = 15  # Email change verification code expiration
     CABINET_EMAIL_AUTH_ENABLED: bool = True  # Enable email registration/login in cabinet
     CABINET_URL: str = 'https://example.com/cabinet'  # Base URL for cabinet (used in verification emails)
+    CABINET_WS_DELIVERY_BACKEND: str = 'local'  # local | redis (pub/sub между репликами)
+    CABINET_WS_SEND_QUEUE_SIZE: int = 100  # Очередь исходящих сообщений на одно WS-подключение
+    CABINET_WS_SEND_TIMEOUT_SECONDS: float = 5.0  # Медленный клиент отключается по таймауту отправки
+    CABINET_PRINCIPAL_CACHE_TTL_SECONDS: int = 30  # Кеш статуса/админ-флага/блэклиста по токену, 0 - выключен
+    CABINET_TRUSTED_PROXY_NETWORKS: str = ''  # Сети reverse proxy, которым верим X-Forwarded-For/X-Real-IP
 
     # OAuth 2.0 provider settings for cabinet
     OAUTH_GOOGLE_CLIENT_ID: str = ''
@@ -883,40 +933,46 @@ class Settings(BaseSettings):
         Returns:
             True if user is admin
         """
-        if telegram_id and telegram_id in self.get_admin_ids():
+        if telegram_id and telegram_id in self._get_derived('admin_id_set', lambda: frozenset(self.get_admin_ids())):
             return True
-        if email and email.lower() in [e.lower() for e in self.get_admin_emails()]:
+        if email and email.lower() in self._get_derived('admin_email_set', lambda: frozenset(self.get_admin_emails())):
             return True
         return False
 
     def get_admin_ids(self) -> list[int]:
+        return list(self._get_derived('admin_ids', self._parse_admin_ids))
+
+    def _parse_admin_ids(self) -> tuple[int, ...]:
         try:
             admin_ids = self.ADMIN_IDS
 
             if isinstance(admin_ids, str):
                 if not admin_ids.strip():
-                    return []
-                return [int(x.strip()) for x in admin_ids.split(',') if x.strip()]
+                    return ()
+                return tuple(int(x.strip()) for x in admin_ids.split(',') if x.strip())
 
-            return []
+            return ()
 
         except (ValueError, AttributeError):
-            return []
+            return ()
 
     def get_admin_emails(self) -> list[str]:
         """Get list of admin emails for email-only users."""
+        return list(self._get_derived('admin_emails', self._parse_admin_emails))
+
+    def _parse_admin_emails(self) -> tuple[str, ...]:
         try:
             admin_emails = self.ADMIN_EMAILS
 
             if isinstance(admin_emails, str):
                 if not admin_emails.strip():
-                    return []
-                return [e.strip().lower() for e in admin_emails.split(',') if e.strip()]
+                    return ()
+                return tuple(e.strip().lower() for e in admin_emails.split(',') if e.strip())
 
-            return []
+            return ()
 
         except (ValueError, AttributeError):
-            return []
+            return ()
 
     def get_test_email(self) -> str | None:
         """Get test email for development/testing."""
@@ -1111,7 +1167,12 @@ class Settings(BaseSettings):
         return parsed
 
     def get_remnawave_auto_sync_times(self) -> list[time]:
-        return self.parse_daily_time_list(self.REMNAWAVE_AUTO_SYNC_TIMES)
+        return list(
+            self._get_derived(
+                'remnawave_auto_sync_times',
+                lambda: tuple(self.parse_daily_time_list(self.REMNAWAVE_AUTO_SYNC_TIMES)),
+            )
+        )
 
     def is_remnawave_webhook_enabled(self) -> bool:
         return (
@@ -2143,6 +2204,9 @@ class Settings(BaseSettings):
         return self.REFERRAL_NOTIFICATIONS_ENABLED
 
     def get_traffic_packages(self) -> list[dict]:
+        return [dict(package) for package in self._get_derived('traffic_packages', self._parse_traffic_packages)]
+
+    def _parse_traffic_packages(self) -> list[dict]:
         try:
             packages = []
             config_str = self.TRAFFIC_PACKAGES_CONFIG.strip()
@@ -2223,7 +2287,13 @@ class Settings(BaseSettings):
         ]
 
     def get_traffic_price(self, gb: int | None) -> int:
-        packages = self.get_traffic_packages()
+        prices = self._get_derived('traffic_prices', dict)
+        if gb not in prices:
+            prices[gb] = self._calculate_traffic_price(gb)
+        return prices[gb]
+
+    def _calculate_traffic_price(self, gb: int | None) -> int:
+        packages = self._get_derived('traffic_packages', self._parse_traffic_packages)
         enabled_packages = [pkg for pkg in packages if pkg['enabled']]
 
         if not enabled_packages:
@@ -2431,6 +2501,13 @@ class Settings(BaseSettings):
             timeout = 30.0
         return max(1.0, timeout)
 
+    def get_webhook_ingress_mode(self) -> str:
+        mode = (self.WEBHOOK_INGRESS_MODE or 'queue').strip().lower()
+        return mode if mode in {'queue', 'redis_stream'} else 'queue'
+
+    def is_webhook_stream_ingress_enabled(self) -> bool:
+        return self.get_webhook_ingress_mode() == 'redis_stream'
+
     def get_telegram_webhook_url(self) -> str | None:
         base_url = (self.WEBHOOK_URL or '').strip()
         if not base_url:
@@ -2479,6 +2556,22 @@ class Settings(BaseSettings):
     def is_cabinet_email_auth_enabled(self) -> bool:
         return bool(self.CABINET_EMAIL_AUTH_ENABLED)
 
+    def get_cabinet_ws_delivery_backend(self) -> str:
+        backend = (self.CABINET_WS_DELIVERY_BACKEND or 'local').strip().lower()
+        return backend if backend in {'local', 'redis'} else 'local'
+
+    def get_cabinet_ws_send_queue_size(self) -> int:
+        return max(1, self.CABINET_WS_SEND_QUEUE_SIZE)
+
+    def get_cabinet_ws_send_timeout(self) -> float:
+        return max(0.1, float(self.CABINET_WS_SEND_TIMEOUT_SECONDS))
+
+    def get_cabinet_principal_cache_ttl(self) -> int:
+        return max(0, self.CABINET_PRINCIPAL_CACHE_TTL_SECONDS)
+
+    def get_cabinet_trusted_proxy_networks(self) -> list[str]:
+        return [n.strip() for n in (self.CABINET_TRUSTED_PROXY_NETWORKS or '').split(',') if n.strip()]
+
     def is_smtp_configured(self) -> bool:
         # For servers without AUTH, only host and from_email are required
         has_from = bool(self.SMTP_FROM_EMAIL or self.SMTP_USER)
@@ -2543,6 +2636,26 @@ class Settings(BaseSettings):
 
     model_config = {'env_file': '.env', 'env_file_encoding': 'utf-8', 'extra': 'ignore'}
 
+    # Значения, вычисляемые из полей (ID админов, пакеты трафика, расписания),
+    # строятся один раз на версию настроек. Любое присваивание поля начинает новую версию.
+    _version: int = PrivateAttr(default=0)
+    _derived: dict = PrivateAttr(default_factory=dict)
+
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self._version += 1
+            self._derived.clear()
+
+    def get_settings_version(self) -> int:
+        return self._version
+
+    def _get_derived(self, name: str, builder):
+        derived = self._derived
+        if name not in derived:
+            derived[name] = builder()
+        return derived[name]
+
     @field_validator('TIMEZONE')
     @classmethod
     def validate_timezone(cls, value: str) -> str:
@@ -170,29 +170,85 @@ async def add_contest_event(
     db.add(event)
     await db.commit()
     await db.refresh(event)
+    await _leaderboard_store().record_event(contest_id, event.id, referrer_id, amount_kopeks)
     return event
 
 
-async def get_contest_leaderboard(
-    db: AsyncSession,
-    contest_id: int,
-    *,
-    limit: int | None = None,
-) -> Sequence[tuple[User, int, int]]:
-    """Получить лидерборд конкурса.
+def _leaderboard_store():
+    from app.services.contest_leaderboard import contest_leaderboard_store
 
-    Учитывает только рефералов, зарегистрированных В ПЕРИОД конкурса.
-    """
-    contest = await get_referral_contest(db, contest_id)
-    if not contest:
-        return []
+    return contest_leaderboard_store
 
-    # Нормализуем границы дат
-    contest_start = contest.start_at
+
+def _contest_bounds(contest: ReferralContest) -> tuple[datetime, datetime]:
     contest_end = contest.end_at
     if contest_end.hour == 0 and contest_end.minute == 0 and contest_end.second == 0:
         contest_end = contest_end.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return contest.start_at, contest_end
+
 
+async def _load_leaderboard_entries(db: AsyncSession, contest: ReferralContest) -> tuple[list, list]:
+    """События и виртуальные участники конкурса из БД для пересборки лидерборда в Redis."""
+    from app.services.contest_leaderboard import ContestEventScore, LeaderboardEntry
+
+    contest_start, contest_end = _contest_bounds(contest)
+    result = await db.execute(
+        select(
+            ReferralContestEvent.id,
+            ReferralContestEvent.referrer_id,
+            func.coalesce(ReferralContestEvent.amount_kopeks, 0),
+        )
+        .join(User, User.id == ReferralContestEvent.referrer_id)
+        .where(
+            and_(
+                ReferralContestEvent.contest_id == contest.id,
+                ReferralContestEvent.occurred_at >= contest_start,
+                ReferralContestEvent.occurred_at <= contest_end,
+            )
+        )
+    )
+    events = [ContestEventScore(event_id, referrer_id, int(amount)) for event_id, referrer_id, amount in result.all()]
+    virtual = [
+        LeaderboardEntry(vp.id, vp.referral_count, vp.total_amount_kopeks)
+        for vp in await list_virtual_participants(db, contest.id)
+    ]
+    return events, virtual
+
+
+async def _get_cached_top(
+    db: AsyncSession,
+    contest: ReferralContest,
+    limit: int | None,
+    *,
+    virtual: bool = False,
+) -> list | None:
+    """Топ из Redis или None, если лидерборд нужно считать по SQL."""
+    store = _leaderboard_store()
+    if not await store.ensure(contest.id, lambda: _load_leaderboard_entries(db, contest)):
+        return None
+    try:
+        return await store.top(contest.id, limit, virtual=virtual)
+    except Exception as error:
+        logger.warning('Не удалось прочитать лидерборд конкурса из Redis', contest_id=contest.id, error=error)
+        return None
+
+
+async def _get_leaderboard_rows(
+    db: AsyncSession,
+    contest: ReferralContest,
+    limit: int | None,
+) -> Sequence[tuple[User, int, int]]:
+    entries = await _get_cached_top(db, contest, limit)
+    if entries is not None:
+        if not entries:
+            return []
+        users_result = await db.execute(select(User).where(User.id.in_([entry.member_id for entry in entries])))
+        users = {user.id: user for user in users_result.scalars().all()}
+        return [
+            (users[entry.member_id], entry.count, entry.amount_kopeks) for entry in entries if entry.member_id in users
+        ]
+
+    contest_start, contest_end = _contest_bounds(contest)
     query = (
         select(
             User,
@@ -202,7 +258,7 @@ async def get_contest_leaderboard(
         .join(User, User.id == ReferralContestEvent.referrer_id)
         .where(
             and_(
-                ReferralContestEvent.contest_id == contest_id,
+                ReferralContestEvent.contest_id == contest.id,
                 ReferralContestEvent.occurred_at >= contest_start,
                 ReferralContestEvent.occurred_at <= contest_end,
             )
@@ -213,41 +269,37 @@ async def get_contest_leaderboard(
     if limit:
         query = query.limit(limit)
     result = await db.execute(query)
-    leaderboard = result.all()
-
-    return leaderboard
+    return result.all()
 
 
-async def get_contest_participants(
+async def get_contest_leaderboard(
     db: AsyncSession,
     contest_id: int,
-) -> Sequence[tuple[User, int]]:
-    """Получить участников конкурса.
+    *,
+    limit: int | None = None,
+) -> Sequence[tuple[User, int, int]]:
+    """Получить лидерборд конкурса.
 
     Учитывает только рефералов, зарегистрированных В ПЕРИОД конкурса.
+    Читается из Redis, если он доступен, иначе считается по событиям в БД.
     """
     contest = await get_referral_contest(db, contest_id)
     if not contest:
         return []
 
-    contest_start = contest.start_at
-    contest_end = contest.end_at
-    if contest_end.hour == 0 and contest_end.minute == 0 and contest_end.second == 0:
-        contest_end = contest_end.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return await _get_leaderboard_rows(db, contest, limit)
 
-    result = await db.execute(
-        select(User, func.count(ReferralContestEvent.id).label('referral_count'))
-        .join(User, User.id == ReferralContestEvent.referrer_id)
-        .where(
-            and_(
-                ReferralContestEvent.contest_id == contest_id,
-                ReferralContestEvent.occurred_at >= contest_start,
-                ReferralContestEvent.occurred_at <= contest_end,
-            )
-        )
-        .group_by(User.id)
-    )
-    return result.all()
+
+async def get_contest_participants(
+    db: AsyncSession,
+    contest_id: int,
+) -> Sequence[tuple[User, int]]:
+    """Получить участников конкурса.
+
+    Учитывает только рефералов, зарегистрированных В ПЕРИОД конкурса.
+    """
+    leaderboard = await get_contest_leaderboard(db, contest_id)
+    return [(user, referral_count) for user, referral_count, _ in leaderboard]
 
 
 async def get_referrer_score(
@@ -326,8 +378,10 @@ async def delete_referral_contest(
     db: AsyncSession,
     contest: ReferralContest,
 ) -> None:
+    contest_id = contest.id
     await db.delete(contest)
     await db.commit()
+    await _leaderboard_store().invalidate(contest_id)
 
 
 async def get_contest_payment_stats(
@@ -504,6 +558,7 @@ async def upsert_contest_event(
             existing.amount_kopeks = amount_kopeks
             await db.commit()
             await db.refresh(existing)
+            await _leaderboard_store().record_event(contest_id, existing.id, existing.referrer_id, amount_kopeks)
         return existing, False
 
     event = ReferralContestEvent(
@@ -517,6 +572,7 @@ async def upsert_contest_event(
     db.add(event)
     await db.commit()
     await db.refresh(event)
+    await _leaderboard_store().record_event(contest_id, event.id, referrer_id, amount_kopeks)
     return event, True
 
 
@@ -831,6 +887,7 @@ async def sync_contest_events(
 
     # Сохраняем изменения
     await db.commit()
+    await _leaderboard_store().invalidate(contest_id)
 
     logger.info(
         'Синхронизация конкурса завершена: обновлено , пропущено , сумма коп.',
@@ -908,6 +965,7 @@ async def cleanup_invalid_contest_events(
         )
         deleted = delete_result.rowcount
         await db.commit()
+        await _leaderboard_store().invalidate(contest_id)
 
     # Считаем сколько осталось валидных событий
     remaining_result = await db.execute(
@@ -951,6 +1009,7 @@ async def add_virtual_participant(
     db.add(vp)
     await db.commit()
     await db.refresh(vp)
+    await _leaderboard_store().set_virtual(contest_id, vp.id, vp.referral_count, vp.total_amount_kopeks)
     return vp
 
 
@@ -976,8 +1035,10 @@ async def delete_virtual_participant(
     vp = result.scalar_one_or_none()
     if not vp:
         return False
+    contest_id = vp.contest_id
     await db.delete(vp)
     await db.commit()
+    await _leaderboard_store().remove_virtual(contest_id, participant_id)
     return True
 
 
@@ -995,6 +1056,7 @@ async def update_virtual_participant_count(
     vp.referral_count = referral_count
     await db.commit()
     await db.refresh(vp)
+    await _leaderboard_store().set_virtual(vp.contest_id, vp.id, vp.referral_count, vp.total_amount_kopeks)
     return vp
 
 
@@ -1008,14 +1070,38 @@ async def get_contest_leaderboard_with_virtual(
 
     Возвращает список кортежей (display_name, referral_count, total_amount, is_virtual).
     """
-    real = await get_contest_leaderboard(db, contest_id)
-    virtual = await list_virtual_participants(db, contest_id)
+    contest = await get_referral_contest(db, contest_id)
+    if not contest:
+        return []
+
+    # Топ объединения входит в топы реальных и виртуальных участников по отдельности
+    real = await _get_leaderboard_rows(db, contest, limit)
+    virtual_entries = await _get_cached_top(db, contest, limit, virtual=True)
+    if virtual_entries is None:
+        virtual = [
+            (vp.display_name, vp.referral_count, vp.total_amount_kopeks)
+            for vp in await list_virtual_participants(db, contest_id)
+        ]
+    elif virtual_entries:
+        names_result = await db.execute(
+            select(ReferralContestVirtualParticipant.id, ReferralContestVirtualParticipant.display_name).where(
+                ReferralContestVirtualParticipant.id.in_([entry.member_id for entry in virtual_entries])
+            )
+        )
+        names = dict(names_result.all())
+        virtual = [
+            (names[entry.member_id], entry.count, entry.amount_kopeks)
+            for entry in virtual_entries
+            if entry.member_id in names
+        ]
+    else:
+        virtual = []
 
     merged: list[tuple[str, int, int, bool]] = []
     for user, score, amount in real:
         merged.append((user.full_name, score, amount, False))
-    for vp in virtual:
-        merged.append((vp.display_name, vp.referral_count, vp.total_amount_kopeks, True))
+    for name, score, amount in virtual:
+        merged.append((name, score, amount, True))
 
     merged.sort(key=lambda x: (-x[1], -x[2]))
 
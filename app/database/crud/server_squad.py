@@ -696,32 +696,30 @@ def _extract_country_code(original_name: str) -> str | None:
 
 
 async def get_server_statistics(db: AsyncSession) -> dict:
-    total_result = await db.execute(select(func.count(ServerSquad.id)))
-    total_servers = total_result.scalar()
-
-    available_result = await db.execute(select(func.count(ServerSquad.id)).where(ServerSquad.is_available == True))
-    available_servers = available_result.scalar()
-
-    servers_with_connections = 0
-    all_servers_result = await db.execute(select(ServerSquad.squad_uuid))
-    all_server_uuids = [row[0] for row in all_servers_result.fetchall()]
-
-    for squad_uuid in all_server_uuids:
-        count_result = await db.execute(
-            text("""
-                SELECT COUNT(s.id)
-                FROM subscriptions s
-                WHERE s.status IN ('active', 'trial')
-                AND s.connected_squads::text LIKE :uuid_pattern
-            """),
-            {'uuid_pattern': f'%"{squad_uuid}"%'},
-        )
-        user_count = count_result.scalar() or 0
-        if user_count > 0:
-            servers_with_connections += 1
+    # Счётчики серверов, наличие подключений и выручка - одним запросом
+    result = await db.execute(
+        text("""
+            SELECT
+                COUNT(ss.id) AS total_servers,
+                COUNT(ss.id) FILTER (WHERE ss.is_available) AS available_servers,
+                COUNT(ss.id) FILTER (
+                    WHERE EXISTS (
+                        SELECT 1
+                        FROM subscriptions s
+                        WHERE s.status IN ('active', 'trial')
+                        AND s.connected_squads::text LIKE '%"' || ss.squad_uuid || '"%'
+                    )
+                ) AS servers_with_connections,
+                (SELECT COALESCE(SUM(paid_price_kopeks), 0) FROM subscription_servers) AS total_revenue_kopeks
+            FROM server_squads ss
+        """)
+    )
+    row = result.one()
 
-    revenue_result = await db.execute(select(func.coalesce(func.sum(SubscriptionServer.paid_price_kopeks), 0)))
-    total_revenue_kopeks = revenue_result.scalar()
+    total_servers = row.total_servers or 0
+    available_servers = row.available_servers or 0
+    servers_with_connections = row.servers_with_connections or 0
+    total_revenue_kopeks = row.total_revenue_kopeks or 0
 
     return {
         'total_servers': total_servers,
@@ -798,46 +798,37 @@ async def get_subscriptions_for_autopay(db: AsyncSession) -> list[Subscription]:
 
 
 async def get_subscriptions_statistics(db: AsyncSession) -> dict:
-    total_result = await db.execute(select(func.count(Subscription.id)))
-    total_subscriptions = total_result.scalar()
+    now = datetime.now(UTC)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
 
-    active_result = await db.execute(
-        select(func.count(Subscription.id)).where(Subscription.status == SubscriptionStatus.ACTIVE.value)
-    )
-    active_subscriptions = active_result.scalar()
+    is_active = Subscription.status == SubscriptionStatus.ACTIVE.value
+    is_paid = Subscription.is_trial == False
 
-    trial_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            and_(Subscription.is_trial == True, Subscription.status == SubscriptionStatus.ACTIVE.value)
+    # Все счётчики одним проходом по таблице подписок
+    counters = (
+        await db.execute(
+            select(
+                func.count(Subscription.id).label('total'),
+                func.count(Subscription.id).filter(is_active).label('active'),
+                func.count(Subscription.id).filter(and_(is_active, Subscription.is_trial == True)).label('trial'),
+                func.count(Subscription.id)
+                .filter(and_(is_paid, Subscription.created_at >= today_start))
+                .label('today'),
+                func.count(Subscription.id).filter(and_(is_paid, Subscription.created_at >= week_ago)).label('week'),
+                func.count(Subscription.id).filter(and_(is_paid, Subscription.created_at >= month_ago)).label('month'),
+            )
         )
-    )
-    trial_subscriptions = trial_result.scalar()
+    ).one()
 
+    total_subscriptions = counters.total or 0
+    active_subscriptions = counters.active or 0
+    trial_subscriptions = counters.trial or 0
     paid_subscriptions = active_subscriptions - trial_subscriptions
-
-    today = datetime.now(UTC).date()
-    today_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            and_(Subscription.created_at >= today, Subscription.is_trial == False)
-        )
-    )
-    purchased_today = today_result.scalar()
-
-    week_ago = datetime.now(UTC) - timedelta(days=7)
-    week_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            and_(Subscription.created_at >= week_ago, Subscription.is_trial == False)
-        )
-    )
-    purchased_week = week_result.scalar()
-
-    month_ago = datetime.now(UTC) - timedelta(days=30)
-    month_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            and_(Subscription.created_at >= month_ago, Subscription.is_trial == False)
-        )
-    )
-    purchased_month = month_result.scalar()
+    purchased_today = counters.today or 0
+    purchased_week = counters.week or 0
+    purchased_month = counters.month or 0
 
     try:
         from app.database.crud.subscription_conversion import get_conversion_statistics
@@ -1068,14 +1059,11 @@ async def get_servers_monthly_prices(
     user: Optional['User'] = None,
 ) -> list[int]:
     """Получает месячные цены серверов с проверкой доступности для промогруппы пользователя."""
-    from sqlalchemy.orm import selectinload
-
-    from app.database.models import ServerSquad
+    from app.services.server_squad_catalog import server_squad_catalog
 
     prices = []
 
     # Загружаем промогруппы пользователя если нужно
-    user_promo_group = None
     user_promo_group_id = None
     if user:
         try:
@@ -1089,14 +1077,10 @@ async def get_servers_monthly_prices(
         except Exception as e:
             logger.warning('Не удалось получить промогруппу пользователя', error=e)
 
+    await server_squad_catalog.ensure_fresh(db)
+
     for server_id in server_squad_ids:
-        # Загружаем сервер с промогруппами
-        result = await db.execute(
-            select(ServerSquad)
-            .options(selectinload(ServerSquad.allowed_promo_groups))
-            .where(ServerSquad.id == server_id)
-        )
-        server = result.scalar_one_or_none()
+        server = server_squad_catalog.get_by_id(server_id)
 
         if not server:
             prices.append(0)
@@ -1104,9 +1088,8 @@ async def get_servers_monthly_prices(
 
         # Проверяем доступность сервера для промогруппы пользователя
         is_allowed = True
-        if user_promo_group_id is not None and server.allowed_promo_groups:
-            allowed_ids = {pg.id for pg in server.allowed_promo_groups}
-            is_allowed = user_promo_group_id in allowed_ids
+        if user_promo_group_id is not None and server.allowed_promo_group_ids:
+            is_allowed = user_promo_group_id in server.allowed_promo_group_ids
 
         if server.is_available and is_allowed:
             prices.append(server.price_kopeks)
@@ -1117,7 +1100,7 @@ async def get_servers_monthly_prices(
                 display_name=server.display_name,
                 server_id=server_id,
                 user_promo_group_id=user_promo_group_id,
-                value=[pg.id for pg in server.allowed_promo_groups] if server.allowed_promo_groups else [],
+                value=sorted(server.allowed_promo_group_ids),
             )
             prices.append(server.price_kopeks)  # Всё равно берём реальную цену
 
@@ -56,18 +56,35 @@ async def get_conversion_by_user_id(db: AsyncSession, user_id: int) -> Subscript
 async def get_conversion_statistics(db: AsyncSession) -> dict:
     from app.database.models import Subscription
 
-    # Получаем количество записей о конверсиях в таблице
-    total_conversions_result = await db.execute(select(func.count(SubscriptionConversion.id)))
-    total_conversions = total_conversions_result.scalar() or 0
-
-    # Подсчитываем пользователей с платными подписками
-    users_with_paid_result = await db.execute(select(func.count(User.id)).where(User.has_had_paid_subscription == True))
-    users_with_paid = users_with_paid_result.scalar() or 0
+    month_ago = datetime.now(UTC) - timedelta(days=30)
 
-    # Подсчитываем всех пользователей с подписками (использовавших триал)
-    # Считаем что все новые пользователи начинают с триала
-    total_users_with_subscriptions_result = await db.execute(select(func.count(func.distinct(Subscription.user_id))))
-    total_users_with_subscriptions = total_users_with_subscriptions_result.scalar() or 0
+    # Агрегаты по конверсиям считаются одним проходом, счётчики пользователей и подписок - подзапросами
+    users_with_paid_subquery = (
+        select(func.count(User.id)).where(User.has_had_paid_subscription == True).scalar_subquery()
+    )
+    users_with_subscriptions_subquery = select(func.count(func.distinct(Subscription.user_id))).scalar_subquery()
+
+    row = (
+        await db.execute(
+            select(
+                func.count(SubscriptionConversion.id).label('total_conversions'),
+                func.avg(SubscriptionConversion.trial_duration_days).label('avg_trial_duration'),
+                func.avg(SubscriptionConversion.first_payment_amount_kopeks).label('avg_first_payment'),
+                func.count(SubscriptionConversion.id)
+                .filter(SubscriptionConversion.converted_at >= month_ago)
+                .label('month_conversions'),
+                users_with_paid_subquery.label('users_with_paid'),
+                users_with_subscriptions_subquery.label('users_with_subscriptions'),
+            )
+        )
+    ).one()
+
+    total_conversions = row.total_conversions or 0
+    users_with_paid = row.users_with_paid or 0
+    total_users_with_subscriptions = row.users_with_subscriptions or 0
+    avg_trial_duration = row.avg_trial_duration or 0
+    avg_first_payment = row.avg_first_payment or 0
+    month_conversions = row.month_conversions or 0
 
     # Расчёт конверсии: (оплатившие) / (всего с подписками) * 100
     # Это показывает какой % пользователей, получивших подписку, в итоге оплатили
@@ -76,18 +93,6 @@ async def get_conversion_statistics(db: AsyncSession) -> dict:
     else:
         conversion_rate = 0.0
 
-    avg_trial_duration_result = await db.execute(select(func.avg(SubscriptionConversion.trial_duration_days)))
-    avg_trial_duration = avg_trial_duration_result.scalar() or 0
-
-    avg_first_payment_result = await db.execute(select(func.avg(SubscriptionConversion.first_payment_amount_kopeks)))
-    avg_first_payment = avg_first_payment_result.scalar() or 0
-
-    month_ago = datetime.now(UTC) - timedelta(days=30)
-    month_conversions_result = await db.execute(
-        select(func.count(SubscriptionConversion.id)).where(SubscriptionConversion.converted_at >= month_ago)
-    )
-    month_conversions = month_conversions_result.scalar() or 0
-
     logger.info('📊 Статистика конверсий:')
     logger.info('Всего пользователей с подписками', total_users_with_subscriptions=total_users_with_subscriptions)
     logger.info('Оплативших подписку', users_with_paid=users_with_paid)
@@ -202,43 +202,46 @@ async def get_transactions_statistics(
     if not end_date:
         end_date = datetime.now(UTC)
 
+    today_start = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    in_period = and_(Transaction.created_at >= start_date, Transaction.created_at <= end_date)
+    in_today = Transaction.created_at >= today_start
     # Доход считаем только по реальным платежам (исключаем колесо, промокоды, админские пополнения)
-    income_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(
-                Transaction.type == TransactionType.DEPOSIT.value,
-                Transaction.is_completed == True,
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date,
-                Transaction.payment_method.in_(REAL_PAYMENT_METHODS),
-            )
-        )
+    is_real_income = and_(
+        Transaction.type == TransactionType.DEPOSIT.value,
+        Transaction.payment_method.in_(REAL_PAYMENT_METHODS),
     )
-    total_income = income_result.scalar()
 
-    expenses_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(
-                Transaction.type == TransactionType.WITHDRAWAL.value,
-                Transaction.is_completed == True,
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date,
-            )
+    # Итоги за период и за сегодня одним проходом по завершённым транзакциям
+    totals = (
+        await db.execute(
+            select(
+                func.coalesce(func.sum(Transaction.amount_kopeks).filter(and_(in_period, is_real_income)), 0).label(
+                    'income'
+                ),
+                func.coalesce(
+                    func.sum(Transaction.amount_kopeks).filter(
+                        and_(in_period, Transaction.type == TransactionType.WITHDRAWAL.value)
+                    ),
+                    0,
+                ).label('expenses'),
+                func.coalesce(
+                    func.sum(func.abs(Transaction.amount_kopeks)).filter(
+                        and_(in_period, Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value)
+                    ),
+                    0,
+                ).label('subscription_income'),
+                func.count(Transaction.id).filter(in_today).label('today_count'),
+                func.coalesce(func.sum(Transaction.amount_kopeks).filter(and_(in_today, is_real_income)), 0).label(
+                    'today_income'
+                ),
+            ).where(and_(Transaction.is_completed == True, or_(in_period, in_today)))
         )
-    )
-    total_expenses = expenses_result.scalar()
-
-    subscription_income_result = await db.execute(
-        select(func.coalesce(func.sum(func.abs(Transaction.amount_kopeks)), 0)).where(
-            and_(
-                Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value,
-                Transaction.is_completed == True,
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date,
-            )
-        )
-    )
-    subscription_income = subscription_income_result.scalar()
+    ).one()
+    total_income = totals.income
+    total_expenses = totals.expenses
+    subscription_income = totals.subscription_income
+    transactions_today = totals.today_count
+    income_today = totals.today_income
 
     transactions_count_result = await db.execute(
         select(
@@ -279,27 +282,6 @@ async def get_transactions_statistics(
         row.payment_method: {'count': row.count, 'amount': row.total_amount} for row in payment_methods_result
     }
 
-    today = datetime.now(UTC).date()
-    today_result = await db.execute(
-        select(func.count(Transaction.id)).where(
-            and_(Transaction.is_completed == True, Transaction.created_at >= today)
-        )
-    )
-    transactions_today = today_result.scalar()
-
-    # Доход за сегодня - только реальные платежи
-    today_income_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(
-                Transaction.type == TransactionType.DEPOSIT.value,
-                Transaction.is_completed == True,
-                Transaction.created_at >= today,
-                Transaction.payment_method.in_(REAL_PAYMENT_METHODS),
-            )
-        )
-    )
-    income_today = today_income_result.scalar()
-
     return {
         'period': {'start_date': start_date, 'end_date': end_date},
         'totals': {
@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from app.config import settings
+from app.utils.metrics import DB_CONNECTION_HOLD, metrics
 
 
 logger = structlog.get_logger(__name__)
@@ -189,6 +190,44 @@ if settings.DEBUG:
         else:
             logger.debug('⚡ Query executed in', total=round(total, 3))
 
+# ============================================================================
+# POOL METRICS (/metrics)
+# ============================================================================
+
+if metrics.enabled:
+
+    @event.listens_for(engine.sync_engine.pool, 'checkout')
+    def record_connection_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['metrics_checkout_at'] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine.pool, 'checkin')
+    def record_connection_checkin(dbapi_connection, connection_record):
+        checkout_at = connection_record.info.pop('metrics_checkout_at', None)
+        if checkout_at is not None:
+            DB_CONNECTION_HOLD.observe(time.perf_counter() - checkout_at)
+
+    def _pool_connection_samples():
+        counters = _pool_counters(engine.pool)
+        if counters is None:
+            return []
+        # До заполнения пула SQLAlchemy отдаёт отрицательный overflow
+        return [
+            (('checked_out',), counters['checked_out']),
+            (('checked_in',), counters['checked_in']),
+            (('overflow',), max(counters['overflow'], 0)),
+        ]
+
+    def _pool_capacity_samples():
+        counters = _pool_counters(engine.pool)
+        if counters is None:
+            return []
+        return [((), counters['size'] + (getattr(engine.pool, '_max_overflow', 0) or 0))]
+
+    metrics.gauge_callback(
+        'bot_db_pool_connections', 'Соединения пула БД по состоянию', ('state',), _pool_connection_samples
+    )
+    metrics.gauge_callback('bot_db_pool_max_connections', 'Предел соединений пула БД', (), _pool_capacity_samples)
+
 # ============================================================================
 # ADVANCED SESSION MANAGER WITH READ REPLICAS
 # ============================================================================
@@ -32,6 +32,8 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Mapped, backref, mapped_column, relationship
 from sqlalchemy.sql import func
 
+from app.database.partitions import attach_default_partition
+
 
 class AwareDateTime(TypeDecorator):
     """DateTime that auto-converts naive values to UTC-aware on load from DB.
@@ -1380,6 +1382,7 @@ class TrafficPurchase(Base):
 
 class Transaction(Base):
     __tablename__ = 'transactions'
+    __table_args__ = (Index('ix_transactions_user_created', 'user_id', 'created_at'),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -1519,6 +1522,27 @@ class ReferralEarning(Base):
         return self.amount_kopeks / 100
 
 
+class ReferralClickEvent(Base):
+    """Переход по реферальной ссылке (/start ref...), пишется пачками ReferralClickRecorder."""
+
+    __tablename__ = 'referral_click_events'
+    __table_args__ = (
+        Index('ix_referral_click_events_code_created', 'code', 'created_at'),
+        Index('ix_referral_click_events_telegram_created', 'telegram_id', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    # Ключ включает created_at: в PostgreSQL таблица разбита на помесячные партиции
+    created_at = Column(AwareDateTime(), primary_key=True)
+    telegram_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    code = Column(String(64), primary_key=True)  # очищенный код (refXXX)
+    payload = Column(String(255), nullable=False)  # payload как пришёл в /start
+    source = Column(String(20), nullable=False)  # start, pending, channel_check
+
+
+attach_default_partition(ReferralClickEvent.__table__)
+
+
 class WithdrawalRequestStatus(Enum):
     """Статусы заявки на вывод реферального баланса."""
 
@@ -1835,8 +1859,13 @@ class SystemSetting(Base):
 
 class MonitoringLog(Base):
     __tablename__ = 'monitoring_logs'
+    __table_args__ = (
+        Index('ix_monitoring_logs_event_type_created', 'event_type', 'created_at'),
+        Index('ix_monitoring_logs_created_at', 'created_at'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # В PostgreSQL таблица разбита по месяцам created_at (миграция 0009), ключ там (id, created_at)
+    id = Column(Integer, primary_key=True)
 
     event_type = Column(String(100), nullable=False)
 
@@ -1845,7 +1874,7 @@ class MonitoringLog(Base):
 
     is_success = Column(Boolean, default=True)
 
-    created_at = Column(AwareDateTime(), default=func.now())
+    created_at = Column(AwareDateTime(), nullable=False, default=func.now())
 
 
 class SentNotification(Base):
@@ -2156,8 +2185,13 @@ class SubscriptionServer(Base):
 
 class SupportAuditLog(Base):
     __tablename__ = 'support_audit_logs'
+    __table_args__ = (
+        Index('ix_support_audit_logs_action_created', 'action', 'created_at'),
+        Index('ix_support_audit_logs_created_at', 'created_at'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # В PostgreSQL таблица разбита по месяцам created_at (миграция 0009), ключ там (id, created_at)
+    id = Column(Integer, primary_key=True)
     actor_user_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
     actor_telegram_id = Column(BigInteger, nullable=True)  # Can be None for email-only users
     is_moderator = Column(Boolean, default=False)
@@ -2165,7 +2199,7 @@ class SupportAuditLog(Base):
     ticket_id = Column(Integer, ForeignKey('tickets.id', ondelete='SET NULL'), nullable=True)
     target_user_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
     details = Column(JSON, nullable=True)
-    created_at = Column(AwareDateTime(), default=func.now())
+    created_at = Column(AwareDateTime(), nullable=False, default=func.now())
 
     actor = relationship('User', foreign_keys=[actor_user_id])
     ticket = relationship('Ticket', foreign_keys=[ticket_id])
@@ -2270,7 +2304,10 @@ class AdvertisingCampaign(Base):
 
 class AdvertisingCampaignRegistration(Base):
     __tablename__ = 'advertising_campaign_registrations'
-    __table_args__ = (UniqueConstraint('campaign_id', 'user_id', name='uq_campaign_user'),)
+    __table_args__ = (
+        UniqueConstraint('campaign_id', 'user_id', name='uq_campaign_user'),
+        Index('ix_advertising_campaign_registrations_user_id', 'user_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     campaign_id = Column(Integer, ForeignKey('advertising_campaigns.id', ondelete='CASCADE'), nullable=False)
@@ -2561,6 +2598,58 @@ class WebhookDelivery(Base):
         return f"<WebhookDelivery id={self.id} webhook_id={self.webhook_id} status='{self.status}' event='{self.event_type}'>"
 
 
+class RemnaWaveWebhookEvent(Base):
+    """Входящий webhook RemnaWave, ожидающий обработки воркером."""
+
+    __tablename__ = 'remnawave_webhook_events'
+    __table_args__ = (
+        Index('ix_remnawave_webhook_events_status_id', 'status', 'id'),
+        Index('ix_remnawave_webhook_events_user_key', 'user_key'),
+        UniqueConstraint('event_key', name='uq_remnawave_webhook_events_event_key'),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    event_key = Column(String(64), nullable=False)  # sha256 тела запроса, отсекает повторы
+    event_name = Column(String(100), nullable=False)
+    user_key = Column(String(100), nullable=True)  # uuid или telegramId пользователя, по нему склеиваются события
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default='pending')  # pending, processing, processed, coalesced, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error_message = Column(Text, nullable=True)
+    received_at = Column(AwareDateTime(), nullable=False, default=func.now())
+    locked_at = Column(AwareDateTime(), nullable=True)
+    processed_at = Column(AwareDateTime(), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<RemnaWaveWebhookEvent id={self.id} event='{self.event_name}' status='{self.status}'>"
+
+
+class PaymentWebhookEvent(Base):
+    """Проверенный callback платёжного шлюза, ожидающий зачисления."""
+
+    __tablename__ = 'payment_webhook_events'
+    __table_args__ = (
+        Index('ix_payment_webhook_events_status_available', 'status', 'available_at'),
+        UniqueConstraint('provider', 'external_id', name='uq_payment_webhook_events_provider_external'),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    provider = Column(String(32), nullable=False)
+    external_id = Column(String(255), nullable=False)  # id платежа у шлюза + статус из callback
+    method_name = Column(String(100), nullable=False)  # метод PaymentService, который проводит callback
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default='pending')  # pending, processing, processed, rejected, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error_message = Column(Text, nullable=True)
+    received_at = Column(AwareDateTime(), nullable=False, default=func.now())
+    available_at = Column(AwareDateTime(), nullable=False, default=func.now())
+    locked_at = Column(AwareDateTime(), nullable=True)
+    processed_at = Column(AwareDateTime(), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<PaymentWebhookEvent id={self.id} provider='{self.provider}' status='{self.status}'>"
+
+
 class CabinetRefreshToken(Base):
     """Refresh tokens for cabinet JWT authentication."""
 
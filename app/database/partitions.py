@@ -0,0 +1,135 @@
+"""Помесячные партиции PostgreSQL для журналов событий.
+
+Таблица объявляется с postgresql_partition_by='RANGE (created_at)' и
+партицией по умолчанию (attach_default_partition). Партиции на текущий и
+следующие месяцы создаются заранее ensure_monthly_partitions, старые месяцы
+удаляются целиком drop_partitions_before — это дешевле DELETE по большой
+таблице. На SQLite таблица обычная, очистка идёт через DELETE.
+
+Таблицы, которые уже были в БД обычными (monitoring_logs,
+support_audit_logs), переводятся на партиции миграцией 0009; в моделях у них
+остаётся обычный ключ id, чтобы на SQLite работал автоинкремент.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import UTC, date, datetime
+
+import structlog
+from sqlalchemy import DDL, Table, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+logger = structlog.get_logger(__name__)
+
+_PARTITION_SUFFIX_RE = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f'{table}_p{month:%Y%m}'
+
+
+def default_partition_name(table: str) -> str:
+    return f'{table}_default'
+
+
+def default_partition_ddl(table: str) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS {_quote_ident(default_partition_name(table))} '
+        f'PARTITION OF {_quote_ident(table)} DEFAULT'
+    )
+
+
+def attach_default_partition(table: Table) -> None:
+    """Создавать партицию по умолчанию вместе с таблицей (metadata.create_all на PostgreSQL)."""
+    event.listen(table, 'after_create', DDL(default_partition_ddl(table.name)).execute_if(dialect='postgresql'))
+
+
+async def _list_partitions(conn: AsyncConnection, table: str) -> list[str] | None:
+    """Имена партиций таблицы; None, если таблица не партиционирована."""
+    relkind = await conn.scalar(text('SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)'), {'table': table})
+    if relkind != 'p':
+        return None
+    result = await conn.execute(
+        text(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(:table)'
+        ),
+        {'table': table},
+    )
+    return [row[0] for row in result]
+
+
+async def ensure_monthly_partitions(
+    conn: AsyncConnection, table: str, months_ahead: int = 2, now: datetime | None = None
+) -> list[str]:
+    """Создать партиции на текущий и months_ahead следующих месяцев. Возвращает созданные."""
+    if conn.dialect.name != 'postgresql':
+        return []
+    existing = await _list_partitions(conn, table)
+    if existing is None:
+        return []
+
+    current = _month_start((now or datetime.now(UTC)).date())
+    created: list[str] = []
+    for offset in range(max(0, months_ahead) + 1):
+        month = _add_months(current, offset)
+        name = partition_name(table, month)
+        if name in existing:
+            continue
+        try:
+            async with conn.begin_nested():
+                await conn.execute(
+                    text(
+                        f'CREATE TABLE {_quote_ident(name)} PARTITION OF {_quote_ident(table)} '
+                        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+                        f"TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+                    )
+                )
+            created.append(name)
+        except DBAPIError as error:
+            # Обычно значит, что строки этого месяца уже лежат в партиции по умолчанию
+            logger.warning('Не удалось создать партицию', table=table, partition=name, error=error)
+    return created
+
+
+async def drop_partitions_before(conn: AsyncConnection, table: str, cutoff: datetime) -> list[str] | None:
+    """Удалить партиции месяцев, целиком лежащих раньше cutoff.
+
+    Returns:
+        Удалённые партиции или None, если таблица не партиционирована
+        (тогда старые строки нужно удалять DELETE).
+    """
+    if conn.dialect.name != 'postgresql':
+        return None
+    existing = await _list_partitions(conn, table)
+    if existing is None:
+        return None
+
+    boundary = _month_start(cutoff.date())
+    dropped: list[str] = []
+    for name in existing:
+        match = _PARTITION_SUFFIX_RE.search(name)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if _add_months(month, 1) <= boundary:
+            await conn.execute(text(f'DROP TABLE IF EXISTS {_quote_ident(name)}'))
+            dropped.append(name)
+    return sorted(dropped)
@@ -2,6 +2,7 @@ import asyncio
 import base64
 import json
 import ssl
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
@@ -11,6 +12,8 @@ from urllib.parse import urlparse
 import aiohttp
 import structlog
 
+from app.utils.metrics import REMNAWAVE_REQUEST_DURATION, metrics, normalize_endpoint
+
 
 logger = structlog.get_logger(__name__)
 
@@ -366,6 +369,27 @@ class RemnaWaveAPI:
         if not self.session:
             raise RemnaWaveAPIError('Session not initialized. Use async context manager.')
 
+        started = time.perf_counter()
+        status = 'network_error'
+        try:
+            response_data, status = await self._request_with_retries(method, endpoint, data, params)
+            return response_data
+        except RemnaWaveAPIError as error:
+            if error.status_code:
+                status = str(error.status_code)
+            raise
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
+        finally:
+            if metrics.enabled:
+                REMNAWAVE_REQUEST_DURATION.observe(
+                    time.perf_counter() - started, method, normalize_endpoint(endpoint), status
+                )
+
+    async def _request_with_retries(
+        self, method: str, endpoint: str, data: dict | None, params: dict | None
+    ) -> tuple[dict, str]:
         url = f'{self.base_url}{endpoint}'
         max_retries = 3
         base_delay = 1.0
@@ -405,7 +429,7 @@ class RemnaWaveAPI:
                         log('Response: %s', response_text[:500])
                         raise RemnaWaveAPIError(error_message, response.status, response_data)
 
-                    return response_data
+                    return response_data, str(response.status)
 
             except aiohttp.ClientError as e:
                 if attempt < max_retries:
@@ -754,18 +754,21 @@ async def _show_diagnostics_for_period(callback: types.CallbackQuery, db: AsyncS
         else:
             text += '\n✅ <b>Все рефералы засчитаны!</b>\n'
 
-        # Информация о логах
-        log_path = referral_diagnostics_service.log_path
-        log_exists = log_path.exists()
-        log_size = log_path.stat().st_size if log_exists else 0
-
-        text += f'\n<i>📂 {log_path.name}'
-        if log_exists:
-            text += f' ({log_size / 1024:.0f} KB)'
-            text += f' | Строк: {report.lines_in_period}'
+        # Источник данных: журнал переходов в БД или лог-файл
+        if report.source == 'events':
+            text += '\n<i>📊 Журнал переходов (БД)</i>'
         else:
-            text += ' (не найден!)'
-        text += '</i>'
+            log_path = referral_diagnostics_service.log_path
+            log_exists = log_path.exists()
+            log_size = log_path.stat().st_size if log_exists else 0
+
+            text += f'\n<i>📂 {log_path.name}'
+            if log_exists:
+                text += f' ({log_size / 1024:.0f} KB)'
+                text += f' | Строк: {report.lines_in_period}'
+            else:
+                text += ' (не найден!)'
+            text += '</i>'
 
         # Кнопки: только "Сегодня" (текущий лог) и "Загрузить файл" (старые логи)
         keyboard_rows = [
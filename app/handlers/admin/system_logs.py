@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.database.models import User
 from app.utils.decorators import admin_required, error_handler
+from app.utils.log_reader import read_tail
 
 
 logger = structlog.get_logger(__name__)
@@ -39,29 +40,22 @@ def _build_logs_message(log_path: Path) -> str:
         return message
 
     try:
-        content = log_path.read_text(encoding='utf-8', errors='ignore')
+        tail = read_tail(log_path, LOG_PREVIEW_LIMIT)
     except Exception as error:  # pragma: no cover - защита от проблем чтения
         logger.error('Ошибка чтения лог-файла', log_path=log_path, error=error)
         message = f'❌ <b>Ошибка чтения логов</b>\n\nНе удалось прочитать файл <code>{log_path}</code>.'
         return message
 
-    total_length = len(content)
-    stats = log_path.stat()
-    updated_at = datetime.fromtimestamp(stats.st_mtime, tz=UTC)
-
-    if not content:
-        preview_text = 'Лог-файл пуст.'
-        truncated = False
-    else:
-        preview_text = content[-LOG_PREVIEW_LIMIT:]
-        truncated = total_length > LOG_PREVIEW_LIMIT
+    updated_at = datetime.fromtimestamp(tail.mtime, tz=UTC)
+    preview_text = tail.text or 'Лог-файл пуст.'
+    truncated = tail.truncated
 
     details_lines = [
         '🧾 <b>Системные логи</b>',
         '',
         f'📁 <b>Файл:</b> <code>{log_path}</code>',
         f'🕒 <b>Обновлен:</b> {updated_at.strftime("%d.%m.%Y %H:%M:%S")}',
-        f'🧮 <b>Размер:</b> {total_length} символов',
+        f'🧮 <b>Размер:</b> {tail.size_bytes} байт',
         (f'👇 Показаны последние {LOG_PREVIEW_LIMIT} символов.' if truncated else '📄 Показано все содержимое файла.'),
         '',
         _format_preview_block(preview_text),
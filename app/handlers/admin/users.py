@@ -12,10 +12,6 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.database.crud.campaign import (
-    get_campaign_registration_by_user,
-    get_campaign_statistics,
-)
 from app.database.crud.promo_group import get_promo_groups_with_counts
 from app.database.crud.server_squad import (
     get_all_server_squads,
@@ -41,6 +37,7 @@ from app.keyboards.admin import (
     get_user_restrictions_keyboard,
 )
 from app.localization.texts import get_texts
+from app.services.admin_user_card_service import admin_user_card_service
 from app.services.remnawave_service import RemnaWaveService
 from app.services.subscription_service import SubscriptionService
 from app.services.user_service import UserService
@@ -55,6 +52,8 @@ from app.utils.user_utils import get_effective_referral_commission_percent
 
 logger = structlog.get_logger(__name__)
 
+_STATISTICS_TOP_REFERRALS = 5
+
 
 # =============================================================================
 # Конфигурация фильтров пользователей
@@ -1020,6 +1019,7 @@ async def delete_user_account(callback: types.CallbackQuery, db_user: User, db:
 
     user_service = UserService()
     success = await user_service.delete_user_account(db, user_id, db_user.id)
+    admin_user_card_service.invalidate(user_id)
 
     if success:
         await callback.message.edit_text(
@@ -1147,15 +1147,14 @@ async def show_user_management(callback: types.CallbackQuery, db_user: User, db:
     # Если callback_data содержит информацию о том, что мы пришли из списка по балансу
     # В реальности это сложно определить, поэтому будем использовать состояние
 
-    user_service = UserService()
-    profile = await user_service.get_user_profile(db, user_id)
+    card = await admin_user_card_service.load(db, user_id, refresh_subscription_status=True)
 
-    if not profile:
+    if not card:
         await callback.answer('❌ Пользователь не найден', show_alert=True)
         return
 
-    user = profile['user']
-    subscription = profile['subscription']
+    user = card.user
+    subscription = card.subscription
 
     texts = get_texts(db_user.language)
 
@@ -1181,10 +1180,10 @@ async def show_user_management(callback: types.CallbackQuery, db_user: User, db:
             status=status_text,
             language=user.language,
             balance=settings.format_price(user.balance_kopeks),
-            transactions=profile['transactions_count'],
+            transactions=card.stats.transactions_count,
             registration=format_datetime(user.created_at),
             last_activity=last_activity,
-            registration_days=profile['registration_days'],
+            registration_days=card.registration_days,
         )
     ]
 
@@ -1561,6 +1560,7 @@ async def _update_referral_commission_percent(
         user.updated_at = datetime.now(UTC)
 
         await db.commit()
+        admin_user_card_service.invalidate(user_id)
 
         effective = get_effective_referral_commission_percent(user)
 
@@ -1872,6 +1872,7 @@ async def process_edit_user_referrals(
         new_referral_ids,
         db_user.id,
     )
+    admin_user_card_service.invalidate(user_id)
 
     if not success:
         await message.answer(
@@ -2108,6 +2109,8 @@ async def set_user_promo_group(callback: types.CallbackQuery, db_user: User, db:
             show_alert=True,
         )
 
+    admin_user_card_service.invalidate(user_id)
+
     # Refresh user data and show updated list
     user = await get_user_by_id(db, user_id)
     promo_groups = await get_promo_groups_with_counts(db)
@@ -2296,6 +2299,7 @@ async def process_balance_edit(message: types.Message, db_user: User, state: FSM
         )
 
         if success:
+            admin_user_card_service.invalidate(user_id)
             action = 'пополнен' if amount_kopeks > 0 else 'списан'
             await message.answer(
                 f'✅ Баланс пользователя {action} на {settings.format_price(abs(amount_kopeks))}',
@@ -2342,6 +2346,7 @@ async def block_user(callback: types.CallbackQuery, db_user: User, db: AsyncSess
 
     user_service = UserService()
     success = await user_service.block_user(db, user_id, db_user.id, 'Заблокирован администратором')
+    admin_user_card_service.invalidate(user_id)
 
     if success:
         await callback.message.edit_text(
@@ -2426,6 +2431,7 @@ async def toggle_user_restriction_topup(callback: types.CallbackQuery, db_user:
     current_value = getattr(user, 'restriction_topup', False)
     user.restriction_topup = not current_value
     await db.commit()
+    admin_user_card_service.invalidate(user_id)
 
     action = 'установлено' if user.restriction_topup else 'снято'
     await callback.answer(f'Ограничение на пополнение {action}', show_alert=False)
@@ -2449,6 +2455,7 @@ async def toggle_user_restriction_subscription(callback: types.CallbackQuery, db
     current_value = getattr(user, 'restriction_subscription', False)
     user.restriction_subscription = not current_value
     await db.commit()
+    admin_user_card_service.invalidate(user_id)
 
     action = 'установлено' if user.restriction_subscription else 'снято'
     await callback.answer(f'Ограничение на подписку {action}', show_alert=False)
@@ -2514,6 +2521,7 @@ async def save_restriction_reason(message: types.Message, db_user: User, db: Asy
     reason = message.text.strip()[:500]  # Ограничение 500 символов
     user.restriction_reason = reason
     await db.commit()
+    admin_user_card_service.invalidate(user_id)
 
     await state.clear()
 
@@ -2559,6 +2567,7 @@ async def clear_user_restrictions(callback: types.CallbackQuery, db_user: User,
     user.restriction_subscription = False
     user.restriction_reason = None
     await db.commit()
+    admin_user_card_service.invalidate(user_id)
 
     await callback.answer('Все ограничения сняты', show_alert=True)
 
@@ -2646,6 +2655,7 @@ async def unblock_user(callback: types.CallbackQuery, db_user: User, db: AsyncSe
 
     user_service = UserService()
     success = await user_service.unblock_user(db, user_id, db_user.id)
+    admin_user_card_service.invalidate(user_id)
 
     if success:
         await callback.message.edit_text(
@@ -2674,21 +2684,17 @@ async def unblock_user(callback: types.CallbackQuery, db_user: User, db: AsyncSe
 async def show_user_statistics(callback: types.CallbackQuery, db_user: User, db: AsyncSession):
     user_id = int(callback.data.split('_')[-1])
 
-    user_service = UserService()
-    profile = await user_service.get_user_profile(db, user_id)
+    card = await admin_user_card_service.load(
+        db, user_id, top_referrals=_STATISTICS_TOP_REFERRALS, refresh_subscription_status=True
+    )
 
-    if not profile:
+    if not card:
         await callback.answer('❌ Пользователь не найден', show_alert=True)
         return
 
-    user = profile['user']
-    subscription = profile['subscription']
-
-    referral_stats = await get_detailed_referral_stats(db, user.id)
-    campaign_registration = await get_campaign_registration_by_user(db, user.id)
-    campaign_stats = None
-    if campaign_registration:
-        campaign_stats = await get_campaign_statistics(db, campaign_registration.campaign_id)
+    user = card.user
+    subscription = card.subscription
+    stats = card.stats
 
     text = '📊 <b>Статистика пользователя</b>\n\n'
     if user.telegram_id:
@@ -2700,9 +2706,9 @@ async def show_user_statistics(callback: types.CallbackQuery, db_user: User, db:
     text += f'👤 {user_link} (ID: <code>{user_id_display}</code>)\n\n'
 
     text += '<b>Основная информация:</b>\n'
-    text += f'• Дней с регистрации: {profile["registration_days"]}\n'
+    text += f'• Дней с регистрации: {card.registration_days}\n'
     text += f'• Баланс: {settings.format_price(user.balance_kopeks)}\n'
-    text += f'• Транзакций: {profile["transactions_count"]}\n'
+    text += f'• Транзакций: {card.stats.transactions_count}\n'
     text += f'• Язык: {user.language}\n\n'
 
     text += '<b>Подписка:</b>\n'
@@ -2719,139 +2725,63 @@ async def show_user_statistics(callback: types.CallbackQuery, db_user: User, db:
     text += '\n<b>Реферальная программа:</b>\n'
 
     if user.referred_by_id:
-        referrer = await get_user_by_id(db, user.referred_by_id)
+        referrer = card.referrer
         if referrer:
             text += f'• Пришел по реферальной ссылке от <b>{referrer.full_name}</b>\n'
         else:
             text += '• Пришел по реферальной ссылке (реферер не найден)\n'
-        if campaign_registration and campaign_registration.campaign:
-            text += f'• Дополнительно зарегистрирован через кампанию <b>{campaign_registration.campaign.name}</b>\n'
-    elif campaign_registration and campaign_registration.campaign:
-        text += f'• Регистрация через рекламную кампанию <b>{campaign_registration.campaign.name}</b>\n'
-        if campaign_registration.created_at:
-            text += f'• Дата регистрации по кампании: {campaign_registration.created_at.strftime("%d.%m.%Y %H:%M")}\n'
+        if stats.campaign_name:
+            text += f'• Дополнительно зарегистрирован через кампанию <b>{stats.campaign_name}</b>\n'
+    elif stats.campaign_name:
+        text += f'• Регистрация через рекламную кампанию <b>{stats.campaign_name}</b>\n'
+        if stats.campaign_registered_at:
+            text += f'• Дата регистрации по кампании: {stats.campaign_registered_at.strftime("%d.%m.%Y %H:%M")}\n'
     else:
         text += '• Прямая регистрация\n'
 
     text += f'• Реферальный код: <code>{user.referral_code}</code>\n\n'
 
-    if campaign_registration and campaign_registration.campaign and campaign_stats:
+    if stats.campaign_id:
         text += '<b>Рекламная кампания:</b>\n'
-        text += f'• Название: <b>{campaign_registration.campaign.name}</b>'
-        if campaign_registration.campaign.start_parameter:
-            text += f' (параметр: <code>{campaign_registration.campaign.start_parameter}</code>)'
-        text += '\n'
-        text += f'• Всего регистраций: {campaign_stats["registrations"]}\n'
-        text += f'• Суммарный доход: {settings.format_price(campaign_stats["total_revenue_kopeks"])}\n'
-        text += (
-            '• Получили триал: '
-            f'{campaign_stats["trial_users_count"]}'
-            f' (активно: {campaign_stats["active_trials_count"]})\n'
-        )
-        text += (
-            '• Конверсий в оплату: '
-            f'{campaign_stats["conversion_count"]}'
-            f' (оплативших пользователей: {campaign_stats["paid_users_count"]})\n'
-        )
-        text += f'• Конверсия в оплату: {campaign_stats["conversion_rate"]:.1f}%\n'
-        text += f'• Конверсия триала: {campaign_stats["trial_conversion_rate"]:.1f}%\n'
-        text += (
-            f'• Средний доход на пользователя: {settings.format_price(campaign_stats["avg_revenue_per_user_kopeks"])}\n'
-        )
-        text += f'• Средний первый платеж: {settings.format_price(campaign_stats["avg_first_payment_kopeks"])}\n'
-        text += '\n'
+        text += f'• Название: <b>{stats.campaign_name}</b>'
+        if stats.campaign_start_parameter:
+            text += f' (параметр: <code>{stats.campaign_start_parameter}</code>)'
+        text += '\n\n'
 
-    if referral_stats['invited_count'] > 0:
+    if stats.referrals_count > 0:
         text += '<b>Доходы от рефералов:</b>\n'
-        text += f'• Всего приглашено: {referral_stats["invited_count"]}\n'
-        text += f'• Активных рефералов: {referral_stats["active_referrals"]}\n'
-        text += f'• Общий доход: {settings.format_price(referral_stats["total_earned_kopeks"])}\n'
-        text += f'• Доход за месяц: {settings.format_price(referral_stats["month_earned_kopeks"])}\n'
+        text += f'• Всего приглашено: {stats.referrals_count}\n'
+        text += f'• Активных рефералов: {stats.active_referrals_count}\n'
+        text += f'• Общий доход: {settings.format_price(stats.referral_earnings_kopeks)}\n'
+        text += f'• Доход за месяц: {settings.format_price(stats.referral_month_earnings_kopeks)}\n'
 
-        if referral_stats['referrals_detail']:
+        if card.top_referrals:
             text += '\n<b>Детали по рефералам:</b>\n'
-            for detail in referral_stats['referrals_detail'][:5]:
-                referral_name = detail['referral_name']
-                earned = settings.format_price(detail['total_earned_kopeks'])
-                status = '🟢' if detail['is_active'] else '🔴'
-                text += f'• {status} {referral_name}: {earned}\n'
-
-            if len(referral_stats['referrals_detail']) > 5:
-                text += f'• ... и еще {len(referral_stats["referrals_detail"]) - 5} рефералов\n'
+            for referral in card.top_referrals:
+                earned = settings.format_price(referral.earned_kopeks)
+                status = '🟢' if referral.is_active else '🔴'
+                text += f'• {status} {referral.full_name}: {earned}\n'
+
+            if stats.referrals_count > len(card.top_referrals):
+                text += f'• ... и еще {stats.referrals_count - len(card.top_referrals)} рефералов\n'
     else:
         text += '<b>Реферальная программа:</b>\n'
         text += '• Рефералов нет\n'
         text += '• Доходов нет\n'
 
-    await callback.message.edit_text(
-        text,
-        reply_markup=types.InlineKeyboardMarkup(
-            inline_keyboard=[
-                [types.InlineKeyboardButton(text='⬅️ К пользователю', callback_data=f'admin_user_manage_{user_id}')]
+    keyboard = []
+    if stats.campaign_id:
+        keyboard.append(
+            [
+                types.InlineKeyboardButton(
+                    text='📊 Статистика кампании', callback_data=f'admin_campaign_stats_{stats.campaign_id}'
+                )
             ]
-        ),
-    )
-    await callback.answer()
-
-
-async def get_detailed_referral_stats(db: AsyncSession, user_id: int) -> dict:
-    from sqlalchemy import select
-    from sqlalchemy.orm import selectinload
-
-    from app.database.crud.referral import get_referral_earnings_by_user, get_user_referral_stats
-
-    base_stats = await get_user_referral_stats(db, user_id)
-
-    referrals_query = select(User).options(selectinload(User.subscription)).where(User.referred_by_id == user_id)
-
-    referrals_result = await db.execute(referrals_query)
-    referrals = referrals_result.scalars().all()
-
-    earnings_by_referral = {}
-    all_earnings = await get_referral_earnings_by_user(db, user_id)
-
-    for earning in all_earnings:
-        referral_id = earning.referral_id
-        if referral_id not in earnings_by_referral:
-            earnings_by_referral[referral_id] = 0
-        earnings_by_referral[referral_id] += earning.amount_kopeks
-
-    referrals_detail = []
-    current_time = datetime.now(UTC)
-
-    for referral in referrals:
-        earned = earnings_by_referral.get(referral.id, 0)
-
-        is_active = False
-        if referral.subscription:
-            from app.database.models import SubscriptionStatus
-
-            is_active = (
-                referral.subscription.status == SubscriptionStatus.ACTIVE.value
-                and referral.subscription.end_date > current_time
-            )
-
-        referrals_detail.append(
-            {
-                'referral_id': referral.id,
-                'referral_name': referral.full_name,
-                'referral_telegram_id': referral.telegram_id,
-                'total_earned_kopeks': earned,
-                'is_active': is_active,
-                'registration_date': referral.created_at,
-                'has_subscription': bool(referral.subscription),
-            }
         )
+    keyboard.append([types.InlineKeyboardButton(text='⬅️ К пользователю', callback_data=f'admin_user_manage_{user_id}')])
 
-    referrals_detail.sort(key=lambda x: x['total_earned_kopeks'], reverse=True)
-
-    return {
-        'invited_count': base_stats['invited_count'],
-        'active_referrals': base_stats['active_referrals'],
-        'total_earned_kopeks': base_stats['total_earned_kopeks'],
-        'month_earned_kopeks': base_stats['month_earned_kopeks'],
-        'referrals_detail': referrals_detail,
-    }
+    await callback.message.edit_text(text, reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard))
+    await callback.answer()
 
 
 @admin_required
@@ -3472,6 +3402,7 @@ async def toggle_user_server(callback: types.CallbackQuery, db_user: User, db: A
         subscription.updated_at = datetime.now(UTC)
         await db.commit()
         await db.refresh(subscription)
+        admin_user_card_service.invalidate(user_id)
 
         if user.remnawave_uuid:
             try:
@@ -3830,6 +3761,7 @@ async def reset_user_devices(callback: types.CallbackQuery, db_user: User, db: A
             success = await api.reset_user_devices(user.remnawave_uuid)
 
         if success:
+            admin_user_card_service.invalidate(user_id)
             await callback.message.edit_text(
                 '✅ Устройства пользователя успешно сброшены',
                 reply_markup=types.InlineKeyboardMarkup(
@@ -3898,6 +3830,7 @@ async def _update_user_devices(db: AsyncSession, user_id: int, devices: int, adm
             old_devices=old_devices,
             devices=devices,
         )
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -3947,6 +3880,7 @@ async def _update_user_traffic(db: AsyncSession, user_id: int, traffic_gb: int,
             traffic_text_old=traffic_text_old,
             traffic_text_new=traffic_text_new,
         )
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -3976,6 +3910,7 @@ async def _extend_subscription_by_days(db: AsyncSession, user_id: int, days: int
             logger.info(
                 'Админ сократил подписку пользователя на дней', admin_id=admin_id, user_id=user_id, value=abs(days)
             )
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -4004,6 +3939,7 @@ async def _add_subscription_traffic(db: AsyncSession, user_id: int, gb: int, adm
 
         traffic_text = 'безлимитный' if gb == 0 else f'{gb} ГБ'
         logger.info('Админ добавил трафик пользователю', admin_id=admin_id, traffic_text=traffic_text, user_id=user_id)
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -4029,6 +3965,7 @@ async def _deactivate_user_subscription(db: AsyncSession, user_id: int, admin_id
             await subscription_service.disable_remnawave_user(user.remnawave_uuid)
 
         logger.info('Админ деактивировал подписку пользователя', admin_id=admin_id, user_id=user_id)
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -4058,6 +3995,7 @@ async def _activate_user_subscription(db: AsyncSession, user_id: int, admin_id:
         await subscription_service.update_remnawave_user(db, subscription)
 
         logger.info('Админ активировал подписку пользователя', admin_id=admin_id, user_id=user_id)
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -4089,6 +4027,7 @@ async def _grant_trial_subscription(db: AsyncSession, user_id: int, admin_id: in
         await subscription_service.create_remnawave_user(db, subscription)
 
         logger.info('Админ выдал триальную подписку пользователю', admin_id=admin_id, user_id=user_id)
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -4140,6 +4079,7 @@ async def _grant_paid_subscription(db: AsyncSession, user_id: int, days: int, ad
         await subscription_service.create_remnawave_user(db, subscription)
 
         logger.info('Админ выдал платную подписку на дней пользователю', admin_id=admin_id, days=days, user_id=user_id)
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -4625,6 +4565,7 @@ async def admin_buy_subscription_execute(callback: types.CallbackQuery, db_user:
             except Exception as e:
                 logger.error('Ошибка работы с RemnaWave для пользователя', telegram_id=target_user.telegram_id, error=e)
 
+            admin_user_card_service.invalidate(user_id)
             message = f'✅ Подписка пользователя продлена на {period_days} дней'
         else:
             message = '❌ Ошибка: у пользователя нет существующей подписки'
@@ -4993,6 +4934,7 @@ async def admin_buy_tariff_execute(callback: types.CallbackQuery, db_user: User,
             amount_kopeks=-price_kopeks,
             description=f'Покупка тарифа {tariff.name} на {period} дней (администратор)',
         )
+        admin_user_card_service.invalidate(user_id)
 
         if target_user.telegram_id:
             target_user_link = f'<a href="tg://user?id={target_user.telegram_id}">{target_user.full_name}</a>'
@@ -5119,6 +5061,7 @@ async def _change_subscription_type(db: AsyncSession, user_id: int, new_type: st
             old_type=old_type,
             new_type_text=new_type_text,
         )
+        admin_user_card_service.invalidate(user_id)
         return True
 
     except Exception as e:
@@ -5320,6 +5263,7 @@ async def confirm_admin_tariff_change(callback: types.CallbackQuery, db_user: Us
         # Синхронизируем с RemnaWave
         subscription_service = SubscriptionService()
         await subscription_service.update_remnawave_user(db, subscription)
+        admin_user_card_service.invalidate(user_id)
 
         logger.info(
             'Админ изменил тариф пользователя',
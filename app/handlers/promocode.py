@@ -89,8 +89,8 @@ async def process_promocode(message: types.Message, db_user: User, state: FSMCon
         return
 
     # Rate-limit на перебор
-    if promo_limiter.is_blocked(message.from_user.id):
-        cooldown = promo_limiter.get_block_cooldown(message.from_user.id)
+    cooldown = await promo_limiter.get_block_cooldown(message.from_user.id)
+    if cooldown:
         await message.answer(
             texts.t(
                 'PROMO_RATE_LIMITED',
@@ -102,7 +102,7 @@ async def process_promocode(message: types.Message, db_user: User, state: FSMCon
         return
 
     # Лимит на стакинг (макс активаций в день)
-    if not promo_limiter.can_activate(message.from_user.id):
+    if not await promo_limiter.can_activate(message.from_user.id):
         await message.answer(
             texts.t(
                 'PROMO_DAILY_LIMIT',
@@ -116,7 +116,7 @@ async def process_promocode(message: types.Message, db_user: User, state: FSMCon
     result = await activate_promocode_for_registration(db, db_user.id, code, message.bot)
 
     if result['success']:
-        promo_limiter.record_activation(message.from_user.id)
+        await promo_limiter.record_activation(message.from_user.id)
         await message.answer(
             texts.PROMOCODE_SUCCESS.format(description=result['description']),
             reply_markup=get_back_keyboard(db_user.language),
@@ -124,8 +124,7 @@ async def process_promocode(message: types.Message, db_user: User, state: FSMCon
     else:
         # Записываем неудачную попытку только для not_found (перебор)
         if result['error'] == 'not_found':
-            promo_limiter.record_failed_attempt(message.from_user.id)
-            promo_limiter.cleanup()
+            await promo_limiter.record_failed_attempt(message.from_user.id)
 
         error_messages = {
             'not_found': texts.PROMOCODE_INVALID,
@@ -43,6 +43,7 @@ from app.services.pinned_message_service import (
     get_active_pinned_message,
 )
 from app.services.privacy_policy_service import PrivacyPolicyService
+from app.services.referral_click_service import referral_click_recorder
 from app.services.referral_service import process_referral_registration
 from app.services.subscription_service import SubscriptionService
 from app.services.support_settings_service import SupportSettingsService
@@ -174,8 +175,8 @@ async def handle_potential_referral_code(message: types.Message, state: FSMConte
         return False
 
     # Rate-limit на перебор промокодов
-    if promo_limiter.is_blocked(message.from_user.id):
-        cooldown = promo_limiter.get_block_cooldown(message.from_user.id)
+    cooldown = await promo_limiter.get_block_cooldown(message.from_user.id)
+    if cooldown:
         await message.answer(
             texts.t(
                 'PROMO_RATE_LIMITED',
@@ -247,8 +248,7 @@ async def handle_potential_referral_code(message: types.Message, state: FSMConte
         return True
 
     # Ни реферальный код, ни промокод не найдены — записываем неудачную попытку
-    promo_limiter.record_failed_attempt(message.from_user.id)
-    promo_limiter.cleanup()
+    await promo_limiter.record_failed_attempt(message.from_user.id)
 
     await message.answer(
         texts.t(
@@ -400,6 +400,8 @@ async def cmd_start(message: types.Message, state: FSMContext, db: AsyncSession,
         else:
             referral_code = start_parameter
             logger.info('🔎 Найден реферальный код', referral_code=referral_code)
+            if len(start_args) > 1:
+                referral_click_recorder.record(message.from_user.id, referral_code, 'start')
 
     if referral_code:
         await state.update_data(referral_code=referral_code)
@@ -1021,8 +1023,8 @@ async def process_referral_code_input(message: types.Message, state: FSMContext,
         return
 
     # Rate-limit на перебор
-    if promo_limiter.is_blocked(message.from_user.id):
-        cooldown = promo_limiter.get_block_cooldown(message.from_user.id)
+    cooldown = await promo_limiter.get_block_cooldown(message.from_user.id)
+    if cooldown:
         await message.answer(
             texts.t(
                 'PROMO_RATE_LIMITED',
@@ -1061,8 +1063,7 @@ async def process_referral_code_input(message: types.Message, state: FSMContext,
         return
 
     # Ни реферальный код, ни промокод не найдены — записываем неудачу
-    promo_limiter.record_failed_attempt(message.from_user.id)
-    promo_limiter.cleanup()
+    await promo_limiter.record_failed_attempt(message.from_user.id)
 
     await message.answer(texts.t('REFERRAL_OR_PROMO_CODE_INVALID', '❌ Неверный реферальный код или промокод'))
     logger.info('❌ Неверный код (ни реферальный, ни промокод)', code=code)
@@ -117,33 +117,11 @@ async def get_countries_price_by_uuids_fallback(
     promo_group_id: int | None = None,
 ) -> tuple[int, list[int]]:
     try:
-        from app.database.crud.server_squad import get_server_squad_by_uuid
-
-        total_price = 0
-        prices_list = []
-
-        for country_uuid in country_uuids:
-            try:
-                server = await get_server_squad_by_uuid(db, country_uuid)
-                is_allowed = True
-                if promo_group_id is not None and server:
-                    allowed_ids = {pg.id for pg in server.allowed_promo_groups}
-                    is_allowed = promo_group_id in allowed_ids
-
-                if server and server.is_available and not server.is_full and is_allowed:
-                    price = server.price_kopeks
-                    total_price += price
-                    prices_list.append(price)
-                else:
-                    default_price = 0
-                    total_price += default_price
-                    prices_list.append(default_price)
-            except Exception:
-                default_price = 0
-                total_price += default_price
-                prices_list.append(default_price)
-
-        return total_price, prices_list
+        from app.services.server_squad_catalog import server_squad_catalog
+
+        await server_squad_catalog.ensure_fresh(db)
+        quote = server_squad_catalog.quote(country_uuids, promo_group_id)
+        return quote.total_kopeks, quote.prices
 
     except Exception as e:
         logger.error('Ошибка fallback функции', error=e)
@@ -9,7 +9,7 @@ Usage::
 
     file_formatter, console_formatter, telegram_notifier = setup_logging()
     # Apply formatters to handlers...
-    # Later: telegram_notifier.set_bot(bot)
+    # Later: telegram_notifier.set_bot(bot), on shutdown: await telegram_notifier.stop()
 """
 
 from __future__ import annotations
@@ -68,7 +68,11 @@ def setup_logging() -> tuple[logging.Formatter, logging.Formatter, Any]:
     """
     from app.logging_handler import TelegramNotifierProcessor
 
-    telegram_notifier = TelegramNotifierProcessor()
+    telegram_notifier = TelegramNotifierProcessor(
+        window_seconds=settings.LOG_TELEGRAM_DIGEST_WINDOW_SECONDS,
+        max_messages_per_minute=settings.LOG_TELEGRAM_MAX_MESSAGES_PER_MINUTE,
+        max_fingerprints=settings.LOG_TELEGRAM_DIGEST_MAX_ERRORS,
+    )
     timestamper = _create_timezone_timestamper()
 
     # Shared processors applied to both structlog and stdlib log entries.
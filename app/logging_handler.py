@@ -1,41 +1,60 @@
 """Structlog processor for sending ERROR/CRITICAL logs to admin Telegram chat.
 
-Intercepts all log events at ERROR level and above, deduplicates them,
-and schedules async delivery to the admin Telegram chat via the existing
-``send_error_to_admin_chat`` infrastructure.
-
-Deduplication:
+Intercepts all log events at ERROR level and above and groups them into
+time-windowed digests that are delivered to the admin Telegram chat.
+
+Digests:
+- Events are keyed by a fingerprint (logger + message + exception type).
+  Repeats only bump the counter and ``last_seen`` of the pending entry;
+  the traceback is formatted once, for the first occurrence in a window.
+- The pending buffer holds at most ``max_fingerprints`` distinct entries.
+  Events that do not fit are counted (``events_dropped``) and reported
+  in the next digest.
+- A background task sends one digest per ``window_seconds``.  At most
+  ``max_messages_per_minute`` digests are sent per minute; while the cap
+  is reached the buffer keeps aggregating (``digests_deferred``).
 - Events already processed by GlobalErrorMiddleware / @error_handler
   carry ``_admin_notified=True`` and are skipped.
-- Recent message hashes are kept in a TTL cache to prevent duplicate
-  notifications for the same error within a short window.
 
-Async bridge:
-- structlog processors are synchronous.  We use
-  ``asyncio.get_running_loop().call_soon_threadsafe()`` to schedule an
-  asyncio.Task from any thread.
+Thread safety:
+- structlog processors are synchronous and may run in any thread.  The
+  processor only updates the buffer under a lock; all network I/O
+  happens in the flusher task on the bot's event loop.
 
 Deferred init:
 - The Bot instance is created later in main.py.  ``set_bot()`` injects
-  it after creation.  Until then, events are silently passed through.
+  it after creation and starts the flusher.  Until then, events are
+  silently passed through.
 """
 
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import hashlib
+import html
 import sys
 import threading
 import time
 import traceback
+from collections import deque
+from dataclasses import dataclass
+from datetime import UTC, datetime
 from typing import Any, Final
 
 from aiogram import Bot
 
 
 # Constants
-RECENT_HASHES_MAX_SIZE: Final[int] = 256
-RECENT_HASH_TTL_SECONDS: Final[float] = 300.0  # 5 min — matches cooldown in global_error
+DIGEST_WINDOW_SECONDS: Final[float] = 60.0
+DIGEST_MAX_MESSAGES_PER_MINUTE: Final[int] = 2
+DIGEST_MAX_FINGERPRINTS: Final[int] = 50
+RATE_WINDOW_SECONDS: Final[float] = 60.0
+MESSAGE_MAX_LENGTH: Final[int] = 500
+TRACEBACK_MAX_LENGTH: Final[int] = 8000
+CAPTION_MAX_LENGTH: Final[int] = 1024  # Telegram limit for document captions
+CAPTION_ENTRY_PREVIEW_LENGTH: Final[int] = 80
+REPORT_SEPARATOR_WIDTH: Final[int] = 50
 
 # Logger name prefixes we never want notifications from
 # (noisy transport-level loggers).
@@ -72,36 +91,132 @@ IGNORED_LOGGER_PREFIXES: Final[tuple[str, ...]] = (
 )
 
 
-class TelegramNotifierProcessor:
-    """Structlog processor that sends ERROR/CRITICAL events to the admin Telegram chat.
+@dataclass(slots=True)
+class DigestEntry:
+    """Aggregated occurrences of one error fingerprint within a digest window."""
+
+    error_type: str
+    logger_name: str
+    message: str
+    context: str
+    traceback: str | None
+    first_seen: datetime
+    last_seen: datetime
+    count: int = 1
 
-    Uses the existing throttling and buffering from
-    ``app.middlewares.global_error.send_error_to_admin_chat``.
+
+class TelegramNotifierProcessor:
+    """Structlog processor that collects ERROR/CRITICAL events into digests for the admin chat.
 
     Usage::
 
         notifier = TelegramNotifierProcessor()
         # Add to shared_processors list in logging_config.py
-        # Later, when Bot is created:
+        # Later, when Bot is created (inside the running event loop):
         notifier.set_bot(bot)
+        # On shutdown — send what is left:
+        await notifier.stop()
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        window_seconds: float = DIGEST_WINDOW_SECONDS,
+        max_messages_per_minute: int = DIGEST_MAX_MESSAGES_PER_MINUTE,
+        max_fingerprints: int = DIGEST_MAX_FINGERPRINTS,
+    ) -> None:
         self._bot: Bot | None = None
-        # LRU-like cache of recent message hashes: hash -> timestamp
-        self._recent_hashes: dict[str, float] = {}
+        self._window_seconds = max(1.0, window_seconds)
+        self._max_messages_per_minute = max(1, max_messages_per_minute)
+        self._max_fingerprints = max(1, max_fingerprints)
+        # Pending digest: fingerprint -> entry, guarded by self._lock
+        self._pending: dict[str, DigestEntry] = {}
+        self._pending_dropped = 0
+        self._sent_at: deque[float] = deque()
         self._lock = threading.Lock()
+        self._task: asyncio.Task[None] | None = None
+
+        # Counters
+        self.events_total = 0
+        self.events_dropped = 0
+        self.digests_sent = 0
+        self.digests_deferred = 0
+        self.send_failures = 0
 
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
 
     def set_bot(self, bot: Bot) -> None:
-        """Inject the Bot instance for sending messages.
+        """Inject the Bot instance for sending messages and start the flusher.
 
         Called from main.py after the bot is created.
         """
         self._bot = bot
+        if self._task is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # No running loop — digests are sent only by explicit flush()
+                return
+            self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and send the remaining digest."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await self.flush()
+
+    @property
+    def pending_events(self) -> int:
+        with self._lock:
+            return sum(entry.count for entry in self._pending.values())
+
+    async def flush(self) -> bool:
+        """Send the pending digest unless the per-minute cap is reached.
+
+        Returns:
+            True if a digest was delivered.
+        """
+        bot = self._bot
+        if bot is None:
+            return False
+
+        with self._lock:
+            if not self._pending and not self._pending_dropped:
+                return False
+            now = time.monotonic()
+            while self._sent_at and now - self._sent_at[0] >= RATE_WINDOW_SECONDS:
+                self._sent_at.popleft()
+            if len(self._sent_at) >= self._max_messages_per_minute:
+                # Keep aggregating — the events go into the next allowed digest
+                self.digests_deferred += 1
+                return False
+            entries = list(self._pending.values())
+            dropped = self._pending_dropped
+            self._pending = {}
+            self._pending_dropped = 0
+            self._sent_at.append(now)
+
+        try:
+            # Lazy import to avoid circular dependencies at startup
+            from app.middlewares.global_error import send_error_digest_to_admin_chat
+
+            caption, report = build_digest(entries, dropped)
+            sent = await send_error_digest_to_admin_chat(bot, caption, report)
+        except Exception:
+            # Never let an exception leak — errors here must not be logged
+            # at ERROR level, that would feed the digest with itself.
+            sent = False
+
+        if sent:
+            self.digests_sent += 1
+        else:
+            self.send_failures += 1
+        return sent
 
     # ------------------------------------------------------------------
     # Processor interface
@@ -138,22 +253,22 @@ class TelegramNotifierProcessor:
             event_dict['exc_info'] = sys.exc_info()
 
         # 5. Bot not initialized yet — skip
-        bot = self._bot
-        if bot is None:
+        if self._bot is None:
             return event_dict
 
-        # 6. Deduplication via hash
-        msg_hash = self._compute_hash(event_dict)
-        now = time.monotonic()
-
+        # 6. Aggregate into the pending digest
+        fingerprint = self._compute_hash(event_dict)
+        now = datetime.now(tz=UTC)
         with self._lock:
-            self._evict_stale(now)
-            if msg_hash in self._recent_hashes:
+            self.events_total += 1
+            if self._touch(fingerprint, now) or self._is_full():
                 return event_dict
-            self._recent_hashes[msg_hash] = now
 
-        # 7. Schedule async send
-        self._schedule_send(bot, event_dict)
+        # First occurrence in this window: format the traceback outside the lock
+        entry = _make_entry(event_dict, now)
+        with self._lock:
+            if not self._touch(fingerprint, now) and not self._is_full():
+                self._pending[fingerprint] = entry
 
         return event_dict
 
@@ -163,7 +278,7 @@ class TelegramNotifierProcessor:
 
     @staticmethod
     def _compute_hash(event_dict: dict[str, Any]) -> str:
-        """Compute a short hash for deduplication.
+        """Compute a short fingerprint for aggregation.
 
         Hashes logger name + event message + exception type (if present).
         """
@@ -179,113 +294,129 @@ class TelegramNotifierProcessor:
         raw = f'{logger_name}:{event_msg}:{exc_type}'
         return hashlib.md5(raw.encode('utf-8', errors='replace')).hexdigest()
 
-    def _evict_stale(self, now: float) -> None:
-        """Remove expired entries from the hash cache. Must be called under self._lock."""
-        if not self._recent_hashes:
-            return
-        stale_keys = [k for k, ts in self._recent_hashes.items() if (now - ts) > RECENT_HASH_TTL_SECONDS]
-        for k in stale_keys:
-            self._recent_hashes.pop(k, None)
-        # Force eviction on overflow — remove oldest entries
-        if len(self._recent_hashes) > RECENT_HASHES_MAX_SIZE:
-            sorted_keys = sorted(self._recent_hashes, key=lambda k: self._recent_hashes[k])
-            for k in sorted_keys[: len(self._recent_hashes) - RECENT_HASHES_MAX_SIZE]:
-                self._recent_hashes.pop(k, None)
-
-    def _schedule_send(self, bot: Bot, event_dict: dict[str, Any]) -> None:
-        """Schedule async delivery via event loop.
-
-        Works from any thread:
-        - From async context: creates Task directly.
-        - From other threads: uses call_soon_threadsafe.
-        """
-        try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            # No running loop — silently skip.
-            # The structlog processor runs in sync context; if there's no loop,
-            # we can't send anything.
-            return
-        else:
-            # We're in async context — create task directly
-            self._create_send_task(bot, event_dict, loop)
-
-    def _create_send_task(
-        self,
-        bot: Bot,
-        event_dict: dict[str, Any],
-        loop: asyncio.AbstractEventLoop,
-    ) -> None:
-        """Create an asyncio.Task for sending the notification."""
-        loop.create_task(self._send(bot, event_dict))
-
-    @staticmethod
-    async def _send(bot: Bot, event_dict: dict[str, Any]) -> None:
-        """Send the log event to the admin chat via existing infrastructure."""
-        try:
-            # Lazy import to avoid circular dependencies at startup
-            from app.middlewares.global_error import send_error_to_admin_chat
-
-            # Build a pseudo-Exception from the event_dict
-            error = _make_event_dict_error(event_dict)
-
-            # Build rich context from event_dict
-            context_parts: list[str] = []
-            logger_name = event_dict.get('logger', '')
-            if logger_name:
-                context_parts.append(f'Logger: {logger_name}')
-            user_id = event_dict.get('user_id')
-            username = event_dict.get('username')
-            if user_id:
-                user_str = f'User: {user_id}'
-                if username:
-                    user_str += f' (@{username})'
-                context_parts.append(user_str)
-
-            context = '\n'.join(context_parts)
-
-            # Extract traceback from exc_info if present
-            tb_override: str | None = None
-            exc_info = event_dict.get('exc_info')
-            if exc_info and isinstance(exc_info, tuple) and exc_info[2] is not None:
-                tb_override = ''.join(traceback.format_exception(*exc_info))
-
-            await send_error_to_admin_chat(bot, error, context, tb_override=tb_override)
+    def _touch(self, fingerprint: str, now: datetime) -> bool:
+        """Count a repeat of a pending fingerprint. Must be called under self._lock."""
+        entry = self._pending.get(fingerprint)
+        if entry is None:
+            return False
+        entry.count += 1
+        entry.last_seen = now
+        return True
+
+    def _is_full(self) -> bool:
+        """Count an event that does not fit the buffer. Must be called under self._lock."""
+        if len(self._pending) < self._max_fingerprints:
+            return False
+        self._pending_dropped += 1
+        self.events_dropped += 1
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._window_seconds)
+            await self.flush()
+
+
+def _error_type_name(event_dict: dict[str, Any]) -> str:
+    """Name of the real exception type from exc_info or error kwarg, else ``Log<Level>``."""
+    exc_info = event_dict.get('exc_info')
+    if exc_info and isinstance(exc_info, tuple) and exc_info[1] is not None:
+        return type(exc_info[1]).__name__
+    error_kwarg = event_dict.get('error')
+    if error_kwarg and isinstance(error_kwarg, BaseException):
+        return type(error_kwarg).__name__
+    level = event_dict.get('level', 'error')
+    return f'Log{level.capitalize()}'
+
+
+def _make_entry(event_dict: dict[str, Any], now: datetime) -> DigestEntry:
+    """Build a digest entry from the first occurrence of an event."""
+    context_parts: list[str] = []
+    user_id = event_dict.get('user_id')
+    username = event_dict.get('username')
+    if user_id:
+        user_str = f'User: {user_id}'
+        if username:
+            user_str += f' (@{username})'
+        context_parts.append(user_str)
+
+    tb: str | None = None
+    exc_info = event_dict.get('exc_info')
+    if exc_info and isinstance(exc_info, tuple) and exc_info[2] is not None:
+        tb = ''.join(traceback.format_exception(*exc_info))[-TRACEBACK_MAX_LENGTH:]
+
+    return DigestEntry(
+        error_type=_error_type_name(event_dict),
+        logger_name=str(event_dict.get('logger', '')),
+        message=str(event_dict.get('event', ''))[:MESSAGE_MAX_LENGTH],
+        context='\n'.join(context_parts),
+        traceback=tb,
+        first_seen=now,
+        last_seen=now,
+    )
 
-        except Exception:
-            # Never let an exception leak — this is a logging processor,
-            # recursion would kill the application.
-            pass
 
+def build_digest(entries: list[DigestEntry], dropped: int = 0) -> tuple[str, str]:
+    """Render a digest as (HTML caption, plain-text report attached as a file)."""
+    from app.utils.timezone import format_local_datetime
 
-def _make_event_dict_error(event_dict: dict[str, Any]) -> Exception:
-    """Create an Exception wrapper for a structlog event_dict.
+    entries = sorted(entries, key=lambda entry: entry.count, reverse=True)
+    total = sum(entry.count for entry in entries) + dropped
+    first_seen = min((entry.first_seen for entry in entries), default=None)
+    last_seen = max((entry.last_seen for entry in entries), default=None)
+    period = f'{format_local_datetime(first_seen, "%H:%M:%S")} — {format_local_datetime(last_seen, "%H:%M:%S")}'
 
-    ``send_error_to_admin_chat`` uses ``type(error).__name__`` as error_type.
-    If exc_info contains a real exception, use its type name.
-    Otherwise, create a descriptive class from the log level.
-    """
-    # Prefer the real exception type from exc_info or error kwarg
-    exc_info = event_dict.get('exc_info')
-    if exc_info and isinstance(exc_info, tuple) and exc_info[1] is not None:
-        real_exc = exc_info[1]
-        class_name = type(real_exc).__name__
-    else:
-        error_kwarg = event_dict.get('error')
-        if error_kwarg and isinstance(error_kwarg, BaseException):
-            class_name = type(error_kwarg).__name__
-        else:
-            level = event_dict.get('level', 'error')
-            class_name = f'Log{level.capitalize()}'
-
-    error_cls = type(
-        class_name,
-        (Exception,),
-        {
-            '__str__': lambda self: self.args[0] if self.args else '',
-        },
+    header = (
+        f'<b>Remnawave Bedolaga Bot</b>\n\n'
+        f'⚠️ Сводка ошибок\n\n'
+        f'<b>Событий:</b> {total}, <b>видов:</b> {len(entries)}\n'
+        f'<b>Период:</b> {period}\n'
     )
-    message = str(event_dict.get('event', ''))
-    error = error_cls(message)
-    error.event_dict = event_dict  # type: ignore[attr-defined]
-    return error
+    footer = f'\n<b>Не вошло в сводку:</b> {dropped}' if dropped else ''
+
+    lines: list[str] = []
+    budget = CAPTION_MAX_LENGTH - len(header) - len(footer) - 40  # room for the "and N more" line
+    for index, entry in enumerate(entries):
+        preview = entry.message[:CAPTION_ENTRY_PREVIEW_LENGTH]
+        line = f'\n{entry.count}× <code>{html.escape(entry.error_type)}</code> {html.escape(preview)}'
+        if len(line) > budget:
+            lines.append(f'\n<i>... и ещё {len(entries) - index}</i>')
+            break
+        lines.append(line)
+        budget -= len(line)
+    caption = header + ''.join(lines) + footer
+
+    separator = '=' * REPORT_SEPARATOR_WIDTH
+    report_lines = [
+        'ERROR DIGEST',
+        separator,
+        f'Period: {format_local_datetime(first_seen)} - {format_local_datetime(last_seen)}',
+        f'Events: {total}',
+        f'Fingerprints: {len(entries)}',
+        f'Dropped (buffer full): {dropped}',
+        '',
+    ]
+    for index, entry in enumerate(entries):
+        report_lines.extend(
+            [
+                separator,
+                f'ERROR #{index}: {entry.error_type} x{entry.count}',
+                separator,
+                f'Logger: {entry.logger_name}',
+                f'First seen: {format_local_datetime(entry.first_seen)}',
+                f'Last seen: {format_local_datetime(entry.last_seen)}',
+            ]
+        )
+        if entry.context:
+            report_lines.append(f'Context: {entry.context}')
+        report_lines.extend(
+            [
+                f'Message: {entry.message}',
+                '',
+                'Traceback (first occurrence):',
+                entry.traceback or '(no traceback available)',
+                '',
+            ]
+        )
+
+    return caption, '\n'.join(report_lines)
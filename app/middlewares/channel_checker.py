@@ -20,6 +20,7 @@ from app.keyboards.inline import get_channel_sub_keyboard
 from app.localization.loader import DEFAULT_LANGUAGE
 from app.localization.texts import get_texts
 from app.services.admin_notification_service import AdminNotificationService
+from app.services.referral_click_service import referral_click_recorder
 from app.services.subscription_service import SubscriptionService
 from app.utils.check_reg_process import is_registration_process
 
@@ -245,6 +246,7 @@ class ChannelCheckerMiddleware(BaseMiddleware):
             return
 
         payload = parts[1]
+        referral_click_recorder.record(telegram_id, payload, 'channel_check')
 
         # Сохраняем в FSM state
         if state:
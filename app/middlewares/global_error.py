@@ -275,12 +275,6 @@ async def send_error_to_admin_chat(
 
         errors_count = len(_error_buffer)
 
-        file_name = f'error_report_{now.strftime(DATETIME_FORMAT_FILENAME)}.txt'
-        file = BufferedInputFile(
-            file=log_content.encode('utf-8'),
-            filename=file_name,
-        )
-
         message_text = (
             f'<b>Remnawave Bedolaga Bot</b>\n\n'
             f'⚠️ Ошибка во время работы\n\n'
@@ -297,29 +291,7 @@ async def send_error_to_admin_chat(
 
         message_text += f'\n<i>{timestamp}</i>'
 
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text='💬 Сообщить разработчику',
-                        url=DEVELOPER_CONTACT_URL,
-                    ),
-                ],
-            ]
-        )
-
-        message_kwargs: dict = {
-            'chat_id': chat_id,
-            'document': file,
-            'caption': message_text,
-            'parse_mode': ParseMode.HTML,
-            'reply_markup': keyboard,
-        }
-
-        if topic_id:
-            message_kwargs['message_thread_id'] = topic_id
-
-        await bot.send_document(**message_kwargs)
+        await _send_report_document(bot, chat_id, topic_id, message_text, log_content, now)
         _error_buffer.clear()  # Clear only after successful send
         logger.info('Уведомление об ошибке отправлено в чат', chat_id=chat_id)
         return True
@@ -327,3 +299,59 @@ async def send_error_to_admin_chat(
     except Exception as e:
         logger.error('Ошибка отправки уведомления об ошибке', e=e, _admin_notified=True)
         return False
+
+
+async def send_error_digest_to_admin_chat(bot: Bot, caption: str, report: str) -> bool:
+    """
+    Отправляет готовую сводку ошибок в админский чат без троттлинга.
+
+    Частоту сводок ограничивает вызывающий код (TelegramNotifierProcessor).
+
+    Returns:
+        bool: True если сводка отправлена
+    """
+    chat_id = getattr(settings, 'ADMIN_NOTIFICATIONS_CHAT_ID', None)
+    topic_id = getattr(settings, 'ADMIN_NOTIFICATIONS_TOPIC_ID', None)
+    enabled = getattr(settings, 'ADMIN_NOTIFICATIONS_ENABLED', False)
+
+    if not enabled or not chat_id:
+        return False
+
+    try:
+        await _send_report_document(bot, chat_id, topic_id, caption, report, datetime.now(tz=UTC))
+        return True
+    except Exception as e:
+        logger.error('Ошибка отправки сводки ошибок', e=e, _admin_notified=True)
+        return False
+
+
+async def _send_report_document(
+    bot: Bot, chat_id: str, topic_id: int | None, caption: str, log_content: str, now: datetime
+) -> None:
+    file = BufferedInputFile(
+        file=log_content.encode('utf-8'),
+        filename=f'error_report_{now.strftime(DATETIME_FORMAT_FILENAME)}.txt',
+    )
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text='💬 Сообщить разработчику',
+                    url=DEVELOPER_CONTACT_URL,
+                ),
+            ],
+        ]
+    )
+
+    message_kwargs: dict = {
+        'chat_id': chat_id,
+        'document': file,
+        'caption': caption,
+        'parse_mode': ParseMode.HTML,
+        'reply_markup': keyboard,
+    }
+
+    if topic_id:
+        message_kwargs['message_thread_id'] = topic_id
+
+    await bot.send_document(**message_kwargs)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+from aiogram.types.update import UpdateTypeLookupError
+
+from app.utils.metrics import MIDDLEWARE_DURATION, UPDATE_DURATION
+
+
+Handler = Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]
+
+# Наблюдатели, middleware которых оборачиваются таймерами
+_INSTRUMENTED_OBSERVERS = ('message', 'callback_query', 'pre_checkout_query')
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Полное время обработки update: все middleware и обработчик."""
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: dict[str, Any]) -> Any:
+        try:
+            event_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        except UpdateTypeLookupError:
+            event_type = 'unknown'
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            result = await handler(event, data)
+            status = 'ok'
+            return result
+        finally:
+            UPDATE_DURATION.observe(time.perf_counter() - started, event_type, status)
+
+
+class TimedMiddleware(BaseMiddleware):
+    """Собственное время middleware: общее время минус время вложенной цепочки."""
+
+    def __init__(self, middleware: Callable[..., Awaitable[Any]], event_type: str) -> None:
+        self.middleware = middleware
+        self._name = type(middleware).__name__
+        self._event_type = event_type
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: dict[str, Any]) -> Any:
+        inner_elapsed = 0.0
+
+        async def timed_handler(inner_event: TelegramObject, inner_data: dict[str, Any]) -> Any:
+            nonlocal inner_elapsed
+            inner_started = time.perf_counter()
+            try:
+                return await handler(inner_event, inner_data)
+            finally:
+                inner_elapsed += time.perf_counter() - inner_started
+
+        started = time.perf_counter()
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            MIDDLEWARE_DURATION.observe(time.perf_counter() - started - inner_elapsed, self._name, self._event_type)
+
+
+def instrument_dispatcher(dp: Dispatcher) -> None:
+    """Обернуть уже зарегистрированные middleware таймерами и засекать время update целиком."""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+
+    for observer_name in _INSTRUMENTED_OBSERVERS:
+        manager = getattr(dp, observer_name).middleware
+        registered = list(manager)
+        for middleware in registered:
+            manager.unregister(middleware)
+        for middleware in registered:
+            manager.register(TimedMiddleware(middleware, observer_name))
@@ -1,4 +1,3 @@
-import time
 from collections.abc import Awaitable, Callable
 from typing import Any
 
@@ -7,6 +6,8 @@ from aiogram import BaseMiddleware
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message, TelegramObject
 
+from app.utils.rate_limiter import RateLimitPolicy, rate_limiter
+
 
 logger = structlog.get_logger(__name__)
 
@@ -23,14 +24,13 @@ class ThrottlingMiddleware(BaseMiddleware):
         rate_limit: float = 0.5,
         start_max_calls: int = 3,
         start_window: float = 60.0,
+        *,
+        scope: str = 'updates',
     ):
-        self.rate_limit = rate_limit
-        self.user_buckets: dict[int, float] = {}
-
-        # /start anti-spam: sliding window per user
-        self.start_max_calls = start_max_calls
-        self.start_window = start_window
-        self.start_buckets: dict[int, list[float]] = {}
+        # Окна хранятся в общем rate_limiter: с вытеснением старых ключей и, при RATE_LIMIT_BACKEND=redis,
+        # едины для всех реплик бота
+        self.throttle_policy = RateLimitPolicy(f'throttle:{scope}', limit=1, window_seconds=rate_limit)
+        self.start_policy = RateLimitPolicy('start_command', limit=start_max_calls, window_seconds=start_window)
 
     async def __call__(
         self,
@@ -45,37 +45,28 @@ class ThrottlingMiddleware(BaseMiddleware):
         if not user_id:
             return await handler(event, data)
 
-        now = time.time()
-
         # --- /start burst rate-limit ---
         if isinstance(event, Message) and event.text and event.text.startswith('/start'):
-            timestamps = self.start_buckets.get(user_id, [])
-            # Оставляем только вызовы внутри окна
-            timestamps = [ts for ts in timestamps if now - ts < self.start_window]
+            start_result = await rate_limiter.hit(self.start_policy, user_id)
 
-            if len(timestamps) >= self.start_max_calls:
-                cooldown = int(self.start_window - (now - timestamps[0])) + 1
+            if not start_result.allowed:
                 logger.warning(
                     'Rate-limit /start для : вызовов за s (лимит)',
                     user_id=user_id,
-                    timestamps_count=len(timestamps),
-                    start_window=int(self.start_window),
-                    start_max_calls=self.start_max_calls,
+                    timestamps_count=start_result.count,
+                    start_window=int(self.start_policy.window_seconds),
+                    start_max_calls=self.start_policy.limit,
                 )
                 try:
-                    await event.answer(f'⏳ Слишком много запросов. Попробуйте через {cooldown} сек.')
+                    await event.answer(f'⏳ Слишком много запросов. Попробуйте через {start_result.retry_after} сек.')
                 except Exception:
                     pass
-                self.start_buckets[user_id] = timestamps
                 return None
 
-            timestamps.append(now)
-            self.start_buckets[user_id] = timestamps
-
         # --- Общий троттлинг (0.5 сек) ---
-        last_call = self.user_buckets.get(user_id, 0)
+        throttle_result = await rate_limiter.hit(self.throttle_policy, user_id)
 
-        if now - last_call < self.rate_limit:
+        if not throttle_result.allowed:
             logger.warning('Throttling для пользователя', user_id=user_id)
 
             # Для сообщений: молчим только если это состояние работы с тикетами; иначе показываем блок
@@ -102,19 +93,4 @@ class ThrottlingMiddleware(BaseMiddleware):
                 await event.answer('⏳ Слишком быстро! Подождите немного.', show_alert=True)
                 return None
 
-        self.user_buckets[user_id] = now
-
-        # Периодическая очистка старых записей
-        cleanup_threshold = now - 60
-        self.user_buckets = {
-            uid: timestamp for uid, timestamp in self.user_buckets.items() if timestamp > cleanup_threshold
-        }
-        # Очистка /start бакетов (раз в ~60 сек, лениво)
-        if len(self.start_buckets) > 500:
-            self.start_buckets = {
-                uid: [ts for ts in tss if now - ts < self.start_window]
-                for uid, tss in self.start_buckets.items()
-                if any(now - ts < self.start_window for ts in tss)
-            }
-
         return await handler(event, data)
@@ -0,0 +1,436 @@
+"""Карточка пользователя для админки бота и кабинета.
+
+Пользователь с подпиской, тарифом, основной промогруппой и реферером
+загружается одним запросом (плюс один для списка промогрупп). Счётчики и суммы —
+транзакции, траты, рефералы, реферальный доход, рекламная кампания —
+считаются одним запросом из скалярных подзапросов; по запросу ещё одним
+запросом добавляется топ рефералов по принесённому доходу. Данные панели RemnaWave
+кабинет запрашивает отдельно через get_panel_snapshot().
+
+Счётчики и данные панели кешируются на ADMIN_USER_CARD_CACHE_TTL_SECONDS:
+несколько карточек подряд не пересчитывают агрегаты. Сам пользователь и
+подписка читаются из БД при каждом открытии; каждое действие админки,
+меняющее пользователя, сбрасывает его кеш через invalidate().
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload, selectinload
+
+from app.config import settings
+from app.database.crud.subscription import check_and_update_subscription_status
+from app.database.models import (
+    AdvertisingCampaign,
+    AdvertisingCampaignRegistration,
+    ReferralEarning,
+    Subscription,
+    SubscriptionStatus,
+    TrafficPurchase,
+    Transaction,
+    TransactionType,
+    User,
+    UserPromoGroup,
+)
+
+
+logger = structlog.get_logger(__name__)
+
+_CACHE_MAX_USERS = 1000
+_REFERRAL_MONTH = timedelta(days=30)
+
+
+@dataclass(slots=True)
+class UserCardStats:
+    transactions_count: int = 0
+    total_spent_kopeks: int = 0
+    purchase_count: int = 0
+    referrals_count: int = 0
+    active_referrals_count: int = 0
+    referral_earnings_kopeks: int = 0  # начисления ReferralEarning
+    referral_month_earnings_kopeks: int = 0
+    referral_reward_kopeks: int = 0  # транзакции REFERRAL_REWARD
+    campaign_id: int | None = None
+    campaign_name: str | None = None
+    campaign_start_parameter: str | None = None
+    campaign_registered_at: datetime | None = None
+
+
+@dataclass(slots=True)
+class ReferralSummary:
+    user_id: int
+    full_name: str
+    earned_kopeks: int
+    is_active: bool
+
+
+@dataclass(slots=True)
+class PanelUserSnapshot:
+    trojan_password: str | None = None
+    vless_uuid: str | None = None
+    ss_password: str | None = None
+    subscription_url: str | None = None
+    happ_link: str | None = None
+    used_traffic_bytes: int = 0
+    lifetime_used_traffic_bytes: int = 0
+    traffic_limit_bytes: int = 0
+    first_connected_at: datetime | None = None
+    online_at: datetime | None = None
+    last_connected_node_uuid: str | None = None
+    last_connected_node_name: str | None = None
+
+
+@dataclass(slots=True)
+class AdminUserCard:
+    user: User
+    referrer: User | None
+    stats: UserCardStats
+    recent_transactions: list[Transaction] = field(default_factory=list)
+    traffic_purchases: list[TrafficPurchase] = field(default_factory=list)
+    top_referrals: list[ReferralSummary] = field(default_factory=list)
+
+    @property
+    def subscription(self) -> Subscription | None:
+        return self.user.subscription
+
+    @property
+    def registration_days(self) -> int:
+        return (datetime.now(UTC) - self.user.created_at).days
+
+
+class _TTLCache:
+    """Небольшой LRU-кеш в памяти процесса с временем жизни записей."""
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._items: OrderedDict[int, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: int) -> Any | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: int, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+    def pop(self, key: int) -> None:
+        self._items.pop(key, None)
+
+
+class AdminUserCardService:
+    def __init__(self) -> None:
+        self._stats_cache = _TTLCache(_CACHE_MAX_USERS)
+        self._panel_cache = _TTLCache(_CACHE_MAX_USERS)
+
+    @property
+    def _ttl(self) -> int:
+        return max(0, settings.ADMIN_USER_CARD_CACHE_TTL_SECONDS)
+
+    def invalidate(self, user_id: int) -> None:
+        """Сбросить кеш карточки после изменения пользователя."""
+        self._stats_cache.pop(user_id)
+        self._panel_cache.pop(user_id)
+
+    async def load(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        *,
+        recent_transactions: int = 0,
+        include_traffic_purchases: bool = False,
+        top_referrals: int = 0,
+        refresh_subscription_status: bool = False,
+    ) -> AdminUserCard | None:
+        """
+        Собрать карточку пользователя.
+
+        Args:
+            recent_transactions: сколько последних транзакций загрузить
+            include_traffic_purchases: загрузить докупки трафика подписки
+            top_referrals: сколько рефералов с наибольшим доходом загрузить
+            refresh_subscription_status: перевести истёкшую подписку в expired
+
+        Returns:
+            AdminUserCard или None, если пользователя нет
+        """
+        loaded = await self._load_user(db, user_id)
+        if loaded is None:
+            return None
+        user, referrer = loaded
+
+        if refresh_subscription_status and user.subscription:
+            await check_and_update_subscription_status(db, user.subscription)
+
+        stats = self._stats_cache.get(user.id)
+        if stats is None:
+            stats = await self._load_stats(db, user.id)
+            self._stats_cache.set(user.id, stats, self._ttl)
+
+        card = AdminUserCard(user=user, referrer=referrer, stats=stats)
+        if recent_transactions > 0:
+            result = await db.execute(
+                select(Transaction)
+                .where(Transaction.user_id == user.id)
+                .order_by(Transaction.created_at.desc())
+                .limit(recent_transactions)
+            )
+            card.recent_transactions = list(result.scalars().all())
+        if include_traffic_purchases and user.subscription:
+            result = await db.execute(
+                select(TrafficPurchase)
+                .where(TrafficPurchase.subscription_id == user.subscription.id)
+                .order_by(TrafficPurchase.created_at.desc())
+            )
+            card.traffic_purchases = list(result.scalars().all())
+        if top_referrals > 0 and stats.referrals_count > 0:
+            card.top_referrals = await self._load_top_referrals(db, user.id, top_referrals)
+        return card
+
+    @staticmethod
+    async def _load_user(db: AsyncSession, user_id: int) -> tuple[User, User | None] | None:
+        """Пользователь с подпиской, тарифом, промогруппами и реферер одним запросом (+ список промогрупп)."""
+        referrer = aliased(User)
+        result = await db.execute(
+            select(User, referrer)
+            .outerjoin(referrer, referrer.id == User.referred_by_id)
+            .options(
+                joinedload(User.subscription).joinedload(Subscription.tariff),
+                joinedload(User.promo_group),
+                selectinload(User.user_promo_groups).selectinload(UserPromoGroup.promo_group),
+            )
+            .where(User.id == user_id)
+        )
+        row = result.unique().one_or_none()
+        return (row[0], row[1]) if row is not None else None
+
+    @staticmethod
+    async def _load_stats(db: AsyncSession, user_id: int) -> UserCardStats:
+        completed = Transaction.is_completed.is_(True)
+        subscription_payment = and_(completed, Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value)
+        referral_reward = and_(completed, Transaction.type == TransactionType.REFERRAL_REWARD.value)
+        now = datetime.now(UTC)
+
+        transactions = (
+            select(
+                func.count(Transaction.id).label('transactions_count'),
+                func.coalesce(func.sum(case((subscription_payment, Transaction.amount_kopeks), else_=0)), 0).label(
+                    'total_spent'
+                ),
+                func.coalesce(func.sum(case((subscription_payment, 1), else_=0)), 0).label('purchase_count'),
+                func.coalesce(func.sum(case((referral_reward, Transaction.amount_kopeks), else_=0)), 0).label(
+                    'referral_reward'
+                ),
+            )
+            .where(Transaction.user_id == user_id)
+            .subquery()
+        )
+        # Комиссии referral_service зачисляет на баланс транзакцией DEPOSIT, поэтому
+        # реферальный доход считается по ReferralEarning, как в get_user_referral_stats
+        referral_earnings = (
+            select(func.coalesce(func.sum(ReferralEarning.amount_kopeks), 0))
+            .where(ReferralEarning.user_id == user_id)
+            .scalar_subquery()
+            .label('referral_earnings')
+        )
+        referral_month_earnings = (
+            select(func.coalesce(func.sum(ReferralEarning.amount_kopeks), 0))
+            .where(ReferralEarning.user_id == user_id, ReferralEarning.created_at >= now - _REFERRAL_MONTH)
+            .scalar_subquery()
+            .label('referral_month_earnings')
+        )
+        referrals_count = (
+            select(func.count(User.id)).where(User.referred_by_id == user_id).scalar_subquery().label('referrals')
+        )
+        active_referrals_count = (
+            select(func.count(User.id))
+            .join(Subscription, Subscription.user_id == User.id)
+            .where(
+                User.referred_by_id == user_id,
+                Subscription.status == SubscriptionStatus.ACTIVE.value,
+                Subscription.end_date > now,
+            )
+            .scalar_subquery()
+            .label('active_referrals')
+        )
+        campaign = (
+            select(AdvertisingCampaign.id)
+            .join(
+                AdvertisingCampaignRegistration, AdvertisingCampaignRegistration.campaign_id == AdvertisingCampaign.id
+            )
+            .where(AdvertisingCampaignRegistration.user_id == user_id)
+            .order_by(AdvertisingCampaignRegistration.created_at, AdvertisingCampaignRegistration.id)
+            .limit(1)
+        )
+
+        row = (
+            await db.execute(
+                select(
+                    transactions,
+                    referral_earnings,
+                    referral_month_earnings,
+                    referrals_count,
+                    active_referrals_count,
+                    campaign.with_only_columns(AdvertisingCampaign.id).scalar_subquery().label('campaign_id'),
+                    campaign.with_only_columns(AdvertisingCampaign.name).scalar_subquery().label('campaign_name'),
+                    campaign.with_only_columns(AdvertisingCampaign.start_parameter)
+                    .scalar_subquery()
+                    .label('campaign_start_parameter'),
+                    campaign.with_only_columns(AdvertisingCampaignRegistration.created_at)
+                    .scalar_subquery()
+                    .label('campaign_registered_at'),
+                )
+            )
+        ).one()
+
+        return UserCardStats(
+            transactions_count=int(row.transactions_count or 0),
+            total_spent_kopeks=int(row.total_spent or 0),
+            purchase_count=int(row.purchase_count or 0),
+            referrals_count=int(row.referrals or 0),
+            active_referrals_count=int(row.active_referrals or 0),
+            referral_earnings_kopeks=int(row.referral_earnings or 0),
+            referral_month_earnings_kopeks=int(row.referral_month_earnings or 0),
+            referral_reward_kopeks=int(row.referral_reward or 0),
+            campaign_id=row.campaign_id,
+            campaign_name=row.campaign_name,
+            campaign_start_parameter=row.campaign_start_parameter,
+            campaign_registered_at=row.campaign_registered_at,
+        )
+
+    @staticmethod
+    async def _load_top_referrals(db: AsyncSession, user_id: int, limit: int) -> list[ReferralSummary]:
+        """Рефералы с наибольшим доходом для пригласившего и признаком активной подписки."""
+        earned = func.coalesce(
+            select(func.sum(ReferralEarning.amount_kopeks))
+            .where(ReferralEarning.user_id == user_id, ReferralEarning.referral_id == User.id)
+            .correlate(User)
+            .scalar_subquery(),
+            0,
+        ).label('earned')
+        is_active = and_(
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.end_date > datetime.now(UTC),
+        ).label('is_active')
+
+        result = await db.execute(
+            select(User, earned, is_active)
+            .outerjoin(Subscription, Subscription.user_id == User.id)
+            .where(User.referred_by_id == user_id)
+            .order_by(earned.desc(), User.id)
+            .limit(limit)
+        )
+        return [
+            ReferralSummary(
+                user_id=referral.id,
+                full_name=referral.full_name,
+                earned_kopeks=int(earned_kopeks or 0),
+                is_active=bool(active),
+            )
+            for referral, earned_kopeks, active in result.all()
+        ]
+
+    async def get_panel_snapshot(
+        self,
+        user_id: int,
+        remnawave_uuid: str | None,
+        telegram_id: int | None,
+        email: str | None,
+    ) -> PanelUserSnapshot | None:
+        """Данные пользователя из панели RemnaWave (с кешем). None — не найден или панель недоступна."""
+        cached = self._panel_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        try:
+            snapshot = await self._fetch_panel_snapshot(user_id, remnawave_uuid, telegram_id, email)
+        except Exception as error:
+            logger.error('Ошибка получения данных пользователя из панели', user_id=user_id, error=error)
+            return None
+
+        if snapshot is not None:
+            self._panel_cache.set(user_id, snapshot, self._ttl)
+        return snapshot
+
+    @staticmethod
+    async def _fetch_panel_snapshot(
+        user_id: int,
+        remnawave_uuid: str | None,
+        telegram_id: int | None,
+        email: str | None,
+    ) -> PanelUserSnapshot | None:
+        from app.services.remnawave_service import RemnaWaveService
+
+        service = RemnaWaveService()
+        if not service.is_configured:
+            return None
+
+        async with service.get_api_client() as api:
+            panel_user = None
+
+            # Сначала по UUID (работает и для OAuth-пользователей)
+            if remnawave_uuid:
+                panel_user = await api.get_user_by_uuid(remnawave_uuid)
+
+            if not panel_user and telegram_id:
+                panel_users = await api.get_user_by_telegram_id(telegram_id)
+                if panel_users:
+                    panel_user = panel_users[0]
+
+            if not panel_user and email:
+                panel_users_by_email = await api.get_user_by_email(email)
+                if panel_users_by_email:
+                    panel_user = panel_users_by_email[0]
+
+            if not panel_user:
+                return None
+
+            # Имя последней ноды — через доступные пользователю ноды (легче, чем get_all_nodes)
+            last_node_name = None
+            last_node_uuid = None
+            if panel_user.user_traffic and panel_user.user_traffic.last_connected_node_uuid:
+                last_node_uuid = panel_user.user_traffic.last_connected_node_uuid
+                try:
+                    accessible = await api.get_user_accessible_nodes(panel_user.uuid)
+                    for node in accessible:
+                        if node.uuid == last_node_uuid:
+                            last_node_name = node.node_name
+                            break
+                except Exception:
+                    logger.warning('Не удалось определить имя ноды пользователя', user_id=user_id)
+
+            return PanelUserSnapshot(
+                trojan_password=panel_user.trojan_password,
+                vless_uuid=panel_user.vless_uuid,
+                ss_password=panel_user.ss_password,
+                subscription_url=panel_user.subscription_url,
+                happ_link=panel_user.happ_link,
+                used_traffic_bytes=panel_user.used_traffic_bytes,
+                lifetime_used_traffic_bytes=panel_user.lifetime_used_traffic_bytes,
+                traffic_limit_bytes=panel_user.traffic_limit_bytes,
+                first_connected_at=panel_user.first_connected_at,
+                online_at=panel_user.online_at,
+                last_connected_node_uuid=last_node_uuid,
+                last_connected_node_name=last_node_name,
+            )
+
+
+admin_user_card_service = AdminUserCardService()
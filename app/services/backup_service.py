@@ -1,11 +1,13 @@
 import asyncio
 import gzip
+import hashlib
 import json as json_lib
 import math
 import os
 import shutil
 import tarfile
 import tempfile
+from collections.abc import AsyncIterator
 from dataclasses import asdict, dataclass
 from datetime import UTC, date as dt_date, datetime, time as dt_time, timedelta
 from decimal import Decimal
@@ -16,10 +18,11 @@ import aiofiles
 import pyzipper
 import structlog
 from aiogram.types import FSInputFile
-from sqlalchemy import inspect, select, text
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.config import settings
 from app.database.database import AsyncSessionLocal, engine
@@ -101,6 +104,184 @@ from app.database.models import (
 
 logger = structlog.get_logger(__name__)
 
+STREAM_EXPORT_FORMAT_VERSION = 'ndjson-1.0'
+STREAM_EXPORT_FETCH_SIZE = 1000
+RESTORE_CHUNK_ROWS = 1000
+# Nullable FK, которые при восстановлении обнуляются, если целевой записи нет
+_RESTORE_NULLABLE_FK_TARGETS: dict[str, dict[str, Any]] = {'subscriptions': {'tariff_id': Tariff}}
+# asyncpg ограничивает число bind-параметров в одном запросе (32767)
+POSTGRES_MAX_BIND_PARAMS = 32000
+
+
+def _serialize_backup_value(value: Any) -> Any:
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, (datetime, dt_date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, float):
+        return 0.0 if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, (list, dict)):
+        try:
+            return json_lib.dumps(value) if value else None
+        except TypeError:
+            return str(value)
+    if hasattr(value, '__dict__'):
+        return str(value)
+    return value
+
+
+class _HashingWriter:
+    """Файловая обёртка, считающая sha256 и размер записанных байт."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        self.size += len(data)
+        return self._raw.write(data)
+
+    def flush(self) -> None:
+        self._raw.flush()
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class _TableChunkWriter:
+    """Пишет строки таблицы в gzip-NDJSON чанки фиксированного размера.
+
+    Одновременно в памяти находится только текущая партиция строк, поэтому
+    потребление памяти не зависит от размера таблицы.
+    """
+
+    def __init__(self, target_dir: Path, table_name: str, column_names: list[str], chunk_rows: int):
+        self.target_dir = target_dir
+        self.table_name = table_name
+        self.column_names = column_names
+        self.chunk_rows = max(1, chunk_rows)
+        self.rows = 0
+        self.chunks: list[dict[str, Any]] = []
+        self._raw = None
+        self._hashing: _HashingWriter | None = None
+        self._gzip: gzip.GzipFile | None = None
+        self._chunk_path: Path | None = None
+        self._chunk_rows_written = 0
+
+    def _open_chunk(self) -> None:
+        self._chunk_path = self.target_dir / f'{self.table_name}.{len(self.chunks):05d}.ndjson.gz'
+        self._raw = self._chunk_path.open('wb')
+        self._hashing = _HashingWriter(self._raw)
+        self._gzip = gzip.GzipFile(filename='', mode='wb', fileobj=self._hashing, mtime=0)
+        self._chunk_rows_written = 0
+
+    def _close_chunk(self) -> None:
+        if self._gzip is None:
+            return
+        self._gzip.close()
+        self._raw.close()
+        self.chunks.append(
+            {
+                'path': self._chunk_path.name,
+                'rows': self._chunk_rows_written,
+                'sha256': self._hashing.hexdigest(),
+                'size_bytes': self._hashing.size,
+            }
+        )
+        self._gzip = None
+        self._raw = None
+        self._hashing = None
+
+    def write_rows(self, rows) -> None:
+        column_names = self.column_names
+        for row in rows:
+            if self._gzip is None:
+                self._open_chunk()
+
+            record = {name: _serialize_backup_value(value) for name, value in zip(column_names, row, strict=False)}
+            line = json_lib.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str)
+            self._gzip.write(line.encode('utf-8') + b'\n')
+            self._chunk_rows_written += 1
+            self.rows += 1
+
+            if self._chunk_rows_written >= self.chunk_rows:
+                self._close_chunk()
+
+    def close(self) -> dict[str, Any]:
+        self._close_chunk()
+        return {
+            'table': self.table_name,
+            'columns': self.column_names,
+            'rows': self.rows,
+            'chunks': self.chunks,
+        }
+
+
+def _read_ndjson_chunk(chunk_path: Path, expected_sha256: str | None) -> list[dict[str, Any]]:
+    if expected_sha256:
+        digest = hashlib.sha256()
+        with chunk_path.open('rb') as raw:
+            for block in iter(lambda: raw.read(1024 * 1024), b''):
+                digest.update(block)
+        if digest.hexdigest() != expected_sha256:
+            raise ValueError(f'Контрольная сумма чанка {chunk_path.name} не совпадает')
+
+    with gzip.open(chunk_path, 'rt', encoding='utf-8') as chunk_file:
+        return [json_lib.loads(line) for line in chunk_file if line.strip()]
+
+
+class _TableRecords:
+    """Записи таблицы из бекапа, отдаваемые чанками.
+
+    Для JSON-бекапа это срезы уже загруженного списка, для NDJSON — файлы чанков,
+    которые читаются по одному во время восстановления, так что в памяти держится
+    только текущий чанк.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        rows: int,
+        records: list[dict[str, Any]] | None = None,
+        dump_dir: Path | None = None,
+        chunks: list[dict[str, Any]] | None = None,
+    ):
+        self.table_name = table_name
+        self.rows = rows
+        self._records = records
+        self._dump_dir = dump_dir
+        self._chunks = chunks or []
+
+    @classmethod
+    def from_list(cls, table_name: str, records: list[dict[str, Any]]) -> '_TableRecords':
+        return cls(table_name, len(records), records=records)
+
+    @classmethod
+    def from_manifest(cls, dump_dir: Path, entry: dict[str, Any]) -> '_TableRecords':
+        return cls(entry['table'], int(entry.get('rows', 0)), dump_dir=dump_dir, chunks=entry.get('chunks', []))
+
+    def __len__(self) -> int:
+        return self.rows
+
+    async def __aiter__(self) -> AsyncIterator[list[dict[str, Any]]]:
+        if self._records is not None:
+            for start in range(0, len(self._records), RESTORE_CHUNK_ROWS):
+                yield self._records[start : start + RESTORE_CHUNK_ROWS]
+            return
+
+        read = 0
+        for chunk in self._chunks:
+            records = await asyncio.to_thread(_read_ndjson_chunk, self._dump_dir / chunk['path'], chunk.get('sha256'))
+            read += len(records)
+            for start in range(0, len(records), RESTORE_CHUNK_ROWS):
+                yield records[start : start + RESTORE_CHUNK_ROWS]
+        if read != self.rows:
+            raise ValueError(f'Количество строк таблицы {self.table_name} не совпадает с манифестом')
+
 
 @dataclass
 class BackupMetadata:
@@ -124,6 +305,7 @@ class BackupSettings:
     compression_enabled: bool = True
     include_logs: bool = False
     backup_location: str = '/app/data/backups'
+    export_chunk_rows: int = 50000
 
 
 class BackupService:
@@ -235,6 +417,7 @@ class BackupService:
             compression_enabled=os.getenv('BACKUP_COMPRESSION', 'true').lower() == 'true',
             include_logs=os.getenv('BACKUP_INCLUDE_LOGS', 'false').lower() == 'true',
             backup_location=os.getenv('BACKUP_LOCATION', '/app/data/backups'),
+            export_chunk_rows=int(os.getenv('BACKUP_EXPORT_CHUNK_ROWS', '50000')),
         )
 
     def _parse_backup_time(self) -> tuple[int, int]:
@@ -462,9 +645,8 @@ class BackupService:
                     'tool': pg_dump_path,
                 }
 
-            logger.info('pg_dump не найден в PATH. Используется ORM-дамп в формате JSON')
-            json_info = await self._dump_postgres_json(staging_dir, include_logs)
-            return json_info
+            logger.info('pg_dump не найден в PATH. Используется потоковый дамп в формате NDJSON')
+            return await self._dump_postgres_ndjson(staging_dir, include_logs)
 
         dump_path = staging_dir / 'database.sqlite'
         await self._dump_sqlite(dump_path)
@@ -513,44 +695,35 @@ class BackupService:
 
         logger.info('✅ PostgreSQL dump создан', dump_path=dump_path)
 
-    async def _dump_postgres_json(self, staging_dir: Path, include_logs: bool) -> dict[str, Any]:
+    async def _dump_postgres_ndjson(self, staging_dir: Path, include_logs: bool) -> dict[str, Any]:
         models_to_backup = self._get_models_for_backup(include_logs)
-        (
-            backup_data,
-            association_data,
-            total_records,
-            tables_count,
-        ) = await self._export_database_via_orm(models_to_backup)
-
-        dump_path = staging_dir / 'database.json'
-        dump_structure = {
-            'metadata': {
-                'timestamp': datetime.now(UTC).isoformat(),
-                'version': 'orm-1.0',
-                'database_type': 'postgresql',
-                'tables_count': tables_count,
-                'total_records': total_records,
-            },
-            'data': backup_data,
-            'associations': association_data,
-        }
+        dump_dir = staging_dir / 'database'
+        dump_dir.mkdir(parents=True, exist_ok=True)
 
-        async with aiofiles.open(dump_path, 'w', encoding='utf-8') as dump_file:
-            await dump_file.write(json_lib.dumps(dump_structure, ensure_ascii=False, indent=2))
+        manifest = await self._export_database_streaming(models_to_backup, dump_dir)
 
-        size = dump_path.stat().st_size if dump_path.exists() else 0
+        manifest_path = dump_dir / 'manifest.json'
+        async with aiofiles.open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+            await manifest_file.write(json_lib.dumps(manifest, ensure_ascii=False, indent=2))
 
-        logger.info('✅ PostgreSQL экспортирован через ORM в JSON', dump_path=dump_path)
+        size = sum(item.stat().st_size for item in dump_dir.iterdir() if item.is_file())
+
+        logger.info(
+            '✅ PostgreSQL экспортирован потоково в NDJSON',
+            dump_dir=dump_dir,
+            total_records=manifest['total_records'],
+        )
 
         return {
             'type': 'postgresql',
-            'path': dump_path.name,
+            'path': dump_dir.name,
             'size_bytes': size,
-            'format': 'json',
-            'tool': 'orm',
-            'format_version': 'orm-1.0',
-            'tables_count': tables_count,
-            'total_records': total_records,
+            'format': 'ndjson',
+            'tool': 'core-stream',
+            'format_version': STREAM_EXPORT_FORMAT_VERSION,
+            'manifest': f'{dump_dir.name}/{manifest_path.name}',
+            'tables_count': manifest['tables_count'],
+            'total_records': manifest['total_records'],
         }
 
     async def _dump_sqlite(self, dump_path: Path):
@@ -562,73 +735,62 @@ class BackupService:
         await asyncio.to_thread(shutil.copy2, sqlite_path, dump_path)
         logger.info('✅ SQLite база данных скопирована', dump_path=dump_path)
 
-    async def _export_database_via_orm(
-        self,
-        models_to_backup: list[Any],
-    ) -> tuple[dict[str, list[dict[str, Any]]], dict[str, list[dict[str, Any]]], int, int]:
-        backup_data: dict[str, list[dict[str, Any]]] = {}
-        total_records = 0
+    async def _export_database_streaming(self, models_to_backup: list[Any], dump_dir: Path) -> dict[str, Any]:
+        chunk_rows = self._settings.export_chunk_rows
+        tables_manifest: list[dict[str, Any]] = []
+        associations_manifest: list[dict[str, Any]] = []
 
-        async with AsyncSessionLocal() as db:
+        async with engine.connect() as conn:
+            # Единый снимок для всех таблиц, чтобы FK между ними оставались согласованными
+            await conn.execution_options(isolation_level='REPEATABLE READ')
             try:
                 for model in models_to_backup:
-                    table_name = model.__tablename__
-                    logger.info('📊 Экспортируем таблицу', table_name=table_name)
-
-                    query = select(model)
-
-                    if model == User:
-                        query = query.options(selectinload(User.subscription))
-                    elif model == Subscription:
-                        query = query.options(selectinload(Subscription.user))
-                    elif model == Transaction:
-                        query = query.options(selectinload(Transaction.user))
-
-                    result = await db.execute(query)
-                    records = result.scalars().all()
-
-                    table_data: list[dict[str, Any]] = []
-                    for record in records:
-                        record_dict: dict[str, Any] = {}
-                        for column in model.__table__.columns:
-                            value = getattr(record, column.name)
-
-                            if value is None:
-                                record_dict[column.name] = None
-                            elif isinstance(value, (datetime, dt_date, dt_time)):
-                                record_dict[column.name] = value.isoformat()
-                            elif isinstance(value, Decimal):
-                                record_dict[column.name] = float(value)
-                            elif isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
-                                record_dict[column.name] = 0.0
-                            elif isinstance(value, (list, dict)):
-                                try:
-                                    record_dict[column.name] = json_lib.dumps(value) if value else None
-                                except TypeError:
-                                    record_dict[column.name] = str(value)
-                            elif hasattr(value, '__dict__'):
-                                record_dict[column.name] = str(value)
-                            else:
-                                record_dict[column.name] = value
-
-                        table_data.append(record_dict)
-
-                    backup_data[table_name] = table_data
-                    total_records += len(table_data)
-
-                    logger.info('✅ Экспортировано записей из', table_data_count=len(table_data), table_name=table_name)
-
-                association_data = await self._export_association_tables(db)
-                for records in association_data.values():
-                    total_records += len(records)
-
-                tables_count = len(models_to_backup) + len(association_data)
-                return backup_data, association_data, total_records, tables_count
+                    entry = await self._stream_table_to_chunks(conn, model.__table__, dump_dir, chunk_rows)
+                    tables_manifest.append(entry)
 
+                for table_obj in self.association_tables.values():
+                    try:
+                        entry = await self._stream_table_to_chunks(conn, table_obj, dump_dir, chunk_rows)
+                    except Exception as e:
+                        logger.error('Ошибка экспорта таблицы связей', table_name=table_obj.name, error=e)
+                        continue
+                    associations_manifest.append(entry)
             except Exception as exc:
                 logger.error('Ошибка при экспорте данных', exc=exc)
                 raise
 
+        total_records = sum(entry['rows'] for entry in tables_manifest)
+        total_records += sum(entry['rows'] for entry in associations_manifest)
+
+        return {
+            'format_version': STREAM_EXPORT_FORMAT_VERSION,
+            'timestamp': datetime.now(UTC).isoformat(),
+            'database_type': 'postgresql',
+            'chunk_rows': chunk_rows,
+            'tables_count': len(tables_manifest) + len(associations_manifest),
+            'total_records': total_records,
+            'tables': tables_manifest,
+            'associations': associations_manifest,
+        }
+
+    async def _stream_table_to_chunks(self, conn, table_obj, dump_dir: Path, chunk_rows: int) -> dict[str, Any]:
+        table_name = table_obj.name
+        logger.info('📊 Экспортируем таблицу', table_name=table_name)
+
+        column_names = [column.name for column in table_obj.columns]
+        writer = _TableChunkWriter(dump_dir, table_name, column_names, chunk_rows)
+
+        try:
+            # Core select + серверный курсор: строки приходят партициями, без ORM-объектов
+            result = await conn.stream(select(table_obj).execution_options(yield_per=STREAM_EXPORT_FETCH_SIZE))
+            async for partition in result.partitions():
+                await asyncio.to_thread(writer.write_rows, partition)
+        finally:
+            entry = await asyncio.to_thread(writer.close)
+
+        logger.info('✅ Экспортировано записей из', table_data_count=entry['rows'], table_name=table_name)
+        return entry
+
     async def _collect_files(self, staging_dir: Path, include_logs: bool) -> list[dict[str, Any]]:
         files_info: list[dict[str, Any]] = []
         files_dir = staging_dir / 'files'
@@ -729,10 +891,12 @@ class BackupService:
 
             if database_info.get('type') == 'postgresql':
                 db_format = database_info.get('format', 'sql')
-                default_name = 'database.json' if db_format == 'json' else 'database.sql'
-                dump_file = temp_path / database_info.get('path', default_name)
+                default_names = {'json': 'database.json', 'ndjson': 'database'}
+                dump_file = temp_path / database_info.get('path', default_names.get(db_format, 'database.sql'))
 
-                if db_format == 'json':
+                if db_format == 'ndjson':
+                    await self._restore_postgres_ndjson(dump_file, clear_existing)
+                elif db_format == 'json':
                     await self._restore_postgres_json(dump_file, clear_existing)
                 else:
                     await self._restore_postgres(dump_file, clear_existing)
@@ -835,6 +999,31 @@ class BackupService:
 
         logger.info('✅ PostgreSQL восстановлен из ORM JSON', dump_path=dump_path)
 
+    async def _restore_postgres_ndjson(self, dump_dir: Path, clear_existing: bool):
+        manifest_path = dump_dir / 'manifest.json'
+        if not manifest_path.exists():
+            raise FileNotFoundError(f'Манифест NDJSON дампа не найден: {manifest_path}')
+
+        async with aiofiles.open(manifest_path, encoding='utf-8') as manifest_file:
+            manifest = json_lib.loads(await manifest_file.read())
+
+        # Чанки читаются по мере восстановления таблицы, а не все заранее
+        backup_data = {
+            entry['table']: _TableRecords.from_manifest(dump_dir, entry) for entry in manifest.get('tables', [])
+        }
+        association_data = {
+            entry['table']: _TableRecords.from_manifest(dump_dir, entry) for entry in manifest.get('associations', [])
+        }
+
+        await self._restore_database_payload(
+            backup_data,
+            association_data,
+            manifest,
+            clear_existing,
+        )
+
+        logger.info('✅ PostgreSQL восстановлен из NDJSON', dump_dir=dump_dir)
+
     async def _restore_sqlite(self, dump_path: Path, clear_existing: bool):
         if not dump_path.exists():
             raise FileNotFoundError(f'SQLite файл не найден: {dump_path}')
@@ -902,14 +1091,17 @@ class BackupService:
 
     async def _restore_database_payload(
         self,
-        backup_data: dict[str, list[dict[str, Any]]],
-        association_data: dict[str, list[dict[str, Any]]],
+        backup_data: dict[str, list[dict[str, Any]] | _TableRecords],
+        association_data: dict[str, list[dict[str, Any]] | _TableRecords],
         metadata: dict[str, Any],
         clear_existing: bool,
     ) -> tuple[int, int]:
         if not backup_data:
             raise ValueError('❌ Файл бекапа не содержит данных')
 
+        backup_data = self._as_table_records(backup_data)
+        association_data = self._as_table_records(association_data)
+
         logger.info('📊 Загружен дамп', metadata=metadata.get('timestamp', 'неизвестная дата'))
 
         estimated_records = metadata.get('total_records')
@@ -937,7 +1129,7 @@ class BackupService:
                     if not model:
                         continue
 
-                    records = backup_data.get(table_name, [])
+                    records = backup_data.get(table_name)
                     if not records:
                         continue
 
@@ -957,7 +1149,7 @@ class BackupService:
                         restored_tables += 1
                         logger.info('✅ Таблица восстановлена', table_name=table_name)
 
-                await self._restore_users_without_referrals(
+                referral_pairs = await self._restore_users_without_referrals(
                     db,
                     backup_data,
                     models_by_table,
@@ -969,7 +1161,7 @@ class BackupService:
                     if table_name == 'users' or table_name in pre_restore_tables:
                         continue
 
-                    records = backup_data.get(table_name, [])
+                    records = backup_data.get(table_name)
                     if not records:
                         continue
 
@@ -992,7 +1184,7 @@ class BackupService:
                 # Flush все изменения перед обновлением реферальных связей
                 await db.flush()
 
-                await self._update_user_referrals(db, backup_data)
+                await self._update_user_referrals(db, referral_pairs)
 
                 assoc_tables, assoc_records = await self._restore_association_tables(
                     db,
@@ -1011,6 +1203,15 @@ class BackupService:
 
         return restored_tables, restored_records
 
+    @staticmethod
+    def _as_table_records(
+        data: dict[str, list[dict[str, Any]] | _TableRecords],
+    ) -> dict[str, _TableRecords]:
+        return {
+            table_name: records if isinstance(records, _TableRecords) else _TableRecords.from_list(table_name, records)
+            for table_name, records in data.items()
+        }
+
     async def _restore_from_legacy(
         self,
         backup_path: Path,
@@ -1056,100 +1257,64 @@ class BackupService:
         logger.info(message)
         return True, message
 
-    async def _restore_users_without_referrals(self, db: AsyncSession, backup_data: dict, models_by_table: dict):
-        users_data = backup_data.get('users', [])
+    async def _restore_users_without_referrals(
+        self, db: AsyncSession, backup_data: dict[str, _TableRecords], models_by_table: dict
+    ) -> list[tuple[Any, Any]]:
+        """Восстановить пользователей без referred_by_id; вернуть пары (пользователь, реферер) для второго прохода."""
+        users_data = backup_data.get('users')
         if not users_data:
-            return
+            return []
 
         logger.info('👥 Восстанавливаем пользователей без реферальных связей', users_data_count=len(users_data))
 
         User = models_by_table['users']
 
-        for user_data in users_data:
-            try:
+        restored = 0
+        processed = 0
+        referral_pairs = []
+        async for chunk in users_data:
+            rows = []
+            for user_data in chunk:
+                if user_data.get('id') and user_data.get('referred_by_id'):
+                    referral_pairs.append((user_data['id'], user_data['referred_by_id']))
                 processed_data = self._process_record_data(user_data, User, 'users')
                 processed_data['referred_by_id'] = None
+                rows.append(processed_data)
 
-                if 'id' in processed_data:
-                    existing_user = await db.execute(select(User).where(User.id == processed_data['id']))
-                    existing = existing_user.scalar_one_or_none()
-
-                    if existing:
-                        for key, value in processed_data.items():
-                            if key != 'id':
-                                setattr(existing, key, value)
-                    else:
-                        instance = User(**processed_data)
-                        try:
-                            async with db.begin_nested():
-                                db.add(instance)
-                                await db.flush()
-                        except IntegrityError:
-                            logger.warning(
-                                'Дубликат пользователя (id telegram_id=), пропускаем',
-                                processed_data=processed_data.get('id'),
-                                processed_data_2=processed_data.get('telegram_id'),
-                            )
-                            continue
-                else:
-                    instance = User(**processed_data)
-                    try:
-                        async with db.begin_nested():
-                            db.add(instance)
-                            await db.flush()
-                    except IntegrityError:
-                        logger.warning(
-                            'Дубликат пользователя (telegram_id=), пропускаем',
-                            processed_data=processed_data.get('telegram_id'),
-                        )
-                        continue
+            restored += await self._bulk_upsert_chunk(db, User.__table__, 'users', rows)
+            processed += len(chunk)
+            logger.info('📦 Чанк пользователей восстановлен', processed=processed, total=len(users_data))
 
-            except Exception as e:
-                logger.error('Ошибка при восстановлении пользователя', error=e)
-                raise
+        logger.info('✅ Пользователи без реферальных связей восстановлены', restored=restored)
+        return referral_pairs
 
-        try:
-            await db.flush()
-        except IntegrityError as e:
-            logger.warning('IntegrityError при flush пользователей, откатываем', e=e)
-            await db.rollback()
-        logger.info('✅ Пользователи без реферальных связей восстановлены')
-
-    async def _update_user_referrals(self, db: AsyncSession, backup_data: dict):
-        users_data = backup_data.get('users', [])
-        if not users_data:
+    async def _update_user_referrals(self, db: AsyncSession, pairs: list[tuple[Any, Any]]):
+        if not pairs:
             return
 
         logger.info('🔗 Обновляем реферальные связи пользователей')
 
-        for user_data in users_data:
-            try:
-                referred_by_id = user_data.get('referred_by_id')
-                user_id = user_data.get('id')
-
-                if referred_by_id and user_id:
-                    referrer_result = await db.execute(select(User).where(User.id == referred_by_id))
-                    referrer = referrer_result.scalar_one_or_none()
-
-                    if referrer:
-                        user_result = await db.execute(select(User).where(User.id == user_id))
-                        user = user_result.scalar_one_or_none()
+        existing_ids = set((await db.execute(select(User.id))).scalars().all())
+        params = [
+            {'b_user_id': user_id, 'b_referred_by_id': referred_by_id}
+            for user_id, referred_by_id in pairs
+            if user_id in existing_ids and referred_by_id in existing_ids
+        ]
 
-                        if user:
-                            user.referred_by_id = referred_by_id
-                        else:
-                            logger.warning('Пользователь не найден для обновления реферальной связи', user_id=user_id)
-                    else:
-                        logger.warning(
-                            'Реферер не найден для пользователя', referred_by_id=referred_by_id, user_id=user_id
-                        )
+        skipped = len(pairs) - len(params)
+        if skipped:
+            logger.warning('Пропущены реферальные связи без пользователя или реферера', skipped=skipped)
 
-            except Exception as e:
-                logger.error('Ошибка при обновлении реферальной связи', error=e)
-                continue
+        users_table = User.__table__
+        stmt = (
+            update(users_table)
+            .where(users_table.c.id == bindparam('b_user_id'))
+            .values(referred_by_id=bindparam('b_referred_by_id'))
+        )
+        for start in range(0, len(params), RESTORE_CHUNK_ROWS):
+            await db.execute(stmt, params[start : start + RESTORE_CHUNK_ROWS])
 
-        await db.flush()
-        logger.info('✅ Реферальные связи обновлены')
+        logger.info('✅ Реферальные связи обновлены', updated=len(params))
 
     def _process_record_data(self, record_data: dict, model, table_name: str) -> dict:
         processed_data = {}
@@ -1221,23 +1386,8 @@ class BackupService:
     def _get_primary_key_columns(self, model) -> list[str]:
         return [col.name for col in model.__table__.columns if col.primary_key]
 
-    async def _export_association_tables(self, db: AsyncSession) -> dict[str, list[dict[str, Any]]]:
-        association_data: dict[str, list[dict[str, Any]]] = {}
-
-        for table_name, table_obj in self.association_tables.items():
-            try:
-                logger.info('📊 Экспортируем таблицу связей', table_name=table_name)
-                result = await db.execute(select(table_obj))
-                rows = result.mappings().all()
-                association_data[table_name] = [dict(row) for row in rows]
-                logger.info('✅ Экспортировано связей из', rows_count=len(rows), table_name=table_name)
-            except Exception as e:
-                logger.error('Ошибка экспорта таблицы связей', table_name=table_name, error=e)
-
-        return association_data
-
     async def _restore_association_tables(
-        self, db: AsyncSession, association_data: dict[str, list[dict[str, Any]]], clear_existing: bool
+        self, db: AsyncSession, association_data: dict[str, _TableRecords], clear_existing: bool
     ) -> tuple[int, int]:
         if not association_data:
             return 0, 0
@@ -1262,7 +1412,7 @@ class BackupService:
         db: AsyncSession,
         table_obj,
         table_name: str,
-        records: list[dict[str, Any]],
+        records: _TableRecords,
         clear_existing: bool,
         col_names: list[str],
     ) -> int:
@@ -1273,108 +1423,199 @@ class BackupService:
             await db.execute(table_obj.delete())
 
         restored = 0
+        async for chunk in records:
+            rows = []
+            for record in chunk:
+                values = {col: record.get(col) for col in col_names}
 
-        for record in records:
-            values = {col: record.get(col) for col in col_names}
-
-            if any(v is None for v in values.values()):
-                logger.warning('Пропущена некорректная запись', table_name=table_name, record=record)
-                continue
-
-            try:
-                first_col = col_names[0]
-                exists_stmt = (
-                    select(table_obj.c[first_col])
-                    .where(*[table_obj.c[col] == values[col] for col in col_names])
-                    .limit(1)
-                )
-                existing = await db.execute(exists_stmt)
-
-                if existing.scalar_one_or_none() is not None:
-                    logger.debug('Запись уже существует', table_name=table_name, values=values)
+                if any(v is None for v in values.values()):
+                    logger.warning('Пропущена некорректная запись', table_name=table_name, record=record)
                     continue
 
-                try:
-                    async with db.begin_nested():
-                        await db.execute(table_obj.insert().values(**values))
-                    restored += 1
-                except IntegrityError:
-                    logger.warning('Пропускаем связь (FK или дубликат)', table_name=table_name, values=values)
-                    continue
-            except Exception as e:
-                logger.error('Ошибка при восстановлении связи', table_name=table_name, values=values, e=e)
-                raise
+                rows.append(values)
+
+            restored += await self._bulk_upsert_chunk(db, table_obj, table_name, rows, update_existing=False)
 
         return restored
 
     async def _restore_table_records(
-        self, db: AsyncSession, model, table_name: str, records: list[dict[str, Any]], clear_existing: bool
+        self, db: AsyncSession, model, table_name: str, records: _TableRecords, clear_existing: bool
     ) -> int:
         restored_count = 0
+        processed = 0
+        fk_targets = await self._load_fk_remap_targets(db, table_name)
 
-        # Кешируем существующие tariff_id для проверки FK
-        existing_tariff_ids = set()
-        if table_name == 'subscriptions':
+        async for chunk in records:
             try:
-                result = await db.execute(select(Tariff.id))
-                existing_tariff_ids = {row[0] for row in result.fetchall()}
+                rows = [self._process_record_data(record_data, model, table_name) for record_data in chunk]
+            except Exception as e:
+                logger.error('Ошибка подготовки записей', table_name=table_name, error=e)
+                raise
+
+            self._apply_fk_remaps(table_name, rows, fk_targets)
+            restored_count += await self._bulk_upsert_chunk(db, model.__table__, table_name, rows)
+            processed += len(chunk)
+
+            logger.info(
+                '📦 Чанк восстановлен',
+                table_name=table_name,
+                processed=processed,
+                total=len(records),
+            )
+
+        return restored_count
+
+    async def _load_fk_remap_targets(self, db: AsyncSession, table_name: str) -> dict[str, set[Any]]:
+        targets: dict[str, set[Any]] = {}
+
+        for column_name, target_model in _RESTORE_NULLABLE_FK_TARGETS.get(table_name, {}).items():
+            try:
+                result = await db.execute(select(target_model.id))
+                targets[column_name] = set(result.scalars().all())
                 logger.info(
-                    '📋 Найдено существующих тарифов для валидации FK',
-                    existing_tariff_ids_count=len(existing_tariff_ids),
+                    '📋 Загружены ключи для валидации FK',
+                    table_name=table_name,
+                    column=column_name,
+                    count=len(targets[column_name]),
                 )
             except Exception as e:
-                logger.warning('⚠️ Не удалось получить список тарифов', error=e)
+                logger.warning('⚠️ Не удалось получить ключи для валидации FK', column=column_name, error=e)
 
-        for record_data in records:
-            try:
-                processed_data = self._process_record_data(record_data, model, table_name)
-
-                # Валидация FK для subscriptions.tariff_id
-                if table_name == 'subscriptions' and 'tariff_id' in processed_data:
-                    tariff_id = processed_data.get('tariff_id')
-                    if tariff_id is not None and tariff_id not in existing_tariff_ids:
-                        logger.warning(
-                            '⚠️ Тариф не найден, устанавливаем tariff_id=NULL для подписки', tariff_id=tariff_id
-                        )
-                        processed_data['tariff_id'] = None
-
-                pk_cols = self._get_primary_key_columns(model)
-
-                if pk_cols and all(col in processed_data for col in pk_cols):
-                    where_clause = [getattr(model, col) == processed_data[col] for col in pk_cols]
-                    existing_record = await db.execute(select(model).where(*where_clause))
-                    existing = existing_record.scalar_one_or_none()
-
-                    if existing:
-                        for key, value in processed_data.items():
-                            if key not in pk_cols:
-                                setattr(existing, key, value)
-                    else:
-                        instance = model(**processed_data)
-                        try:
-                            async with db.begin_nested():
-                                db.add(instance)
-                                await db.flush()
-                        except IntegrityError:
-                            # Unique constraint conflict — record exists with different PK
-                            logger.warning(
-                                'Дубликат по уникальному ключу в %s (PK=%s), пропускаем',
-                                table_name,
-                                {col: processed_data.get(col) for col in pk_cols},
-                            )
-                            continue
-                else:
-                    instance = model(**processed_data)
-                    db.add(instance)
+        return targets
 
-                restored_count += 1
+    @staticmethod
+    def _apply_fk_remaps(table_name: str, rows: list[dict[str, Any]], fk_targets: dict[str, set[Any]]) -> None:
+        for column_name, existing_ids in fk_targets.items():
+            referenced = {row[column_name] for row in rows if row.get(column_name) is not None}
+            missing = referenced - existing_ids
+            if not missing:
+                continue
 
-            except Exception as e:
-                logger.error('Ошибка восстановления записи в', table_name=table_name, error=e)
-                logger.error('Проблемные данные', record_data=record_data)
-                raise
+            for row in rows:
+                if row.get(column_name) in missing:
+                    row[column_name] = None
 
-        return restored_count
+            logger.warning(
+                '⚠️ Ссылки на отсутствующие записи заменены на NULL',
+                table_name=table_name,
+                column=column_name,
+                missing=sorted(missing)[:20],
+            )
+
+    async def _bulk_upsert_chunk(
+        self,
+        db: AsyncSession,
+        table_obj,
+        table_name: str,
+        rows: list[dict[str, Any]],
+        update_existing: bool = True,
+    ) -> int:
+        if not rows:
+            return 0
+
+        is_postgres = db.get_bind().dialect.name == 'postgresql'
+        pk_cols = [column.name for column in table_obj.primary_key.columns]
+
+        # Многострочный VALUES требует одинакового набора колонок, а ON CONFLICT DO UPDATE —
+        # уникальных PK внутри одного запроса
+        groups: dict[tuple[str, ...], dict[Any, dict[str, Any]]] = {}
+        for index, row in enumerate(rows):
+            row_key = tuple(row[col] for col in pk_cols) if pk_cols and all(col in row for col in pk_cols) else index
+            groups.setdefault(tuple(sorted(row)), {})[row_key] = row
+
+        restored = 0
+        for columns, group_rows in groups.items():
+            group = list(group_rows.values())
+            batch_size = len(group)
+            if is_postgres:
+                batch_size = max(1, POSTGRES_MAX_BIND_PARAMS // max(1, len(columns)))
+
+            for start in range(0, len(group), batch_size):
+                batch = group[start : start + batch_size]
+                restored += await self._execute_upsert_batch(
+                    db, table_obj, table_name, pk_cols, columns, batch, update_existing, is_postgres
+                )
+
+        return restored
+
+    def _build_upsert_statement(
+        self,
+        table_obj,
+        pk_cols: list[str],
+        columns: tuple[str, ...],
+        update_existing: bool,
+        is_postgres: bool,
+        values: list[dict[str, Any]] | None = None,
+    ):
+        stmt = (pg_insert if is_postgres else sqlite_insert)(table_obj)
+        if values is not None:
+            stmt = stmt.values(values)
+
+        if not pk_cols:
+            return stmt
+
+        update_cols = [column for column in columns if column not in pk_cols]
+        if update_existing and update_cols:
+            return stmt.on_conflict_do_update(
+                index_elements=pk_cols,
+                set_={column: stmt.excluded[column] for column in update_cols},
+            )
+        return stmt.on_conflict_do_nothing(index_elements=pk_cols)
+
+    @staticmethod
+    def _affected_rows(result, expected: int) -> int:
+        """Сколько строк реально записано: ON CONFLICT DO NOTHING пропускает существующие."""
+        rowcount = getattr(result, 'rowcount', None)
+        if isinstance(rowcount, int) and rowcount >= 0:
+            return rowcount
+        return expected
+
+    async def _execute_upsert_batch(
+        self,
+        db: AsyncSession,
+        table_obj,
+        table_name: str,
+        pk_cols: list[str],
+        columns: tuple[str, ...],
+        batch: list[dict[str, Any]],
+        update_existing: bool,
+        is_postgres: bool,
+    ) -> int:
+        try:
+            async with db.begin_nested():
+                if is_postgres:
+                    stmt = self._build_upsert_statement(
+                        table_obj, pk_cols, columns, update_existing, is_postgres, values=batch
+                    )
+                    result = await db.execute(stmt)
+                else:
+                    stmt = self._build_upsert_statement(table_obj, pk_cols, columns, update_existing, is_postgres)
+                    result = await db.execute(stmt, batch)
+            return self._affected_rows(result, len(batch))
+        except IntegrityError as e:
+            logger.warning(
+                'Конфликт в пакете, переключаемся на построчную вставку',
+                table_name=table_name,
+                batch_size=len(batch),
+                error=str(e.orig) if e.orig else str(e),
+            )
+
+        # Конфликт по уникальному ключу (не PK) или FK — изолируем проблемные строки
+        stmt = self._build_upsert_statement(table_obj, pk_cols, columns, update_existing, is_postgres)
+        restored = 0
+        for row in batch:
+            try:
+                async with db.begin_nested():
+                    result = await db.execute(stmt, row)
+                restored += self._affected_rows(result, 1)
+            except IntegrityError:
+                logger.warning(
+                    'Дубликат по уникальному ключу или нарушение FK, пропускаем',
+                    table_name=table_name,
+                    pk={col: row.get(col) for col in pk_cols},
+                )
+
+        return restored
 
     async def _clear_database_tables(self, db: AsyncSession, backup_data: dict[str, Any] | None = None):
         tables_order = [
@@ -125,6 +125,11 @@ class BlacklistService:
                 self.last_update = datetime.now(UTC)
                 self._check_cache.clear()
                 logger.info('Черный список успешно обновлен. Найдено записей', blacklist_data_count=len(blacklist_data))
+
+                # Вердикты в кеше авторизации кабинета больше не актуальны
+                from app.cabinet.services.principal_cache import invalidate_all_cabinet_principals
+
+                await invalidate_all_cabinet_principals()
                 return True
 
             except ValueError as e:
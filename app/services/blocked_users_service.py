@@ -14,7 +14,7 @@ from enum import Enum
 import structlog
 from aiogram import Bot
 from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError
-from sqlalchemy import delete, select
+from sqlalchemy import delete, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -53,6 +53,7 @@ from app.database.models import (
     WithdrawalRequest,
     YooKassaPayment,
 )
+from app.services.contest_leaderboard import contest_leaderboard_store
 from app.services.remnawave_service import RemnaWaveService
 
 
@@ -342,8 +343,12 @@ class BlockedUsersService:
             await db.execute(delete(SentNotification).where(SentNotification.user_id == user.id))
             await db.execute(delete(PollResponse).where(PollResponse.user_id == user.id))
             await db.execute(delete(ContestAttempt).where(ContestAttempt.user_id == user.id))
-            await db.execute(delete(ReferralContestEvent).where(ReferralContestEvent.referrer_id == user.id))
-            await db.execute(delete(ReferralContestEvent).where(ReferralContestEvent.referral_id == user.id))
+            contest_events_result = await db.execute(
+                delete(ReferralContestEvent)
+                .where(or_(ReferralContestEvent.referrer_id == user.id, ReferralContestEvent.referral_id == user.id))
+                .returning(ReferralContestEvent.contest_id)
+            )
+            affected_contest_ids = set(contest_events_result.scalars().all())
             await db.execute(
                 delete(AdvertisingCampaignRegistration).where(AdvertisingCampaignRegistration.user_id == user.id)
             )
@@ -362,6 +367,10 @@ class BlockedUsersService:
             await db.delete(user)
             await db.commit()
 
+            # Лидерборды конкурсов в Redis пересоберутся из БД без удалённых событий
+            for contest_id in affected_contest_ids:
+                await contest_leaderboard_store.invalidate(contest_id)
+
             logger.info('Пользователь полностью удален из БД', user_display=user_display)
             return True
 
@@ -19,6 +19,7 @@ from app.handlers.admin.messages import (
     get_custom_users,
     get_target_users,
 )
+from app.utils.metrics import BROADCAST_MESSAGES
 
 
 if TYPE_CHECKING:
@@ -338,8 +339,10 @@ class BroadcastService:
                         blocked_telegram_ids.append(batch[idx])
                     else:
                         failed_count += 1
+                    BROADCAST_MESSAGES.inc('telegram', result)
                 elif isinstance(result, Exception):
                     failed_count += 1
+                    BROADCAST_MESSAGES.inc('telegram', 'failed')
                     logger.error('Необработанное исключение в рассылке', broadcast_id=broadcast_id, result=result)
 
             # Обновляем прогресс в БД периодически
@@ -851,10 +854,12 @@ class EmailBroadcastService:
             for result in results:
                 if result is True:
                     sent_count += 1
+                    BROADCAST_MESSAGES.inc('email', 'sent')
                 elif result is None:
                     pass  # Cancelled or skipped
                 else:
                     failed_count += 1
+                    BROADCAST_MESSAGES.inc('email', 'failed')
 
             # Обновляем прогресс периодически
             processed = sent_count + failed_count
@@ -0,0 +1,287 @@
+"""Лидерборды реферальных конкурсов в sorted set-ах Redis.
+
+Каждый зачёт конкурса увеличивает счёт реферера (ZINCRBY), поэтому топ
+читается за O(log n) без GROUP BY по событиям. Счёт хранит
+количество рефералов и сумму их оплат одним числом: count * AMOUNT_BASE +
+amount_kopeks, так что порядок совпадает с SQL-лидербордом. Виртуальные
+участники лежат в отдельном наборе того же конкурса.
+
+Набор считается актуальным, пока жив ключ готовности. Когда он истекает
+(CONTESTS_LEADERBOARD_RECONCILE_MINUTES) или сбрасывается после правки событий,
+следующее чтение пересобирает лидерборд из БД. Без Redis вызывающий код
+работает по SQL, как раньше.
+
+Гонки пересборки с зачётами закрыты двумя способами. Набор помнит сумму
+каждого учтённого события, и повторный зачёт уже попавшего в пересборку
+события ничего не добавляет. Пересборка пишет во временные ключи и
+публикует их, только если её токен пережил загрузку из БД: любой зачёт или
+сброс во время загрузки снимает токен, и результат отбрасывается.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from typing import NamedTuple
+
+import structlog
+
+from app.config import settings
+from app.utils.cache import cache
+
+
+logger = structlog.get_logger(__name__)
+
+# Сумма в копейках занимает младшие разряды счёта; 10^10 коп. = 100 млн ₽ на участника
+AMOUNT_BASE = 10**10
+
+KEY_PREFIX = 'contest_lb'
+
+# Время жизни токена и временных ключей пересборки
+_BUILD_TTL_SECONDS = 120
+
+# Счёт меняется только в актуальном наборе; без него зачёт снимает токен идущей пересборки.
+# Сумма события хранится в хеше: повторный зачёт добавляет только разницу.
+_RECORD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('DEL', KEYS[4])
+    return 0
+end
+local amount = tonumber(ARGV[3])
+local previous = redis.call('HGET', KEYS[3], ARGV[1])
+local delta
+if previous then
+    delta = amount - tonumber(previous)
+else
+    delta = tonumber(ARGV[4]) + amount
+end
+if delta ~= 0 then
+    redis.call('ZINCRBY', KEYS[2], delta, ARGV[2])
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+return 1
+"""
+
+_SET_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('DEL', KEYS[3])
+    return 0
+end
+if ARGV[1] == '' then
+    redis.call('ZREM', KEYS[2], ARGV[2])
+else
+    redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+end
+return 1
+"""
+
+# Публикация пересборки: KEYS[1..4] — готовность, участники, виртуальные, события;
+# KEYS[5] — токен; KEYS[6..8] — временные участники, виртуальные, события
+_PUBLISH_SCRIPT = """
+if redis.call('GET', KEYS[5]) ~= ARGV[1] then
+    redis.call('DEL', KEYS[6], KEYS[7], KEYS[8])
+    return 0
+end
+redis.call('DEL', KEYS[2], KEYS[3], KEYS[4], KEYS[5])
+for i = 6, 8 do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('PERSIST', KEYS[i])
+        redis.call('RENAME', KEYS[i], KEYS[i - 4])
+    end
+end
+redis.call('SET', KEYS[1], 1, 'EX', ARGV[2])
+return 1
+"""
+
+
+class LeaderboardEntry(NamedTuple):
+    member_id: int  # id пользователя или виртуального участника
+    count: int
+    amount_kopeks: int
+
+
+class ContestEventScore(NamedTuple):
+    event_id: int
+    referrer_id: int
+    amount_kopeks: int
+
+
+def encode_score(count: int, amount_kopeks: int) -> int:
+    return int(count) * AMOUNT_BASE + min(max(int(amount_kopeks or 0), 0), AMOUNT_BASE - 1)
+
+
+def decode_score(score: float) -> tuple[int, int]:
+    count, amount = divmod(int(score), AMOUNT_BASE)
+    return count, amount
+
+
+class _Keys(NamedTuple):
+    ready: str
+    real: str
+    virtual: str
+    events: str
+    building: str
+
+
+def _keys(contest_id: int) -> _Keys:
+    base = f'{KEY_PREFIX}:{contest_id}'
+    return _Keys(f'{base}:ready', base, f'{base}:virtual', f'{base}:events', f'{base}:building')
+
+
+class ContestLeaderboardStore:
+    def __init__(self) -> None:
+        self._rebuild_locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    @property
+    def available(self) -> bool:
+        return cache.is_connected
+
+    def _ttl_seconds(self) -> int:
+        return max(1, settings.CONTESTS_LEADERBOARD_RECONCILE_MINUTES) * 60
+
+    async def ensure(
+        self,
+        contest_id: int,
+        loader: Callable[[], Awaitable[tuple[Iterable[ContestEventScore], Iterable[LeaderboardEntry]]]],
+    ) -> bool:
+        """Проверить актуальность набора и при необходимости пересобрать его из loader()."""
+        if not self.available:
+            return False
+        keys = _keys(contest_id)
+        try:
+            if await cache.redis_client.exists(keys.ready):
+                return True
+            async with self._rebuild_locks[contest_id]:
+                if await cache.redis_client.exists(keys.ready):
+                    return True
+                token = uuid.uuid4().hex
+                await cache.redis_client.set(keys.building, token, ex=_BUILD_TTL_SECONDS)
+                events, virtual = await loader()
+                return await self._rebuild(contest_id, token, events, virtual)
+        except Exception as error:
+            logger.warning('Лидерборд конкурса недоступен в Redis', contest_id=contest_id, error=error)
+            return False
+
+    async def _rebuild(
+        self,
+        contest_id: int,
+        token: str,
+        events: Iterable[ContestEventScore],
+        virtual: Iterable[LeaderboardEntry],
+    ) -> bool:
+        keys = _keys(contest_id)
+        staging_real, staging_virtual, staging_events = (
+            f'{key}:build:{token}' for key in (keys.real, keys.virtual, keys.events)
+        )
+
+        real_scores: defaultdict[str, int] = defaultdict(int)
+        event_amounts = {}
+        for event in events:
+            real_scores[str(event.referrer_id)] += encode_score(1, event.amount_kopeks)
+            event_amounts[str(event.event_id)] = int(event.amount_kopeks or 0)
+        virtual_scores = {str(entry.member_id): encode_score(entry.count, entry.amount_kopeks) for entry in virtual}
+
+        pipe = cache.redis_client.pipeline(transaction=True)
+        if real_scores:
+            pipe.zadd(staging_real, real_scores)
+            pipe.expire(staging_real, _BUILD_TTL_SECONDS)
+        if virtual_scores:
+            pipe.zadd(staging_virtual, virtual_scores)
+            pipe.expire(staging_virtual, _BUILD_TTL_SECONDS)
+        if event_amounts:
+            pipe.hset(staging_events, mapping=event_amounts)
+            pipe.expire(staging_events, _BUILD_TTL_SECONDS)
+        await pipe.execute()
+
+        published = await cache.redis_client.eval(
+            _PUBLISH_SCRIPT,
+            8,
+            *keys,
+            staging_real,
+            staging_virtual,
+            staging_events,
+            token,
+            self._ttl_seconds(),
+        )
+        if not published:
+            logger.debug('Пересборка лидерборда конкурса устарела во время загрузки', contest_id=contest_id)
+            return False
+
+        logger.debug(
+            'Лидерборд конкурса пересобран',
+            contest_id=contest_id,
+            participants=len(real_scores),
+            virtual=len(virtual_scores),
+        )
+        return True
+
+    async def record_event(self, contest_id: int, event_id: int, referrer_id: int, amount_kopeks: int) -> None:
+        """Учесть событие конкурса с его текущей суммой; повторный вызов добавляет только разницу суммы."""
+        if not self.available:
+            return
+        keys = _keys(contest_id)
+        try:
+            await cache.redis_client.eval(
+                _RECORD_SCRIPT,
+                4,
+                keys.ready,
+                keys.real,
+                keys.events,
+                keys.building,
+                str(event_id),
+                str(referrer_id),
+                int(amount_kopeks or 0),
+                AMOUNT_BASE,
+            )
+        except Exception as error:
+            logger.warning('Не удалось обновить лидерборд конкурса', contest_id=contest_id, error=error)
+            await self.invalidate(contest_id)
+
+    async def set_virtual(self, contest_id: int, participant_id: int, count: int, amount_kopeks: int) -> None:
+        await self._set_virtual(contest_id, participant_id, str(encode_score(count, amount_kopeks)))
+
+    async def remove_virtual(self, contest_id: int, participant_id: int) -> None:
+        await self._set_virtual(contest_id, participant_id, '')
+
+    async def _set_virtual(self, contest_id: int, participant_id: int, score: str) -> None:
+        if not self.available:
+            return
+        keys = _keys(contest_id)
+        try:
+            await cache.redis_client.eval(
+                _SET_SCRIPT, 3, keys.ready, keys.virtual, keys.building, score, str(participant_id)
+            )
+        except Exception as error:
+            logger.warning('Не удалось обновить виртуального участника', contest_id=contest_id, error=error)
+            await self.invalidate(contest_id)
+
+    async def invalidate(self, contest_id: int) -> None:
+        """Сбросить набор: следующее чтение пересоберёт его из БД."""
+        if not self.available:
+            return
+        try:
+            await cache.redis_client.delete(*_keys(contest_id))
+        except Exception as error:
+            logger.warning('Не удалось сбросить лидерборд конкурса', contest_id=contest_id, error=error)
+
+    async def top(self, contest_id: int, limit: int | None = None, *, virtual: bool = False) -> list[LeaderboardEntry]:
+        """Лучшие участники: по количеству, затем сумме, при равенстве — по возрастанию id."""
+        keys = _keys(contest_id)
+        key = keys.virtual if virtual else keys.real
+        client = cache.redis_client
+
+        rows = await client.zrevrange(key, 0, (limit - 1) if limit else -1, withscores=True)
+        if limit and len(rows) == limit:
+            # Участники с тем же счётом, что и последний в выборке, могли не попасть в неё
+            boundary = rows[-1][1]
+            ties = await client.zrangebyscore(key, boundary, boundary, withscores=True)
+            rows = [row for row in rows if row[1] > boundary] + ties
+
+        entries = [LeaderboardEntry(int(member), *decode_score(score)) for member, score in rows]
+        entries.sort(key=lambda entry: (-entry.count, -entry.amount_kopeks, entry.member_id))
+        return entries[:limit] if limit else entries
+
+
+contest_leaderboard_store = ContestLeaderboardStore()
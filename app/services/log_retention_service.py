@@ -0,0 +1,100 @@
+"""Срок хранения журналов мониторинга и аудита модераторов.
+
+В PostgreSQL monitoring_logs и support_audit_logs разбиты по месяцам
+created_at (миграция 0009). Раз в сутки создаются партиции на следующие
+месяцы, а месяцы старше срока хранения удаляются целиком — без массового
+DELETE, который раздувает таблицу и надолго занимает autovacuum. Остаток у
+границы срока, строки в партиции по умолчанию и SQLite удаляются пачками
+по _DELETE_BATCH_SIZE строк, каждая пачка в своей транзакции.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+
+import structlog
+from sqlalchemy import delete, select
+
+from app.config import settings
+from app.database.database import engine
+from app.database.models import MonitoringLog, SupportAuditLog
+from app.database.partitions import drop_partitions_before, ensure_monthly_partitions
+
+
+logger = structlog.get_logger(__name__)
+
+_DELETE_BATCH_SIZE = 5000
+_PARTITION_MONTHS_AHEAD = 2
+
+LogModel = type[MonitoringLog] | type[SupportAuditLog]
+
+
+@dataclass(slots=True)
+class LogRetentionResult:
+    table: str
+    created_partitions: list[str] = field(default_factory=list)
+    dropped_partitions: list[str] = field(default_factory=list)
+    deleted_rows: int = 0
+
+
+def _retention_days(model: LogModel) -> int:
+    if model is MonitoringLog:
+        return settings.MONITORING_LOGS_RETENTION_DAYS
+    return settings.SUPPORT_AUDIT_LOGS_RETENTION_DAYS
+
+
+async def purge_logs_before(
+    model: LogModel, cutoff: datetime, *, batch_size: int = _DELETE_BATCH_SIZE
+) -> LogRetentionResult:
+    """Удалить записи журнала старше cutoff: сначала партиции целиком, затем остаток пачками."""
+    table = model.__tablename__
+    result = LogRetentionResult(table=table)
+
+    async with engine.begin() as conn:
+        result.dropped_partitions = await drop_partitions_before(conn, table, cutoff) or []
+
+    while True:
+        batch = select(model.id).where(model.created_at < cutoff).limit(batch_size).scalar_subquery()
+        async with engine.begin() as conn:
+            deleted = await conn.execute(delete(model).where(model.created_at < cutoff, model.id.in_(batch)))
+        result.deleted_rows += deleted.rowcount or 0
+        if (deleted.rowcount or 0) < batch_size:
+            return result
+
+
+async def maintain_log_table(model: LogModel, *, now: datetime | None = None) -> LogRetentionResult:
+    """Подготовить партиции на следующие месяцы и применить срок хранения журнала."""
+    now = now or datetime.now(UTC)
+    async with engine.begin() as conn:
+        created = await ensure_monthly_partitions(conn, model.__tablename__, _PARTITION_MONTHS_AHEAD, now)
+
+    retention_days = _retention_days(model)
+    if retention_days > 0:
+        result = await purge_logs_before(model, now - timedelta(days=retention_days))
+    else:
+        result = LogRetentionResult(table=model.__tablename__)
+    result.created_partitions = created
+    return result
+
+
+async def maintain_log_tables() -> list[LogRetentionResult]:
+    """Обслужить журналы мониторинга и аудита; ошибка одного журнала не мешает другому."""
+    results: list[LogRetentionResult] = []
+    for model in (MonitoringLog, SupportAuditLog):
+        try:
+            result = await maintain_log_table(model)
+        except Exception as error:
+            logger.warning('Не удалось обслужить журнал', table=model.__tablename__, error=error)
+            continue
+
+        if result.created_partitions or result.dropped_partitions or result.deleted_rows:
+            logger.info(
+                '🧹 Журнал обслужен',
+                table=result.table,
+                created_partitions=result.created_partitions,
+                dropped_partitions=result.dropped_partitions,
+                deleted=result.deleted_rows,
+            )
+        results.append(result)
+    return results
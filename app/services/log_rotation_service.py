@@ -12,7 +12,6 @@
 from __future__ import annotations
 
 import asyncio
-import logging
 import tarfile
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -23,11 +22,15 @@ from aiogram import Bot
 from aiogram.types import FSInputFile
 
 from app.config import settings
+from app.utils.log_handlers import QueueLogListener
 from app.utils.timezone import get_local_timezone
 
 
 logger = structlog.get_logger(__name__)
 
+# Суффикс файлов, отцепленных от слушателя логов на время архивации
+ROTATING_SUFFIX = '.rotating'
+
 
 @dataclass
 class LogRotationStatus:
@@ -50,7 +53,7 @@ class LogRotationService:
         self.bot = bot
         self._rotation_task: asyncio.Task | None = None
         self._running = False
-        self._handlers: list[logging.Handler] = []
+        self._listener: QueueLogListener | None = None
 
         # Пути
         self.log_dir = Path(settings.LOG_DIR).resolve()
@@ -72,9 +75,9 @@ class LogRotationService:
         """Установить экземпляр бота для отправки логов."""
         self.bot = bot
 
-    def register_handlers(self, handlers: list[logging.Handler]) -> None:
-        """Зарегистрировать хэндлеры для управления при ротации."""
-        self._handlers = handlers
+    def register_listener(self, listener: QueueLogListener) -> None:
+        """Зарегистрировать слушатель очереди логов, который пишет файлы."""
+        self._listener = listener
 
     async def initialize(self) -> None:
         """Создать необходимые директории."""
@@ -160,18 +163,20 @@ class LogRotationService:
             # Дата для архива (вчера, т.к. логи были за предыдущие сутки)
             yesterday = (datetime.now(get_local_timezone()) - timedelta(days=1)).strftime('%Y-%m-%d')
 
-            # Сбрасываем буферы хэндлеров перед архивацией
-            for handler in self._handlers:
-                try:
-                    handler.flush()
-                except Exception:
-                    pass
-
             # Собираем файлы для архивации
             files_to_archive: list[tuple[Path, str]] = []
-            for name, log_path in self.log_files.items():
-                if log_path.exists() and log_path.stat().st_size > 0:
-                    files_to_archive.append((log_path, f'{name}.log'))
+            if self._listener is not None:
+                # Дописываем очередь и подменяем файлы пустыми под блокировкой слушателя:
+                # записи после этого момента попадут уже в новые файлы
+                await asyncio.to_thread(self._listener.flush)
+                detached = await asyncio.to_thread(self._listener.detach_files, ROTATING_SUFFIX)
+                for name, log_path in self.log_files.items():
+                    if log_path in detached:
+                        files_to_archive.append((detached[log_path], f'{name}.log'))
+            else:
+                for name, log_path in self.log_files.items():
+                    if log_path.exists() and log_path.stat().st_size > 0:
+                        files_to_archive.append((log_path, f'{name}.log'))
 
             if not files_to_archive:
                 message = 'Нет логов для архивации'
@@ -182,9 +187,12 @@ class LogRotationService:
             archive_path = await self._create_archive(files_to_archive, yesterday)
 
             if archive_path:
-                # Очищаем текущие лог-файлы
+                # Удаляем отцепленные файлы или очищаем текущие
                 for log_path, _ in files_to_archive:
-                    log_path.write_text('')
+                    if self._listener is not None:
+                        log_path.unlink(missing_ok=True)
+                    else:
+                        log_path.write_text('')
 
                 # Очистка старых архивов
                 await self._cleanup_old_archives()
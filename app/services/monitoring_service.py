@@ -1,4 +1,5 @@
 import asyncio
+import time
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any
@@ -54,13 +55,16 @@ from app.external.remnawave_api import (
     UserStatus as RemnaWaveUserStatus,
 )
 from app.localization.texts import get_texts
+from app.services.log_retention_service import maintain_log_tables, purge_logs_before
 from app.services.notification_delivery_service import (
     notification_delivery_service,
 )
 from app.services.notification_settings_service import NotificationSettingsService
 from app.services.promo_offer_service import promo_offer_service
+from app.services.renewal_quotes import prepare_renewal_quotes, quote_renewals
 from app.services.subscription_service import SubscriptionService
 from app.utils.cache import cache
+from app.utils.metrics import BACKGROUND_CYCLE_DURATION
 from app.utils.miniapp_buttons import build_miniapp_or_callback_button
 from app.utils.pricing_utils import apply_percentage_discount
 from app.utils.subscription_utils import (
@@ -78,6 +82,9 @@ logger = structlog.get_logger(__name__)
 
 LOGO_PATH = Path(settings.LOGO_FILE)
 
+LOG_MAINTENANCE_INTERVAL_SECONDS = 86400
+EVENT_TYPES_CACHE_TTL_SECONDS = 600
+
 
 class MonitoringService:
     def __init__(self, bot=None):
@@ -86,6 +93,9 @@ class MonitoringService:
         self.bot = bot
         self._notified_users: set[str] = set()
         self._last_cleanup = datetime.now(UTC)
+        self._last_log_maintenance: datetime | None = None
+        self._event_types: set[str] | None = None
+        self._event_types_loaded_at: datetime | None = None
         self._sla_task = None
 
     async def _send_message_with_logo(
@@ -195,9 +205,12 @@ class MonitoringService:
             pass
 
     async def _monitoring_cycle(self):
+        started = time.perf_counter()
+        status = 'error'
         async with AsyncSessionLocal() as db:
             try:
                 await self._cleanup_notification_cache()
+                await self._maintain_log_tables()
 
                 expired_offers = await deactivate_expired_offers(db)
                 if expired_offers:
@@ -233,6 +246,7 @@ class MonitoringService:
                     {'timestamp': datetime.now(UTC).isoformat()},
                 )
                 await db.commit()
+                status = 'ok'
 
             except Exception as e:
                 logger.error('Ошибка в цикле мониторинга', error=e)
@@ -247,6 +261,8 @@ class MonitoringService:
                 except Exception:
                     pass
                 await db.rollback()
+            finally:
+                BACKGROUND_CYCLE_DURATION.observe(time.perf_counter() - started, 'monitoring', status)
 
     async def _cleanup_notification_cache(self):
         current_time = datetime.now(UTC)
@@ -257,6 +273,23 @@ class MonitoringService:
             self._last_cleanup = current_time
             logger.info('🧹 Очищен кеш уведомлений ( записей)', old_count=old_count)
 
+    async def _maintain_log_tables(self):
+        """Раз в сутки применить срок хранения журналов мониторинга и аудита."""
+        current_time = datetime.now(UTC)
+        if (
+            self._last_log_maintenance is not None
+            and (current_time - self._last_log_maintenance).total_seconds() < LOG_MAINTENANCE_INTERVAL_SECONDS
+        ):
+            return
+
+        self._last_log_maintenance = current_time
+        results = await maintain_log_tables()
+        if any(
+            result.table == MonitoringLog.__tablename__ and (result.dropped_partitions or result.deleted_rows)
+            for result in results
+        ):
+            self._event_types = None
+
     async def _check_expired_subscriptions(self, db: AsyncSession):
         try:
             from app.database.crud.subscription import is_recently_updated_by_webhook
@@ -945,6 +978,17 @@ class MonitoringService:
                     'Failed to rollback session after promo offer autopay log failure', rollback_error=rollback_error
                 )
 
+    async def _quote_autopay_renewals(self, db: AsyncSession, subscriptions: list[Subscription]) -> dict[int, int]:
+        """Цены продления на 30 дней для всей пачки автоплатежей одним проходом."""
+        if not subscriptions:
+            return {}
+        try:
+            snapshot, items = await prepare_renewal_quotes(db, subscriptions, 30)
+            return quote_renewals(snapshot, items)
+        except Exception as error:
+            logger.warning('Не удалось рассчитать цены автопродления пачкой', error=error)
+            return {}
+
     async def _process_autopayments(self, db: AsyncSession):
         try:
             current_time = datetime.now(UTC)
@@ -984,6 +1028,7 @@ class MonitoringService:
 
             processed_count = 0
             failed_count = 0
+            renewal_quotes = await self._quote_autopay_renewals(db, autopay_subscriptions)
 
             for subscription in autopay_subscriptions:
                 from app.database.crud.subscription import is_recently_updated_by_webhook
@@ -1001,7 +1046,11 @@ class MonitoringService:
                 user_identifier = user.telegram_id or f'email:{user.id}'
 
                 # Правильный расчет стоимости продления с учетом всех параметров подписки
-                renewal_cost = await self.subscription_service.calculate_renewal_price(subscription, 30, db, user=user)
+                renewal_cost = renewal_quotes.get(subscription.id)
+                if renewal_cost is None:
+                    renewal_cost = await self.subscription_service.calculate_renewal_price(
+                        subscription, 30, db, user=user
+                    )
                 promo_discount_percent = self._get_user_promo_offer_discount_percent(user)
                 charge_amount = renewal_cost
                 promo_discount_value = 0
@@ -1761,12 +1810,15 @@ class MonitoringService:
             db.add(log_entry)
             await db.commit()
 
+            if self._event_types is not None:
+                self._event_types.add(event_type)
+
         except Exception as e:
             logger.error('Ошибка логирования события мониторинга', error=e)
 
     async def get_monitoring_status(self, db: AsyncSession) -> dict[str, Any]:
         try:
-            from sqlalchemy import desc, select
+            from sqlalchemy import case, desc, func, select
 
             recent_events_result = await db.execute(
                 select(MonitoringLog).order_by(desc(MonitoringLog.created_at)).limit(10)
@@ -1775,11 +1827,19 @@ class MonitoringService:
 
             yesterday = datetime.now(UTC) - timedelta(days=1)
 
-            events_24h_result = await db.execute(select(MonitoringLog).where(MonitoringLog.created_at >= yesterday))
-            events_24h = events_24h_result.scalars().all()
-
-            successful_events = sum(1 for event in events_24h if event.is_success)
-            failed_events = sum(1 for event in events_24h if not event.is_success)
+            stats_24h = (
+                await db.execute(
+                    select(
+                        func.count(MonitoringLog.id).label('total'),
+                        func.coalesce(func.sum(case((MonitoringLog.is_success.is_(True), 1), else_=0)), 0).label(
+                            'successful'
+                        ),
+                    ).where(MonitoringLog.created_at >= yesterday)
+                )
+            ).one()
+            total_events = int(stats_24h.total or 0)
+            successful_events = int(stats_24h.successful or 0)
+            failed_events = total_events - successful_events
 
             return {
                 'is_running': self.is_running,
@@ -1794,10 +1854,10 @@ class MonitoringService:
                     for event in recent_events
                 ],
                 'stats_24h': {
-                    'total_events': len(events_24h),
+                    'total_events': total_events,
                     'successful': successful_events,
                     'failed': failed_events,
-                    'success_rate': round(successful_events / len(events_24h) * 100, 1) if events_24h else 0,
+                    'success_rate': round(successful_events / total_events * 100, 1) if total_events else 0,
                 },
             }
 
@@ -1905,17 +1965,24 @@ class MonitoringService:
             return 0
 
     async def get_monitoring_event_types(self, db: AsyncSession) -> list[str]:
+        """Типы событий журнала. DISTINCT по таблице выполняется раз в EVENT_TYPES_CACHE_TTL_SECONDS,
+        новые типы добавляются в кеш при записи события."""
         try:
             from sqlalchemy import select
 
-            result = await db.execute(
-                select(MonitoringLog.event_type)
-                .where(MonitoringLog.event_type.isnot(None))
-                .distinct()
-                .order_by(MonitoringLog.event_type)
-            )
+            now = datetime.now(UTC)
+            if (
+                self._event_types is None
+                or self._event_types_loaded_at is None
+                or (now - self._event_types_loaded_at).total_seconds() >= EVENT_TYPES_CACHE_TTL_SECONDS
+            ):
+                result = await db.execute(
+                    select(MonitoringLog.event_type).where(MonitoringLog.event_type.isnot(None)).distinct()
+                )
+                self._event_types = {row[0] for row in result.fetchall() if row[0]}
+                self._event_types_loaded_at = now
 
-            return [row[0] for row in result.fetchall() if row[0]]
+            return sorted(self._event_types)
 
         except Exception as e:
             logger.error('Ошибка получения списка типов событий мониторинга', error=e)
@@ -1923,16 +1990,23 @@ class MonitoringService:
 
     async def cleanup_old_logs(self, db: AsyncSession, days: int = 30) -> int:
         try:
-            from sqlalchemy import delete
+            from sqlalchemy import delete, func, select, text
 
             if days == 0:
-                result = await db.execute(delete(MonitoringLog))
+                if db.bind.dialect.name == 'postgresql':
+                    # TRUNCATE очищает все партиции без построчного удаления
+                    deleted_count = int(await db.scalar(select(func.count()).select_from(MonitoringLog)) or 0)
+                    await db.execute(text(f'TRUNCATE TABLE {MonitoringLog.__tablename__}'))
+                else:
+                    deleted_count = (await db.execute(delete(MonitoringLog))).rowcount
+                await db.commit()
             else:
+                # Партиции и пачки удаляются в отдельных транзакциях
+                await db.commit()
                 cutoff_date = datetime.now(UTC) - timedelta(days=days)
-                result = await db.execute(delete(MonitoringLog).where(MonitoringLog.created_at < cutoff_date))
+                deleted_count = (await purge_logs_before(MonitoringLog, cutoff_date)).deleted_rows
 
-            deleted_count = result.rowcount
-            await db.commit()
+            self._event_types = None
 
             if days == 0:
                 logger.info('🗑️ Удалены все логи мониторинга ( записей)', deleted_count=deleted_count)
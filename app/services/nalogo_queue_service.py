@@ -129,28 +129,53 @@ class NalogoQueueService:
 
             await asyncio.sleep(self._check_interval)
 
-    async def _process_pending_receipts(self) -> None:
-        """Обработать все ожидающие чеки в очереди."""
-        if not self._nalogo_service:
-            return
-
-        queue_length = await self._nalogo_service.get_queue_length()
-        if queue_length == 0:
-            return
-
-        logger.info('Начинаем обработку очереди чеков: шт.', queue_length=queue_length)
-        self._had_pending_receipts = True
+    @property
+    def _concurrency(self) -> int:
+        """Сколько чеков отправляется одновременно."""
+        return max(1, getattr(settings, 'NALOGO_QUEUE_CONCURRENCY', 3))
 
-        processed = 0
-        failed = 0
-        skipped = 0
-        total_processed_amount = 0.0
-        service_unavailable = False
+    @property
+    def _batch_size(self) -> int:
+        """Сколько чеков забирается из очереди за один проход."""
+        return max(1, getattr(settings, 'NALOGO_QUEUE_BATCH_SIZE', 20))
 
-        while True:
+    async def _pop_batch(self) -> list[dict]:
+        batch = []
+        while len(batch) < self._batch_size:
             receipt_data = await self._nalogo_service.pop_receipt_from_queue()
             if not receipt_data:
                 break
+            batch.append(receipt_data)
+        return batch
+
+    @staticmethod
+    def _parse_created_at(receipt_data: dict) -> datetime | None:
+        created_at_str = receipt_data.get('created_at')
+        if not created_at_str:
+            return None
+        try:
+            operation_time = isoparse(created_at_str)
+        except (ValueError, TypeError) as parse_error:
+            logger.warning('Не удалось распарсить created_at', created_at_str=created_at_str, parse_error=parse_error)
+            return None
+        if operation_time.tzinfo is None:
+            operation_time = operation_time.replace(tzinfo=UTC)
+        return operation_time
+
+    async def _submit_receipt(
+        self,
+        receipt_data: dict,
+        semaphore: asyncio.Semaphore,
+        stop: asyncio.Event,
+    ) -> str:
+        """Отправить один чек из очереди.
+
+        Возвращает processed, skipped (найден уже созданный чек), failed (чек возвращён
+        в очередь, дальнейшая отправка останавливается) или deferred (не отправлялся).
+        """
+        async with semaphore:
+            if stop.is_set():
+                return 'deferred'
 
             attempts = receipt_data.get('attempts', 0)
             payment_id = receipt_data.get('payment_id', 'unknown')
@@ -160,24 +185,13 @@ class NalogoQueueService:
             if attempts >= 10:
                 logger.warning('Чек уже попыток, продолжаем пытаться...', payment_id=payment_id, attempts=attempts)
 
-            # Пытаемся отправить чек
             try:
                 # Восстанавливаем описание из сохранённых данных
                 telegram_user_id = receipt_data.get('telegram_user_id')
                 amount_kopeks = receipt_data.get('amount_kopeks')
 
-                # Извлекаем время оплаты из очереди (чтобы чек был с правильным временем)
-                operation_time = None
-                created_at_str = receipt_data.get('created_at')
-                if created_at_str:
-                    try:
-                        operation_time = isoparse(created_at_str)
-                        if operation_time.tzinfo is None:
-                            operation_time = operation_time.replace(tzinfo=UTC)
-                    except (ValueError, TypeError) as parse_error:
-                        logger.warning(
-                            'Не удалось распарсить created_at', created_at_str=created_at_str, parse_error=parse_error
-                        )
+                # Время оплаты из очереди (чтобы чек был с правильным временем)
+                operation_time = self._parse_created_at(receipt_data)
 
                 # Формируем описание заново из настроек (если есть данные)
                 if amount_kopeks is not None:
@@ -188,6 +202,22 @@ class NalogoQueueService:
                         'name', settings.get_balance_payment_description(int(amount * 100), telegram_user_id)
                     )
 
+                # Повторная попытка после таймаута могла уже создать чек на стороне налоговой
+                if attempts > 0 and operation_time is not None:
+                    duplicate_uuid = await self._nalogo_service.find_duplicate_receipt(
+                        amount, operation_time, name=receipt_name
+                    )
+                    if duplicate_uuid:
+                        if payment_id:
+                            await cache.set(f'nalogo:created:{payment_id}', duplicate_uuid, expire=30 * 24 * 3600)
+                            await cache.delete(f'nalogo:queued:{payment_id}')
+                        logger.info(
+                            'Чек из очереди уже создан в налоговой, повторно не отправляем',
+                            payment_id=payment_id,
+                            receipt_uuid=duplicate_uuid,
+                        )
+                        return 'skipped'
+
                 receipt_uuid = await self._nalogo_service.create_receipt(
                     name=receipt_name,
                     amount=amount,
@@ -199,45 +229,91 @@ class NalogoQueueService:
                     amount_kopeks=amount_kopeks,
                     operation_time=operation_time,  # Время оплаты, а не отправки
                 )
-
-                if receipt_uuid:
-                    processed += 1
-                    total_processed_amount += amount
-
-                    # Удаляем метку "в очереди" (чек создан успешно)
-                    if payment_id:
-                        queued_key = f'nalogo:queued:{payment_id}'
-                        await cache.delete(queued_key)
-
-                    logger.info(
-                        'Чек из очереди успешно создан: (payment_id=, попытка )',
-                        receipt_uuid=receipt_uuid,
-                        payment_id=payment_id,
-                        attempts=attempts + 1,
-                    )
-                else:
-                    # Вернуть в очередь с увеличенным счетчиком попыток
-                    await self._nalogo_service.requeue_receipt(receipt_data)
-                    failed += 1
-                    service_unavailable = True
-                    logger.warning(
-                        'Не удалось создать чек из очереди (payment_id=), возвращен в очередь (попытка /)',
-                        payment_id=payment_id,
-                        attempts=attempts + 1,
-                        _max_attempts=self._max_attempts,
-                    )
-                    # Если сервис недоступен, прекращаем попытки до следующего цикла
-                    break
-
             except Exception as error:
+                stop.set()
                 await self._nalogo_service.requeue_receipt(receipt_data)
-                failed += 1
                 logger.error('Ошибка при создании чека из очереди (payment_id=)', payment_id=payment_id, error=error)
-                # Прекращаем попытки при ошибке
-                break
+                return 'failed'
+
+            if not receipt_uuid:
+                # Сервис недоступен: возвращаем чек и прекращаем попытки до следующего цикла
+                stop.set()
+                await self._nalogo_service.requeue_receipt(receipt_data)
+                logger.warning(
+                    'Не удалось создать чек из очереди (payment_id=), возвращен в очередь (попытка /)',
+                    payment_id=payment_id,
+                    attempts=attempts + 1,
+                    _max_attempts=self._max_attempts,
+                )
+                return 'failed'
+
+            # Удаляем метку "в очереди" (чек создан успешно)
+            if payment_id:
+                await cache.delete(f'nalogo:queued:{payment_id}')
+
+            logger.info(
+                'Чек из очереди успешно создан: (payment_id=, попытка )',
+                receipt_uuid=receipt_uuid,
+                payment_id=payment_id,
+                attempts=attempts + 1,
+            )
 
-            # Задержка между чеками чтобы не долбить API
+            # Задержка между чеками одного воркера, чтобы не долбить API
             await asyncio.sleep(self._receipt_delay)
+            return 'processed'
+
+    async def _process_pending_receipts(self) -> None:
+        """Обработать все ожидающие чеки в очереди.
+
+        Чеки забираются пачками и отправляются параллельно (не больше
+        NALOGO_QUEUE_CONCURRENCY одновременно). Первая неудача останавливает
+        отправку: неотправленные чеки пачки возвращаются в начало очереди.
+        """
+        if not self._nalogo_service:
+            return
+
+        queue_length = await self._nalogo_service.get_queue_length()
+        if queue_length == 0:
+            return
+
+        logger.info('Начинаем обработку очереди чеков: шт.', queue_length=queue_length)
+        self._had_pending_receipts = True
+
+        processed = 0
+        failed = 0
+        skipped = 0
+        total_processed_amount = 0.0
+        service_unavailable = False
+        semaphore = asyncio.Semaphore(self._concurrency)
+        stop = asyncio.Event()
+
+        while not stop.is_set():
+            batch = await self._pop_batch()
+            if not batch:
+                break
+
+            outcomes = await asyncio.gather(
+                *(self._submit_receipt(receipt_data, semaphore, stop) for receipt_data in batch)
+            )
+
+            deferred = []
+            for receipt_data, outcome in zip(batch, outcomes, strict=True):
+                if outcome == 'processed':
+                    processed += 1
+                    total_processed_amount += receipt_data.get('amount', 0)
+                elif outcome == 'skipped':
+                    skipped += 1
+                elif outcome == 'failed':
+                    failed += 1
+                else:
+                    deferred.append(receipt_data)
+
+            # rpush в обратном порядке: следующий проход заберёт их в исходной очерёдности
+            for receipt_data in reversed(deferred):
+                await self._nalogo_service.return_receipt_to_queue(receipt_data)
+
+        if stop.is_set():
+            service_unavailable = True
 
         if processed > 0 or failed > 0 or skipped > 0:
             logger.info(
@@ -1,8 +1,13 @@
+import asyncio
+import time
+from collections import defaultdict
+from collections.abc import Iterable
 from datetime import UTC, date, datetime, timedelta
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from typing import Any
 
 import structlog
+from dateutil.parser import isoparse
 
 from app.config import settings
 
@@ -17,6 +22,79 @@ logger = structlog.get_logger(__name__)
 NALOGO_QUEUE_KEY = 'nalogo:receipt_queue'
 NALOGO_PENDING_VERIFICATION_KEY = 'nalogo:pending_verification'
 
+# Размер страницы при выгрузке чеков и ширина интервала времени в индексе
+_INCOMES_PAGE_SIZE = 100
+_INCOME_BUCKET_SECONDS = 300
+
+
+def _parse_operation_time(value: Any) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = isoparse(value) if isinstance(value, str) else value
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(parsed, datetime):
+        return None
+    return parsed.replace(tzinfo=UTC) if parsed.tzinfo is None else parsed
+
+
+class IncomeIndex:
+    """Чеки из NaloGO, разложенные по сумме в копейках и интервалу времени операции.
+
+    Поиск дубля смотрит только соседние интервалы нужной суммы. Найденный чек
+    помечается занятым, чтобы два платежа на одну сумму не сопоставились с одним чеком.
+    """
+
+    def __init__(self, incomes: Iterable[dict[str, Any]], bucket_seconds: int = _INCOME_BUCKET_SECONDS):
+        self._bucket_seconds = bucket_seconds
+        self._buckets: dict[tuple[int, int], list[tuple[datetime, str, str | None]]] = defaultdict(list)
+        self._claimed: set[str] = set()
+        self.size = 0
+
+        for income in incomes:
+            receipt_uuid = income.get('approvedReceiptUuid', income.get('receiptUuid'))
+            operation_time = _parse_operation_time(income.get('operationTime'))
+            if not receipt_uuid or operation_time is None:
+                continue
+            try:
+                amount = Decimal(str(income.get('totalAmount', income.get('amount', 0))))
+            except (InvalidOperation, ValueError):
+                continue
+
+            amount_kopeks = int((amount * 100).to_integral_value())
+            bucket = int(operation_time.timestamp()) // bucket_seconds
+            self._buckets[(amount_kopeks, bucket)].append((operation_time, receipt_uuid, income.get('name')))
+            self.size += 1
+
+    def find(
+        self,
+        amount_kopeks: int,
+        operation_time: datetime,
+        window_seconds: int,
+        name: str | None = None,
+    ) -> str | None:
+        """Ближайший по времени незанятый чек с той же суммой (и названием, если оно известно)."""
+        center = int(operation_time.timestamp())
+        first_bucket = (center - window_seconds) // self._bucket_seconds
+        last_bucket = (center + window_seconds) // self._bucket_seconds
+
+        best: tuple[float, str] | None = None
+        for bucket in range(first_bucket, last_bucket + 1):
+            for income_time, receipt_uuid, income_name in self._buckets.get((amount_kopeks, bucket), ()):
+                if receipt_uuid in self._claimed:
+                    continue
+                if name and income_name and income_name != name:
+                    continue
+                time_diff = abs((income_time - operation_time).total_seconds())
+                if time_diff <= window_seconds and (best is None or time_diff < best[0]):
+                    best = (time_diff, receipt_uuid)
+
+        if best is None:
+            return None
+        self._claimed.add(best[1])
+        return best[1]
+
 
 class NaloGoService:
     """Сервис для работы с API NaloGO (налоговая служба самозанятых)."""
@@ -34,6 +112,8 @@ class NaloGoService:
         storage_path = storage_path or getattr(settings, 'NALOGO_STORAGE_PATH', './nalogo_tokens.json')
 
         self.configured = False
+        self._income_indexes: dict[date, tuple[float, IncomeIndex]] = {}
+        self._income_index_locks: dict[date, asyncio.Lock] = defaultdict(asyncio.Lock)
 
         if not inn or not password:
             logger.warning('NaloGO INN или PASSWORD не настроены в settings. Функционал чеков будет ОТКЛЮЧЕН.')
@@ -384,6 +464,8 @@ class NaloGoService:
             )
 
             receipt_uuid = result.get('approvedReceiptUuid')
+            if not receipt_uuid:
+                self.invalidate_income_index(operation_time)
             if receipt_uuid:
                 logger.info('Чек создан успешно: на сумму ₽', receipt_uuid=receipt_uuid, amount=amount)
 
@@ -399,6 +481,8 @@ class NaloGoService:
         except Exception as error:
             # ВАЖНО: Аутентификация была успешной, запрос на создание чека УШЁЛ
             # При таймауте чек МОГ быть создан на сервере — НЕ добавляем в очередь!
+            # Загруженный индекс этого чека не содержит: повторная попытка должна перечитать чеки
+            self.invalidate_income_index(operation_time)
             if self._is_service_unavailable(error):
                 error_msg = str(error)[:200]
                 logger.error(
@@ -438,21 +522,30 @@ class NaloGoService:
         receipt_data['attempts'] = receipt_data.get('attempts', 0) + 1
         return await cache.lpush(NALOGO_QUEUE_KEY, receipt_data)
 
+    async def return_receipt_to_queue(self, receipt_data: dict[str, Any]) -> bool:
+        """Вернуть неотправленный чек в начало очереди без увеличения счётчика попыток."""
+        return await cache.rpush(NALOGO_QUEUE_KEY, receipt_data)
+
     async def find_duplicate_receipt(
         self,
         amount: float,
         created_at: datetime,
         time_window_minutes: int = 10,
+        name: str | None = None,
     ) -> str | None:
         """Проверяет, не был ли уже создан чек с такой суммой в заданном временном окне.
 
         Используется для защиты от дублей при таймаутах — когда сервер создал чек,
-        но ответ не вернулся.
+        но ответ не вернулся. Чеки за день загружаются один раз и кешируются
+        (NALOGO_INCOME_INDEX_TTL), поэтому проверка пачки чеков за один день
+        стоит одной выгрузки из API. Неудачный create_receipt сбрасывает индекс
+        своего дня, чтобы повторная попытка увидела чек, созданный первой.
 
         Args:
             amount: Сумма чека в рублях
             created_at: Время создания записи в очереди
             time_window_minutes: Окно поиска в минутах (±)
+            name: Название услуги; если указано, чек с другим названием не считается дублем
 
         Returns:
             UUID чека если дубликат найден, None если не найден
@@ -460,65 +553,85 @@ class NaloGoService:
         if not self.configured:
             return None
 
-        try:
-            # Запрашиваем чеки за день когда был создан запрос
-            from_date = created_at.date()
-            to_date = from_date + timedelta(days=1)
-
-            incomes = await self.get_incomes(
-                from_date=from_date,
-                to_date=to_date,
-                limit=50,
-            )
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=UTC)
 
-            if not incomes:
-                return None
+        index = await self.get_income_index(created_at.date())
+        if index is None:
+            return None
 
-            # Ищем чек с такой же суммой в пределах временного окна
-            for income in incomes:
-                income_amount = float(income.get('totalAmount', income.get('amount', 0)))
+        amount_kopeks = int((Decimal(str(amount)) * 100).to_integral_value())
+        receipt_uuid = index.find(amount_kopeks, created_at, time_window_minutes * 60, name=name)
+        if receipt_uuid:
+            logger.info(
+                'Найден дубликат чека', receipt_uuid=receipt_uuid, amount=amount, created_at=created_at.isoformat()
+            )
+        return receipt_uuid
 
-                # Проверяем сумму (с погрешностью 0.01)
-                if abs(income_amount - amount) > 0.01:
-                    continue
+    async def get_income_index(self, day: date) -> IncomeIndex | None:
+        """Индекс чеков вокруг дня day (±1 день, чтобы окно не обрывалось на полуночи)."""
+        cached = self._income_indexes.get(day)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
 
-                # Проверяем время
-                operation_time_str = income.get('operationTime')
-                if operation_time_str:
-                    try:
-                        from dateutil.parser import isoparse
-
-                        operation_time = isoparse(operation_time_str)
-                        if operation_time.tzinfo is None:
-                            operation_time = operation_time.replace(tzinfo=UTC)
-
-                        time_diff = abs((operation_time - created_at).total_seconds())
-                        if time_diff <= time_window_minutes * 60:
-                            receipt_uuid = income.get('approvedReceiptUuid', income.get('receiptUuid'))
-                            if receipt_uuid:
-                                logger.info(
-                                    'Найден дубликат чека: (сумма=₽, время=, разница=с)',
-                                    receipt_uuid=receipt_uuid,
-                                    income_amount=income_amount,
-                                    operation_time=operation_time,
-                                    time_diff=round(time_diff, 0),
-                                )
-                                return receipt_uuid
-                    except Exception as parse_error:
-                        logger.debug('Ошибка парсинга времени чека', parse_error=parse_error)
-                        continue
+        async with self._income_index_locks[day]:
+            cached = self._income_indexes.get(day)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
 
-            return None
+            incomes = await self.get_all_incomes(day - timedelta(days=1), day + timedelta(days=1))
+            if incomes is None:
+                return None
 
-        except Exception as error:
-            logger.warning('Ошибка проверки дубликата чека', error=error)
-            return None
+            index = IncomeIndex(incomes)
+            ttl = getattr(settings, 'NALOGO_INCOME_INDEX_TTL', 600)
+            self._evict_expired_income_indexes()
+            self._income_indexes[day] = (time.monotonic() + ttl, index)
+            logger.debug('Индекс чеков NaloGO загружен', day=day.isoformat(), incomes_count=index.size)
+            return index
+
+    def invalidate_income_index(self, operation_time: datetime | None = None) -> None:
+        """Сбросить индексы, в которые мог попасть чек с временем operation_time (по умолчанию сейчас)."""
+        moment = operation_time or datetime.now(UTC)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=UTC)
+        day = moment.astimezone(UTC).date()
+        for offset in (-1, 0, 1):
+            self._income_indexes.pop(day + timedelta(days=offset), None)
+
+    def _evict_expired_income_indexes(self) -> None:
+        now = time.monotonic()
+        for day, (expires_at, _) in list(self._income_indexes.items()):
+            if expires_at <= now:
+                del self._income_indexes[day]
+        for day, lock in list(self._income_index_locks.items()):
+            if day not in self._income_indexes and not lock.locked():
+                del self._income_index_locks[day]
+
+    async def get_all_incomes(self, from_date: date, to_date: date) -> list[dict[str, Any]] | None:
+        """Все чеки за период постранично. None - если хотя бы одна страница не загрузилась."""
+        incomes: list[dict[str, Any]] = []
+        offset = 0
+        while True:
+            page = await self.get_incomes(
+                from_date=from_date,
+                to_date=to_date,
+                limit=_INCOMES_PAGE_SIZE,
+                offset=offset,
+            )
+            if page is None:
+                return None
+            incomes.extend(page)
+            if len(page) < _INCOMES_PAGE_SIZE:
+                return incomes
+            offset += _INCOMES_PAGE_SIZE
 
     async def get_incomes(
         self,
         from_date: date | None = None,
         to_date: date | None = None,
         limit: int = 100,
+        offset: int = 0,
     ) -> list[dict[str, Any]] | None:
         """Получить список доходов (чеков) за период.
 
@@ -526,6 +639,7 @@ class NaloGoService:
             from_date: Начало периода (по умолчанию 30 дней назад)
             to_date: Конец периода (по умолчанию сегодня)
             limit: Максимальное количество записей
+            offset: Смещение для постраничной выгрузки
 
         Returns:
             Список чеков с информацией, или None при ошибке
@@ -539,13 +653,14 @@ class NaloGoService:
             if not hasattr(self.client, '_access_token') or not self.client._access_token:
                 auth_success = await self.authenticate()
                 if not auth_success:
-                    return []
+                    return None
 
             income_api = self.client.income()
             result = await income_api.get_list(
                 from_date=from_date,
                 to_date=to_date,
                 limit=limit,
+                offset=offset,
             )
 
             # API возвращает структуру с полем content или items
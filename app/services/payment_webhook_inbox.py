@@ -0,0 +1,377 @@
+"""Очередь входящих callback-ов платёжных шлюзов.
+
+Маршрут webhook-а проверяет подпись и сохраняет callback один раз на пару
+(provider, external_id), после чего сразу отвечает шлюзу. Зачисление выполняют
+фоновые воркеры через соответствующий метод PaymentService.
+
+Доставка "хотя бы один раз": отметка о проведении коммитится после
+обработчика, и callback, брошенный упавшим воркером, проводится повторно.
+Повтор безопасен, потому что обработчики PaymentService перед зачислением
+проверяют статус локального платежа (is_paid, transaction_id).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.database.database import AsyncSessionLocal
+from app.database.models import PaymentWebhookEvent
+from app.utils.metrics import PAYMENT_SETTLE_DURATION
+
+
+logger = structlog.get_logger(__name__)
+
+# Поля с идентификатором платежа и статусом в callback-ах шлюзов (первое найденное)
+_EXTERNAL_ID_FIELDS: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {
+    'mulenpay': (('uuid', 'id'), ('payment_status', 'status', 'paymentStatus')),
+    'cryptobot': (('payload.invoice_id',), ('update_type', 'payload.status')),
+    'yookassa': (('object.id',), ('event',)),
+    'wata': (('id', 'transactionId', 'orderId'), ('transactionStatus',)),
+    'heleket': (('uuid', 'order_id'), ('status', 'payment_status')),
+    'pal24': (('TrsId', 'id', 'InvId', 'bill_id'), ('Status', 'status')),
+    'platega': (('id', 'transactionId'), ('status',)),
+    'cloudpayments': (('transaction_id', 'invoice_id'), ('status',)),
+}
+
+# Строки в статусе processing дольше этого считаются брошенными упавшим воркером
+_LOCK_TIMEOUT_SECONDS = 300
+_POLL_INTERVAL_SECONDS = 1.0
+_RETRY_BASE_DELAY_SECONDS = 10
+_CLEANUP_INTERVAL_SECONDS = 3600
+_SHUTDOWN_TIMEOUT_SECONDS = 30
+
+
+@dataclass(slots=True)
+class _ProviderStats:
+    received: int = 0
+    duplicates: int = 0
+    settled: int = 0
+    rejected: int = 0
+    retried: int = 0
+    failed: int = 0
+    settle_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        finished = self.settled + self.rejected
+        return {
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'settled': self.settled,
+            'rejected': self.rejected,
+            'retried': self.retried,
+            'failed': self.failed,
+            'avg_settle_ms': round(self.settle_seconds * 1000 / finished, 1) if finished else None,
+        }
+
+
+def _lookup(payload: dict, path: str) -> Any:
+    value: Any = payload
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def get_external_id(provider: str, payload: dict) -> str:
+    """Ключ идемпотентности callback-а: id платежа у шлюза и его статус.
+
+    Статус входит в ключ, чтобы разные переходы одного платежа
+    (например, waiting_for_capture и succeeded) не склеивались. Если шлюз
+    не прислал идентификатор, используется хеш содержимого.
+    """
+    id_fields, status_fields = _EXTERNAL_ID_FIELDS.get(provider, ((), ()))
+    payment_id = next((_lookup(payload, field) for field in id_fields if _lookup(payload, field)), None)
+    if payment_id is None:
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return f'sha256:{hashlib.sha256(canonical.encode("utf-8")).hexdigest()}'
+
+    status = next((_lookup(payload, field) for field in status_fields if _lookup(payload, field)), '')
+    return f'{payment_id}:{status}'[:255]
+
+
+class PaymentWebhookInbox:
+    """Сохраняет callback-и шлюзов и проводит их ограниченным пулом воркеров."""
+
+    def __init__(
+        self,
+        payment_service: Any,
+        *,
+        worker_count: int,
+        batch_size: int,
+        max_attempts: int,
+        retention_hours: int,
+    ) -> None:
+        self._payment_service = payment_service
+        self._worker_count = max(1, worker_count)
+        self._batch_size = max(1, batch_size)
+        self._max_attempts = max(1, max_attempts)
+        self._retention = timedelta(hours=max(1, retention_hours))
+        self._semaphore = asyncio.Semaphore(self._worker_count)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._running = False
+        self._last_cleanup = 0.0
+        self._stats: dict[str, _ProviderStats] = defaultdict(_ProviderStats)
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    async def enqueue(self, provider: str, method_name: str, payload: dict) -> bool:
+        """Сохранить проверенный callback. False - такой callback уже принят."""
+        now = datetime.now(UTC)
+        async with AsyncSessionLocal() as db:
+            is_postgres = db.bind.dialect.name == 'postgresql'
+            stmt = (pg_insert if is_postgres else sqlite_insert)(PaymentWebhookEvent).values(
+                provider=provider,
+                external_id=get_external_id(provider, payload),
+                method_name=method_name,
+                payload=payload,
+                status='pending',
+                attempts=0,
+                received_at=now,
+                available_at=now,
+            )
+            result = await db.execute(stmt.on_conflict_do_nothing(index_elements=['provider', 'external_id']))
+            await db.commit()
+
+        stats = self._stats[provider]
+        if not result.rowcount:
+            stats.duplicates += 1
+            logger.info('Повторный платёжный callback пропущен', provider=provider)
+            return False
+
+        stats.received += 1
+        self._wakeup.set()
+        return True
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run(), name='payment-webhook-inbox')
+        logger.info('🚀 Очередь платёжных webhook-ов запущена', worker_count=self._worker_count)
+
+    async def stop(self) -> None:
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        if self._task is not None:
+            # Незавершённые строки заберёт следующий запуск после истечения блокировки
+            try:
+                await asyncio.wait_for(self._task, timeout=_SHUTDOWN_TIMEOUT_SECONDS)
+            except TimeoutError:
+                logger.warning('⏱️ Очередь платёжных webhook-ов не успела завершить пачку')
+            self._task = None
+        logger.info('🛑 Очередь платёжных webhook-ов остановлена')
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            'running': self._running,
+            'workers': self._worker_count,
+            'providers': {provider: stats.as_dict() for provider, stats in self._stats.items()},
+        }
+
+    async def _run(self) -> None:
+        while self._running:
+            try:
+                events = await self._claim_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('Не удалось выбрать платёжные callback-и из очереди', error=error)
+                await asyncio.sleep(_POLL_INTERVAL_SECONDS)
+                continue
+
+            if events:
+                await asyncio.gather(*(self._settle(event) for event in events))
+                continue
+
+            await self._cleanup_if_due()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=_POLL_INTERVAL_SECONDS)
+            except TimeoutError:
+                pass
+
+    async def _claim_batch(self) -> list[Any]:
+        now = datetime.now(UTC)
+        model = PaymentWebhookEvent
+        candidates = (
+            select(model.id)
+            .where(
+                or_(
+                    and_(model.status == 'pending', model.available_at <= now),
+                    and_(
+                        model.status == 'processing',
+                        model.locked_at < now - timedelta(seconds=_LOCK_TIMEOUT_SECONDS),
+                    ),
+                )
+            )
+            .order_by(model.id)
+            .limit(self._batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(model)
+            .where(model.id.in_(candidates))
+            .values(status='processing', locked_at=now, attempts=model.attempts + 1)
+            .returning(
+                model.id,
+                model.provider,
+                model.method_name,
+                model.payload,
+                model.attempts,
+                model.received_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(stmt)).all()
+            await db.commit()
+        return sorted(rows, key=lambda row: row.id)
+
+    async def _settle(self, event: Any) -> None:
+        async with self._semaphore:
+            stats = self._stats[event.provider]
+            error_message = None
+            try:
+                async with AsyncSessionLocal() as db:
+                    process_callback = getattr(self._payment_service, event.method_name)
+                    success = await process_callback(db, event.payload)
+                    # Как и get_db при прямой обработке: изменения обработчика фиксируются при любом результате
+                    await db.commit()
+                if success:
+                    # Обработчики коммитят сами, поэтому отметка - отдельная транзакция. Если воркер упадёт
+                    # до неё, callback проведётся повторно после истечения блокировки: обработчики
+                    # PaymentService сверяют is_paid и transaction_id локального платежа и второй раз
+                    # не зачисляют
+                    async with AsyncSessionLocal() as db:
+                        await self._finish(db, event.id, 'processed', claimed_attempt=event.attempts)
+                        await db.commit()
+            except Exception as error:
+                logger.exception('Ошибка проведения платёжного callback-а', provider=event.provider, event_id=event.id)
+                success = False
+                error_message = str(error)[:1000]
+
+            if success:
+                elapsed = self._elapsed(event.received_at)
+                stats.settled += 1
+                stats.settle_seconds += elapsed
+                PAYMENT_SETTLE_DURATION.observe(elapsed, event.provider, 'settled')
+                return
+
+            try:
+                await self._reschedule(event, error_message)
+            except Exception as error:
+                logger.error('Не удалось обновить статус платёжного callback-а', event_id=event.id, error=error)
+                return
+
+            if event.attempts < self._max_attempts:
+                stats.retried += 1
+            elif error_message:
+                stats.failed += 1
+            else:
+                elapsed = self._elapsed(event.received_at)
+                stats.rejected += 1
+                stats.settle_seconds += elapsed
+                PAYMENT_SETTLE_DURATION.observe(elapsed, event.provider, 'rejected')
+
+    @staticmethod
+    def _elapsed(received_at: datetime | None) -> float:
+        if received_at is None:
+            return 0.0
+        if received_at.tzinfo is None:
+            received_at = received_at.replace(tzinfo=UTC)
+        return max(0.0, (datetime.now(UTC) - received_at).total_seconds())
+
+    @staticmethod
+    async def _finish(
+        db,
+        event_id: int,
+        status: str,
+        error_message: str | None = None,
+        *,
+        claimed_attempt: int | None = None,
+    ) -> None:
+        stmt = update(PaymentWebhookEvent).where(PaymentWebhookEvent.id == event_id)
+        if claimed_attempt is not None:
+            # attempts растёт при каждом захвате: строку, перехваченную другим воркером, не трогаем
+            stmt = stmt.where(
+                PaymentWebhookEvent.status == 'processing',
+                PaymentWebhookEvent.attempts == claimed_attempt,
+            )
+        await db.execute(
+            stmt.values(
+                status=status, processed_at=datetime.now(UTC), locked_at=None, error_message=error_message
+            ).execution_options(synchronize_session=False)
+        )
+
+    async def _reschedule(self, event: Any, error_message: str | None) -> None:
+        """Вернуть callback в очередь с экспоненциальной задержкой или закрыть его."""
+        async with AsyncSessionLocal() as db:
+            if event.attempts >= self._max_attempts:
+                status = 'failed' if error_message else 'rejected'
+                await self._finish(db, event.id, status, error_message, claimed_attempt=event.attempts)
+                logger.error(
+                    'Платёжный callback не проведён',
+                    provider=event.provider,
+                    event_id=event.id,
+                    status=status,
+                    attempts=event.attempts,
+                )
+            else:
+                delay = _RETRY_BASE_DELAY_SECONDS * 2 ** (event.attempts - 1)
+                await db.execute(
+                    update(PaymentWebhookEvent)
+                    .where(
+                        PaymentWebhookEvent.id == event.id,
+                        PaymentWebhookEvent.status == 'processing',
+                        PaymentWebhookEvent.attempts == event.attempts,
+                    )
+                    .values(
+                        status='pending',
+                        locked_at=None,
+                        error_message=error_message,
+                        available_at=datetime.now(UTC) + timedelta(seconds=delay),
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+
+    async def _cleanup_if_due(self) -> None:
+        if time.monotonic() - self._last_cleanup < _CLEANUP_INTERVAL_SECONDS:
+            return
+        self._last_cleanup = time.monotonic()
+
+        model = PaymentWebhookEvent
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    delete(model).where(
+                        model.status.in_(('processed', 'rejected', 'failed')),
+                        model.received_at < datetime.now(UTC) - self._retention,
+                    )
+                )
+                await db.commit()
+        except Exception as error:
+            logger.warning('Не удалось очистить очередь платёжных callback-ов', error=error)
+            return
+
+        if result.rowcount:
+            logger.info('Удалены старые платёжные callback-и', count=result.rowcount)
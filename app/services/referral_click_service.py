@@ -0,0 +1,170 @@
+"""Журнал переходов по реферальным ссылкам.
+
+Обработчик /start только добавляет переход в буфер в памяти (record не ждёт
+БД). Фоновая задача раз в REFERRAL_CLICK_FLUSH_INTERVAL_SECONDS или при
+заполнении пачки пишет буфер в referral_click_events одной вставкой.
+Диагностика рефералов (ReferralDiagnosticsService) читает переходы из этой
+таблицы индексированными запросами вместо разбора логов.
+
+Раз в сутки задача создаёт партиции на следующие месяцы и удаляет переходы
+старше REFERRAL_CLICK_RETENTION_DAYS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections import deque
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal, engine
+from app.database.models import ReferralClickEvent
+from app.database.partitions import drop_partitions_before, ensure_monthly_partitions
+
+
+logger = structlog.get_logger(__name__)
+
+REFERRAL_CODE_PREFIX = 'ref'
+
+_MAINTENANCE_INTERVAL_SECONDS = 86400
+_PARTITION_MONTHS_AHEAD = 2
+
+
+def clean_referral_code(raw_code: str) -> str:
+    """ref_refXXX -> refXXX (miniapp добавляет ref_), остальные коды без изменений."""
+    if raw_code.startswith('ref_ref'):
+        return raw_code[4:]
+    return raw_code
+
+
+class ReferralClickRecorder:
+    """Буферизованная запись переходов по реф-ссылкам в referral_click_events."""
+
+    def __init__(self, *, batch_size: int, flush_interval: float, max_buffer_size: int) -> None:
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = max(0.1, flush_interval)
+        self._buffer: deque[dict[str, Any]] = deque(maxlen=max(1, max_buffer_size))
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._last_maintenance = 0.0
+        self.dropped = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def record(self, telegram_id: int | None, payload: str | None, source: str) -> None:
+        """Запомнить переход, если payload — реферальный код (ref...)."""
+        if not telegram_id or not payload:
+            return
+        payload = payload.strip()
+        code = clean_referral_code(payload)
+        if not code.startswith(REFERRAL_CODE_PREFIX):
+            return
+
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(
+            {
+                'created_at': datetime.now(UTC),
+                'telegram_id': telegram_id,
+                'code': code[:64],
+                'payload': payload[:255],
+                'source': source,
+            }
+        )
+        if len(self._buffer) >= self._batch_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        # Партиции текущего месяца должны появиться до первой вставки
+        await self._maintain()
+        self._task = asyncio.create_task(self._run())
+        logger.info('Журнал переходов по реф-ссылкам запущен', batch_size=self._batch_size)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Записать накопленные переходы. Возвращает число записанных."""
+        written = 0
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self._batch_size, len(self._buffer)))]
+            try:
+                await self._insert(batch)
+            except Exception as error:
+                logger.warning('Не удалось записать переходы по реф-ссылкам', count=len(batch), error=error)
+                # Возвращаем пачку в начало буфера, запишем при следующей попытке
+                self._buffer.extendleft(reversed(batch))
+                break
+            written += len(batch)
+        return written
+
+    async def _insert(self, batch: list[dict[str, Any]]) -> None:
+        async with AsyncSessionLocal() as db:
+            is_postgres = db.bind.dialect.name == 'postgresql'
+            stmt = (pg_insert if is_postgres else sqlite_insert)(ReferralClickEvent).on_conflict_do_nothing()
+            await db.execute(stmt, batch)
+            await db.commit()
+
+    async def _run(self) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_maintenance >= _MAINTENANCE_INTERVAL_SECONDS:
+                    await self._maintain()
+            except Exception as error:
+                logger.error('Ошибка журнала переходов по реф-ссылкам', error=error)
+
+    async def _maintain(self) -> None:
+        """Создать партиции на следующие месяцы и удалить устаревшие переходы."""
+        self._last_maintenance = time.monotonic()
+        table = ReferralClickEvent.__tablename__
+        cutoff = datetime.now(UTC) - timedelta(days=max(1, settings.REFERRAL_CLICK_RETENTION_DAYS))
+        try:
+            async with engine.begin() as conn:
+                created = await ensure_monthly_partitions(conn, table, _PARTITION_MONTHS_AHEAD)
+                dropped = await drop_partitions_before(conn, table, cutoff)
+                # Остаток: неполный месяц у границы, партиция по умолчанию или SQLite
+                result = await conn.execute(delete(ReferralClickEvent).where(ReferralClickEvent.created_at < cutoff))
+        except Exception as error:
+            logger.warning('Не удалось обслужить журнал переходов по реф-ссылкам', error=error)
+            return
+
+        if created or dropped or result.rowcount:
+            logger.info(
+                'Журнал переходов по реф-ссылкам обслужен',
+                created_partitions=created,
+                dropped_partitions=dropped,
+                deleted=result.rowcount,
+            )
+
+
+referral_click_recorder = ReferralClickRecorder(
+    batch_size=settings.REFERRAL_CLICK_BATCH_SIZE,
+    flush_interval=settings.REFERRAL_CLICK_FLUSH_INTERVAL_SECONDS,
+    max_buffer_size=settings.REFERRAL_CLICK_BUFFER_MAX_SIZE,
+)
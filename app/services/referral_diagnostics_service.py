@@ -7,6 +7,9 @@
 - Выявление потерянных рефералов
 """
 
+import asyncio
+import mmap
+import os
 import re
 from dataclasses import dataclass, field
 from datetime import UTC, datetime, timedelta
@@ -14,17 +17,34 @@ from pathlib import Path
 from typing import Optional
 
 import structlog
-from sqlalchemy import select
+from sqlalchemy import and_, distinct, exists, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from app.config import settings
 from app.database.crud.referral import create_referral_earning, get_user_campaign_id
 from app.database.crud.user import add_user_balance
-from app.database.models import ReferralEarning, User
+from app.database.models import ReferralClickEvent, ReferralEarning, Transaction, TransactionType, User
+from app.services.referral_click_service import clean_referral_code
+from app.utils.log_reader import find_offset
+from app.utils.timezone import get_local_timezone
 
 
 logger = structlog.get_logger(__name__)
 
+# Заголовок строки лога: старый формат "2025-01-10 12:00:00,123 - module - INFO - текст"
+# и формат structlog "2025-01-10 12:00:00 [info] [module] текст" (app/logging_config.py)
+_LINE_HEADER_RE = re.compile(rb'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:,\d+ - .+? - .+? - | \[\w+\] )')
+
+# Переходы по реф-ссылкам: /start refXXX или /start ref_refXXX и сохранение payload
+_CLICK_PATTERNS: tuple[tuple[re.Pattern[str], int, int], ...] = (
+    # (паттерн, группа telegram_id, группа кода)
+    (re.compile(r'📩 Сообщение от ID:(\d+).*?/start\s+(ref[\w_]+)'), 1, 2),
+    (re.compile(r"💾 Сохранен start payload '(ref[\w_]+)' для пользователя\s*(\d+)"), 2, 1),
+    (re.compile(r'💾 Сохранен start payload .*?payload=(ref[\w_]+).*?telegram_id=(\d+)'), 2, 1),
+)
+_CLICK_MARKER = b'ref'
+
 
 @dataclass
 class ReferralClick:
@@ -109,9 +129,13 @@ class DiagnosticReport:
     total_lines_parsed: int = 0
     lines_in_period: int = 0
 
+    # Откуда взяты переходы: events — журнал referral_click_events, logs — лог-файл
+    source: str = 'logs'
+
     def to_dict(self) -> dict:
         """Сериализация в dict для хранения в Redis."""
         return {
+            'source': self.source,
             'total_ref_clicks': self.total_ref_clicks,
             'unique_users_clicked': self.unique_users_clicked,
             'lost_referrals': [lr.to_dict() for lr in self.lost_referrals],
@@ -141,6 +165,7 @@ class DiagnosticReport:
             analysis_period_end=end,
             total_lines_parsed=data.get('total_lines_parsed', 0),
             lines_in_period=data.get('lines_in_period', 0),
+            source=data.get('source', 'logs'),
         )
 
 
@@ -286,6 +311,95 @@ class MissingBonusReport:
         )
 
 
+def scan_referral_clicks(
+    log_path: Path, start_date: datetime, end_date: datetime, skip_date_filter: bool = False
+) -> tuple[list[ReferralClick], int, int]:
+    """
+    Найти переходы по реф-ссылкам в лог-файле.
+
+    Синхронная функция для пула потоков. Файл читается через mmap; при
+    фильтре по дате чтение начинается с контрольной точки индекса
+    app.utils.log_reader, а не с начала файла, и заканчивается на первой
+    записи позже end_date. Время в логе локальное (TIMEZONE), в кликах — UTC.
+
+    Returns:
+        (клики, просмотрено строк, строк за период)
+    """
+    clicks: list[ReferralClick] = []
+    total_lines = 0
+    lines_in_period = 0
+
+    local_tz = get_local_timezone()
+    start_offset = 0
+    if not skip_date_filter:
+        start_offset = find_offset(log_path, start_date.astimezone(local_tz).replace(tzinfo=None))
+
+    with log_path.open('rb') as handle:
+        if os.fstat(handle.fileno()).st_size <= start_offset:
+            return clicks, 0, 0
+
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            mapped.seek(start_offset)
+            parsed_timestamps: dict[bytes, datetime] = {}
+
+            for raw_line in iter(mapped.readline, b''):
+                total_lines += 1
+                line = raw_line.strip()
+                if not line:
+                    continue
+
+                # Убираем Docker-префикс
+                if b' | ' in line[:50]:
+                    line = line.split(b' | ', 1)[-1]
+
+                header = _LINE_HEADER_RE.match(line)
+                if not header:
+                    continue
+
+                timestamp_raw = header.group(1)
+                timestamp = parsed_timestamps.get(timestamp_raw)
+                if timestamp is None:
+                    try:
+                        timestamp = (
+                            datetime.strptime(timestamp_raw.decode(), '%Y-%m-%d %H:%M:%S')
+                            .replace(tzinfo=local_tz)
+                            .astimezone(UTC)
+                        )
+                    except ValueError:
+                        continue
+                    if len(parsed_timestamps) > 4096:
+                        parsed_timestamps.clear()
+                    parsed_timestamps[timestamp_raw] = timestamp
+
+                if not skip_date_filter:
+                    if timestamp >= end_date:
+                        break
+                    if timestamp < start_date:
+                        continue
+
+                lines_in_period += 1
+
+                if _CLICK_MARKER not in line:
+                    continue
+                message = line[header.end() :].decode('utf-8', errors='ignore')
+                for pattern, id_group, code_group in _CLICK_PATTERNS:
+                    event_match = pattern.search(message)
+                    if event_match:
+                        raw_code = event_match.group(code_group)
+                        clicks.append(
+                            ReferralClick(
+                                timestamp=timestamp,
+                                telegram_id=int(event_match.group(id_group)),
+                                raw_code=raw_code,
+                                clean_code=clean_referral_code(raw_code),
+                                log_line=line.decode('utf-8', errors='ignore'),
+                            )
+                        )
+                        break
+
+    return clicks, total_lines, lines_in_period
+
+
 class ReferralDiagnosticsService:
     """Сервис диагностики реферальной системы."""
 
@@ -333,9 +447,7 @@ class ReferralDiagnosticsService:
         ref_refXXX -> refXXX (miniapp добавляет ref_)
         refXXX -> refXXX (без изменений)
         """
-        if raw_code.startswith('ref_ref'):
-            return raw_code[4:]  # Убираем "ref_"
-        return raw_code
+        return clean_referral_code(raw_code)
 
     async def analyze_today(self, db: AsyncSession) -> DiagnosticReport:
         """Анализирует реферальные события за сегодня."""
@@ -344,7 +456,16 @@ class ReferralDiagnosticsService:
         return await self.analyze_period(db, today, tomorrow)
 
     async def analyze_period(self, db: AsyncSession, start_date: datetime, end_date: datetime) -> DiagnosticReport:
-        """Анализирует реферальные события за указанный период."""
+        """
+        Анализирует реферальные события за указанный период.
+
+        Переходы берутся из журнала referral_click_events. Если журнал
+        не покрывает начало периода (переходы до его появления), период
+        разбирается по логам, как раньше.
+        """
+        first_recorded = await db.scalar(select(func.min(ReferralClickEvent.created_at)))
+        if first_recorded is not None and first_recorded <= start_date:
+            return await self._analyze_click_events(db, start_date, end_date)
 
         # 1. Парсим логи — находим все переходы по реф-ссылкам
         clicks, total_lines, lines_in_period = await self._parse_clicks(start_date, end_date)
@@ -367,6 +488,101 @@ class ReferralDiagnosticsService:
             lines_in_period=lines_in_period,
         )
 
+    async def _analyze_click_events(
+        self, db: AsyncSession, start_date: datetime, end_date: datetime
+    ) -> DiagnosticReport:
+        """Потерянные рефералы по журналу переходов: последний переход каждого пользователя сверяется в SQL.
+
+        Берётся последний переход не позже регистрации пользователя: повторный клик
+        уже зарегистрированного реферала не должен скрывать исходный потерянный переход.
+        """
+        event = ReferralClickEvent
+        in_period = and_(event.created_at >= start_date, event.created_at < end_date)
+
+        total_clicks, unique_users = (
+            await db.execute(select(func.count(), func.count(distinct(event.telegram_id))).where(in_period))
+        ).one()
+
+        registered_user = aliased(User)
+        last_clicks = (
+            select(
+                event.telegram_id,
+                event.code,
+                event.created_at,
+                func.row_number()
+                .over(partition_by=event.telegram_id, order_by=event.created_at.desc())
+                .label('position'),
+            )
+            .outerjoin(registered_user, registered_user.telegram_id == event.telegram_id)
+            .where(
+                in_period,
+                or_(
+                    registered_user.id.is_(None),
+                    registered_user.created_at.is_(None),
+                    registered_user.created_at >= event.created_at,
+                ),
+            )
+            .subquery()
+        )
+        clicked_user = aliased(User)
+        referrer = aliased(User)
+
+        # Те же условия, что в _find_lost_referrals
+        is_lost = or_(
+            clicked_user.id.is_(None),
+            and_(
+                or_(clicked_user.created_at.is_(None), clicked_user.created_at >= last_clicks.c.created_at),
+                or_(
+                    clicked_user.referred_by_id.is_(None),
+                    and_(referrer.id.isnot(None), clicked_user.referred_by_id != referrer.id),
+                ),
+            ),
+        )
+        result = await db.execute(
+            select(last_clicks.c.telegram_id, last_clicks.c.code, last_clicks.c.created_at, clicked_user, referrer)
+            .outerjoin(clicked_user, clicked_user.telegram_id == last_clicks.c.telegram_id)
+            .outerjoin(referrer, referrer.referral_code == last_clicks.c.code)
+            .where(last_clicks.c.position == 1, is_lost)
+            .order_by(last_clicks.c.created_at)
+        )
+        lost_referrals = [
+            self._make_lost_referral(telegram_id, code, click_time, user, referrer_user)
+            for telegram_id, code, click_time, user, referrer_user in result.all()
+        ]
+        logger.info(
+            '🔍 Диагностика по журналу переходов',
+            clicks_count=total_clicks,
+            unique_users=unique_users,
+            lost_count=len(lost_referrals),
+        )
+
+        return DiagnosticReport(
+            total_ref_clicks=total_clicks,
+            unique_users_clicked=unique_users,
+            lost_referrals=lost_referrals,
+            analysis_period_start=start_date,
+            analysis_period_end=end_date,
+            source='events',
+        )
+
+    @staticmethod
+    def _make_lost_referral(
+        telegram_id: int, code: str, click_time: datetime, user: User | None, referrer: User | None
+    ) -> LostReferral:
+        return LostReferral(
+            telegram_id=telegram_id,
+            username=user.username if user else None,
+            full_name=user.full_name if user else None,
+            referral_code=code,
+            expected_referrer_code=code,
+            expected_referrer_id=referrer.id if referrer else None,
+            expected_referrer_name=referrer.full_name if referrer else None,
+            click_time=click_time,
+            registered=user is not None,
+            has_referrer=user.referred_by_id is not None if user else False,
+            current_referrer_id=user.referred_by_id if user else None,
+        )
+
     async def analyze_file(self, db: AsyncSession, file_path: str) -> DiagnosticReport:
         """
         Анализирует загруженный лог-файл на наличие потерянных рефералов.
@@ -424,90 +640,22 @@ class ReferralDiagnosticsService:
     async def _parse_clicks(
         self, start_date: datetime, end_date: datetime, skip_date_filter: bool = False
     ) -> tuple[list[ReferralClick], int, int]:
-        """Парсит логи и находит все переходы по реф-ссылкам."""
-
-        clicks = []
-        total_lines = 0
-        lines_in_period = 0
+        """Парсит логи и находит все переходы по реф-ссылкам (в пуле потоков, не блокируя event loop)."""
 
         if not self.log_path.exists():
             logger.warning('❌ Лог-файл не найден', log_path=self.log_path)
-            return clicks, 0, 0
+            return [], 0, 0
 
         file_size = self.log_path.stat().st_size
         logger.info('📂 Читаю лог-файл: ( MB)', log_path=self.log_path, file_size=round(file_size / 1024 / 1024, 2))
 
-        # Паттерн timestamp
-        timestamp_pattern = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - .+ - .+ - (.+)$')
-
-        # Паттерны для поиска реф-кликов
-        # /start refXXX или /start ref_refXXX
-        start_pattern = re.compile(r'📩 Сообщение от ID:(\d+).*?/start\s+(ref[\w_]+)')
-        # Сохранение payload
-        payload_pattern = re.compile(r"💾 Сохранен start payload '(ref[\w_]+)' для пользователя\s*(\d+)")
-
-        # Для быстрой фильтрации по дате (только если не пропускаем фильтр)
-        use_date_prefix = not skip_date_filter and (end_date - start_date).days <= 31
-        date_prefix = start_date.strftime('%Y-%m-%d') if use_date_prefix else None
-
         try:
-            with open(self.log_path, encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    total_lines += 1
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # Убираем Docker-префикс
-                    if ' | ' in line[:50]:
-                        line = line.split(' | ', 1)[-1]
-
-                    # Быстрая проверка по дате (только для коротких периодов)
-                    if date_prefix and date_prefix not in line[:10]:
-                        continue
-
-                    # Парсим timestamp
-                    match = timestamp_pattern.match(line)
-                    if not match:
-                        continue
-
-                    timestamp_str, message = match.groups()
-                    try:
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S').replace(tzinfo=UTC)
-                    except ValueError:
-                        continue
-
-                    if not (start_date <= timestamp < end_date):
-                        continue
-
-                    lines_in_period += 1
-
-                    # Ищем реф-клики
-                    for pattern in [start_pattern, payload_pattern]:
-                        event_match = pattern.search(message)
-                        if event_match:
-                            if pattern == start_pattern:
-                                telegram_id = int(event_match.group(1))
-                                raw_code = event_match.group(2)
-                            else:
-                                raw_code = event_match.group(1)
-                                telegram_id = int(event_match.group(2))
-
-                            clean_code = self.clean_referral_code(raw_code)
-
-                            clicks.append(
-                                ReferralClick(
-                                    timestamp=timestamp,
-                                    telegram_id=telegram_id,
-                                    raw_code=raw_code,
-                                    clean_code=clean_code,
-                                    log_line=line,
-                                )
-                            )
-                            break
-
+            clicks, total_lines, lines_in_period = await asyncio.to_thread(
+                scan_referral_clicks, self.log_path, start_date, end_date, skip_date_filter
+            )
         except Exception as e:
             logger.error('Ошибка парсинга логов', error=e, exc_info=True)
+            return [], 0, 0
 
         logger.info(
             '📊 Парсинг: строк=, за период=, реф-кликов',
@@ -524,16 +672,20 @@ class ReferralDiagnosticsService:
             return []
 
         lost = []
-        telegram_ids = [c.telegram_id for c in clicks]
-
-        # Получаем пользователей из БД
-        result = await db.execute(select(User).where(User.telegram_id.in_(telegram_ids)))
-        users_map = {u.telegram_id: u for u in result.scalars().all()}
+        telegram_ids = {c.telegram_id for c in clicks}
+        codes = {c.clean_code for c in clicks}
 
-        # Получаем всех рефереров по кодам
-        codes = list({c.clean_code for c in clicks})
-        referrers_result = await db.execute(select(User).where(User.referral_code.in_(codes)))
-        referrers_map = {u.referral_code: u for u in referrers_result.scalars().all()}
+        # Пользователи и рефереры по кодам — одним запросом
+        result = await db.execute(
+            select(User).where(or_(User.telegram_id.in_(telegram_ids), User.referral_code.in_(codes)))
+        )
+        users_map: dict[int, User] = {}
+        referrers_map: dict[str, User] = {}
+        for candidate in result.scalars().all():
+            if candidate.telegram_id in telegram_ids:
+                users_map[candidate.telegram_id] = candidate
+            if candidate.referral_code in codes:
+                referrers_map[candidate.referral_code] = candidate
 
         for click in clicks:
             user = users_map.get(click.telegram_id)
@@ -564,19 +716,7 @@ class ReferralDiagnosticsService:
 
             if is_lost:
                 lost.append(
-                    LostReferral(
-                        telegram_id=click.telegram_id,
-                        username=user.username if user else None,
-                        full_name=user.full_name if user else None,
-                        referral_code=click.clean_code,
-                        expected_referrer_code=click.clean_code,
-                        expected_referrer_id=referrer.id if referrer else None,
-                        expected_referrer_name=referrer.full_name if referrer else None,
-                        click_time=click.timestamp,
-                        registered=user is not None,
-                        has_referrer=user.referred_by_id is not None if user else False,
-                        current_referrer_id=user.referred_by_id if user else None,
-                    )
+                    self._make_lost_referral(click.telegram_id, click.clean_code, click.timestamp, user, referrer)
                 )
 
         logger.info('🔍 Найдено потерянных рефералов', lost_count=len(lost))
@@ -662,6 +802,33 @@ class ReferralDiagnosticsService:
             except Exception as exc:
                 logger.error('Не удалось добавить в конкурс регистрации', contest_id=contest.id, error=exc)
 
+    @staticmethod
+    def _first_topups_subquery(user_ids):
+        """Пополнения пользователей user_ids с номером по порядку (position = 1 — первое)."""
+        return (
+            select(
+                Transaction.id,
+                Transaction.user_id,
+                Transaction.amount_kopeks,
+                Transaction.created_at,
+                func.row_number()
+                .over(partition_by=Transaction.user_id, order_by=(Transaction.created_at.asc(), Transaction.id.asc()))
+                .label('position'),
+            )
+            .where(Transaction.user_id.in_(user_ids), Transaction.type == TransactionType.DEPOSIT.value)
+            .subquery()
+        )
+
+    async def _get_first_topups(self, db: AsyncSession, user_ids: list[int]) -> dict[int, Transaction]:
+        """Первое пополнение каждого пользователя одним запросом."""
+        if not user_ids:
+            return {}
+        ranked = self._first_topups_subquery(user_ids)
+        result = await db.execute(
+            select(Transaction).join(ranked, ranked.c.id == Transaction.id).where(ranked.c.position == 1)
+        )
+        return {transaction.user_id: transaction for transaction in result.scalars().all()}
+
     async def fix_lost_referrals(
         self, db: AsyncSession, lost_referrals: list[LostReferral], apply: bool = False
     ) -> FixReport:
@@ -682,14 +849,30 @@ class ReferralDiagnosticsService:
             logger.info('🔍 Нет потерянных рефералов для исправления')
             return report
 
-        # Получаем всех пользователей и рефереров
-        telegram_ids = [lr.telegram_id for lr in lost_referrals]
-        result = await db.execute(select(User).where(User.telegram_id.in_(telegram_ids)))
-        users_map = {u.telegram_id: u for u in result.scalars().all()}
-
-        referrer_ids = list({lr.expected_referrer_id for lr in lost_referrals if lr.expected_referrer_id})
-        referrers_result = await db.execute(select(User).where(User.id.in_(referrer_ids)))
-        referrers_map = {u.id: u for u in referrers_result.scalars().all()}
+        # Пользователи и рефереры — одним запросом
+        telegram_ids = {lr.telegram_id for lr in lost_referrals}
+        referrer_ids = {lr.expected_referrer_id for lr in lost_referrals if lr.expected_referrer_id}
+        result = await db.execute(
+            select(User).where(or_(User.telegram_id.in_(telegram_ids), User.id.in_(referrer_ids)))
+        )
+        users_map: dict[int, User] = {}
+        referrers_map: dict[int, User] = {}
+        for candidate in result.scalars().all():
+            if candidate.telegram_id in telegram_ids:
+                users_map[candidate.telegram_id] = candidate
+            if candidate.id in referrer_ids:
+                referrers_map[candidate.id] = candidate
+
+        # Первые пополнения и уже начисленные бонусы — по одному запросу на всех
+        user_ids = [user.id for user in users_map.values()]
+        first_topups = await self._get_first_topups(db, user_ids)
+        earnings_result = await db.execute(
+            select(ReferralEarning.user_id, ReferralEarning.referral_id).where(
+                ReferralEarning.referral_id.in_(user_ids),
+                ReferralEarning.reason == 'referral_first_topup',
+            )
+        )
+        existing_earnings = {(row.user_id, row.referral_id) for row in earnings_result}
 
         for lost in lost_referrals:
             detail = FixDetail(
@@ -729,34 +912,14 @@ class ReferralDiagnosticsService:
                     report.users_fixed += 1
 
                 # 2. Проверяем первое пополнение
-                # Ищем первое пополнение пользователя
-                from app.database.models import Transaction, TransactionType
-
-                first_topup_result = await db.execute(
-                    select(Transaction)
-                    .where(Transaction.user_id == user.id, Transaction.type == TransactionType.DEPOSIT.value)
-                    .order_by(Transaction.created_at.asc())
-                    .limit(1)
-                )
-                first_topup = first_topup_result.scalar_one_or_none()
+                first_topup = first_topups.get(user.id)
 
                 if first_topup and first_topup.amount_kopeks >= settings.REFERRAL_MINIMUM_TOPUP_KOPEKS:
                     detail.had_first_topup = True
                     detail.topup_amount_kopeks = first_topup.amount_kopeks
 
                     # Проверяем, не начисляли ли уже бонусы
-                    existing_bonus_result = await db.execute(
-                        select(ReferralEarning)
-                        .where(
-                            ReferralEarning.user_id == referrer.id,
-                            ReferralEarning.referral_id == user.id,
-                            ReferralEarning.reason == 'referral_first_topup',
-                        )
-                        .limit(1)
-                    )
-                    existing_bonus = existing_bonus_result.scalar_one_or_none()
-
-                    if not existing_bonus:
+                    if (referrer.id, user.id) not in existing_earnings:
                         # 3. Начисляем бонус рефералу (приглашённому)
                         # Не проверяем has_made_first_topup — это восстановление потерянного реферала,
                         # он мог пополнить баланс, но бонус не получил т.к. не было referred_by_id
@@ -856,83 +1019,55 @@ class ReferralDiagnosticsService:
         Returns:
             MissingBonusReport со списком ненначисленных бонусов
         """
-        from app.database.models import Transaction, TransactionType
         from app.utils.user_utils import get_effective_referral_commission_percent
 
         report = MissingBonusReport()
 
-        # 1. Находим всех рефералов (у кого есть referred_by_id)
-        referrals_result = await db.execute(select(User).where(User.referred_by_id.isnot(None)))
-        referrals = referrals_result.scalars().all()
-        report.total_referrals_checked = len(referrals)
+        # 1. Всего рефералов (у кого есть referred_by_id)
+        report.total_referrals_checked = await db.scalar(
+            select(func.count()).select_from(User).where(User.referred_by_id.isnot(None))
+        )
 
-        if not referrals:
+        if not report.total_referrals_checked:
             logger.info('📊 Нет рефералов для проверки')
             return report
 
-        # 2. Собираем ID рефереров
-        referrer_ids = list({r.referred_by_id for r in referrals})
-        referrers_result = await db.execute(select(User).where(User.id.in_(referrer_ids)))
-        referrers_map = {u.id: u for u in referrers_result.scalars().all()}
-
-        # 3. Получаем все ReferralEarning для проверки
-        referral_ids = [r.id for r in referrals]
-        earnings_result = await db.execute(
-            select(ReferralEarning).where(
-                ReferralEarning.referral_id.in_(referral_ids),
-                ReferralEarning.reason == 'referral_first_topup',
-            )
+        # 2. Первое пополнение каждого реферала, реферер и наличие бонуса — в SQL
+        first_topup = self._first_topups_subquery(select(User.id).where(User.referred_by_id.isnot(None)))
+        referral = aliased(User)
+        referrer_alias = aliased(User)
+        eligible = (
+            select(referral, referrer_alias, first_topup.c.amount_kopeks, first_topup.c.created_at)
+            .join(referrer_alias, referrer_alias.id == referral.referred_by_id)
+            .join(first_topup, and_(first_topup.c.user_id == referral.id, first_topup.c.position == 1))
+            .where(first_topup.c.amount_kopeks >= settings.REFERRAL_MINIMUM_TOPUP_KOPEKS)
         )
-        # Множество пар (referrer_id, referral_id) где бонус уже начислен
-        existing_earnings = {(e.user_id, e.referral_id) for e in earnings_result.scalars().all()}
-
-        # 4. Проверяем каждого реферала
-        for referral in referrals:
-            referrer = referrers_map.get(referral.referred_by_id)
-            if not referrer:
-                continue
-
-            # Ищем первое пополнение
-            first_topup_result = await db.execute(
-                select(Transaction)
-                .where(
-                    Transaction.user_id == referral.id,
-                    Transaction.type == TransactionType.DEPOSIT.value,
-                )
-                .order_by(Transaction.created_at.asc())
-                .limit(1)
-            )
-            first_topup = first_topup_result.scalar_one_or_none()
+        report.referrals_with_topup = await db.scalar(select(func.count()).select_from(eligible.subquery()))
 
-            # Если нет пополнения или меньше минимума — пропускаем
-            if not first_topup or first_topup.amount_kopeks < settings.REFERRAL_MINIMUM_TOPUP_KOPEKS:
-                continue
-
-            report.referrals_with_topup += 1
-
-            # Проверяем начислен ли бонус
-            bonus_exists = (referrer.id, referral.id) in existing_earnings
-
-            if bonus_exists:
-                # Бонусы уже начислены
-                continue
+        bonus_exists = exists().where(
+            ReferralEarning.user_id == referrer_alias.id,
+            ReferralEarning.referral_id == referral.id,
+            ReferralEarning.reason == 'referral_first_topup',
+        )
+        missing_result = await db.execute(eligible.where(~bonus_exists).order_by(referral.id))
 
-            # Бонусы НЕ начислены — добавляем в отчёт
+        # 3. Считаем суммы для рефералов без бонусов
+        for referral_user, referrer, topup_amount_kopeks, topup_created_at in missing_result.all():
             commission_percent = get_effective_referral_commission_percent(referrer)
-            commission_amount = int(first_topup.amount_kopeks * commission_percent / 100)
+            commission_amount = int(topup_amount_kopeks * commission_percent / 100)
             referrer_bonus = max(settings.REFERRAL_INVITER_BONUS_KOPEKS, commission_amount)
 
             missing = MissingBonus(
-                referral_id=referral.id,
-                referral_telegram_id=referral.telegram_id,
-                referral_username=referral.username,
-                referral_full_name=referral.full_name,
+                referral_id=referral_user.id,
+                referral_telegram_id=referral_user.telegram_id,
+                referral_username=referral_user.username,
+                referral_full_name=referral_user.full_name,
                 referrer_id=referrer.id,
                 referrer_telegram_id=referrer.telegram_id,
                 referrer_username=referrer.username,
                 referrer_full_name=referrer.full_name,
-                first_topup_amount_kopeks=first_topup.amount_kopeks,
-                first_topup_date=first_topup.created_at,
+                first_topup_amount_kopeks=topup_amount_kopeks,
+                first_topup_date=topup_created_at,
                 missing_referral_bonus=settings.REFERRAL_FIRST_TOPUP_BONUS_KOPEKS > 0,
                 missing_referrer_bonus=referrer_bonus > 0,
                 referral_bonus_amount=settings.REFERRAL_FIRST_TOPUP_BONUS_KOPEKS,
@@ -0,0 +1,392 @@
+"""Durable inbox for incoming RemnaWave webhooks.
+
+The webhook route only verifies and persists events; a background worker pool
+claims pending rows in batches, collapses redundant events of the same panel
+user and runs them through RemnaWaveWebhookService.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.database.database import AsyncSessionLocal
+from app.database.models import RemnaWaveWebhookEvent
+from app.services.remnawave_webhook_service import RemnaWaveWebhookService
+
+
+logger = structlog.get_logger(__name__)
+
+# Events carrying a full snapshot of the panel user: only the newest one
+# per user in a batch has to be applied.
+COALESCIBLE_EVENTS = frozenset({'user.modified'})
+
+# Rows left in 'processing' longer than this are considered abandoned by a dead worker
+_LOCK_TIMEOUT_SECONDS = 300
+_POLL_INTERVAL_SECONDS = 1.0
+_CLEANUP_INTERVAL_SECONDS = 3600
+_SHUTDOWN_TIMEOUT_SECONDS = 30
+_MAX_ATTEMPTS = 5
+
+
+@dataclass(slots=True)
+class InboxEvent:
+    id: int
+    event_name: str
+    user_key: str | None
+    data: dict = field(default_factory=dict)
+    attempts: int = 0
+
+
+@dataclass(slots=True)
+class _BatchOutcome:
+    processed: list[int] = field(default_factory=list)
+    skipped: list[int] = field(default_factory=list)
+    coalesced: list[int] = field(default_factory=list)
+    retry: list[int] = field(default_factory=list)
+    failed: dict[int, str] = field(default_factory=dict)
+
+
+def get_event_key(raw_body: bytes) -> str:
+    """Replay-detection key: RemnaWave re-sends the very same signed body."""
+    return hashlib.sha256(raw_body).hexdigest()
+
+
+def extract_user_key(data: dict) -> str | None:
+    """Panel user identity used to group events (uuid preferred over telegramId)."""
+    nested_user = data.get('user') if isinstance(data.get('user'), dict) else {}
+
+    uuid = data.get('uuid') or data.get('userUuid') or nested_user.get('uuid')
+    if uuid:
+        return f'uuid:{uuid}'[:100]
+
+    telegram_id = data.get('telegramId') or nested_user.get('telegramId')
+    if telegram_id:
+        return f'tg:{telegram_id}'[:100]
+    return None
+
+
+def coalesce_events(events: list[InboxEvent]) -> tuple[list[list[InboxEvent]], list[int]]:
+    """Split a claimed batch into per-user sequences and drop redundant events.
+
+    Events of one user keep their arrival order. Of several snapshot events
+    (user.modified) only the last survives, and repeated events with an
+    identical payload are applied once. Events without a user key are
+    returned as single-item sequences.
+    """
+    groups: dict[str, list[InboxEvent]] = defaultdict(list)
+    sequences: list[list[InboxEvent]] = []
+    for event in sorted(events, key=lambda item: item.id):
+        if event.user_key is None:
+            sequences.append([event])
+        else:
+            groups[event.user_key].append(event)
+
+    coalesced: list[int] = []
+    for group in groups.values():
+        latest_snapshot: dict[str, int] = {}
+        for event in group:
+            if event.event_name in COALESCIBLE_EVENTS:
+                latest_snapshot[event.event_name] = event.id
+
+        kept: list[InboxEvent] = []
+        seen: list[tuple[str, dict]] = []
+        for event in group:
+            if event.event_name in COALESCIBLE_EVENTS and latest_snapshot[event.event_name] != event.id:
+                coalesced.append(event.id)
+                continue
+            signature = (event.event_name, event.data)
+            if signature in seen:
+                coalesced.append(event.id)
+                continue
+            seen.append(signature)
+            kept.append(event)
+        sequences.append(kept)
+
+    return sequences, coalesced
+
+
+class RemnaWaveWebhookInbox:
+    """Persists RemnaWave webhooks and processes them with a worker pool."""
+
+    def __init__(
+        self,
+        webhook_service: RemnaWaveWebhookService,
+        *,
+        worker_count: int,
+        batch_size: int,
+        retention_hours: int,
+    ) -> None:
+        self._webhook_service = webhook_service
+        self._worker_count = max(1, worker_count)
+        self._batch_size = max(1, batch_size)
+        self._retention = timedelta(hours=max(1, retention_hours))
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._running = False
+        self._last_cleanup = 0.0
+        self._accepted = 0
+        self._duplicates = 0
+        self._processed = 0
+        self._coalesced = 0
+        self._failed = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    async def enqueue(self, raw_body: bytes, event_name: str, data: dict) -> bool:
+        """Persist a verified webhook. Returns False if the same body was already accepted."""
+        async with AsyncSessionLocal() as db:
+            is_postgres = db.bind.dialect.name == 'postgresql'
+            stmt = (pg_insert if is_postgres else sqlite_insert)(RemnaWaveWebhookEvent).values(
+                event_key=get_event_key(raw_body),
+                event_name=event_name[:100],
+                user_key=extract_user_key(data),
+                payload=data,
+                status='pending',
+                attempts=0,
+                received_at=datetime.now(UTC),
+            )
+            result = await db.execute(stmt.on_conflict_do_nothing(index_elements=['event_key']))
+            await db.commit()
+
+        if not result.rowcount:
+            self._duplicates += 1
+            return False
+
+        self._accepted += 1
+        self._wakeup.set()
+        return True
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run(), name='remnawave-webhook-inbox')
+        logger.info('RemnaWave webhook inbox started', worker_count=self._worker_count, batch_size=self._batch_size)
+
+    async def stop(self) -> None:
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        if self._task is not None:
+            # Claimed but unfinished rows are picked up again after the lock timeout
+            try:
+                await asyncio.wait_for(self._task, timeout=_SHUTDOWN_TIMEOUT_SECONDS)
+            except TimeoutError:
+                logger.warning('RemnaWave webhook inbox: batch did not finish before shutdown')
+            self._task = None
+        logger.info('RemnaWave webhook inbox stopped')
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            'running': self._running,
+            'workers': self._worker_count,
+            'accepted': self._accepted,
+            'duplicates': self._duplicates,
+            'processed': self._processed,
+            'coalesced': self._coalesced,
+            'failed': self._failed,
+        }
+
+    async def _run(self) -> None:
+        while self._running:
+            try:
+                events = await self._claim_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('RemnaWave webhook inbox: failed to claim events', error=error)
+                await asyncio.sleep(_POLL_INTERVAL_SECONDS)
+                continue
+
+            if events:
+                await self._process_batch(events)
+                continue
+
+            await self._cleanup_if_due()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=_POLL_INTERVAL_SECONDS)
+            except TimeoutError:
+                pass
+
+    async def _claim_batch(self) -> list[InboxEvent]:
+        now = datetime.now(UTC)
+        model = RemnaWaveWebhookEvent
+        claimable = or_(
+            model.status == 'pending',
+            and_(
+                model.status == 'processing',
+                model.locked_at < now - timedelta(seconds=_LOCK_TIMEOUT_SECONDS),
+            ),
+        )
+        # A row whose worker keeps dying mid-handler would otherwise be reclaimed forever
+        exhaust_stmt = (
+            update(model)
+            .where(claimable, model.attempts >= _MAX_ATTEMPTS)
+            .values(
+                status='failed',
+                processed_at=now,
+                locked_at=None,
+                error_message=f'Abandoned by a worker {_MAX_ATTEMPTS} times',
+            )
+            .execution_options(synchronize_session=False)
+        )
+        candidates = (
+            select(model.id)
+            .where(claimable, model.attempts < _MAX_ATTEMPTS)
+            .order_by(model.id)
+            .limit(self._batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(model)
+            .where(model.id.in_(candidates))
+            .values(status='processing', locked_at=now, attempts=model.attempts + 1)
+            .returning(model.id, model.event_name, model.user_key, model.payload, model.attempts)
+            .execution_options(synchronize_session=False)
+        )
+
+        async with AsyncSessionLocal() as db:
+            exhausted = await db.execute(exhaust_stmt)
+            rows = (await db.execute(stmt)).all()
+            await db.commit()
+
+        if exhausted.rowcount:
+            self._failed += exhausted.rowcount
+            logger.error('RemnaWave webhook inbox: gave up on abandoned events', count=exhausted.rowcount)
+
+        return [
+            InboxEvent(
+                id=row.id,
+                event_name=row.event_name,
+                user_key=row.user_key,
+                data=row.payload if isinstance(row.payload, dict) else {},
+                attempts=row.attempts,
+            )
+            for row in rows
+        ]
+
+    async def _process_batch(self, events: list[InboxEvent]) -> None:
+        sequences, coalesced = coalesce_events(events)
+        outcome = _BatchOutcome(coalesced=coalesced)
+        semaphore = asyncio.Semaphore(self._worker_count)
+
+        async def run_sequence(sequence: list[InboxEvent]) -> None:
+            async with semaphore:
+                await self._process_sequence(sequence, outcome)
+
+        await asyncio.gather(*(run_sequence(sequence) for sequence in sequences if sequence))
+
+        self._processed += len(outcome.processed) + len(outcome.skipped)
+        self._coalesced += len(outcome.coalesced)
+        self._failed += len(outcome.failed)
+        if outcome.coalesced:
+            logger.debug('RemnaWave webhook inbox: coalesced events', count=len(outcome.coalesced))
+
+        try:
+            await self._store_outcome(outcome)
+        except Exception as error:
+            logger.error('RemnaWave webhook inbox: failed to store batch outcome', error=error)
+
+    async def _process_sequence(self, sequence: list[InboxEvent], outcome: _BatchOutcome) -> None:
+        """Apply events of one user in order within a single session."""
+        if self._webhook_service.is_admin_event(sequence[0].event_name):
+            for event in sequence:
+                await self._process_event(None, event, outcome)
+            return
+
+        try:
+            async with AsyncSessionLocal() as db:
+                for event in sequence:
+                    await self._process_event(db, event, outcome)
+        except Exception as error:
+            logger.error('RemnaWave webhook inbox: database session failed', error=error)
+            done = set(outcome.processed) | set(outcome.skipped) | set(outcome.failed)
+            for event in sequence:
+                if event.id in done:
+                    continue
+                if event.attempts >= _MAX_ATTEMPTS:
+                    outcome.failed[event.id] = str(error)[:1000]
+                else:
+                    outcome.retry.append(event.id)
+
+    async def _process_event(self, db, event: InboxEvent, outcome: _BatchOutcome) -> None:
+        try:
+            processed = await self._webhook_service.process_event(db, event.event_name, event.data)
+            if db is not None:
+                await db.commit()
+        except Exception as error:
+            if db is not None:
+                await db.rollback()
+            logger.exception('RemnaWave webhook processing error for event', event_name=event.event_name)
+            outcome.failed[event.id] = str(error)[:1000]
+            return
+
+        (outcome.processed if processed else outcome.skipped).append(event.id)
+
+    async def _store_outcome(self, outcome: _BatchOutcome) -> None:
+        model = RemnaWaveWebhookEvent
+        now = datetime.now(UTC)
+        async with AsyncSessionLocal() as db:
+            for status, ids in (
+                ('processed', outcome.processed + outcome.skipped),
+                ('coalesced', outcome.coalesced),
+            ):
+                if ids:
+                    await db.execute(
+                        update(model)
+                        .where(model.id.in_(ids))
+                        .values(status=status, processed_at=now, locked_at=None)
+                        .execution_options(synchronize_session=False)
+                    )
+            if outcome.retry:
+                await db.execute(
+                    update(model)
+                    .where(model.id.in_(outcome.retry))
+                    .values(status='pending', locked_at=None)
+                    .execution_options(synchronize_session=False)
+                )
+            for event_id, error_message in outcome.failed.items():
+                await db.execute(
+                    update(model)
+                    .where(model.id == event_id)
+                    .values(status='failed', processed_at=now, locked_at=None, error_message=error_message)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+
+    async def _cleanup_if_due(self) -> None:
+        if time.monotonic() - self._last_cleanup < _CLEANUP_INTERVAL_SECONDS:
+            return
+        self._last_cleanup = time.monotonic()
+
+        model = RemnaWaveWebhookEvent
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    delete(model).where(
+                        model.status.in_(('processed', 'coalesced', 'failed')),
+                        model.received_at < datetime.now(UTC) - self._retention,
+                    )
+                )
+                await db.commit()
+        except Exception as error:
+            logger.warning('RemnaWave webhook inbox: cleanup failed', error=error)
+            return
+
+        if result.rowcount:
+            logger.info('RemnaWave webhook inbox: removed old events', count=result.rowcount)
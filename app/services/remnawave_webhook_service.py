@@ -114,6 +114,16 @@ _ADMIN_ERROR_EVENTS: dict[str, str] = {
     'errors.bandwidth_usage_threshold_reached_max_notifications': '⚠️ Достигнут лимит уведомлений о трафике',
 }
 
+# User events whose payload carries the panel traffic counter
+_TRAFFIC_EVENTS = frozenset(
+    {
+        'user.modified',
+        'user.limited',
+        'user.traffic_reset',
+        'user.bandwidth_usage_threshold_reached',
+    }
+)
+
 
 class RemnaWaveWebhookService:
     """Processes incoming webhooks from RemnaWave backend."""
@@ -192,6 +202,8 @@ class RemnaWaveWebhookService:
         user_id = user.id
         try:
             await handler(db, user, subscription, data)
+            if event_name in _TRAFFIC_EVENTS:
+                await self._track_traffic(data)
             return True
         except (StaleDataError, PendingRollbackError):
             logger.warning(
@@ -214,6 +226,15 @@ class RemnaWaveWebhookService:
                 logger.debug('Rollback after webhook handler error also failed')
             return False
 
+    async def _track_traffic(self, data: dict) -> None:
+        """Feed the panel traffic counter to the traffic monitor (replaces per-interval polling)."""
+        from app.services.traffic_monitoring_service import traffic_monitoring_service_v2
+
+        try:
+            await traffic_monitoring_service_v2.track_webhook_event(data, self.bot)
+        except Exception:
+            logger.exception('RemnaWave webhook: traffic tracking failed', uuid=data.get('uuid'))
+
     async def _process_admin_event(self, event_name: str, data: dict) -> bool:
         """Format and send admin notification for infrastructure events."""
         if not self._admin_service.is_enabled:
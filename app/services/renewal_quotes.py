@@ -0,0 +1,155 @@
+"""Batch renewal quotes for autopay and other bulk runs.
+
+``SubscriptionService.calculate_renewal_price`` resolves promo groups,
+discounts, traffic and server prices for one subscription at a time. Here the
+same rules are split in two steps: ``prepare_renewal_quotes`` collects
+everything pricing depends on into an immutable snapshot (one catalog check,
+no per-subscription queries), and ``quote_renewal`` turns a subscription into
+a price with plain arithmetic.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import PERIOD_PRICES, settings
+from app.database.models import PromoGroup, Subscription, User
+from app.services.server_squad_catalog import ServerSquadCatalog, server_squad_catalog
+
+
+@dataclass(frozen=True, slots=True)
+class PromoDiscounts:
+    """Discount percents of one promo group for the quoted period."""
+
+    period: int = 0
+    servers: int = 0
+    traffic: int = 0
+    devices: int = 0
+
+    @classmethod
+    def from_group(cls, group: PromoGroup | None, period_days: int) -> PromoDiscounts:
+        if group is None:
+            return cls()
+        return cls(
+            period=group.get_discount_percent('period', period_days),
+            servers=group.get_discount_percent('servers', period_days),
+            traffic=group.get_discount_percent('traffic', period_days),
+            devices=group.get_discount_percent('devices', period_days),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class RenewalQuoteInput:
+    subscription_id: int
+    connected_squads: tuple[str, ...]
+    device_limit: int | None
+    traffic_limit_gb: int | None
+    promo_group_id: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class RenewalPricingSnapshot:
+    period_days: int
+    base_price: int
+    default_device_limit: int
+    unset_device_limit: int | None
+    price_per_device: int
+    fixed_traffic_gb: int | None
+    traffic_prices: Mapping[int | None, int]
+    discounts: Mapping[int | None, PromoDiscounts]
+    catalog: ServerSquadCatalog = field(repr=False)
+
+
+def _resolve_promo_group(subscription: Subscription, user: User | None) -> PromoGroup | None:
+    if user is None:
+        user = getattr(subscription, 'user', None)
+    return user.get_primary_promo_group() if user else None
+
+
+def _unset_device_limit() -> int | None:
+    """Device limit charged for subscriptions without an explicit one."""
+    if settings.is_devices_selection_enabled():
+        return settings.DEFAULT_DEVICE_LIMIT
+    forced_limit = settings.get_disabled_mode_device_limit()
+    return settings.DEFAULT_DEVICE_LIMIT if forced_limit is None else forced_limit
+
+
+async def prepare_renewal_quotes(
+    db: AsyncSession,
+    subscriptions: Iterable[Subscription],
+    period_days: int,
+    *,
+    catalog: ServerSquadCatalog = server_squad_catalog,
+) -> tuple[RenewalPricingSnapshot, list[RenewalQuoteInput]]:
+    """Build the pricing snapshot and quote inputs for already loaded subscriptions."""
+    await catalog.ensure_fresh(db)
+
+    fixed_traffic_gb = settings.get_fixed_traffic_limit() if settings.is_traffic_fixed() else None
+    discounts: dict[int | None, PromoDiscounts] = {None: PromoDiscounts()}
+    traffic_prices: dict[int | None, int] = {}
+    inputs: list[RenewalQuoteInput] = []
+
+    for subscription in subscriptions:
+        group = _resolve_promo_group(subscription, None)
+        group_id = group.id if group else None
+        if group_id not in discounts:
+            discounts[group_id] = PromoDiscounts.from_group(group, period_days)
+
+        traffic_gb = fixed_traffic_gb if fixed_traffic_gb is not None else subscription.traffic_limit_gb
+        if traffic_gb not in traffic_prices:
+            traffic_prices[traffic_gb] = settings.get_traffic_price(traffic_gb)
+
+        inputs.append(
+            RenewalQuoteInput(
+                subscription_id=subscription.id,
+                connected_squads=tuple(subscription.connected_squads or ()),
+                device_limit=subscription.device_limit,
+                traffic_limit_gb=subscription.traffic_limit_gb,
+                promo_group_id=group_id,
+            )
+        )
+
+    snapshot = RenewalPricingSnapshot(
+        period_days=period_days,
+        base_price=PERIOD_PRICES.get(period_days, 0),
+        default_device_limit=settings.DEFAULT_DEVICE_LIMIT,
+        unset_device_limit=_unset_device_limit(),
+        price_per_device=settings.PRICE_PER_DEVICE,
+        fixed_traffic_gb=fixed_traffic_gb,
+        traffic_prices=traffic_prices,
+        discounts=discounts,
+        catalog=catalog,
+    )
+    return snapshot, inputs
+
+
+def _discounted(price: int, percent: int) -> int:
+    return price - price * percent // 100
+
+
+def quote_renewal(snapshot: RenewalPricingSnapshot, item: RenewalQuoteInput) -> int:
+    """Renewal price of one subscription; mirrors calculate_renewal_price."""
+    discounts = snapshot.discounts.get(item.promo_group_id) or PromoDiscounts()
+
+    servers_price = snapshot.catalog.quote(item.connected_squads, item.promo_group_id).total_kopeks
+
+    device_limit = item.device_limit if item.device_limit is not None else snapshot.unset_device_limit
+    devices_price = max(0, (device_limit or 0) - snapshot.default_device_limit) * snapshot.price_per_device
+
+    traffic_gb = snapshot.fixed_traffic_gb if snapshot.fixed_traffic_gb is not None else item.traffic_limit_gb
+    traffic_price = snapshot.traffic_prices[traffic_gb]
+
+    return (
+        _discounted(snapshot.base_price, discounts.period)
+        + _discounted(servers_price, discounts.servers)
+        + _discounted(devices_price, discounts.devices)
+        + _discounted(traffic_price, discounts.traffic)
+    )
+
+
+def quote_renewals(snapshot: RenewalPricingSnapshot, items: Sequence[RenewalQuoteInput]) -> dict[int, int]:
+    """Renewal prices keyed by subscription id."""
+    return {item.subscription_id: quote_renewal(snapshot, item) for item in items}
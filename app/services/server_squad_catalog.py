@@ -0,0 +1,160 @@
+"""In-process catalog of server squads used for price calculation.
+
+Renewal, autopay, cart and cabinet pricing look up the same handful of
+squads over and over. The catalog keeps a versioned snapshot of the fields
+pricing needs and answers quotes synchronously; it is reloaded after any
+committed change to ``server_squads`` and at least every TTL seconds so other
+replicas pick up admin edits.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import structlog
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import settings
+from app.database.models import ServerSquad
+
+
+logger = structlog.get_logger(__name__)
+
+_SESSION_INFO_KEY = 'server_squad_catalog_invalidate'
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSquad:
+    """Pricing view of a ServerSquad row."""
+
+    id: int
+    squad_uuid: str
+    display_name: str
+    price_kopeks: int
+    is_available: bool
+    is_full: bool
+    allowed_promo_group_ids: frozenset[int]
+
+    def is_sellable(self, promo_group_id: int | None = None) -> bool:
+        if not self.is_available or self.is_full:
+            return False
+        return promo_group_id is None or promo_group_id in self.allowed_promo_group_ids
+
+
+class SquadQuote(NamedTuple):
+    total_kopeks: int
+    prices: list[int]
+    unavailable: list[str]
+
+
+class ServerSquadCatalog:
+    def __init__(self) -> None:
+        self._squads: dict[str, CatalogSquad] = {}
+        self._by_id: dict[int, CatalogSquad] = {}
+        self._version = 0
+        self._loaded_at: float | None = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def is_fresh(self) -> bool:
+        if self._stale or self._loaded_at is None:
+            return False
+        return time.monotonic() - self._loaded_at < settings.SERVER_SQUAD_CATALOG_TTL_SECONDS
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """Reload the snapshot if it was invalidated or expired; otherwise no DB access."""
+        if self.is_fresh():
+            return
+        async with self._lock:
+            if self.is_fresh():
+                return
+            await self._reload(db)
+
+    async def _reload(self, db: AsyncSession) -> None:
+        # Снимаем флаг до запроса: изменение во время загрузки снова пометит снимок устаревшим
+        self._stale = False
+        result = await db.execute(select(ServerSquad).options(selectinload(ServerSquad.allowed_promo_groups)))
+        self._squads = {
+            squad.squad_uuid: CatalogSquad(
+                id=squad.id,
+                squad_uuid=squad.squad_uuid,
+                display_name=squad.display_name,
+                price_kopeks=squad.price_kopeks or 0,
+                is_available=bool(squad.is_available),
+                is_full=squad.is_full,
+                allowed_promo_group_ids=frozenset(group.id for group in squad.allowed_promo_groups),
+            )
+            for squad in result.scalars().unique().all()
+        }
+        self._by_id = {squad.id: squad for squad in self._squads.values()}
+        self._loaded_at = time.monotonic()
+        self._version += 1
+        logger.debug('Каталог серверов обновлён', version=self._version, squads=len(self._squads))
+
+    def get(self, squad_uuid: str) -> CatalogSquad | None:
+        return self._squads.get(squad_uuid)
+
+    def get_by_id(self, squad_id: int) -> CatalogSquad | None:
+        return self._by_id.get(squad_id)
+
+    def quote(self, squad_uuids: Sequence[str], promo_group_id: int | None = None) -> SquadQuote:
+        """Monthly price of the given squads; unavailable ones are priced at zero."""
+        prices: list[int] = []
+        unavailable: list[str] = []
+        for squad_uuid in squad_uuids:
+            squad = self._squads.get(squad_uuid)
+            if squad is not None and squad.is_sellable(promo_group_id):
+                prices.append(squad.price_kopeks)
+            else:
+                prices.append(0)
+                unavailable.append(squad_uuid)
+        return SquadQuote(sum(prices), prices, unavailable)
+
+    def quote_many(self, requests: Iterable[tuple[Sequence[str], int | None]]) -> list[SquadQuote]:
+        """Quote several (squad_uuids, promo_group_id) pairs against one snapshot."""
+        return [self.quote(squad_uuids, promo_group_id) for squad_uuids, promo_group_id in requests]
+
+
+server_squad_catalog = ServerSquadCatalog()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_squad_changes(session: Session, flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ServerSquad):
+            session.info[_SESSION_INFO_KEY] = True
+            return
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_squad_changes(orm_execute_state) -> None:
+    """Bulk UPDATE/DELETE on server_squads (user counters, admin edits) bypass the flush."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None and table.name == ServerSquad.__tablename__:
+        orm_execute_state.session.info[_SESSION_INFO_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session) -> None:
+    if session.info.pop(_SESSION_INFO_KEY, None):
+        server_squad_catalog.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
@@ -0,0 +1,222 @@
+"""Рассылка изменений системных настроек между процессами.
+
+Изменение из админки применяется в текущем процессе сразу, а после коммита
+транзакции публикуется в Redis вместе с номером версии из общего счётчика.
+Остальные реплики бота и веб-API применяют его точечно. Если номер версии
+пропущен (например, процесс терял соединение с Redis), настройки
+перечитываются из БД целиком.
+
+Неудачная публикация повторяется несколько раз. Если Redis так и не ответил,
+следующая публикация (или первая после восстановления подписки) увеличивает
+версию через одну: остальные процессы видят пропуск и перечитывают настройки
+из БД, где изменение уже сохранено.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from dataclasses import asdict, dataclass
+
+import redis.asyncio as redis
+import structlog
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+
+logger = structlog.get_logger(__name__)
+
+CHANNEL = 'system_settings:changes'
+VERSION_KEY = 'system_settings:version'
+
+_SESSION_INFO_KEY = 'system_settings_pending_changes'
+
+# Номер версии выдаётся и публикуется одной командой, чтобы порядок сообщений в канале совпадал с версиями.
+# ARGV[3] = 2 оставляет пропуск в версиях: получатели перечитают настройки из БД
+_PUBLISH_SCRIPT = """
+local version = redis.call('INCRBY', KEYS[1], ARGV[3])
+redis.call('PUBLISH', ARGV[1], version .. '|' .. ARGV[2])
+return version
+"""
+
+_PUBLISH_ATTEMPTS = 3
+_PUBLISH_RETRY_SECONDS = 0.5
+
+
+@dataclass(frozen=True, slots=True)
+class SettingChange:
+    key: str
+    raw_value: str | None
+    reset: bool = False
+
+
+def queue_setting_change(db, change: SettingChange) -> None:
+    """Отложить рассылку изменения до коммита сессии db."""
+    info = getattr(db, 'info', None)
+    if isinstance(info, dict):
+        info.setdefault(_SESSION_INFO_KEY, []).append(change)
+
+
+def parse_message(data: str) -> tuple[int, str, list[SettingChange]]:
+    raw_version, _, body = data.partition('|')
+    payload = json.loads(body)
+    changes = [SettingChange(**item) for item in payload.get('changes', [])]
+    return int(raw_version), payload.get('origin', ''), changes
+
+
+class SettingsBroadcaster:
+    def __init__(self) -> None:
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._redis: redis.Redis | None = None
+        self._pubsub = None
+        self._listener_task: asyncio.Task | None = None
+        self._publish_tasks: set[asyncio.Task] = set()
+        self._version = 0
+        # Изменение не удалось разослать: следующая публикация оставит пропуск в версиях
+        self._resync_pending = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._listener_task is not None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    async def start(self) -> None:
+        if self.is_running or not settings.SETTINGS_BROADCAST_ENABLED:
+            return
+        client = redis.from_url(settings.REDIS_URL)
+        try:
+            await client.ping()
+            self._version = int(await client.get(VERSION_KEY) or 0)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(CHANNEL)
+        except Exception as error:
+            logger.warning('Рассылка настроек недоступна, изменения применяются только локально', error=error)
+            await client.aclose()
+            return
+
+        self._redis = client
+        self._pubsub = pubsub
+        self._listener_task = asyncio.create_task(self._listen(), name='settings-broadcast')
+        logger.info('Рассылка настроек запущена', instance_id=self.instance_id, version=self._version)
+
+    async def stop(self) -> None:
+        if self._publish_tasks:
+            await asyncio.gather(*self._publish_tasks, return_exceptions=True)
+
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception as error:
+                logger.debug('Не удалось закрыть подписку на изменения настроек', error=error)
+            self._pubsub = None
+
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def schedule_publish(self, changes: list[SettingChange]) -> None:
+        if (not changes and not self._resync_pending) or self._redis is None:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self.publish(changes))
+        except RuntimeError:
+            return
+        self._publish_tasks.add(task)
+        task.add_done_callback(self._publish_tasks.discard)
+
+    async def publish(self, changes: list[SettingChange]) -> None:
+        body = json.dumps(
+            {'origin': self.instance_id, 'changes': [asdict(change) for change in changes]},
+            ensure_ascii=False,
+        )
+        keys = [change.key for change in changes]
+        resync = self._resync_pending
+        for attempt in range(1, _PUBLISH_ATTEMPTS + 1):
+            try:
+                version = await self._redis.eval(_PUBLISH_SCRIPT, 1, VERSION_KEY, CHANNEL, body, 2 if resync else 1)
+                break
+            except Exception as error:
+                if attempt == _PUBLISH_ATTEMPTS:
+                    self._resync_pending = True
+                    logger.warning(
+                        'Не удалось разослать изменение настроек, другие процессы перечитают их позже',
+                        keys=keys,
+                        error=error,
+                    )
+                    return
+                await asyncio.sleep(_PUBLISH_RETRY_SECONDS * attempt)
+
+        if resync:
+            self._resync_pending = False
+            logger.info('Пропуск в версиях настроек разослан', version=version)
+        logger.debug('Изменение настроек разослано', version=version, keys=keys)
+
+    async def handle_message(self, data: str) -> None:
+        from app.services.system_settings_service import BotConfigurationService
+
+        version, origin, changes = parse_message(data)
+        if version <= self._version:
+            return
+
+        if version > self._version + 1:
+            logger.info('Пропущены изменения настроек, перечитываем из БД', local=self._version, remote=version)
+            await BotConfigurationService.reload()
+        elif origin != self.instance_id:
+            BotConfigurationService.apply_remote_changes(changes)
+        self._version = version
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('Ошибка чтения канала изменений настроек', error=error)
+                await asyncio.sleep(1)
+                continue
+
+            # Redis снова отвечает: сообщаем о неразосланных изменениях
+            if self._resync_pending and not self._publish_tasks:
+                self.schedule_publish([])
+
+            if not message or message.get('type') != 'message':
+                continue
+
+            data = message['data']
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+
+            try:
+                await self.handle_message(data)
+            except Exception as error:
+                logger.error('Не удалось применить изменение настроек из другого процесса', error=error)
+
+
+settings_broadcaster = SettingsBroadcaster()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_after_commit(session: Session) -> None:
+    changes = session.info.pop(_SESSION_INFO_KEY, None)
+    if changes:
+        settings_broadcaster.schedule_publish(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
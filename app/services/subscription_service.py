@@ -8,6 +8,7 @@ from app.config import settings
 from app.database.crud.user import get_user_by_id
 from app.database.models import PromoGroup, Subscription, SubscriptionStatus, User
 from app.external.remnawave_api import RemnaWaveAPI, RemnaWaveAPIError, RemnaWaveUser, TrafficLimitStrategy, UserStatus
+from app.services.server_squad_catalog import server_squad_catalog
 from app.utils.pricing_utils import (
     calculate_months_from_days,
     get_remaining_months,
@@ -952,41 +953,18 @@ class SubscriptionService:
         promo_group_id: int | None = None,
     ) -> tuple[int, list[int]]:
         try:
-            from app.database.crud.server_squad import get_server_squad_by_uuid
-
-            total_price = 0
-            prices_list = []
-
-            for country_uuid in country_uuids:
-                server = await get_server_squad_by_uuid(db, country_uuid)
-                is_allowed = True
-                if promo_group_id is not None and server:
-                    allowed_ids = {pg.id for pg in server.allowed_promo_groups}
-                    is_allowed = promo_group_id in allowed_ids
-
-                if server and server.is_available and not server.is_full and is_allowed:
-                    price = server.price_kopeks
-                    total_price += price
-                    prices_list.append(price)
-                    logger.debug('🏷️ Страна ₽', display_name=server.display_name, price=price / 100)
-                else:
-                    default_price = 0
-                    total_price += default_price
-                    prices_list.append(default_price)
-                    logger.warning(
-                        '⚠️ Сервер недоступен, используем базовую цену: ₽',
-                        country_uuid=country_uuid,
-                        default_price=default_price / 100,
-                    )
-
-            logger.info('💰 Общая стоимость стран: ₽', total_price=total_price / 100)
-            return total_price, prices_list
-
+            await server_squad_catalog.ensure_fresh(db)
+            quote = server_squad_catalog.quote(country_uuids, promo_group_id)
         except Exception as e:
             logger.error('Ошибка получения цен стран', error=e)
             default_prices = [0] * len(country_uuids)
             return sum(default_prices), default_prices
 
+        if quote.unavailable:
+            logger.warning('⚠️ Серверы недоступны, используем базовую цену 0 ₽', country_uuids=quote.unavailable)
+        logger.debug('💰 Общая стоимость стран: ₽', total_price=quote.total_kopeks / 100)
+        return quote.total_kopeks, quote.prices
+
     async def _get_countries_price(self, country_uuids: list[str], db: AsyncSession) -> int:
         try:
             total_price, _ = await self.get_countries_price_by_uuids(country_uuids, db)
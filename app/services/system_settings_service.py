@@ -20,6 +20,7 @@ from app.database.crud.system_setting import (
 )
 from app.database.database import AsyncSessionLocal
 from app.database.models import SystemSetting
+from app.services.settings_broadcast import SettingChange, queue_setting_change
 from app.services.web_api_token_service import ensure_default_web_api_token
 
 
@@ -248,6 +249,7 @@ class BotConfigurationService:
         'SUPPORT_TICKET_SLA_MINUTES': 'SUPPORT',
         'SUPPORT_TICKET_SLA_CHECK_INTERVAL_SECONDS': 'SUPPORT',
         'SUPPORT_TICKET_SLA_REMINDER_COOLDOWN_MINUTES': 'SUPPORT',
+        'SUPPORT_AUDIT_LOGS_RETENTION_DAYS': 'SUPPORT',
         'ADMIN_NOTIFICATIONS_ENABLED': 'ADMIN_NOTIFICATIONS',
         'ADMIN_NOTIFICATIONS_CHAT_ID': 'ADMIN_NOTIFICATIONS',
         'ADMIN_NOTIFICATIONS_TOPIC_ID': 'ADMIN_NOTIFICATIONS',
@@ -1550,6 +1552,7 @@ class BotConfigurationService:
         else:
             cls._overrides_raw[key] = raw_value
             cls._apply_to_settings(key, value)
+        queue_setting_change(db, SettingChange(key, raw_value))
 
         if key in {'WEB_API_DEFAULT_TOKEN', 'WEB_API_DEFAULT_TOKEN_NAME'}:
             await cls._sync_default_web_api_token()
@@ -1572,10 +1575,35 @@ class BotConfigurationService:
         else:
             original = cls.get_original_value(key)
             cls._apply_to_settings(key, original)
+        queue_setting_change(db, SettingChange(key, None, reset=True))
 
         if key in {'WEB_API_DEFAULT_TOKEN', 'WEB_API_DEFAULT_TOKEN_NAME'}:
             await cls._sync_default_web_api_token()
 
+    @classmethod
+    def apply_remote_changes(cls, changes: list[SettingChange]) -> None:
+        """Применить изменения, сохранённые другим процессом (без записи в БД)."""
+        for change in changes:
+            key = change.key
+            if key not in cls._definitions:
+                continue
+            if cls._is_env_override(key):
+                cls._overrides_raw.pop(key, None)
+                continue
+
+            if change.reset:
+                cls._overrides_raw.pop(key, None)
+                cls._apply_to_settings(key, cls.get_original_value(key))
+                continue
+
+            try:
+                value = cls.deserialize_value(key, change.raw_value)
+            except Exception as error:
+                logger.error('Не удалось применить настройку', key=key, error=error)
+                continue
+            cls._overrides_raw[key] = change.raw_value
+            cls._apply_to_settings(key, value)
+
     @classmethod
     def _apply_to_settings(cls, key: str, value: Any) -> None:
         if cls._is_env_override(key):
@@ -4,6 +4,7 @@
 """
 
 import asyncio
+from array import array
 from dataclasses import dataclass
 from datetime import UTC, datetime, time, timedelta
 
@@ -24,6 +25,8 @@ logger = structlog.get_logger(__name__)
 TRAFFIC_SNAPSHOT_KEY = 'traffic:snapshot'
 TRAFFIC_SNAPSHOT_TIME_KEY = 'traffic:snapshot:time'
 TRAFFIC_NOTIFICATION_CACHE_KEY = 'traffic:notifications'
+# Окно учёта трафика по вебхукам: {bytes, at} на пользователя
+TRAFFIC_LIVE_WINDOW_KEY = 'traffic:live'
 
 
 @dataclass
@@ -59,6 +62,7 @@ class TrafficMonitoringServiceV2:
         self._memory_snapshot: dict[str, float] = {}
         self._memory_snapshot_time: datetime | None = None
         self._memory_notification_cache: dict[str, datetime] = {}
+        self._memory_live_windows: dict[str, tuple[float, datetime]] = {}
 
     # ============== Настройки ==============
 
@@ -75,6 +79,27 @@ class TrafficMonitoringServiceV2:
             return settings.TRAFFIC_MONITORING_INTERVAL_HOURS * 3600
         return settings.TRAFFIC_FAST_CHECK_INTERVAL_MINUTES * 60
 
+    def is_webhook_tracking_enabled(self) -> bool:
+        """Дельта считается по вебхукам панели, опрос всех пользователей — только сверка"""
+        return (
+            self.is_fast_check_enabled()
+            and settings.TRAFFIC_WEBHOOK_TRACKING_ENABLED
+            and settings.is_remnawave_webhook_enabled()
+        )
+
+    def get_poll_interval_seconds(self) -> int:
+        """Интервал полного опроса: при учёте по вебхукам — интервал сверки"""
+        interval = self.get_fast_check_interval_seconds()
+        if self.is_webhook_tracking_enabled():
+            return max(interval, settings.TRAFFIC_RECONCILE_INTERVAL_MINUTES * 60)
+        return interval
+
+    def get_poll_threshold_gb(self) -> float:
+        """Порог дельты для полного опроса, пропорциональный его интервалу"""
+        threshold = self.get_fast_check_threshold_gb()
+        ratio = self.get_poll_interval_seconds() / self.get_fast_check_interval_seconds()
+        return round(threshold * ratio, 2)
+
     def get_fast_check_threshold_gb(self) -> float:
         # Если используется старый параметр — используем старый порог
         if settings.TRAFFIC_MONITORING_ENABLED and not settings.TRAFFIC_FAST_CHECK_ENABLED:
@@ -188,6 +213,37 @@ class TrafficMonitoringServiceV2:
             logger.error('❌ Ошибка получения времени уведомления', error=e)
             return None
 
+    async def _load_live_window(self, user_uuid: str) -> tuple[float, datetime] | None:
+        """Окно учёта по вебхукам (Redis + fallback на память)"""
+        try:
+            data = await cache.get(cache_key(TRAFFIC_LIVE_WINDOW_KEY, user_uuid))
+            if isinstance(data, dict):
+                started_at = datetime.fromisoformat(data['at'])
+                if started_at.tzinfo is None:
+                    started_at = started_at.replace(tzinfo=UTC)
+                return float(data['bytes']), started_at
+        except Exception as e:
+            logger.error('❌ Ошибка загрузки окна трафика из Redis', user_uuid=user_uuid, error=e)
+        return self._memory_live_windows.get(user_uuid)
+
+    async def _save_live_window(self, user_uuid: str, used_bytes: float, started_at: datetime) -> None:
+        """Начинает новое окно учёта с текущего значения счётчика"""
+        ttl = self.get_fast_check_interval_seconds() * 2
+        saved = False
+        try:
+            saved = await cache.set(
+                cache_key(TRAFFIC_LIVE_WINDOW_KEY, user_uuid),
+                {'bytes': used_bytes, 'at': started_at.isoformat()},
+                expire=ttl,
+            )
+        except Exception as e:
+            logger.error('❌ Ошибка сохранения окна трафика в Redis', user_uuid=user_uuid, error=e)
+
+        if saved:
+            self._memory_live_windows.pop(user_uuid, None)
+        else:
+            self._memory_live_windows[user_uuid] = (used_bytes, started_at)
+
     # ============== Работа с нодами ==============
 
     async def _load_nodes_cache(self):
@@ -261,6 +317,11 @@ class TrafficMonitoringServiceV2:
         if expired:
             logger.debug('🧹 Очищено записей из памяти уведомлений о трафике', expired_count=len(expired))
 
+        window_ttl = timedelta(seconds=self.get_fast_check_interval_seconds() * 2)
+        stale_windows = [uuid for uuid, (_, at) in self._memory_live_windows.items() if (now - at) > window_ttl]
+        for uuid in stale_windows:
+            del self._memory_live_windows[uuid]
+
     # ============== Получение пользователей ==============
 
     async def get_all_users_with_traffic(self) -> list[dict]:
@@ -410,6 +471,7 @@ class TrafficMonitoringServiceV2:
 
         start_time = datetime.now(UTC)
         is_first_run = not await self.has_snapshot()
+        threshold_gb = self.get_poll_threshold_gb()
 
         # Загружаем кеш нод для красивых названий в уведомлениях
         await self._load_nodes_cache()
@@ -436,11 +498,11 @@ class TrafficMonitoringServiceV2:
             logger.info(
                 '🚀 Быстрая проверка трафика (snapshot мин назад, порог ГБ)...',
                 age=round(age, 1),
-                get_fast_check_threshold_gb=self.get_fast_check_threshold_gb(),
+                threshold_gb=threshold_gb,
             )
 
         violations: list[TrafficViolation] = []
-        threshold_bytes = self.get_fast_check_threshold_gb() * (1024**3)
+        threshold_bytes = threshold_gb * (1024**3)
 
         users = await self.get_all_users_with_traffic()
         new_snapshot: dict[str, float] = {}
@@ -496,7 +558,7 @@ class TrafficMonitoringServiceV2:
                     '⚠️ Превышение дельты: ... + ГБ (порог ГБ, previous= ГБ, current= ГБ)',
                     uuid=user.uuid[:8],
                     delta_gb=round(delta_gb, 2),
-                    get_fast_check_threshold_gb=self.get_fast_check_threshold_gb(),
+                    threshold_gb=threshold_gb,
                     previous_bytes=round(previous_bytes / 1024**3, 2),
                     current_bytes=round(current_bytes / 1024**3, 2),
                 )
@@ -527,7 +589,7 @@ class TrafficMonitoringServiceV2:
                     full_name=user.username,
                     username=None,
                     used_traffic_gb=delta_gb,  # Это дельта, не общий трафик!
-                    threshold_gb=self.get_fast_check_threshold_gb(),
+                    threshold_gb=threshold_gb,
                     last_node_uuid=last_node_uuid,
                     last_node_name=node_name,
                     check_type='fast',
@@ -562,12 +624,87 @@ class TrafficMonitoringServiceV2:
 
         return violations
 
+    # ============== Учёт по вебхукам ==============
+
+    @staticmethod
+    def _extract_webhook_usage(data: dict) -> tuple[float | None, str | None]:
+        """Достаёт usedTrafficBytes и последнюю ноду из payload (новый и старый формат)"""
+        source = data.get('userTraffic')
+        if not isinstance(source, dict):
+            source = data
+        used_bytes = source.get('usedTrafficBytes')
+        if used_bytes is None:
+            return None, None
+        try:
+            return float(used_bytes), source.get('lastConnectedNodeUuid')
+        except (TypeError, ValueError):
+            return None, None
+
+    async def track_webhook_event(self, data: dict, bot) -> TrafficViolation | None:
+        """
+        Обновляет счётчик пользователя по событию панели и проверяет дельту.
+
+        Дельта считается от начала окна длиной в интервал быстрой проверки;
+        после его истечения или сброса трафика окно начинается заново.
+        """
+        if not self.is_webhook_tracking_enabled():
+            return None
+
+        user_uuid = data.get('uuid')
+        used_bytes, node_uuid = self._extract_webhook_usage(data)
+        if not user_uuid or used_bytes is None:
+            return None
+
+        now = datetime.now(UTC)
+        window = await self._load_live_window(user_uuid)
+        if (
+            window is None
+            or used_bytes < window[0]
+            or (now - window[1]).total_seconds() >= self.get_fast_check_interval_seconds()
+        ):
+            await self._save_live_window(user_uuid, used_bytes, now)
+            return None
+
+        threshold_gb = self.get_fast_check_threshold_gb()
+        delta_bytes = used_bytes - window[0]
+        if delta_bytes < threshold_gb * (1024**3):
+            return None
+
+        if user_uuid.lower() in self.get_excluded_user_uuids():
+            return None
+        if not self.should_monitor_node(node_uuid):
+            return None
+
+        if node_uuid and not self._nodes_cache:
+            await self._load_nodes_cache()
+
+        violation = TrafficViolation(
+            user_uuid=user_uuid,
+            telegram_id=data.get('telegramId'),
+            full_name=data.get('username'),
+            username=None,
+            used_traffic_gb=round(delta_bytes / (1024**3), 2),
+            threshold_gb=threshold_gb,
+            last_node_uuid=node_uuid,
+            last_node_name=self.get_node_name(node_uuid),
+            check_type='fast',
+        )
+        logger.info(
+            '⚠️ Превышение дельты по вебхуку',
+            uuid=user_uuid[:8],
+            delta_gb=violation.used_traffic_gb,
+            threshold_gb=threshold_gb,
+        )
+        await self._send_violation_notifications([violation], bot)
+        return violation
+
     # ============== Суточная проверка ==============
 
     async def run_daily_check(self, bot) -> list[TrafficViolation]:
         """
         Суточная проверка трафика за последние 24 часа
-        Использует bandwidth-stats API
+        Суммы считаются по агрегатам bandwidth-stats нод (запрос на ноду),
+        запросы по каждому пользователю — только если агрегаты недоступны
         """
         if not self.is_daily_check_enabled():
             return []
@@ -586,64 +723,36 @@ class TrafficMonitoringServiceV2:
         start_date = (now - timedelta(hours=24)).strftime('%Y-%m-%d')
         end_date = now.strftime('%Y-%m-%d')
 
-        users = await self.get_all_users_with_traffic()
-        semaphore = asyncio.Semaphore(self.get_concurrency())
-
-        async def check_user_daily_traffic(user) -> TrafficViolation | None:
-            async with semaphore:
-                try:
-                    if not user.uuid:
-                        return None
+        users = [user for user in await self.get_all_users_with_traffic() if user.uuid]
 
-                    # Получаем статистику за период
-                    async with self.remnawave_service.get_api_client() as api:
-                        stats = await api.get_bandwidth_stats_user(user.uuid, start_date, end_date)
+        totals = await self._collect_daily_totals_by_nodes(users, start_date, end_date)
+        if totals is None:
+            logger.warning('⚠️ Агрегаты по нодам недоступны, суточная проверка по каждому пользователю')
+            totals = await self._collect_daily_totals_per_user(users, start_date, end_date)
 
-                    if not stats:
-                        return None
+        # Один проход по массиву сумм вместо отдельной проверки на каждого пользователя
+        exceeded = [i for i, total in enumerate(totals) if total >= threshold_bytes]
 
-                    # Суммируем трафик по нодам
-                    total_bytes = 0
-                    if isinstance(stats, list):
-                        for item in stats:
-                            total_bytes += item.get('total', 0)
-                    elif isinstance(stats, dict):
-                        total_bytes = stats.get('total', 0)
-
-                    if total_bytes < threshold_bytes:
-                        return None
-
-                    # Проверяем фильтр по нодам
-                    user_traffic = user.user_traffic
-                    last_node_uuid = user_traffic.last_connected_node_uuid if user_traffic else None
-                    if not self.should_monitor_node(last_node_uuid):
-                        return None
-
-                    used_gb = round(total_bytes / (1024**3), 2)
-                    node_name = self.get_node_name(last_node_uuid)
-                    return TrafficViolation(
-                        user_uuid=user.uuid,
-                        telegram_id=user.telegram_id,
-                        full_name=user.username,
-                        username=None,
-                        used_traffic_gb=used_gb,
-                        threshold_gb=self.get_daily_threshold_gb(),
-                        last_node_uuid=last_node_uuid,
-                        last_node_name=node_name,
-                        check_type='daily',
-                    )
-
-                except Exception as e:
-                    logger.error('❌ Ошибка суточной проверки для', uuid=user.uuid, error=e)
-                    return None
-
-        # Параллельная проверка
-        tasks = [check_user_daily_traffic(user) for user in users if user.uuid]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for i in exceeded:
+            user = users[i]
+            user_traffic = user.user_traffic
+            last_node_uuid = user_traffic.last_connected_node_uuid if user_traffic else None
+            if not self.should_monitor_node(last_node_uuid):
+                continue
 
-        for result in results:
-            if isinstance(result, TrafficViolation):
-                violations.append(result)
+            violations.append(
+                TrafficViolation(
+                    user_uuid=user.uuid,
+                    telegram_id=user.telegram_id,
+                    full_name=user.username,
+                    username=None,
+                    used_traffic_gb=round(totals[i] / (1024**3), 2),
+                    threshold_gb=self.get_daily_threshold_gb(),
+                    last_node_uuid=last_node_uuid,
+                    last_node_name=self.get_node_name(last_node_uuid),
+                    check_type='daily',
+                )
+            )
 
         elapsed = (datetime.now(UTC) - start_time).total_seconds()
         logger.info(
@@ -658,6 +767,65 @@ class TrafficMonitoringServiceV2:
 
         return violations
 
+    async def _collect_daily_totals_by_nodes(self, users: list, start_date: str, end_date: str) -> array | None:
+        """
+        Суммы трафика за период по агрегатам нод: один запрос на ноду.
+        Возвращает массив, выровненный по списку users, или None при ошибке любой ноды.
+        """
+        index = {user.uuid: i for i, user in enumerate(users)}
+        totals = array('d', bytes(8 * len(users)))
+        semaphore = asyncio.Semaphore(self.get_concurrency())
+
+        try:
+            async with self.remnawave_service.get_api_client() as api:
+                nodes = await api.get_all_nodes()
+
+                async def fetch_node_users(node) -> list:
+                    async with semaphore:
+                        return await api.get_bandwidth_stats_node_users_legacy(node.uuid, start_date, end_date)
+
+                results = await asyncio.gather(*(fetch_node_users(node) for node in nodes))
+        except Exception as e:
+            logger.error('❌ Ошибка получения трафика по нодам', error=e)
+            return None
+
+        # Legacy-ответ: [{userUuid, nodeUuid, total, date}, ...]
+        for entries in results:
+            if not isinstance(entries, list):
+                return None
+            for entry in entries:
+                i = index.get(entry.get('userUuid'))
+                if i is not None:
+                    totals[i] += entry.get('total', 0) or 0
+
+        logger.info('📊 Суточный трафик собран по нодам', nodes_count=len(nodes), users_count=len(users))
+        return totals
+
+    async def _collect_daily_totals_per_user(self, users: list, start_date: str, end_date: str) -> array:
+        """Запасной путь: статистика каждого пользователя отдельным запросом"""
+        totals = array('d', bytes(8 * len(users)))
+        semaphore = asyncio.Semaphore(self.get_concurrency())
+
+        async with self.remnawave_service.get_api_client() as api:
+
+            async def fetch_user_total(i: int, user) -> None:
+                async with semaphore:
+                    try:
+                        stats = await api.get_bandwidth_stats_user(user.uuid, start_date, end_date)
+                    except Exception as e:
+                        logger.error('❌ Ошибка суточной проверки для', uuid=user.uuid, error=e)
+                        return
+
+                    # Суммируем трафик по нодам
+                    if isinstance(stats, list):
+                        totals[i] = sum(item.get('total', 0) for item in stats)
+                    elif isinstance(stats, dict):
+                        totals[i] = stats.get('total', 0)
+
+            await asyncio.gather(*(fetch_user_total(i, user) for i, user in enumerate(users)))
+
+        return totals
+
     # ============== Уведомления ==============
 
     async def _send_violation_notifications(self, violations: list[TrafficViolation], bot):
@@ -780,10 +948,14 @@ class TrafficMonitoringSchedulerV2:
         if self.service.is_fast_check_enabled():
             await self.service.create_initial_snapshot()
 
-        # Запускаем быструю проверку
+        # Запускаем быструю проверку (при учёте по вебхукам — редкую сверку)
         if self.service.is_fast_check_enabled():
-            interval = self.service.get_fast_check_interval_seconds()
-            logger.info('🚀 Запуск быстрой проверки трафика каждые мин', value=interval // 60)
+            interval = self.service.get_poll_interval_seconds()
+            logger.info(
+                '🚀 Запуск быстрой проверки трафика каждые мин',
+                value=interval // 60,
+                webhook_tracking=self.service.is_webhook_tracking_enabled(),
+            )
             self._fast_check_task = asyncio.create_task(self._run_fast_check_loop(interval))
 
         # Запускаем суточную проверку
@@ -968,7 +1140,13 @@ class TrafficMonitoringScheduler:
         if self._v2_service.is_fast_check_enabled():
             interval_min = self._v2_service.get_fast_check_interval_seconds() // 60
             threshold = self._v2_service.get_fast_check_threshold_gb()
-            info.append(f'Быстрая: каждые {interval_min} мин, порог {threshold} ГБ')
+            if self._v2_service.is_webhook_tracking_enabled():
+                reconcile_min = self._v2_service.get_poll_interval_seconds() // 60
+                info.append(
+                    f'Быстрая: по вебхукам, окно {interval_min} мин, порог {threshold} ГБ, сверка каждые {reconcile_min} мин'
+                )
+            else:
+                info.append(f'Быстрая: каждые {interval_min} мин, порог {threshold} ГБ')
         if self._v2_service.is_daily_check_enabled():
             check_time = self._v2_service.get_daily_check_time()
             threshold = self._v2_service.get_daily_threshold_gb()
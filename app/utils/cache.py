@@ -6,16 +6,26 @@ import redis.asyncio as redis
 import structlog
 
 from app.config import settings
+from app.utils.metrics import CACHE_REQUESTS, metrics
 
 
 logger = structlog.get_logger(__name__)
 
 
+def _key_prefix(key: str) -> str:
+    """Первая часть ключа до двоеточия — метка метрики без идентификаторов."""
+    return key.split(':', 1)[0]
+
+
 class CacheService:
     def __init__(self):
         self.redis_client: redis.Redis | None = None
         self._connected = False
 
+    @property
+    def is_connected(self) -> bool:
+        return self._connected and self.redis_client is not None
+
     async def connect(self):
         try:
             self.redis_client = redis.from_url(settings.REDIS_URL)
@@ -37,10 +47,12 @@ class CacheService:
 
         try:
             value = await self.redis_client.get(key)
-            if value:
-                return json.loads(value)
-            return None
+            if metrics.enabled:
+                CACHE_REQUESTS.inc(_key_prefix(key), 'hit' if value else 'miss')
+            return json.loads(value) if value else None
         except Exception as e:
+            if metrics.enabled:
+                CACHE_REQUESTS.inc(_key_prefix(key), 'error')
             logger.error('Ошибка получения из кеша', key=key, error=e)
             return None
 
@@ -201,6 +213,19 @@ class CacheService:
             logger.error('Ошибка добавления в очередь', key=key, error=e)
             return False
 
+    async def rpush(self, key: str, value: Any) -> bool:
+        """Вернуть элемент в конец списка: следующий rpop заберёт его первым."""
+        if not self._connected:
+            return False
+
+        try:
+            serialized = json.dumps(value, default=str)
+            await self.redis_client.rpush(key, serialized)
+            return True
+        except Exception as e:
+            logger.error('Ошибка возврата в очередь', key=key, error=e)
+            return False
+
     async def rpop(self, key: str) -> Any | None:
         """Извлечь элемент из конца списка (FIFO очередь)."""
         if not self._connected:
@@ -1,61 +1,297 @@
-"""Кастомные хэндлеры для системы логирования с ротацией.
+"""Кастомные хэндлеры для системы логирования.
 
 Модуль предоставляет:
-- LevelFilterHandler: фильтрация логов по диапазону уровней
+- QueueLogHandler: неблокирующая постановка записей в ограниченную очередь
+- QueueLogListener: фоновый поток, который пишет записи из очереди в приёмники
+- LogSink: приёмник (файл или консоль) с диапазоном уровней и фильтрами
 - PaymentLogFilter: перехват логов из платежных модулей
 - ExcludePaymentFilter: исключение платежей из основных логов
 """
 
 from __future__ import annotations
 
+import copy
 import logging
+import queue
+import shutil
+import sys
+import threading
+import traceback
+from collections.abc import Sequence
+from dataclasses import dataclass
+from logging.handlers import QueueHandler
+from pathlib import Path
+from typing import Any, TextIO
 
 
-class LevelFilterHandler(logging.Handler):
-    """Хэндлер, фильтрующий логи по диапазону уровней.
+# Сигнал остановки фонового потока
+_STOP = object()
+
+
+class QueueLogHandler(QueueHandler):
+    """Хэндлер, который только ставит запись в очередь и не ждёт записи на диск.
+
+    Очередь ограничена: при переполнении запись отбрасывается и учитывается
+    в счётчике, поток вызывающего кода никогда не блокируется на логировании.
+
+    Процессоры structlog для записей stdlib (contextvars, время, уведомления
+    в Telegram) выполняются здесь, в потоке вызывающего кода: в фоновом
+    потоке нет ни контекста запроса, ни event loop. Итоговый рендеринг
+    делает QueueLogListener.
+
+    Args:
+        log_queue: Очередь записей (queue.Queue с maxsize)
+        pre_chain: foreign_pre_chain из ProcessorFormatter (app/logging_config.py)
+    """
+
+    def __init__(self, log_queue: queue.Queue, pre_chain: Sequence[Any] | None = None):
+        super().__init__(log_queue)
+        self._pre_chain = tuple(pre_chain or ())
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Поставить запись в очередь, при переполнении — отбросить и посчитать."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+
+    def take_dropped(self) -> int:
+        """Вернуть число отброшенных записей с прошлого вызова и обнулить счётчик."""
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        return dropped
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Подготовить запись к передаче в другой поток без рендеринга текста."""
+        record = copy.copy(record)
+
+        if isinstance(record.msg, dict) and hasattr(record, '_logger'):
+            # Запись structlog: процессоры уже выполнены, осталось зафиксировать исключение
+            if record.msg.get('exc_info') is True:
+                record.msg = {**record.msg, 'exc_info': sys.exc_info()}
+            return record
+
+        method_name = record.levelname.lower()
+        event_dict: dict[str, Any] = {
+            'event': record.getMessage(),
+            '_record': record,
+            '_from_structlog': False,
+        }
+        if record.exc_info:
+            event_dict['exc_info'] = record.exc_info
+        if record.stack_info:
+            event_dict['stack_info'] = record.stack_info
+
+        for processor in self._pre_chain:
+            event_dict = processor(None, method_name, event_dict)
+
+        event_dict.pop('_record', None)
+        event_dict.pop('_from_structlog', None)
+
+        # С _logger/_name ProcessorFormatter считает запись уже обработанной
+        # и применяет только финальные процессоры
+        record.msg = event_dict
+        record.args = ()
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        record._logger = None
+        record._name = method_name
+        return record
+
+
+@dataclass(eq=False)
+class LogSink:
+    """Приёмник записей для QueueLogListener.
+
+    Файловые приёмники открываются и переоткрываются слушателем (в т.ч. при
+    ротации), поток (stream) используется как есть.
 
     Используется для разделения логов:
     - info.log: только INFO (min_level=INFO, max_level=INFO)
     - warning.log: WARNING и выше (min_level=WARNING)
     - error.log: ERROR и CRITICAL (min_level=ERROR)
+    """
+
+    formatter: logging.Formatter
+    path: Path | None = None
+    stream: TextIO | None = None
+    min_level: int = logging.NOTSET
+    max_level: int = logging.CRITICAL
+    filters: tuple[logging.Filter, ...] = ()
+
+    def accepts(self, record: logging.LogRecord) -> bool:
+        """Проверить уровень и фильтры приёмника."""
+        if not self.min_level <= record.levelno <= self.max_level:
+            return False
+        return all(log_filter.filter(record) for log_filter in self.filters)
+
+    def open(self) -> None:
+        if self.path is not None and self.stream is None:
+            self.stream = self.path.open('a', encoding='utf-8')
+
+    def close(self) -> None:
+        if self.path is not None and self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+class QueueLogListener:
+    """Фоновый поток, разбирающий очередь QueueLogHandler пачками.
+
+    Каждая запись рендерится один раз на форматтер (файловые приёмники
+    используют общий текст), после пачки приёмники сбрасываются на диск
+    один раз. Запись пачки и ротация файлов выполняются под одной
+    блокировкой, поэтому ротация не теряет и не разрывает записи.
 
     Args:
-        filename: Путь к файлу лога
-        min_level: Минимальный уровень логирования
-        max_level: Максимальный уровень (по умолчанию CRITICAL)
-        encoding: Кодировка файла
+        log_queue: Очередь, в которую пишет handler
+        handler: QueueLogHandler (источник счётчика отброшенных записей)
+        sinks: Приёмники записей
+        batch_size: Максимум записей, обрабатываемых за один сброс
     """
 
     def __init__(
         self,
-        filename: str,
-        min_level: int,
-        max_level: int | None = None,
-        encoding: str = 'utf-8',
+        log_queue: queue.Queue,
+        handler: QueueLogHandler,
+        sinks: Sequence[LogSink],
+        batch_size: int = 256,
     ):
-        super().__init__(level=min_level)
-        self.min_level = min_level
-        self.max_level = max_level if max_level is not None else logging.CRITICAL
-        self._file_handler = logging.FileHandler(filename, encoding=encoding)
+        self._queue = log_queue
+        self._handler = handler
+        self._sinks = list(sinks)
+        self._batch_size = max(1, batch_size)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.records_written = 0
+        self.records_dropped = 0
 
-    def emit(self, record: logging.LogRecord) -> None:
-        """Записать лог только если уровень в заданном диапазоне."""
-        if self.min_level <= record.levelno <= self.max_level:
-            self._file_handler.emit(record)
+    def start(self) -> None:
+        """Открыть файлы и запустить фоновый поток."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            for sink in self._sinks:
+                sink.open()
+        self._thread = threading.Thread(target=self._run, name='log-queue-listener', daemon=True)
+        self._thread.start()
 
-    def setFormatter(self, fmt: logging.Formatter) -> None:
-        """Установить форматтер для внутреннего хэндлера."""
-        super().setFormatter(fmt)
-        self._file_handler.setFormatter(fmt)
-
-    def close(self) -> None:
-        """Закрыть файловый хэндлер."""
-        self._file_handler.close()
-        super().close()
+    def stop(self) -> None:
+        """Дописать оставшиеся записи, остановить поток и закрыть файлы."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+        self._thread = None
+        with self._lock:
+            for sink in self._sinks:
+                sink.close()
 
     def flush(self) -> None:
-        """Сбросить буфер файлового хэндлера."""
-        self._file_handler.flush()
+        """Дождаться записи всего, что уже стоит в очереди."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def detach_files(self, suffix: str) -> dict[Path, Path]:
+        """Отцепить файлы приёмников для архивации.
+
+        Непустой файл переименовывается в <имя><suffix>, на его месте сразу
+        открывается пустой. Если такой файл остался от неудачной ротации,
+        новое содержимое дописывается в него.
+
+        Returns:
+            Словарь {путь к логу: путь к отцепленному файлу}
+        """
+        detached: dict[Path, Path] = {}
+        with self._lock:
+            for sink in self._sinks:
+                if sink.path is None:
+                    continue
+                target = sink.path.with_name(sink.path.name + suffix)
+                has_data = sink.path.exists() and sink.path.stat().st_size > 0
+                if not has_data and not target.exists():
+                    continue
+
+                sink.close()
+                try:
+                    if has_data and target.exists():
+                        with sink.path.open('rb') as source, target.open('ab') as destination:
+                            shutil.copyfileobj(source, destination)
+                        sink.path.unlink()
+                    elif has_data:
+                        sink.path.replace(target)
+                finally:
+                    sink.open()
+                detached[sink.path] = target
+        return detached
+
+    def _run(self) -> None:
+        log_queue = self._queue
+        stopping = False
+        while True:
+            try:
+                item = log_queue.get(block=not stopping)
+            except queue.Empty:
+                return
+            batch = [item]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = [item for item in batch if item is not _STOP]
+            stopping = stopping or len(records) != len(batch)
+            self._write_batch(records)
+            for _ in batch:
+                log_queue.task_done()
+
+    def _write_batch(self, records: list[logging.LogRecord]) -> None:
+        dropped = self._handler.take_dropped()
+        if dropped:
+            self.records_dropped += dropped
+            records.append(self._dropped_record(dropped))
+
+        with self._lock:
+            touched: set[int] = set()
+            for record in records:
+                rendered: dict[int, str] = {}
+                for position, sink in enumerate(self._sinks):
+                    if sink.stream is None or not sink.accepts(record):
+                        continue
+                    try:
+                        text = rendered.get(id(sink.formatter))
+                        if text is None:
+                            text = sink.formatter.format(record) + '\n'
+                            rendered[id(sink.formatter)] = text
+                        sink.stream.write(text)
+                        touched.add(position)
+                    except Exception:
+                        traceback.print_exc(file=sys.stderr)
+
+            for position in touched:
+                try:
+                    self._sinks[position].stream.flush()
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+            self.records_written += len(records)
+
+    def _dropped_record(self, dropped: int) -> logging.LogRecord:
+        record = logging.LogRecord(
+            __name__,
+            logging.WARNING,
+            __file__,
+            0,
+            'Очередь логов переполнена, пропущено записей: %s',
+            (dropped,),
+            None,
+        )
+        return self._handler.prepare(record)
 
 
 class PaymentLogFilter(logging.Filter):
@@ -0,0 +1,261 @@
+"""Чтение системного лог-файла без загрузки его целиком в память.
+
+Предпросмотр читает только хвост файла, поиск идёт потоком по строкам.
+Чтобы поиск по времени не начинался с начала файла, для каждого файла
+держится разреженный индекс «время записи → смещение в байтах»: контрольная
+точка ставится примерно через каждые INDEX_STEP_BYTES байт, индекс
+дополняется только дописанной частью файла и сбрасывается при ротации.
+Тот же индекс считает символы в проиндексированной части файла.
+
+Все функции синхронные, из async-кода их вызывают через пул потоков.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import re
+import threading
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+
+# Строка записи: "2025-01-10 12:00:00 [warning] [app.module] текст" (см. app/logging_config.py)
+_HEADER_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \[(\w+)\](?: \[([^\]\s]+)\])?')
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+INDEX_STEP_BYTES = 256 * 1024
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# UTF-8 символ занимает не больше 4 байт
+_MAX_CHAR_BYTES = 4
+# Байты продолжения UTF-8 (10xxxxxx) не начинают новый символ
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+@dataclass(slots=True)
+class LogTail:
+    text: str
+    size_bytes: int
+    size_chars: int
+    mtime: float
+    truncated: bool
+
+
+@dataclass(slots=True)
+class LogRecord:
+    offset: int
+    timestamp: datetime | None
+    level: str | None
+    logger: str | None
+    text: str
+
+
+@dataclass(slots=True)
+class LogSearchResult:
+    items: list[LogRecord]
+    next_cursor: int | None
+    size_bytes: int
+
+
+@dataclass(slots=True)
+class _SparseIndex:
+    identity: tuple[int, int]
+    timestamps: list[datetime] = field(default_factory=list)
+    offsets: list[int] = field(default_factory=list)
+    indexed_until: int = 0
+    indexed_chars: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def update(self, handle, size: int) -> None:
+        """Дописать контрольные точки для части файла после indexed_until."""
+        next_checkpoint = self.offsets[-1] + INDEX_STEP_BYTES if self.offsets else 0
+        handle.seek(self.indexed_until)
+        offset = self.indexed_until
+        while offset < size:
+            line = handle.readline()
+            if not line.endswith(b'\n'):
+                break  # незавершённая строка — допишется позже
+            if offset >= next_checkpoint:
+                timestamp = _parse_header(line)[0]
+                if timestamp is not None:
+                    self.timestamps.append(timestamp)
+                    self.offsets.append(offset)
+                    next_checkpoint = offset + INDEX_STEP_BYTES
+            offset += len(line)
+            self.indexed_chars += _count_chars(line)
+        self.indexed_until = offset
+
+    def start_offset(self, since: datetime) -> int:
+        """Смещение последней контрольной точки строго раньше since."""
+        position = bisect.bisect_left(self.timestamps, since)
+        return self.offsets[position - 1] if position else 0
+
+
+_indexes: dict[str, _SparseIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _count_chars(data: bytes) -> int:
+    return len(data.translate(None, _CONTINUATION_BYTES))
+
+
+def _parse_header(line: bytes) -> tuple[datetime | None, str | None, str | None]:
+    match = _HEADER_RE.match(line[:160].decode('utf-8', errors='ignore'))
+    if not match:
+        return None, None, None
+    try:
+        timestamp = datetime.strptime(match.group(1), _TIMESTAMP_FORMAT)
+    except ValueError:
+        return None, None, None
+    return timestamp, match.group(2).lower(), match.group(3)
+
+
+def _get_index(path: Path, stat: os.stat_result) -> _SparseIndex:
+    key = str(path)
+    identity = (stat.st_dev, stat.st_ino)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.identity != identity or stat.st_size < index.indexed_until:
+            index = _SparseIndex(identity)
+            _indexes[key] = index
+        return index
+
+
+def _indexed_offset(handle, path: Path, stat: os.stat_result, since: datetime) -> int:
+    index = _get_index(path, stat)
+    with index.lock:
+        index.update(handle, stat.st_size)
+        return index.start_offset(since)
+
+
+def find_offset(path: Path, since: datetime) -> int:
+    """Смещение, начиная с которого в файле лежат все записи не раньше since (по индексу)."""
+    with path.open('rb') as handle:
+        stat = os.fstat(handle.fileno())
+        return _indexed_offset(handle, path, stat, since)
+
+
+def read_tail(path: Path, max_chars: int) -> LogTail:
+    """Последние max_chars символов файла: читается только хвост от конца файла.
+
+    Число символов во всём файле берётся из индекса, который дочитывает
+    только дописанную с прошлого раза часть.
+    """
+    with path.open('rb') as handle:
+        stat = os.fstat(handle.fileno())
+        index = _get_index(path, stat)
+        with index.lock:
+            index.update(handle, stat.st_size)
+            handle.seek(index.indexed_until)
+            unindexed = handle.read(max(0, stat.st_size - index.indexed_until))
+            size_chars = index.indexed_chars + _count_chars(unindexed)
+        start = max(0, stat.st_size - max_chars * _MAX_CHAR_BYTES)
+        handle.seek(start)
+        data = handle.read(stat.st_size - start)
+
+    text = data.decode('utf-8', errors='ignore')
+    preview = text[-max_chars:] if max_chars > 0 else ''
+    return LogTail(
+        text=preview,
+        size_bytes=stat.st_size,
+        size_chars=size_chars,
+        mtime=stat.st_mtime,
+        truncated=start > 0 or len(text) > len(preview),
+    )
+
+
+def _iter_records(handle, start: int, size: int) -> Iterator[tuple[LogRecord, int]]:
+    """Записи с продолжениями (трейсбеки и т.п.) и смещение конца каждой записи."""
+    handle.seek(start)
+    offset = start
+    record: LogRecord | None = None
+    lines: list[bytes] = []
+
+    while offset < size:
+        line = handle.readline()
+        if not line:
+            break
+        timestamp, level, logger_name = _parse_header(line)
+        if timestamp is not None or record is None:
+            if record is not None:
+                record.text = b''.join(lines).decode('utf-8', errors='ignore').rstrip('\n')
+                yield record, offset
+            record = LogRecord(offset=offset, timestamp=timestamp, level=level, logger=logger_name, text='')
+            lines = []
+        lines.append(line)
+        offset += len(line)
+
+    if record is not None:
+        record.text = b''.join(lines).decode('utf-8', errors='ignore').rstrip('\n')
+        yield record, offset
+
+
+def search_log(
+    path: Path,
+    *,
+    levels: set[str] | None = None,
+    logger_prefix: str | None = None,
+    text: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: int | None = None,
+    limit: int = 100,
+) -> LogSearchResult:
+    """
+    Найти записи по фильтрам, от старых к новым.
+
+    since/until сравниваются с временем записей в логе (часовой пояс TIMEZONE,
+    без tzinfo). next_cursor — смещение, с которого продолжать следующую страницу.
+    """
+    needle = text.lower() if text else None
+
+    with path.open('rb') as handle:
+        stat = os.fstat(handle.fileno())
+        size = stat.st_size
+
+        if cursor is not None:
+            start = min(cursor, size)
+        elif since is not None:
+            start = _indexed_offset(handle, path, stat, since)
+        else:
+            start = 0
+
+        items: list[LogRecord] = []
+        next_cursor: int | None = None
+        for record, end_offset in _iter_records(handle, start, size):
+            if since is not None or until is not None:
+                if record.timestamp is None:
+                    continue
+                if until is not None and record.timestamp > until:
+                    break
+                if since is not None and record.timestamp < since:
+                    continue
+            if levels and record.level not in levels:
+                continue
+            if logger_prefix and not (record.logger or '').startswith(logger_prefix):
+                continue
+            if needle and needle not in record.text.lower():
+                continue
+
+            items.append(record)
+            if len(items) >= limit:
+                if end_offset < size:
+                    next_cursor = end_offset
+                break
+
+    return LogSearchResult(items=items, next_cursor=next_cursor, size_bytes=size)
+
+
+def iter_gzip(path: Path) -> Iterator[bytes]:
+    """Содержимое файла, сжатое gzip на лету, порциями по DOWNLOAD_CHUNK_BYTES."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    with path.open('rb') as handle:
+        while chunk := handle.read(DOWNLOAD_CHUNK_BYTES):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+    yield compressor.flush()
@@ -0,0 +1,244 @@
+"""Метрики горячих путей в текстовом формате Prometheus.
+
+Счётчики и гистограммы объявлены здесь же, ниже реестра, и обновляются в
+местах вызова: middleware бота, HTTP-маршруты, запросы к RemnaWave API,
+соединения пула БД, кеш Redis, рассылки, проведение платежей, фоновые циклы.
+Значения, которые и так хранятся в объектах (пул БД, очереди webhook-ов),
+снимаются колбэками только при запросе /metrics.
+
+При METRICS_ENABLED=false inc/observe возвращаются сразу, обёртки middleware
+и слушатели пула не подключаются, а маршрут /metrics не монтируется.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Sequence
+
+import structlog
+
+from app.config import settings
+
+
+logger = structlog.get_logger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LONG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+GaugeCallback = Callable[[], Iterable[tuple[Sequence[str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, labelnames: Sequence[str]) -> None:
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _header(self) -> list[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not self._registry.enabled or amount <= 0:
+            return
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class _HistogramState:
+    __slots__ = ('bucket_counts', 'count', 'sum')
+
+    def __init__(self, size: int) -> None:
+        self.bucket_counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple[str, ...], _HistogramState] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not self._registry.enabled:
+            return
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = _HistogramState(len(self.buckets) + 1)
+        # Последняя ячейка — значения больше верхней границы (+Inf)
+        state.bucket_counts[bisect_left(self.buckets, value)] += 1
+        state.count += 1
+        state.sum += value
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return state.count if state else 0
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, state in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float('inf')), state.bucket_counts, strict=True):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(state.sum)}')
+            lines.append(f'{self.name}_count{label_text} {state.count}')
+        return lines
+
+
+class _CallbackGauge(_Metric):
+    type_name = 'gauge'
+
+    def __init__(self, *args, callback: GaugeCallback, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._callback = callback
+
+    def render(self) -> list[str]:
+        try:
+            samples = list(self._callback())
+        except Exception as error:
+            logger.warning('Не удалось снять метрику', metric=self.name, error=error)
+            return []
+
+        lines = self._header()
+        for labels, value in samples:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса."""
+
+    def __init__(self, *, enabled: bool) -> None:
+        self.enabled = enabled
+        self._metrics: dict[str, _Metric] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(self, name, documentation, labelnames)
+        self._add(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(self, name, documentation, labelnames, buckets=buckets)
+        self._add(metric)
+        return metric
+
+    def gauge_callback(self, name: str, documentation: str, labelnames: Sequence[str], callback: GaugeCallback) -> None:
+        """Gauge, значения которого возвращает callback при каждом запросе /metrics.
+
+        Повторная регистрация с тем же именем заменяет callback.
+        """
+        self._metrics[name] = _CallbackGauge(self, name, documentation, labelnames, callback=callback)
+
+    def _add(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+UPDATE_DURATION = metrics.histogram(
+    'bot_update_duration_seconds', 'Обработка update диспетчером aiogram', ('event_type', 'status')
+)
+MIDDLEWARE_DURATION = metrics.histogram(
+    'bot_middleware_duration_seconds',
+    'Собственное время middleware без вложенных middleware и обработчика',
+    ('middleware', 'event_type'),
+)
+HTTP_REQUEST_DURATION = metrics.histogram(
+    'bot_http_request_duration_seconds', 'HTTP-запросы к единому веб-серверу', ('method', 'route', 'status')
+)
+REMNAWAVE_REQUEST_DURATION = metrics.histogram(
+    'bot_remnawave_request_duration_seconds',
+    'Запросы к RemnaWave API вместе с повторами',
+    ('method', 'endpoint', 'status'),
+)
+DB_CONNECTION_HOLD = metrics.histogram(
+    'bot_db_connection_hold_seconds', 'Время от выдачи соединения из пула БД до его возврата'
+)
+CACHE_REQUESTS = metrics.counter('bot_cache_requests_total', 'Чтения из кеша Redis', ('prefix', 'result'))
+BROADCAST_MESSAGES = metrics.counter('bot_broadcast_messages_total', 'Сообщения рассылок', ('channel', 'result'))
+PAYMENT_SETTLE_DURATION = metrics.histogram(
+    'bot_payment_settle_seconds',
+    'От получения платёжного callback-а до его проведения или отклонения',
+    ('provider', 'result'),
+    buckets=LONG_BUCKETS,
+)
+BACKGROUND_CYCLE_DURATION = metrics.histogram(
+    'bot_background_cycle_duration_seconds', 'Циклы фоновых сервисов', ('service', 'status'), buckets=LONG_BUCKETS
+)
+
+
+_ENDPOINT_WORD_RE = re.compile(r'^[a-z]+(?:-[a-z]+)*$')
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """Путь API без идентификаторов: /api/users/<uuid>/actions/enable -> /api/users/{id}/actions/enable."""
+    segments = []
+    previous = ''
+    for segment in endpoint.split('?', 1)[0].split('/'):
+        if segment and (not _ENDPOINT_WORD_RE.match(segment) or previous.startswith('by-') or previous == 'sub'):
+            segment = '{id}'
+        segments.append(segment)
+        previous = segment
+    return '/'.join(segments)
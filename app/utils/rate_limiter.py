@@ -0,0 +1,221 @@
+"""Ограничение частоты запросов скользящим окном.
+
+Политика (RateLimitPolicy) задаёт, сколько событий допускается за окно;
+ключом служит пользователь, email или любой другой идентификатор. По
+умолчанию окна хранятся в памяти процесса, давно не использованные ключи
+вытесняются. При RATE_LIMIT_BACKEND=redis окна хранятся в Redis и
+проверяются атомарным Lua-скриптом, поэтому лимит общий для всех реплик.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Literal, NamedTuple
+
+import redis.asyncio as redis
+import structlog
+
+from app.config import settings
+
+
+logger = structlog.get_logger(__name__)
+
+Mode = Literal['hit', 'record', 'peek']
+
+# За один вызов проверяется не больше стольких самых старых ключей на истечение окна
+_EVICTION_BATCH = 4
+
+_SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local mode = ARGV[3]
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+local allowed = count < limit
+local retry_after = 0
+if not allowed then
+    local oldest = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+    retry_after = tonumber(oldest[2]) + window - now
+end
+
+if mode == 'record' or (mode == 'hit' and allowed) then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('ZREMRANGEBYRANK', key, 0, -(limit + 1))
+    count = math.min(count + 1, limit)
+end
+if count > 0 then
+    redis.call('PEXPIRE', key, window)
+end
+return {allowed and 1 or 0, count, retry_after}
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitPolicy:
+    name: str
+    limit: int
+    window_seconds: float
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    count: int
+    retry_after: int  # секунд до освобождения места в окне, 0 если событие разрешено
+
+
+# Общие политики: один и тот же ключ расходует общий лимит в боте, кабинете и мини-приложении
+PROMO_FAILED_ATTEMPTS = RateLimitPolicy('promo_failed', limit=5, window_seconds=300)
+PROMO_ACTIVATIONS = RateLimitPolicy('promo_activations', limit=5, window_seconds=86400)
+# Неудачные входы считаются по паре email + IP, чтобы чужие попытки не блокировали владельца,
+# и отдельно по IP — против перебора многих email с одного адреса
+CABINET_LOGIN_FAILURES = RateLimitPolicy('cabinet_login_failed', limit=10, window_seconds=900)
+CABINET_LOGIN_IP_FAILURES = RateLimitPolicy('cabinet_login_ip_failed', limit=50, window_seconds=900)
+CABINET_PASSWORD_RESET = RateLimitPolicy('cabinet_password_reset', limit=3, window_seconds=3600)
+
+
+def _retry_seconds(value: float) -> int:
+    return max(1, math.ceil(value)) if value > 0 else 1
+
+
+class MemoryRateLimitBackend:
+    """Окна в памяти процесса: не больше limit меток на ключ и не больше max_keys ключей."""
+
+    def __init__(self, max_keys: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self._max_keys = max(1, max_keys)
+        self._clock = clock
+        self._windows: OrderedDict[str, tuple[float, deque[float]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    async def apply(self, policy: RateLimitPolicy, key: str, mode: Mode) -> RateLimitResult:
+        now = self._clock()
+        entry = self._windows.get(key)
+        stamps: deque[float] = entry[1] if entry else deque(maxlen=policy.limit)
+        if entry is not None:
+            self._windows.move_to_end(key)
+        cutoff = now - policy.window_seconds
+        while stamps and stamps[0] <= cutoff:
+            stamps.popleft()
+
+        count = len(stamps)
+        allowed = count < policy.limit
+        retry_after = 0 if allowed else _retry_seconds(stamps[0] + policy.window_seconds - now)
+
+        if mode == 'record' or (mode == 'hit' and allowed):
+            stamps.append(now)
+            count = len(stamps)
+            if entry is None:
+                self._windows[key] = (policy.window_seconds, stamps)
+            self._evict(now)
+
+        return RateLimitResult(allowed, count, retry_after)
+
+    async def reset(self, key: str) -> None:
+        self._windows.pop(key, None)
+
+    def _evict(self, now: float) -> None:
+        windows = self._windows
+        while len(windows) > self._max_keys:
+            windows.popitem(last=False)
+        for _ in range(_EVICTION_BATCH):
+            if not windows:
+                return
+            oldest_key = next(iter(windows))
+            window_seconds, stamps = windows[oldest_key]
+            if stamps and stamps[-1] > now - window_seconds:
+                return
+            del windows[oldest_key]
+
+
+class RedisRateLimitBackend:
+    """Окна в sorted set-ах Redis, проверка и запись одним скриптом."""
+
+    KEY_PREFIX = 'ratelimit:'
+
+    def __init__(self, redis_url: str) -> None:
+        self._redis = redis.from_url(redis_url)
+        self._script = self._redis.register_script(_SLIDING_WINDOW_SCRIPT)
+
+    async def apply(self, policy: RateLimitPolicy, key: str, mode: Mode) -> RateLimitResult:
+        allowed, count, retry_after_ms = await self._script(
+            keys=[f'{self.KEY_PREFIX}{key}'],
+            args=[math.ceil(policy.window_seconds * 1000), policy.limit, mode, uuid.uuid4().hex],
+        )
+        allowed = bool(allowed)
+        retry_after = 0 if allowed else _retry_seconds(int(retry_after_ms) / 1000)
+        return RateLimitResult(allowed, int(count), retry_after)
+
+    async def reset(self, key: str) -> None:
+        await self._redis.delete(f'{self.KEY_PREFIX}{key}')
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class RateLimiter:
+    """Точка входа для всех ограничителей; при ошибке Redis работает по памяти процесса."""
+
+    def __init__(self) -> None:
+        self._memory: MemoryRateLimitBackend | None = None
+        self._redis: RedisRateLimitBackend | None = None
+
+    @property
+    def memory(self) -> MemoryRateLimitBackend:
+        if self._memory is None:
+            self._memory = MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+        return self._memory
+
+    def _use_redis(self) -> bool:
+        return settings.RATE_LIMIT_BACKEND.lower() == 'redis'
+
+    async def _apply(self, policy: RateLimitPolicy, key: object, mode: Mode) -> RateLimitResult:
+        bucket_key = f'{policy.name}:{key}'
+        if self._use_redis():
+            try:
+                if self._redis is None:
+                    self._redis = RedisRateLimitBackend(settings.REDIS_URL)
+                return await self._redis.apply(policy, bucket_key, mode)
+            except Exception as error:
+                logger.warning(
+                    'Rate limit: Redis недоступен, используем лимит процесса', policy=policy.name, error=error
+                )
+        return await self.memory.apply(policy, bucket_key, mode)
+
+    async def hit(self, policy: RateLimitPolicy, key: object) -> RateLimitResult:
+        """Засчитать событие, если лимит не исчерпан."""
+        return await self._apply(policy, key, 'hit')
+
+    async def record(self, policy: RateLimitPolicy, key: object) -> RateLimitResult:
+        """Засчитать событие без проверки (например, неудачную попытку)."""
+        return await self._apply(policy, key, 'record')
+
+    async def peek(self, policy: RateLimitPolicy, key: object) -> RateLimitResult:
+        """Проверить лимит, не засчитывая событие."""
+        return await self._apply(policy, key, 'peek')
+
+    async def reset(self, policy: RateLimitPolicy, key: object) -> None:
+        bucket_key = f'{policy.name}:{key}'
+        await self.memory.reset(bucket_key)
+        if self._redis is not None:
+            try:
+                await self._redis.reset(bucket_key)
+            except Exception as error:
+                logger.warning('Rate limit: не удалось сбросить окно в Redis', policy=policy.name, error=error)
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+rate_limiter = RateLimiter()
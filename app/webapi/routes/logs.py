@@ -9,12 +9,14 @@ from typing import Any
 import structlog
 from fastapi import APIRouter, Depends, HTTPException, Query, Security
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.crud.ticket import TicketCRUD
 from app.services.monitoring_service import monitoring_service
+from app.utils.log_reader import iter_gzip, read_tail, search_log
+from app.utils.timezone import get_local_timezone
 
 from ..dependencies import get_db_session, require_api_token
 from ..schemas.logs import (
@@ -26,6 +28,8 @@ from ..schemas.logs import (
     SupportAuditLogListResponse,
     SystemLogFullResponse,
     SystemLogPreviewResponse,
+    SystemLogRecord,
+    SystemLogSearchResponse,
 )
 
 
@@ -36,6 +40,7 @@ logger = structlog.get_logger(__name__)
 
 SYSTEM_LOG_PREVIEW_LIMIT_DEFAULT = 4000
 SYSTEM_LOG_PREVIEW_LIMIT_MAX = 20000
+SYSTEM_LOG_SEARCH_LIMIT_MAX = 500
 
 
 def _resolve_system_log_path() -> Path:
@@ -54,6 +59,13 @@ async def _read_system_log(path: Path) -> tuple[str, int, float | None]:
     return await run_in_threadpool(_read)
 
 
+def _to_log_time(value: datetime | None) -> datetime | None:
+    """Время в записях лога локальное и без tzinfo — приводим фильтр к нему."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(get_local_timezone()).replace(tzinfo=None)
+
+
 def _format_timestamp(timestamp: float | None) -> datetime | None:
     if timestamp is None:
         return None
@@ -88,7 +100,7 @@ async def get_system_log_preview(
         )
 
     try:
-        content, size_bytes, mtime = await _read_system_log(log_path)
+        tail = await run_in_threadpool(read_tail, log_path, preview_limit)
     except FileNotFoundError:
         logger.warning('Лог-файл исчез во время чтения', log_path=log_path)
         return SystemLogPreviewResponse(
@@ -106,33 +118,97 @@ async def get_system_log_preview(
         logger.error('Ошибка чтения лог-файла', log_path=log_path, error=error)
         raise HTTPException(status_code=500, detail='Не удалось прочитать лог-файл') from error
 
-    preview_text = content[-preview_limit:] if preview_limit > 0 else ''
-    truncated = len(content) > len(preview_text)
-
     return SystemLogPreviewResponse(
         path=str(log_path),
         exists=True,
-        updated_at=_format_timestamp(mtime),
-        size_bytes=size_bytes,
-        size_chars=len(content),
-        preview=preview_text,
-        preview_chars=len(preview_text),
-        preview_truncated=truncated,
+        updated_at=_format_timestamp(tail.mtime),
+        size_bytes=tail.size_bytes,
+        size_chars=tail.size_chars,
+        preview=tail.text,
+        preview_chars=len(tail.text),
+        preview_truncated=tail.truncated,
         download_url='/logs/system/download',
     )
 
 
+@router.get('/system/search', response_model=SystemLogSearchResponse)
+async def search_system_log(
+    _: Any = Security(require_api_token),
+    level: list[str] | None = Query(default=None, description='Уровни записей (info, warning, error...)'),
+    logger_name: str | None = Query(
+        default=None,
+        alias='logger',
+        max_length=200,
+        description='Префикс имени логгера, например app.services',
+    ),
+    text: str | None = Query(default=None, max_length=500, description='Подстрока текста записи'),
+    since: datetime | None = Query(default=None, description='Записи не раньше этого времени'),
+    until: datetime | None = Query(default=None, description='Записи не позже этого времени'),
+    cursor: int | None = Query(default=None, ge=0, description='next_cursor предыдущей страницы'),
+    limit: int = Query(100, ge=1, le=SYSTEM_LOG_SEARCH_LIMIT_MAX),
+) -> SystemLogSearchResponse:
+    """Поиск по системному лог-файлу с фильтрами и постраничной выдачей."""
+
+    log_path = _resolve_system_log_path()
+
+    if not log_path.exists() or not log_path.is_file():
+        raise HTTPException(status_code=404, detail='Лог-файл не найден')
+
+    try:
+        result = await run_in_threadpool(
+            lambda: search_log(
+                log_path,
+                levels={item.lower() for item in level} if level else None,
+                logger_prefix=logger_name,
+                text=text,
+                since=_to_log_time(since),
+                until=_to_log_time(until),
+                cursor=cursor,
+                limit=limit,
+            )
+        )
+    except FileNotFoundError as error:
+        raise HTTPException(status_code=404, detail='Лог-файл не найден') from error
+    except Exception as error:  # pragma: no cover - защита от неожиданных ошибок чтения
+        logger.error('Ошибка поиска по лог-файлу', log_path=log_path, error=error)
+        raise HTTPException(status_code=500, detail='Не удалось прочитать лог-файл') from error
+
+    return SystemLogSearchResponse(
+        path=str(log_path),
+        size_bytes=result.size_bytes,
+        items=[
+            SystemLogRecord(
+                offset=record.offset,
+                timestamp=record.timestamp,
+                level=record.level,
+                logger=record.logger,
+                text=record.text,
+            )
+            for record in result.items
+        ],
+        next_cursor=result.next_cursor,
+    )
+
+
 @router.get('/system/download')
 async def download_system_log(
     _: Any = Security(require_api_token),
-) -> FileResponse:
-    """Скачать полный лог-файл бота."""
+    compress: bool = Query(False, description='Отдать файл сжатым gzip'),
+) -> Response:
+    """Скачать полный лог-файл бота (поддерживает Range-запросы или сжатие на лету)."""
 
     log_path = _resolve_system_log_path()
 
     if not log_path.exists() or not log_path.is_file():
         raise HTTPException(status_code=404, detail='Лог-файл не найден')
 
+    if compress:
+        return StreamingResponse(
+            iter_gzip(log_path),
+            media_type='application/gzip',
+            headers={'Content-Disposition': f'attachment; filename="{log_path.name}.gz"'},
+        )
+
     try:
         return FileResponse(
             log_path,
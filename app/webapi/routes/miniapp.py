@@ -99,6 +99,7 @@ from app.utils.pricing_utils import (
     get_remaining_months,
 )
 from app.utils.promo_offer import get_user_active_promo_discount_percent
+from app.utils.promo_rate_limiter import promo_limiter
 from app.utils.subscription_utils import get_happ_cryptolink_redirect_link
 from app.utils.telegram_webapp import (
     TelegramWebAppAuthError,
@@ -4117,8 +4118,22 @@ async def activate_promo_code(
             detail={'code': 'invalid', 'message': 'Promo code must not be empty'},
         )
 
+    # Лимиты общие с ботом: ключом служит Telegram ID
+    cooldown = await promo_limiter.get_block_cooldown(telegram_id)
+    if cooldown:
+        raise HTTPException(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={'code': 'rate_limited', 'message': f'Too many attempts, try again in {cooldown} seconds'},
+        )
+    if not await promo_limiter.can_activate(telegram_id):
+        raise HTTPException(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={'code': 'daily_limit', 'message': 'Daily promo code activation limit reached'},
+        )
+
     result = await promo_code_service.activate_promocode(db, user.id, code)
     if result.get('success'):
+        await promo_limiter.record_activation(telegram_id)
         promocode_data = result.get('promocode') or {}
 
         try:
@@ -4148,6 +4163,8 @@ async def activate_promo_code(
         )
 
     error_code = str(result.get('error') or 'generic')
+    if error_code == 'not_found':
+        await promo_limiter.record_failed_attempt(telegram_id)
     status_map = {
         'user_not_found': status.HTTP_404_NOT_FOUND,
         'not_found': status.HTTP_404_NOT_FOUND,
@@ -89,6 +89,28 @@ class SystemLogPreviewResponse(BaseModel):
     )
 
 
+class SystemLogRecord(BaseModel):
+    """Запись системного лога с продолжением (трейсбек и т.п.)."""
+
+    offset: int = Field(..., ge=0, description='Смещение начала записи в байтах')
+    timestamp: datetime | None = Field(default=None, description='Время записи в часовом поясе бота')
+    level: str | None = None
+    logger: str | None = None
+    text: str
+
+
+class SystemLogSearchResponse(BaseModel):
+    """Страница результатов поиска по системному логу."""
+
+    path: str
+    size_bytes: int = Field(..., ge=0)
+    items: list[SystemLogRecord]
+    next_cursor: int | None = Field(
+        default=None,
+        description='Значение cursor для следующей страницы, null если записей больше нет',
+    )
+
+
 class SystemLogFullResponse(BaseModel):
     """Полное содержимое системного лог-файла."""
 
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import hmac
+import time
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.utils.metrics import CONTENT_TYPE, HTTP_REQUEST_DURATION, metrics
+
+from .telegram import TelegramWebhookProcessor
+
+
+class HTTPMetricsMiddleware:
+    """ASGI-middleware: длительность HTTP-запросов по шаблону маршрута и коду ответа."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Шаблон пути, а не сам путь: идентификаторы не попадают в метки
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, scope['method'], route, str(status_code))
+
+
+def register_webhook_queue_metrics(processor: TelegramWebhookProcessor) -> None:
+    def queue_depth_samples():
+        return [((str(shard['shard']),), shard['depth']) for shard in processor.get_stats()['shards']]
+
+    metrics.gauge_callback(
+        'bot_telegram_webhook_queue_depth',
+        'Обновления Telegram в очереди шарда webhook-процессора',
+        ('shard',),
+        queue_depth_samples,
+    )
+
+
+def create_metrics_router() -> APIRouter:
+    router = APIRouter()
+
+    @router.get('/metrics', include_in_schema=False)
+    async def metrics_endpoint(authorization: str | None = Header(default=None)) -> Response:
+        # Без токена метрики не отдаются: в них пути, очереди и объёмы платежей
+        token = settings.METRICS_TOKEN
+        if not token or not hmac.compare_digest(authorization or '', f'Bearer {token}'):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid metrics token')
+        return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
+    return router
@@ -20,6 +20,7 @@ from app.external.tribute import TributeService as TributeAPI
 from app.external.wata_webhook import WataWebhookHandler
 from app.services.pal24_service import Pal24Service
 from app.services.payment_service import PaymentService
+from app.services.payment_webhook_inbox import PaymentWebhookInbox
 from app.services.tribute_service import TributeService
 
 
@@ -149,6 +150,26 @@ async def _process_payment_service_callback(
             pass
 
 
+async def _enqueue_payment_callback(
+    inbox: PaymentWebhookInbox | None,
+    provider: str,
+    payload: dict,
+    method_name: str,
+) -> bool:
+    """Сохранить callback в очередь. False - очередь недоступна, обработать сразу."""
+    if inbox is None or not inbox.is_running:
+        return False
+
+    try:
+        await inbox.enqueue(provider, method_name, payload)
+    except Exception as error:
+        logger.warning(
+            'Не удалось сохранить платёжный callback в очередь, обрабатываем сразу', provider=provider, error=error
+        )
+        return False
+    return True
+
+
 async def _parse_pal24_payload(request: Request) -> dict[str, str]:
     try:
         if request.headers.get('content-type', '').startswith('application/json'):
@@ -174,7 +195,11 @@ async def _parse_pal24_payload(request: Request) -> dict[str, str]:
     return {}
 
 
-def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRouter | None:
+def create_payment_router(
+    bot: Bot,
+    payment_service: PaymentService,
+    inbox: PaymentWebhookInbox | None = None,
+) -> APIRouter | None:
     router = APIRouter()
     routes_registered = False
 
@@ -265,6 +290,9 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                     status_code=status.HTTP_400_BAD_REQUEST,
                 )
 
+            if await _enqueue_payment_callback(inbox, 'mulenpay', payload, 'process_mulenpay_callback'):
+                return JSONResponse({'status': 'ok'})
+
             try:
                 success = await _process_payment_service_callback(
                     payment_service,
@@ -328,6 +356,9 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                         status_code=status.HTTP_401_UNAUTHORIZED,
                     )
 
+            if await _enqueue_payment_callback(inbox, 'cryptobot', payload, 'process_cryptobot_webhook'):
+                return JSONResponse({'status': 'ok'})
+
             try:
                 success = await _process_payment_service_callback(
                     payment_service,
@@ -444,6 +475,9 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
             }:
                 return JSONResponse({'status': 'ok', 'ignored': event_type})
 
+            if await _enqueue_payment_callback(inbox, 'yookassa', webhook_data, 'process_yookassa_webhook'):
+                return JSONResponse({'status': 'ok'})
+
             try:
                 success = await _process_payment_service_callback(
                     payment_service,
@@ -515,6 +549,9 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                     status_code=status.HTTP_400_BAD_REQUEST,
                 )
 
+            if await _enqueue_payment_callback(inbox, 'wata', payload, 'process_wata_webhook'):
+                return JSONResponse({'status': 'ok'})
+
             try:
                 success = await _process_payment_service_callback(
                     payment_service,
@@ -579,6 +616,9 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                     status_code=status.HTTP_401_UNAUTHORIZED,
                 )
 
+            if await _enqueue_payment_callback(inbox, 'heleket', payload, 'process_heleket_webhook'):
+                return JSONResponse({'status': 'ok'})
+
             try:
                 success = await _process_payment_service_callback(
                     payment_service,
@@ -650,6 +690,9 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                     status_code=status.HTTP_400_BAD_REQUEST,
                 )
 
+            if await _enqueue_payment_callback(inbox, 'pal24', parsed_payload, 'process_pal24_callback'):
+                return JSONResponse({'status': 'ok'})
+
             try:
                 success = await _process_payment_service_callback(
                     payment_service,
@@ -704,6 +747,9 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                     status_code=status.HTTP_400_BAD_REQUEST,
                 )
 
+            if await _enqueue_payment_callback(inbox, 'platega', payload, 'process_platega_webhook'):
+                return JSONResponse({'status': 'ok'})
+
             try:
                 success = await _process_payment_service_callback(
                     payment_service,
@@ -816,11 +862,14 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 return JSONResponse({'code': 0})  # Возвращаем 0, чтобы не было повторов
 
             # Обрабатываем платёж
-            await _process_payment_service_callback(
-                payment_service,
-                webhook_data,
-                'process_cloudpayments_pay_webhook',
-            )
+            if not await _enqueue_payment_callback(
+                inbox, 'cloudpayments', webhook_data, 'process_cloudpayments_pay_webhook'
+            ):
+                await _process_payment_service_callback(
+                    payment_service,
+                    webhook_data,
+                    'process_cloudpayments_pay_webhook',
+                )
 
             return JSONResponse({'code': 0})
 
@@ -848,11 +897,14 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 return JSONResponse({'code': 0})
 
             # Обрабатываем неуспешный платёж
-            await _process_payment_service_callback(
-                payment_service,
-                webhook_data,
-                'process_cloudpayments_fail_webhook',
-            )
+            if not await _enqueue_payment_callback(
+                inbox, 'cloudpayments', webhook_data, 'process_cloudpayments_fail_webhook'
+            ):
+                await _process_payment_service_callback(
+                    payment_service,
+                    webhook_data,
+                    'process_cloudpayments_fail_webhook',
+                )
 
             return JSONResponse({'code': 0})
 
@@ -900,11 +952,14 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
 
                 if status_value in ('Declined', 'Cancelled'):
                     # Неуспешная оплата (Fail notification)
-                    await _process_payment_service_callback(
-                        payment_service,
-                        webhook_data,
-                        'process_cloudpayments_fail_webhook',
-                    )
+                    if not await _enqueue_payment_callback(
+                        inbox, 'cloudpayments', webhook_data, 'process_cloudpayments_fail_webhook'
+                    ):
+                        await _process_payment_service_callback(
+                            payment_service,
+                            webhook_data,
+                            'process_cloudpayments_fail_webhook',
+                        )
                 elif status_value in ('Completed', 'Authorized') and is_pay_notification:
                     # Успешная оплата (Pay notification) - есть Reason или AuthCode
                     logger.info(
@@ -913,11 +968,14 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                         reason=reason,
                         auth_code=auth_code,
                     )
-                    await _process_payment_service_callback(
-                        payment_service,
-                        webhook_data,
-                        'process_cloudpayments_pay_webhook',
-                    )
+                    if not await _enqueue_payment_callback(
+                        inbox, 'cloudpayments', webhook_data, 'process_cloudpayments_pay_webhook'
+                    ):
+                        await _process_payment_service_callback(
+                            payment_service,
+                            webhook_data,
+                            'process_cloudpayments_pay_webhook',
+                        )
                 else:
                     # Check notification или другой тип - просто разрешаем (code=0)
                     # Check приходит ДО оплаты для валидации, не зачисляем баланс
@@ -1126,6 +1184,7 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                     'cloudpayments_enabled': settings.is_cloudpayments_enabled(),
                     'freekassa_enabled': settings.is_freekassa_enabled(),
                     'kassa_ai_enabled': settings.is_kassa_ai_enabled(),
+                    'inbox': inbox.get_stats() if inbox is not None else None,
                 }
             )
 
@@ -1,8 +1,8 @@
 """
 FastAPI router for receiving incoming webhooks from RemnaWave backend.
 
-Handles HMAC-SHA256 signature verification, payload parsing, and
-event dispatch to RemnaWaveWebhookService.
+Handles HMAC-SHA256 signature verification and payload parsing, then
+persists the event to the inbox processed by RemnaWaveWebhookInbox.
 """
 
 from __future__ import annotations
@@ -12,13 +12,11 @@ import hmac
 import json
 
 import structlog
-from aiogram import Bot
 from fastapi import APIRouter, Request, status
 from fastapi.responses import JSONResponse
 
 from app.config import settings
-from app.database.database import AsyncSessionLocal
-from app.services.remnawave_webhook_service import RemnaWaveWebhookService
+from app.services.remnawave_webhook_inbox import RemnaWaveWebhookInbox
 
 
 logger = structlog.get_logger(__name__)
@@ -33,9 +31,8 @@ def _verify_signature(raw_body: bytes, received_signature: str, secret: str) ->
     return hmac.compare_digest(expected, received_signature)
 
 
-def create_remnawave_webhook_router(bot: Bot) -> APIRouter:
+def create_remnawave_webhook_router(inbox: RemnaWaveWebhookInbox) -> APIRouter:
     router = APIRouter()
-    webhook_service = RemnaWaveWebhookService(bot)
     webhook_path = settings.REMNAWAVE_WEBHOOK_PATH
 
     @router.get(webhook_path)
@@ -117,33 +114,17 @@ def create_remnawave_webhook_router(bot: Bot) -> APIRouter:
         event_name = event
         logger.info('RemnaWave webhook received: scope event', scope=scope, event_name=event_name)
 
-        # Process event — return 200 to prevent retries for application-level errors.
-        # Only return non-200 for infrastructure failures (DB unavailable).
-        # Admin events (node/service/crm) don't need a DB session.
-        if webhook_service.is_admin_event(event_name):
-            try:
-                processed = await webhook_service.process_event(None, event_name, data)
-                return JSONResponse({'status': 'ok', 'processed': processed})
-            except Exception:
-                logger.exception('RemnaWave webhook processing error for event', event_name=event_name)
-                return JSONResponse({'status': 'ok', 'processed': False})
-
-        # User events require a DB session
+        # Only persist here: the inbox worker applies events in the background.
+        # Non-200 is returned only for infrastructure failures so RemnaWave retries.
         try:
-            async with AsyncSessionLocal() as db:
-                try:
-                    processed = await webhook_service.process_event(db, event_name, data)
-                    await db.commit()
-                    return JSONResponse({'status': 'ok', 'processed': processed})
-                except Exception:
-                    await db.rollback()
-                    logger.exception('RemnaWave webhook processing error for event', event_name=event_name)
-                    return JSONResponse({'status': 'ok', 'processed': False})
+            accepted = await inbox.enqueue(raw_body, event_name, data)
         except Exception:
-            logger.error('RemnaWave webhook: failed to get database session')
+            logger.exception('RemnaWave webhook: failed to persist event', event_name=event_name)
             return JSONResponse(
                 {'status': 'error', 'reason': 'database_unavailable'},
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
 
+        return JSONResponse({'status': 'ok', 'queued': accepted, 'duplicate': not accepted})
+
     return router
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any
+import time
+from typing import TYPE_CHECKING, Any
 
 import structlog
 from aiogram import Bot, Dispatcher
 from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
 from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.responses import JSONResponse
 
 from app.config import settings
 
 
+if TYPE_CHECKING:
+    from .telegram_stream import TelegramStreamIngress
+
+
 logger = structlog.get_logger(__name__)
 
 
@@ -27,8 +33,66 @@ class TelegramWebhookOverloadedError(TelegramWebhookProcessorError):
     """Очередь переполнена и не успевает обрабатывать новые обновления."""
 
 
+def _jump_consistent_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash: при изменении числа шардов переезжает минимум ключей."""
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def get_update_partition_key(update: Update) -> int:
+    """Ключ упорядочивания update: чат, а если его нет — пользователь.
+
+    Обновления без чата и пользователя раскладываются по update_id.
+    """
+    try:
+        event = update.event
+    except UpdateTypeLookupError:
+        event = None
+
+    if event is not None:
+        chat = getattr(event, 'chat', None)
+        if chat is None:
+            message = getattr(event, 'message', None)
+            chat = getattr(message, 'chat', None) if message is not None else None
+        if chat is not None:
+            return chat.id
+
+        user = getattr(event, 'from_user', None) or getattr(event, 'user', None)
+        if user is not None:
+            return user.id
+
+    return update.update_id
+
+
+class _UpdateShard:
+    """Очередь одного шарда и её счётчики."""
+
+    __slots__ = ('index', 'last_hot_warning', 'max_depth', 'processed', 'queue')
+
+    def __init__(self, index: int, maxsize: int) -> None:
+        self.index = index
+        self.queue: asyncio.Queue[Update | object] = asyncio.Queue(maxsize=maxsize)
+        self.processed = 0
+        self.max_depth = 0
+        self.last_hot_warning = 0.0
+
+
 class TelegramWebhookProcessor:
-    """Асинхронная очередь обработки Telegram webhook-ов."""
+    """Асинхронная обработка Telegram webhook-ов по шардам.
+
+    Обновления распределяются по шардам по ключу чата (consistent hashing),
+    у каждого шарда своя очередь и свой воркер. Обновления одного чата
+    обрабатываются строго по порядку, а медленный обработчик задерживает
+    только свой шард.
+    """
+
+    HOT_SHARD_FILL_RATIO = 0.75
+    HOT_SHARD_WARNING_INTERVAL = 30.0
 
     def __init__(
         self,
@@ -44,9 +108,12 @@ class TelegramWebhookProcessor:
         self._dispatcher = dispatcher
         self._queue_maxsize = max(1, queue_maxsize)
         self._worker_count = max(0, worker_count)
+        self._shard_count = max(1, self._worker_count)
+        # Общая ёмкость делится между шардами
+        self._shard_maxsize = max(1, -(-self._queue_maxsize // self._shard_count))
         self._enqueue_timeout = max(0.0, enqueue_timeout)
         self._shutdown_timeout = max(1.0, shutdown_timeout)
-        self._queue: asyncio.Queue[Update | object] = asyncio.Queue(maxsize=self._queue_maxsize)
+        self._shards = self._create_shards()
         self._workers: list[asyncio.Task[None]] = []
         self._running = False
         self._stop_sentinel: object = object()
@@ -56,27 +123,80 @@ class TelegramWebhookProcessor:
     def is_running(self) -> bool:
         return self._running
 
+    @property
+    def shard_count(self) -> int:
+        return self._shard_count
+
+    def _create_shards(self) -> list[_UpdateShard]:
+        return [_UpdateShard(index, self._shard_maxsize) for index in range(self._shard_count)]
+
+    def get_shard_index(self, update: Update) -> int:
+        return _jump_consistent_hash(get_update_partition_key(update), self._shard_count)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Глубина и счётчики по шардам для health-эндпоинта."""
+        shards = [
+            {
+                'shard': shard.index,
+                'depth': shard.queue.qsize(),
+                'max_depth': shard.max_depth,
+                'processed': shard.processed,
+            }
+            for shard in self._shards
+        ]
+        return {
+            'running': self._running,
+            'shards': shards,
+            'shard_maxsize': self._shard_maxsize,
+            'total_depth': sum(item['depth'] for item in shards),
+            'hot_shards': [shard.index for shard in self._shards if self._is_hot(shard)],
+        }
+
+    def _is_hot(self, shard: _UpdateShard) -> bool:
+        return shard.queue.qsize() >= max(1, int(self._shard_maxsize * self.HOT_SHARD_FILL_RATIO))
+
+    def _check_hot_shard(self, shard: _UpdateShard) -> None:
+        depth = shard.queue.qsize()
+        shard.max_depth = max(shard.max_depth, depth)
+        if self._shard_count < 2 or not self._is_hot(shard):
+            return
+
+        now = time.monotonic()
+        if now - shard.last_hot_warning < self.HOT_SHARD_WARNING_INTERVAL:
+            return
+        shard.last_hot_warning = now
+
+        others = [item.queue.qsize() for item in self._shards if item is not shard]
+        logger.warning(
+            '🔥 Горячий шард Telegram webhook: очередь почти заполнена',
+            shard=shard.index,
+            depth=depth,
+            shard_maxsize=self._shard_maxsize,
+            avg_other_depth=round(sum(others) / len(others), 1),
+        )
+
     async def start(self) -> None:
         async with self._lifecycle_lock:
             if self._running:
                 return
 
             self._running = True
-            self._queue = asyncio.Queue(maxsize=self._queue_maxsize)
+            self._shards = self._create_shards()
             self._workers.clear()
 
             for index in range(self._worker_count):
                 task = asyncio.create_task(
-                    self._worker_loop(index),
+                    self._worker_loop(self._shards[index]),
                     name=f'telegram-webhook-worker-{index}',
                 )
                 self._workers.append(task)
 
             if self._worker_count:
                 logger.info(
-                    '🚀 Telegram webhook processor запущен: воркеров, очередь',
+                    '🚀 Telegram webhook processor запущен: шардов, очередь на шард',
                     worker_count=self._worker_count,
                     queue_maxsize=self._queue_maxsize,
+                    shard_maxsize=self._shard_maxsize,
                 )
             else:
                 logger.warning('Telegram webhook processor запущен без воркеров — обновления не будут обрабатываться')
@@ -90,7 +210,7 @@ class TelegramWebhookProcessor:
 
             if self._worker_count > 0:
                 try:
-                    await asyncio.wait_for(self._queue.join(), timeout=self._shutdown_timeout)
+                    await asyncio.wait_for(self._join_all(), timeout=self._shutdown_timeout)
                 except TimeoutError:
                     logger.warning(
                         '⏱️ Не удалось дождаться завершения очереди Telegram webhook за секунд',
@@ -98,25 +218,26 @@ class TelegramWebhookProcessor:
                     )
             else:
                 drained = 0
-                while not self._queue.empty():
-                    try:
-                        self._queue.get_nowait()
-                    except asyncio.QueueEmpty:  # pragma: no cover - гонка состояния
-                        break
-                    else:
-                        drained += 1
-                        self._queue.task_done()
+                for shard in self._shards:
+                    while not shard.queue.empty():
+                        try:
+                            shard.queue.get_nowait()
+                        except asyncio.QueueEmpty:  # pragma: no cover - гонка состояния
+                            break
+                        else:
+                            drained += 1
+                            shard.queue.task_done()
                 if drained:
                     logger.warning(
                         'Очередь Telegram webhook остановлена без воркеров, потеряно обновлений', drained=drained
                     )
 
-            for _ in range(len(self._workers)):
+            for shard in self._shards[: len(self._workers)]:
                 try:
-                    self._queue.put_nowait(self._stop_sentinel)
+                    shard.queue.put_nowait(self._stop_sentinel)
                 except asyncio.QueueFull:
                     # Очередь переполнена, подождём пока освободится место
-                    await self._queue.put(self._stop_sentinel)
+                    await shard.queue.put(self._stop_sentinel)
 
             if self._workers:
                 await asyncio.gather(*self._workers, return_exceptions=True)
@@ -127,35 +248,43 @@ class TelegramWebhookProcessor:
         if not self._running:
             raise TelegramWebhookProcessorNotRunningError
 
+        shard = self._shards[self.get_shard_index(update)]
         try:
             if self._enqueue_timeout <= 0:
-                self._queue.put_nowait(update)
+                shard.queue.put_nowait(update)
             else:
-                await asyncio.wait_for(self._queue.put(update), timeout=self._enqueue_timeout)
+                await asyncio.wait_for(shard.queue.put(update), timeout=self._enqueue_timeout)
         except asyncio.QueueFull as error:  # pragma: no cover - защитный сценарий
             raise TelegramWebhookOverloadedError from error
         except TimeoutError as error:
             raise TelegramWebhookOverloadedError from error
 
+        self._check_hot_shard(shard)
+
+    async def _join_all(self) -> None:
+        await asyncio.gather(*(shard.queue.join() for shard in self._shards))
+
     async def wait_until_drained(self, timeout: float | None = None) -> None:
         if not self._running or self._worker_count == 0:
             return
         if timeout is None:
-            await self._queue.join()
+            await self._join_all()
             return
-        await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        await asyncio.wait_for(self._join_all(), timeout=timeout)
 
-    async def _worker_loop(self, worker_id: int) -> None:
+    async def _worker_loop(self, shard: _UpdateShard) -> None:
+        worker_id = shard.index
+        queue = shard.queue
         try:
             while True:
                 try:
-                    item = await self._queue.get()
+                    item = await queue.get()
                 except asyncio.CancelledError:  # pragma: no cover - остановка приложения
                     logger.debug('Worker cancelled', worker_id=worker_id)
                     raise
 
                 if item is self._stop_sentinel:
-                    self._queue.task_done()
+                    queue.task_done()
                     break
 
                 update = item
@@ -167,7 +296,8 @@ class TelegramWebhookProcessor:
                 except Exception as error:  # pragma: no cover - логируем сбой обработчика
                     logger.exception('Ошибка обработки Telegram update в worker', worker_id=worker_id, error=error)
                 finally:
-                    self._queue.task_done()
+                    shard.processed += 1
+                    queue.task_done()
         finally:
             logger.debug('Worker завершён', worker_id=worker_id)
 
@@ -178,7 +308,21 @@ async def _dispatch_update(
     dispatcher: Dispatcher,
     bot: Bot,
     processor: TelegramWebhookProcessor | None,
+    ingress: TelegramStreamIngress | None = None,
+    payload: dict[str, Any] | None = None,
 ) -> None:
+    if ingress is not None:
+        try:
+            is_new = await ingress.publish(update.update_id, payload if payload is not None else update.model_dump())
+        except TelegramWebhookProcessorError as error:
+            logger.error('Не удалось записать Telegram update в Redis Stream', error=error)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='webhook_ingress_unavailable'
+            ) from error
+        if not is_new:
+            logger.debug('Повторный Telegram update пропущен', update_id=update.update_id)
+        return
+
     if processor is not None:
         try:
             await processor.enqueue(update)
@@ -200,6 +344,7 @@ def create_telegram_router(
     dispatcher: Dispatcher,
     *,
     processor: TelegramWebhookProcessor | None = None,
+    ingress: TelegramStreamIngress | None = None,
 ) -> APIRouter:
     router = APIRouter()
     webhook_path = settings.get_telegram_webhook_path()
@@ -229,7 +374,9 @@ def create_telegram_router(
             logger.error('Ошибка валидации Telegram update', error=error)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='invalid_update') from error
 
-        await _dispatch_update(update, dispatcher=dispatcher, bot=bot, processor=processor)
+        await _dispatch_update(
+            update, dispatcher=dispatcher, bot=bot, processor=processor, ingress=ingress, payload=payload
+        )
         return JSONResponse({'status': 'ok'})
 
     @router.get('/health/telegram-webhook')
@@ -242,6 +389,8 @@ def create_telegram_router(
                 'webhook_configured': bool(settings.get_telegram_webhook_url()),
                 'queue_maxsize': settings.get_webhook_queue_maxsize(),
                 'workers': settings.get_webhook_worker_count(),
+                'processor': processor.get_stats() if processor is not None else None,
+                'ingress': await ingress.get_stats() if ingress is not None else None,
             }
         )
 
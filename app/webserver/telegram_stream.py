@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import redis.asyncio as redis
+import structlog
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from .telegram import TelegramWebhookProcessorError, get_update_partition_key
+
+
+logger = structlog.get_logger(__name__)
+
+# Отметка update_id и XADD атомарно: повтор от Telegram не попадёт в стрим дважды,
+# а сбой между двумя командами не оставит отметку без записи
+_PUBLISH_SCRIPT = """
+if redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    return redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', 'update_id', ARGV[3], 'payload', ARGV[4])
+end
+return false
+"""
+
+# Снять аренду чата, только если она всё ещё наша (могла истечь и перейти другой реплике)
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# После стольких неудачных обработок update подтверждается без обработки
+_MAX_DELIVERY_ATTEMPTS = 5
+_LEASE_RETRY_SECONDS = 0.05
+
+
+class TelegramStreamIngressError(TelegramWebhookProcessorError):
+    """Не удалось записать update в Redis Stream."""
+
+
+class TelegramStreamIngress:
+    """Приём Telegram webhook-ов через Redis Stream с группой потребителей.
+
+    Webhook только дописывает update в стрим и сразу отвечает Telegram.
+    Воркеры всех реплик читают стрим через одну consumer group, подтверждают
+    записи после обработки и забирают зависшие записи упавших потребителей.
+    Повторы одного update_id отсекаются при записи и при обработке.
+
+    Update одного чата не обрабатываются параллельно: свежие и перехваченные
+    записи проходят через общую блокировку чата внутри реплики и через
+    аренду чата в Redis между репликами. Запись, обработчик которой упал,
+    остаётся неподтверждённой и будет перехвачена повторно.
+    """
+
+    def __init__(
+        self,
+        *,
+        bot: Bot,
+        dispatcher: Dispatcher,
+        redis_url: str,
+        stream_key: str,
+        group: str,
+        maxlen: int,
+        batch_size: int,
+        claim_idle_seconds: float,
+        dedup_ttl_seconds: int,
+        shutdown_timeout: float,
+        consumer_name: str | None = None,
+    ) -> None:
+        self._bot = bot
+        self._dispatcher = dispatcher
+        self._redis_url = redis_url
+        self._stream_key = stream_key
+        self._group = group
+        self._maxlen = max(1, maxlen)
+        self._batch_size = max(1, batch_size)
+        self._claim_idle_ms = max(1000, int(claim_idle_seconds * 1000))
+        self._dedup_ttl_seconds = max(60, dedup_ttl_seconds)
+        self._shutdown_timeout = max(1.0, shutdown_timeout)
+        self.consumer_name = consumer_name or f'{socket.gethostname()}-{os.getpid()}'
+        self._redis: redis.Redis | None = None
+        self._publish_script = None
+        self._release_lease_script = None
+        self._partition_locks: dict[int, asyncio.Lock] = {}
+        self._partition_users: dict[int, int] = defaultdict(int)
+        self._consumer_task: asyncio.Task[None] | None = None
+        self._claim_task: asyncio.Task[None] | None = None
+        self._running = False
+        self._processed = 0
+        self._duplicates = 0
+        self._claimed = 0
+        self._failed = 0
+        self._dropped = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def _seen_key(self, update_id: int) -> str:
+        return f'{self._stream_key}:seen:{update_id}'
+
+    def _done_key(self, update_id: int) -> str:
+        return f'{self._stream_key}:done:{update_id}'
+
+    def _failures_key(self, update_id: int) -> str:
+        return f'{self._stream_key}:failures:{update_id}'
+
+    def _lease_key(self, partition_key: int) -> str:
+        return f'{self._stream_key}:lease:{partition_key}'
+
+    async def start(self) -> None:
+        if self._running:
+            return
+
+        self._redis = redis.from_url(self._redis_url)
+        self._publish_script = self._redis.register_script(_PUBLISH_SCRIPT)
+        self._release_lease_script = self._redis.register_script(_RELEASE_LEASE_SCRIPT)
+        try:
+            await self._redis.xgroup_create(self._stream_key, self._group, id='0', mkstream=True)
+        except Exception as error:
+            # Группа уже создана другой репликой
+            if 'BUSYGROUP' not in str(error):
+                raise
+
+        self._running = True
+        self._consumer_task = asyncio.create_task(self._consume_loop(), name='telegram-stream-consumer')
+        self._claim_task = asyncio.create_task(self._claim_loop(), name='telegram-stream-claimer')
+        logger.info(
+            '🚀 Telegram Redis Stream ingress запущен',
+            stream=self._stream_key,
+            group=self._group,
+            consumer=self.consumer_name,
+        )
+
+    async def stop(self) -> None:
+        if not self._running:
+            return
+
+        self._running = False
+        if self._claim_task is not None:
+            self._claim_task.cancel()
+            await asyncio.gather(self._claim_task, return_exceptions=True)
+
+        if self._consumer_task is not None:
+            # Даём дообработать текущую пачку, неподтверждённое заберут другие потребители
+            try:
+                await asyncio.wait_for(self._consumer_task, timeout=self._shutdown_timeout)
+            except TimeoutError:
+                logger.warning(
+                    '⏱️ Не удалось дождаться обработки пачки Telegram Redis Stream за секунд',
+                    shutdown_timeout=self._shutdown_timeout,
+                )
+        self._consumer_task = None
+        self._claim_task = None
+
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+        logger.info('🛑 Telegram Redis Stream ingress остановлен')
+
+    async def publish(self, update_id: int, payload: dict[str, Any]) -> bool:
+        """Дописать update в стрим. Возвращает False, если такой update_id уже принят."""
+        if not self._running or self._redis is None:
+            raise TelegramStreamIngressError('ingress is not running')
+
+        try:
+            entry_id = await self._publish_script(
+                keys=[self._seen_key(update_id), self._stream_key],
+                args=[self._dedup_ttl_seconds, self._maxlen, update_id, json.dumps(payload, ensure_ascii=False)],
+            )
+        except Exception as error:
+            raise TelegramStreamIngressError(str(error)) from error
+
+        if entry_id is None:
+            self._duplicates += 1
+            return False
+        return True
+
+    async def _consume_loop(self) -> None:
+        while self._running:
+            try:
+                response = await self._redis.xreadgroup(
+                    self._group,
+                    self.consumer_name,
+                    {self._stream_key: '>'},
+                    count=self._batch_size,
+                    block=1000,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('Ошибка чтения Telegram Redis Stream', error=error)
+                await asyncio.sleep(1)
+                continue
+
+            for _stream, entries in response or []:
+                await self._process_entries(entries)
+
+    async def _claim_loop(self) -> None:
+        interval = self._claim_idle_ms / 2000
+        while self._running:
+            await asyncio.sleep(interval)
+            try:
+                result = await self._redis.xautoclaim(
+                    self._stream_key,
+                    self._group,
+                    self.consumer_name,
+                    min_idle_time=self._claim_idle_ms,
+                    start_id='0-0',
+                    count=self._batch_size,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('Ошибка перехвата зависших Telegram update', error=error)
+                continue
+
+            entries = [entry for entry in result[1] if entry and entry[1]]
+            if entries:
+                self._claimed += len(entries)
+                logger.info('Перехвачены зависшие Telegram update', count=len(entries), consumer=self.consumer_name)
+                await self._process_entries(entries)
+
+    async def _process_entries(self, entries: list[tuple[Any, dict]]) -> None:
+        """Обработать пачку: update одного чата по порядку, разные чаты параллельно."""
+        groups: dict[int, list[tuple[Any, int, Update]]] = defaultdict(list)
+        ack_ids: list[Any] = []
+
+        for entry_id, fields in entries:
+            try:
+                update_id = int(fields[b'update_id'])
+                update = Update.model_validate(json.loads(fields[b'payload']))
+            except Exception as error:
+                logger.error('Повреждённая запись Telegram Redis Stream', entry_id=entry_id, error=error)
+                ack_ids.append(entry_id)
+                continue
+            groups[get_update_partition_key(update)].append((entry_id, update_id, update))
+
+        results = await asyncio.gather(*(self._process_group(key, items) for key, items in groups.items()))
+        for processed_ids in results:
+            ack_ids.extend(processed_ids)
+
+        if ack_ids:
+            try:
+                await self._redis.xack(self._stream_key, self._group, *ack_ids)
+            except Exception as error:
+                logger.warning('Не удалось подтвердить Telegram update', count=len(ack_ids), error=error)
+
+    @asynccontextmanager
+    async def _partition(self, partition_key: int) -> AsyncIterator[bool]:
+        """Исключительная обработка чата. True - аренда получена, записи можно обрабатывать."""
+        lock = self._partition_locks.get(partition_key)
+        if lock is None:
+            lock = self._partition_locks[partition_key] = asyncio.Lock()
+        self._partition_users[partition_key] += 1
+        try:
+            async with lock:
+                token = await self._acquire_lease(partition_key)
+                try:
+                    yield token is not None
+                finally:
+                    if token is not None:
+                        await self._release_lease(partition_key, token)
+        finally:
+            self._partition_users[partition_key] -= 1
+            if not self._partition_users[partition_key]:
+                del self._partition_users[partition_key]
+                self._partition_locks.pop(partition_key, None)
+
+    async def _acquire_lease(self, partition_key: int) -> str | None:
+        """Аренда чата на время простоя записи: упавшая реплика отпустит её вместе с записями."""
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._claim_idle_ms / 1000
+        while True:
+            try:
+                if await self._redis.set(self._lease_key(partition_key), token, nx=True, px=self._claim_idle_ms):
+                    return token
+            except Exception as error:
+                logger.warning('Не удалось получить аренду чата Telegram', partition_key=partition_key, error=error)
+                return None
+            if loop.time() >= deadline:
+                return None
+            await asyncio.sleep(_LEASE_RETRY_SECONDS)
+
+    async def _release_lease(self, partition_key: int, token: str) -> None:
+        try:
+            await self._release_lease_script(keys=[self._lease_key(partition_key)], args=[token])
+        except Exception as error:
+            logger.debug('Не удалось снять аренду чата Telegram', partition_key=partition_key, error=error)
+
+    async def _process_group(self, partition_key: int, items: list[tuple[Any, int, Update]]) -> list[Any]:
+        processed_ids = []
+        async with self._partition(partition_key) as leased:
+            if not leased:
+                # Чат занят другой репликой: записи останутся неподтверждёнными и будут перехвачены
+                return processed_ids
+
+            for entry_id, update_id, update in items:
+                done_key = self._done_key(update_id)
+                if await self._redis.exists(done_key):
+                    self._duplicates += 1
+                    processed_ids.append(entry_id)
+                    continue
+
+                try:
+                    await self._dispatcher.feed_update(self._bot, update)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    logger.exception('Ошибка обработки Telegram update из стрима', update_id=update_id, error=error)
+                    if not await self._give_up(update_id):
+                        # Остальные update чата ждут повтора упавшего, чтобы не обогнать его
+                        self._failed += 1
+                        break
+                    processed_ids.append(entry_id)
+                    continue
+
+                self._processed += 1
+                processed_ids.append(entry_id)
+                try:
+                    await self._redis.set(done_key, 1, ex=self._dedup_ttl_seconds)
+                except Exception as error:
+                    logger.debug('Не удалось отметить Telegram update обработанным', update_id=update_id, error=error)
+        return processed_ids
+
+    async def _give_up(self, update_id: int) -> bool:
+        """Учесть неудачу. True - попытки исчерпаны, запись подтверждается без обработки."""
+        failures_key = self._failures_key(update_id)
+        try:
+            failures = await self._redis.incr(failures_key)
+            await self._redis.expire(failures_key, self._dedup_ttl_seconds)
+        except Exception as error:
+            logger.debug('Не удалось учесть неудачу Telegram update', update_id=update_id, error=error)
+            return False
+
+        if failures < _MAX_DELIVERY_ATTEMPTS:
+            return False
+        self._dropped += 1
+        logger.error('Telegram update отброшен после неудачных попыток', update_id=update_id, attempts=failures)
+        return True
+
+    async def get_stats(self) -> dict[str, Any]:
+        """Длина стрима, отставание и число неподтверждённых записей группы."""
+        stats: dict[str, Any] = {
+            'running': self._running,
+            'stream': self._stream_key,
+            'group': self._group,
+            'consumer': self.consumer_name,
+            'processed': self._processed,
+            'duplicates': self._duplicates,
+            'claimed': self._claimed,
+            'failed': self._failed,
+            'dropped': self._dropped,
+        }
+        if self._redis is None:
+            return stats
+
+        try:
+            stats['length'] = await self._redis.xlen(self._stream_key)
+            for group in await self._redis.xinfo_groups(self._stream_key):
+                name = group.get('name')
+                if isinstance(name, bytes):
+                    name = name.decode()
+                if name == self._group:
+                    stats['pending'] = group.get('pending')
+                    stats['lag'] = group.get('lag')
+                    stats['consumers'] = group.get('consumers')
+                    break
+        except Exception as error:
+            stats['error'] = str(error)
+        return stats
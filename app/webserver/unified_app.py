@@ -15,7 +15,7 @@ from app.services.payment_service import PaymentService
 from app.webapi.app import create_web_api_app
 from app.webapi.docs import add_redoc_endpoint
 
-from . import payments, telegram
+from . import metrics, payments, telegram
 
 
 logger = structlog.get_logger(__name__)
@@ -108,16 +108,65 @@ def create_unified_app(
     app.state.dispatcher = dispatcher
     app.state.payment_service = payment_service
 
-    payments_router = payments.create_payment_router(bot, payment_service)
+    if settings.METRICS_ENABLED:
+        app.add_middleware(metrics.HTTPMetricsMiddleware)
+        app.include_router(metrics.create_metrics_router())
+        if settings.METRICS_TOKEN:
+            logger.info('📈 Метрики Prometheus доступны на /metrics')
+        else:
+            logger.warning('⚠️ METRICS_TOKEN не задан: /metrics отвечает 401, пока токен не настроен')
+
+    payment_inbox = None
+    if settings.PAYMENT_WEBHOOK_INBOX_ENABLED:
+        from app.services.payment_webhook_inbox import PaymentWebhookInbox
+
+        payment_inbox = PaymentWebhookInbox(
+            payment_service,
+            worker_count=settings.PAYMENT_WEBHOOK_WORKERS,
+            batch_size=settings.PAYMENT_WEBHOOK_BATCH_SIZE,
+            max_attempts=settings.PAYMENT_WEBHOOK_MAX_ATTEMPTS,
+            retention_hours=settings.PAYMENT_WEBHOOK_INBOX_RETENTION_HOURS,
+        )
+
+    payments_router = payments.create_payment_router(bot, payment_service, inbox=payment_inbox)
     if payments_router:
         app.include_router(payments_router)
 
+        if payment_inbox is not None:
+            app.state.payment_webhook_inbox = payment_inbox
+
+            @app.on_event('startup')
+            async def start_payment_webhook_inbox() -> None:  # pragma: no cover - event hook
+                await payment_inbox.start()
+
+            @app.on_event('shutdown')
+            async def stop_payment_webhook_inbox() -> None:  # pragma: no cover - event hook
+                await payment_inbox.stop()
+
     # Mount RemnaWave incoming webhook router
     remnawave_webhook_enabled = settings.is_remnawave_webhook_enabled()
     if remnawave_webhook_enabled:
+        from app.services.remnawave_webhook_inbox import RemnaWaveWebhookInbox
+        from app.services.remnawave_webhook_service import RemnaWaveWebhookService
         from app.webserver.remnawave_webhook import create_remnawave_webhook_router
 
-        remnawave_router = create_remnawave_webhook_router(bot)
+        remnawave_inbox = RemnaWaveWebhookInbox(
+            RemnaWaveWebhookService(bot),
+            worker_count=settings.REMNAWAVE_WEBHOOK_WORKERS,
+            batch_size=settings.REMNAWAVE_WEBHOOK_BATCH_SIZE,
+            retention_hours=settings.REMNAWAVE_WEBHOOK_INBOX_RETENTION_HOURS,
+        )
+        app.state.remnawave_webhook_inbox = remnawave_inbox
+
+        @app.on_event('startup')
+        async def start_remnawave_webhook_inbox() -> None:  # pragma: no cover - event hook
+            await remnawave_inbox.start()
+
+        @app.on_event('shutdown')
+        async def stop_remnawave_webhook_inbox() -> None:  # pragma: no cover - event hook
+            await remnawave_inbox.stop()
+
+        remnawave_router = create_remnawave_webhook_router(remnawave_inbox)
         app.include_router(remnawave_router)
         logger.info('RemnaWave webhook router mounted at', REMNAWAVE_WEBHOOK_PATH=settings.REMNAWAVE_WEBHOOK_PATH)
 
@@ -132,7 +181,36 @@ def create_unified_app(
         'freekassa': settings.is_freekassa_enabled(),
     }
 
-    if enable_telegram_webhook:
+    telegram_processor = None
+    telegram_ingress = None
+
+    if enable_telegram_webhook and settings.is_webhook_stream_ingress_enabled():
+        from .telegram_stream import TelegramStreamIngress
+
+        telegram_ingress = TelegramStreamIngress(
+            bot=bot,
+            dispatcher=dispatcher,
+            redis_url=settings.REDIS_URL,
+            stream_key=settings.WEBHOOK_STREAM_KEY,
+            group=settings.WEBHOOK_STREAM_GROUP,
+            maxlen=settings.WEBHOOK_STREAM_MAXLEN,
+            batch_size=settings.WEBHOOK_STREAM_BATCH_SIZE,
+            claim_idle_seconds=settings.WEBHOOK_STREAM_CLAIM_IDLE_SECONDS,
+            dedup_ttl_seconds=settings.WEBHOOK_STREAM_DEDUP_TTL_SECONDS,
+            shutdown_timeout=settings.get_webhook_shutdown_timeout(),
+        )
+        app.state.telegram_webhook_ingress = telegram_ingress
+
+        @app.on_event('startup')
+        async def start_telegram_webhook_ingress() -> None:  # pragma: no cover - event hook
+            await telegram_ingress.start()
+
+        @app.on_event('shutdown')
+        async def stop_telegram_webhook_ingress() -> None:  # pragma: no cover - event hook
+            await telegram_ingress.stop()
+
+        app.include_router(telegram.create_telegram_router(bot, dispatcher, ingress=telegram_ingress))
+    elif enable_telegram_webhook:
         telegram_processor = telegram.TelegramWebhookProcessor(
             bot=bot,
             dispatcher=dispatcher,
@@ -142,6 +220,8 @@ def create_unified_app(
             shutdown_timeout=settings.get_webhook_shutdown_timeout(),
         )
         app.state.telegram_webhook_processor = telegram_processor
+        if settings.METRICS_ENABLED:
+            metrics.register_webhook_queue_metrics(telegram_processor)
 
         @app.on_event('startup')
         async def start_telegram_webhook_processor() -> None:  # pragma: no cover - event hook
@@ -152,13 +232,22 @@ def create_unified_app(
             await telegram_processor.stop()
 
         app.include_router(telegram.create_telegram_router(bot, dispatcher, processor=telegram_processor))
-    else:
-        telegram_processor = None
 
     @app.on_event('startup')
     async def start_disposable_email_service() -> None:  # pragma: no cover - event hook
         await disposable_email_service.start()
 
+    if settings.is_cabinet_enabled():
+        from app.cabinet.routes.websocket import cabinet_ws_manager
+
+        @app.on_event('startup')
+        async def start_cabinet_ws_delivery() -> None:  # pragma: no cover - event hook
+            await cabinet_ws_manager.start()
+
+        @app.on_event('shutdown')
+        async def stop_cabinet_ws_delivery() -> None:  # pragma: no cover - event hook
+            await cabinet_ws_manager.stop()
+
     @app.on_event('shutdown')
     async def stop_disposable_email_service() -> None:  # pragma: no cover - event hook
         await disposable_email_service.stop()
@@ -173,7 +262,11 @@ def create_unified_app(
 
         telegram_state = {
             'enabled': enable_telegram_webhook,
-            'running': bool(telegram_processor and telegram_processor.is_running),
+            'running': bool(
+                (telegram_processor and telegram_processor.is_running)
+                or (telegram_ingress and telegram_ingress.is_running)
+            ),
+            'ingress_mode': settings.get_webhook_ingress_mode(),
             'url': settings.get_telegram_webhook_url(),
             'path': webhook_path,
             'secret_configured': bool(settings.WEBHOOK_SECRET_TOKEN),
@@ -194,6 +287,7 @@ def create_unified_app(
         remnawave_webhook_state = {
             'enabled': remnawave_webhook_enabled,
             'path': settings.REMNAWAVE_WEBHOOK_PATH if remnawave_webhook_enabled else None,
+            'inbox': app.state.remnawave_webhook_inbox.get_stats() if remnawave_webhook_enabled else None,
         }
 
         return JSONResponse(
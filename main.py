@@ -1,6 +1,8 @@
 import asyncio
+import atexit
 import logging
 import os
+import queue
 import signal
 import sys
 from pathlib import Path
@@ -35,14 +37,22 @@ from app.services.payment_verification_service import (
     get_enabled_auto_methods,
     method_display_name,
 )
+from app.services.referral_click_service import referral_click_recorder
 from app.services.referral_contest_service import referral_contest_service
 from app.services.remnawave_sync_service import remnawave_sync_service
 from app.services.reporting_service import reporting_service
+from app.services.settings_broadcast import settings_broadcaster
 from app.services.system_settings_service import bot_configuration_service
 from app.services.traffic_monitoring_service import traffic_monitoring_scheduler
 from app.services.version_service import version_service
 from app.services.web_api_token_service import ensure_default_web_api_token
-from app.utils.log_handlers import ExcludePaymentFilter, LevelFilterHandler
+from app.utils.log_handlers import (
+    ExcludePaymentFilter,
+    LogSink,
+    PaymentLogFilter,
+    QueueLogHandler,
+    QueueLogListener,
+)
 from app.utils.payment_logger import configure_payment_logger
 from app.utils.startup_timeline import StartupTimeline
 from app.webapi.server import WebAPIServer
@@ -61,7 +71,10 @@ class GracefulExit:
 async def main():
     file_formatter, console_formatter, telegram_notifier = setup_logging()
 
-    log_handlers = []
+    # Запись логов идёт через очередь: вызывающий код только ставит запись в неё,
+    # рендеринг и запись в файлы/консоль выполняет фоновый поток
+    log_queue: queue.Queue = queue.Queue(maxsize=max(1, settings.LOG_QUEUE_MAX_SIZE))
+    queue_handler = QueueLogHandler(log_queue, file_formatter.foreign_pre_chain)
 
     # === Инициализация системы логирования ===
     if settings.is_log_rotation_enabled():
@@ -70,77 +83,60 @@ async def main():
 
         log_dir = log_rotation_service.current_dir
         log_dir.mkdir(parents=True, exist_ok=True)
+        exclude_payments = ExcludePaymentFilter()
+
+        log_sinks = [
+            # 1. Общий лог (bot.log) - все уровни, без платежей
+            LogSink(file_formatter, path=log_dir / 'bot.log', filters=(exclude_payments,)),
+            # 2. INFO лог - только INFO уровень
+            LogSink(
+                file_formatter,
+                path=log_dir / settings.LOG_INFO_FILE,
+                min_level=logging.INFO,
+                max_level=logging.INFO,
+                filters=(exclude_payments,),
+            ),
+            # 3. WARNING лог - WARNING и выше
+            LogSink(
+                file_formatter,
+                path=log_dir / settings.LOG_WARNING_FILE,
+                min_level=logging.WARNING,
+                filters=(exclude_payments,),
+            ),
+            # 4. ERROR лог - только ERROR и CRITICAL
+            LogSink(
+                file_formatter,
+                path=log_dir / settings.LOG_ERROR_FILE,
+                min_level=logging.ERROR,
+                filters=(exclude_payments,),
+            ),
+            # 5. Payment лог - отдельный файл для платежей
+            LogSink(file_formatter, path=log_dir / settings.LOG_PAYMENTS_FILE, filters=(PaymentLogFilter(),)),
+            # 6. Консольный вывод
+            LogSink(console_formatter, stream=sys.stdout, filters=(exclude_payments,)),
+        ]
+        configure_payment_logger(queue_handler)
+    else:
+        # Старое поведение: один файл лога
+        log_sinks = [
+            LogSink(file_formatter, path=Path(settings.LOG_FILE)),
+            LogSink(console_formatter, stream=sys.stdout),
+        ]
 
-        # 1. Общий лог (bot.log) - все уровни, без платежей
-        bot_handler = logging.FileHandler(log_dir / 'bot.log', encoding='utf-8')
-        bot_handler.setFormatter(file_formatter)
-        bot_handler.addFilter(ExcludePaymentFilter())
-        log_handlers.append(bot_handler)
-
-        # 2. INFO лог - только INFO уровень
-        info_handler = LevelFilterHandler(
-            str(log_dir / settings.LOG_INFO_FILE),
-            min_level=logging.INFO,
-            max_level=logging.INFO,
-        )
-        info_handler.setFormatter(file_formatter)
-        info_handler.addFilter(ExcludePaymentFilter())
-        log_handlers.append(info_handler)
-
-        # 3. WARNING лог - WARNING и выше
-        warning_handler = LevelFilterHandler(
-            str(log_dir / settings.LOG_WARNING_FILE),
-            min_level=logging.WARNING,
-        )
-        warning_handler.setFormatter(file_formatter)
-        warning_handler.addFilter(ExcludePaymentFilter())
-        log_handlers.append(warning_handler)
-
-        # 4. ERROR лог - только ERROR и CRITICAL
-        error_handler = LevelFilterHandler(
-            str(log_dir / settings.LOG_ERROR_FILE),
-            min_level=logging.ERROR,
-        )
-        error_handler.setFormatter(file_formatter)
-        error_handler.addFilter(ExcludePaymentFilter())
-        log_handlers.append(error_handler)
-
-        # 5. Payment лог - отдельный файл для платежей
-        payment_handler = logging.FileHandler(
-            log_dir / settings.LOG_PAYMENTS_FILE,
-            encoding='utf-8',
-        )
-        configure_payment_logger(payment_handler, file_formatter)
-
-        # 6. Консольный вывод
-        stream_handler = logging.StreamHandler(sys.stdout)
-        stream_handler.setFormatter(console_formatter)
-        log_handlers.append(stream_handler)
-
-        logging.basicConfig(
-            level=getattr(logging, settings.LOG_LEVEL),
-            handlers=log_handlers,
-            force=True,
-        )
+    log_listener = QueueLogListener(log_queue, queue_handler, log_sinks, batch_size=settings.LOG_QUEUE_BATCH_SIZE)
+    log_listener.start()
+    # Останавливаем после выхода из event loop, чтобы дописать последние записи
+    atexit.register(log_listener.stop)
 
-        # Регистрируем хэндлеры для управления при ротации
-        log_rotation_service.register_handlers(log_handlers)
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        handlers=[queue_handler],
+        force=True,
+    )
 
-    else:
-        # Старое поведение: один файл лога
-        file_handler = logging.FileHandler(settings.LOG_FILE, encoding='utf-8')
-        file_handler.setFormatter(file_formatter)
-        log_handlers.append(file_handler)
-
-        stream_handler = logging.StreamHandler(sys.stdout)
-        stream_handler.setFormatter(console_formatter)
-        log_handlers.append(stream_handler)
-
-        logging.basicConfig(
-            level=getattr(logging, settings.LOG_LEVEL),
-            handlers=log_handlers,
-            force=True,
-        )
+    if settings.is_log_rotation_enabled():
+        # Ротация подменяет файлы под блокировкой слушателя
+        log_rotation_service.register_listener(log_listener)
 
     # NOTE: TelegramNotifierProcessor and noisy logger suppression are
     # handled inside setup_logging() / logging_config.py.
@@ -273,6 +269,10 @@ async def main():
                 stage.warning(f'Не удалось загрузить конфигурацию: {error}')
                 logger.error('❌ Не удалось загрузить конфигурацию', error=error)
 
+            await settings_broadcaster.start()
+            if settings_broadcaster.is_running:
+                stage.log('Изменения настроек синхронизируются между процессами')
+
         bot = None
         dp = None
         if settings.TELEGRAM_BOT_ENABLED:
@@ -524,6 +524,18 @@ async def main():
             else:
                 stage.skip('NaloGO отключен настройками')
 
+        if bot:
+            async with timeline.stage(
+                'Журнал переходов по реф-ссылкам',
+                '🔗',
+                success_message='Переходы записываются в БД',
+            ) as stage:
+                try:
+                    await referral_click_recorder.start()
+                except Exception as e:
+                    stage.warning(f'Ошибка запуска журнала переходов: {e}')
+                    logger.error('❌ Ошибка запуска журнала переходов по реф-ссылкам', error=e)
+
         if bot:
             async with timeline.stage(
                 'Внешняя админка',
@@ -927,6 +939,18 @@ async def main():
         except Exception as e:
             logger.error('Ошибка остановки очереди чеков NaloGO', error=e)
 
+        logger.info('ℹ️ Остановка журнала переходов по реф-ссылкам...')
+        try:
+            await referral_click_recorder.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки журнала переходов по реф-ссылкам', error=e)
+
+        logger.info('ℹ️ Остановка рассылки настроек...')
+        try:
+            await settings_broadcaster.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки рассылки настроек', error=e)
+
         logger.info('ℹ️ Остановка сервиса бекапов...')
         try:
             await backup_service.stop_auto_backup()
@@ -956,6 +980,11 @@ async def main():
             except Exception as error:
                 logger.error('Ошибка остановки веб-API', error=error)
 
+        try:
+            await telegram_notifier.stop()
+        except Exception as e:
+            logger.warning('Ошибка отправки последней сводки ошибок', error=e)
+
         if 'bot' in locals():
             try:
                 await bot.session.close()
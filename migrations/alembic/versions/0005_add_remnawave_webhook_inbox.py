@@ -0,0 +1,56 @@
+"""add remnawave_webhook_events table
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Adds remnawave_webhook_events inbox table for asynchronous processing
+of incoming RemnaWave webhooks.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table: str) -> bool:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return table in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _has_table('remnawave_webhook_events'):
+        return
+
+    op.create_table(
+        'remnawave_webhook_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+        sa.Column('event_key', sa.String(64), nullable=False),
+        sa.Column('event_name', sa.String(100), nullable=False),
+        sa.Column('user_key', sa.String(100), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('event_key', name='uq_remnawave_webhook_events_event_key'),
+    )
+    op.create_index('ix_remnawave_webhook_events_status_id', 'remnawave_webhook_events', ['status', 'id'])
+    op.create_index('ix_remnawave_webhook_events_user_key', 'remnawave_webhook_events', ['user_key'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_remnawave_webhook_events_user_key', table_name='remnawave_webhook_events')
+    op.drop_index('ix_remnawave_webhook_events_status_id', table_name='remnawave_webhook_events')
+    op.drop_table('remnawave_webhook_events')
@@ -0,0 +1,55 @@
+"""add payment_webhook_events table
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+Adds payment_webhook_events inbox table: verified payment gateway callbacks
+are stored once per (provider, external_id) and settled by background workers.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table: str) -> bool:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return table in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _has_table('payment_webhook_events'):
+        return
+
+    op.create_table(
+        'payment_webhook_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+        sa.Column('provider', sa.String(32), nullable=False),
+        sa.Column('external_id', sa.String(255), nullable=False),
+        sa.Column('method_name', sa.String(100), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('available_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('provider', 'external_id', name='uq_payment_webhook_events_provider_external'),
+    )
+    op.create_index('ix_payment_webhook_events_status_available', 'payment_webhook_events', ['status', 'available_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_webhook_events_status_available', table_name='payment_webhook_events')
+    op.drop_table('payment_webhook_events')
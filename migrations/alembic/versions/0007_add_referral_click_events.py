@@ -0,0 +1,55 @@
+"""add referral_click_events table
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+Adds referral_click_events: /start ref... payloads recorded as structured
+events for referral diagnostics. On PostgreSQL the table is partitioned by
+month on created_at; monthly partitions are created by the application.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table: str) -> bool:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return table in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _has_table('referral_click_events'):
+        return
+
+    op.create_table(
+        'referral_click_events',
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('telegram_id', sa.BigInteger(), nullable=False),
+        sa.Column('code', sa.String(64), nullable=False),
+        sa.Column('payload', sa.String(255), nullable=False),
+        sa.Column('source', sa.String(20), nullable=False),
+        sa.PrimaryKeyConstraint('created_at', 'telegram_id', 'code'),
+        postgresql_partition_by='RANGE (created_at)',
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            'CREATE TABLE IF NOT EXISTS referral_click_events_default PARTITION OF referral_click_events DEFAULT'
+        )
+    op.create_index('ix_referral_click_events_code_created', 'referral_click_events', ['code', 'created_at'])
+    op.create_index('ix_referral_click_events_telegram_created', 'referral_click_events', ['telegram_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_referral_click_events_telegram_created', table_name='referral_click_events')
+    op.drop_index('ix_referral_click_events_code_created', table_name='referral_click_events')
+    op.drop_table('referral_click_events')
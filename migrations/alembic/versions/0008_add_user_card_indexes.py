@@ -0,0 +1,52 @@
+"""add indexes for the admin user card
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+The admin user card counts and sums a user's transactions and looks up
+their campaign registration. Neither transactions.user_id nor
+advertising_campaign_registrations.user_id was indexed, so every card
+scanned both tables.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    ('ix_transactions_user_created', 'transactions', ['user_id', 'created_at']),
+    ('ix_advertising_campaign_registrations_user_id', 'advertising_campaign_registrations', ['user_id']),
+)
+
+
+def _has_table(table: str) -> bool:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return table in inspector.get_table_names()
+
+
+def _has_index(table: str, index: str) -> bool:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return index in [i['name'] for i in inspector.get_indexes(table)]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        if _has_table(table) and not _has_index(table, name):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _columns in INDEXES:
+        if _has_table(table) and _has_index(table, name):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,156 @@
+"""partition monitoring_logs and support_audit_logs by month
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+Monitoring writes a row for every cycle and stage, and both logs were
+trimmed with one large DELETE. On PostgreSQL both tables are rebuilt as
+RANGE (created_at) partitioned tables with the primary key (id, created_at):
+existing rows are copied into monthly partitions, the id sequence is kept.
+Retention then drops whole monthly partitions instead of deleting rows.
+
+Both dialects get indexes for the admin log views: event type / action
+with created_at, and created_at alone.
+
+Downgrade drops the indexes only; partitioned tables stay compatible with
+the models.
+"""
+
+from datetime import UTC, date, datetime
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 2
+
+TABLES = {
+    'monitoring_logs': (
+        ('event_type', 'VARCHAR(100) NOT NULL'),
+        ('message', 'TEXT NOT NULL'),
+        ('data', 'JSON'),
+        ('is_success', 'BOOLEAN'),
+    ),
+    'support_audit_logs': (
+        ('actor_user_id', 'INTEGER'),
+        ('actor_telegram_id', 'BIGINT'),
+        ('is_moderator', 'BOOLEAN'),
+        ('action', 'VARCHAR(50) NOT NULL'),
+        ('ticket_id', 'INTEGER'),
+        ('target_user_id', 'INTEGER'),
+        ('details', 'JSON'),
+    ),
+}
+
+FOREIGN_KEYS = {
+    'support_audit_logs': (
+        ('actor_user_id', 'users'),
+        ('ticket_id', 'tickets'),
+        ('target_user_id', 'users'),
+    ),
+}
+
+INDEXES = (
+    ('ix_monitoring_logs_event_type_created', 'monitoring_logs', ['event_type', 'created_at']),
+    ('ix_monitoring_logs_created_at', 'monitoring_logs', ['created_at']),
+    ('ix_support_audit_logs_action_created', 'support_audit_logs', ['action', 'created_at']),
+    ('ix_support_audit_logs_created_at', 'support_audit_logs', ['created_at']),
+)
+
+
+def _has_table(table: str) -> bool:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return table in inspector.get_table_names()
+
+
+def _has_index(table: str, index: str) -> bool:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return index in [i['name'] for i in inspector.get_indexes(table)]
+
+
+def _is_partitioned(table: str) -> bool:
+    relkind = op.get_bind().scalar(
+        sa.text('SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)'), {'table': table}
+    )
+    return relkind == 'p'
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _partition_table(table: str) -> None:
+    """Пересоздать таблицу как партиционированную по месяцам и перенести строки."""
+    bind = op.get_bind()
+    new_table = f'{table}_partitioned'
+    columns = TABLES[table]
+
+    sequence = bind.scalar(sa.text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': table})
+    if sequence is None:
+        sequence = f'{table}_id_seq'
+        op.execute(f'CREATE SEQUENCE IF NOT EXISTS {sequence}')
+        op.execute(f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+
+    definitions = [f"id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass)"]
+    definitions += [f'{name} {ddl}' for name, ddl in columns]
+    definitions.append('created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()')
+    definitions.append(f'CONSTRAINT {new_table}_pkey PRIMARY KEY (id, created_at)')
+    for column, target in FOREIGN_KEYS.get(table, ()):
+        definitions.append(
+            f'CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) REFERENCES {target}(id) ON DELETE SET NULL'
+        )
+    op.execute(f'CREATE TABLE {new_table} ({", ".join(definitions)}) PARTITION BY RANGE (created_at)')
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {new_table} DEFAULT')
+
+    # Партиции на все месяцы с данными и на месяцы вперёд, чтобы строки не легли в партицию по умолчанию
+    today = datetime.now(UTC).date()
+    oldest = bind.scalar(sa.text(f'SELECT MIN(created_at) FROM {table}'))
+    month = date(today.year, today.month, 1)
+    if oldest is not None and oldest.date() < month:
+        month = date(oldest.year, oldest.month, 1)
+    last_month = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last_month = _next_month(last_month)
+    while month <= last_month:
+        op.execute(
+            f'CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {new_table} '
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_next_month(month).isoformat()} 00:00:00+00')"
+        )
+        month = _next_month(month)
+
+    names = ', '.join(name for name, _ddl in columns)
+    op.execute(
+        f'INSERT INTO {new_table} (id, {names}, created_at) '
+        f'SELECT id, {names}, COALESCE(created_at, now()) FROM {table}'
+    )
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {new_table}.id')
+    op.execute(f'DROP TABLE {table}')
+    op.execute(f'ALTER TABLE {new_table} RENAME TO {table}')
+    op.execute(f'ALTER TABLE {table} RENAME CONSTRAINT {new_table}_pkey TO {table}_pkey')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            if _has_table(table) and not _is_partitioned(table):
+                _partition_table(table)
+
+    for name, table, columns in INDEXES:
+        if _has_table(table) and not _has_index(table, name):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _columns in INDEXES:
+        if _has_table(table) and _has_index(table, name):
+            op.drop_index(name, table_name=table)
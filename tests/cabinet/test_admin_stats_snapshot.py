@@ -0,0 +1,73 @@
+"""
+Тесты снимка статистики админ-дашборда.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.cabinet.routes.admin_stats import _StatsSnapshot
+from app.database.crud.subscription import get_subscriptions_statistics
+
+
+async def test_snapshot_serves_cached_value_and_refreshes_in_background():
+    """Свежий снимок отдаётся без загрузки, устаревший - сразу, а обновляется в фоне."""
+    calls = []
+
+    async def loader():
+        calls.append(len(calls))
+        return len(calls)
+
+    snapshot = _StatsSnapshot(loader, ttl_seconds=60)
+
+    assert await snapshot.get() == 1
+    assert await snapshot.get() == 1
+    assert calls == [0]
+
+    snapshot._loaded_at -= 120
+    assert await snapshot.get() == 1
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert await snapshot.get() == 2
+    assert calls == [0, 1]
+
+
+async def test_snapshot_loads_once_for_concurrent_first_requests():
+    """Одновременные первые запросы ждут одну загрузку."""
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 'stats'
+
+    snapshot = _StatsSnapshot(loader, ttl_seconds=60)
+    results = await asyncio.gather(*(snapshot.get() for _ in range(5)))
+
+    assert results == ['stats'] * 5
+    assert calls == 1
+
+
+async def test_subscription_statistics_use_single_filtered_query(monkeypatch):
+    """Счётчики подписок считаются одним запросом с FILTER."""
+    monkeypatch.setattr(
+        'app.database.crud.subscription_conversion.get_conversion_statistics',
+        AsyncMock(return_value={'conversion_rate': 12.5, 'month_conversions': 3}),
+    )
+    result = MagicMock()
+    result.one.return_value = SimpleNamespace(total=10, active=6, trial=2, today=1, week=3, month=5)
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+
+    stats = await get_subscriptions_statistics(db)
+
+    db.execute.assert_awaited_once()
+    sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert sql.count('FILTER (WHERE') == 5
+    assert stats['paid_subscriptions'] == 4
+    assert stats['purchased_month'] == 5
+    assert stats['trial_to_paid_conversion'] == 12.5
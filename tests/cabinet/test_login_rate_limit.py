@@ -0,0 +1,67 @@
+"""Tests for failed email login limits in the cabinet."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.cabinet.dependencies import get_client_ip
+from app.cabinet.routes import auth as auth_routes
+from app.cabinet.schemas.auth import EmailLoginRequest
+from app.utils.rate_limiter import CABINET_LOGIN_FAILURES, CABINET_LOGIN_IP_FAILURES, RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def limiter(monkeypatch) -> RateLimiter:
+    monkeypatch.setattr(auth_routes.settings, 'RATE_LIMIT_BACKEND', 'memory')
+    limiter = RateLimiter()
+    monkeypatch.setattr(auth_routes, 'rate_limiter', limiter)
+    return limiter
+
+
+def _db() -> AsyncMock:
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = None
+    db = AsyncMock()
+    db.execute.return_value = result
+    return db
+
+
+def _http_request(ip: str, headers: dict[str, str] | None = None) -> SimpleNamespace:
+    return SimpleNamespace(client=SimpleNamespace(host=ip), headers=headers or {})
+
+
+async def _login(email: str, ip: str) -> int:
+    request = EmailLoginRequest(email=email, password='wrong-password')
+    with pytest.raises(HTTPException) as error:
+        await auth_routes.login_email(request, _http_request(ip), db=_db())
+    return error.value.status_code
+
+
+async def test_failures_from_one_address_do_not_lock_out_others() -> None:
+    for _ in range(CABINET_LOGIN_FAILURES.limit):
+        assert await _login('owner@example.com', '93.184.216.34') == 401
+
+    assert await _login('owner@example.com', '93.184.216.34') == 429
+    assert await _login('owner@example.com', '93.184.216.35') == 401
+
+
+def test_client_ip_trusts_forwarded_headers_only_from_configured_proxies(monkeypatch) -> None:
+    forwarded = {'X-Forwarded-For': '1.1.1.1, 93.184.216.34'}
+
+    # Без настроенных прокси адрес частной сети - это прокси, а не клиент
+    assert get_client_ip(_http_request('172.18.0.2', forwarded)) is None
+    assert get_client_ip(_http_request('8.8.8.8', forwarded)) == '8.8.8.8'
+
+    monkeypatch.setattr(auth_routes.settings, 'CABINET_TRUSTED_PROXY_NETWORKS', '172.16.0.0/12')
+    assert get_client_ip(_http_request('172.18.0.2', forwarded)) == '93.184.216.34'
+    assert get_client_ip(_http_request('172.18.0.2', {'X-Real-IP': '93.184.216.35'})) == '93.184.216.35'
+    assert get_client_ip(_http_request('172.18.0.2')) is None
+
+
+async def test_ip_limit_is_skipped_without_trusted_client_ip() -> None:
+    for index in range(CABINET_LOGIN_IP_FAILURES.limit):
+        assert await _login(f'user{index}@example.com', '172.18.0.2') == 401
+
+    assert await _login('owner@example.com', '172.18.0.2') == 401
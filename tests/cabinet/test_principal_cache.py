@@ -0,0 +1,120 @@
+"""
+Тесты кеша авторизованного пользователя кабинета.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.cabinet import dependencies
+from app.cabinet.auth.jwt_handler import create_access_token
+from app.cabinet.services import principal_cache
+from app.cabinet.services.principal_cache import CabinetPrincipal
+from app.database.models import User
+
+
+class _FakeCache:
+    def __init__(self):
+        self.hashes: dict[str, dict[str, str]] = {}
+
+    async def get_hash(self, name, key=None):
+        value = self.hashes.get(name, {})
+        return value.get(key) if key else value
+
+    async def set_hash(self, name, mapping, expire=None):
+        self.hashes.setdefault(name, {}).update(mapping)
+        return True
+
+    async def delete(self, key):
+        return self.hashes.pop(key, None) is not None
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    fake = _FakeCache()
+    monkeypatch.setattr(principal_cache, 'cache', fake)
+    monkeypatch.setattr('app.cabinet.dependencies.settings.CABINET_PRINCIPAL_CACHE_TTL_SECONDS', 30)
+    monkeypatch.setattr('app.cabinet.dependencies.settings.CHANNEL_IS_REQUIRED_SUB', False)
+    monkeypatch.setattr(dependencies.maintenance_service, 'is_maintenance_active', lambda: False)
+    return fake
+
+
+def _credentials(user_id: int) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme='Bearer', credentials=create_access_token(user_id))
+
+
+def _principal(user_id: int, status: str = 'active') -> CabinetPrincipal:
+    return CabinetPrincipal(
+        user_id=user_id,
+        telegram_id=100,
+        username='user',
+        email=None,
+        status=status,
+        is_admin=False,
+        is_blacklisted=False,
+        blacklist_reason=None,
+        cached_at=time.time(),
+    )
+
+
+async def test_principal_cache_hit_skips_database(fake_cache, monkeypatch):
+    """Повторный запрос с тем же токеном не обращается к БД."""
+    calls = []
+
+    async def fake_get_user_by_id(db, user_id):
+        calls.append(user_id)
+        return SimpleNamespace(
+            id=user_id, telegram_id=None, username=None, email=None, email_verified=False, status='active'
+        )
+
+    monkeypatch.setattr(dependencies, 'get_user_by_id', fake_get_user_by_id)
+    credentials = _credentials(7)
+
+    first = await dependencies.get_current_cabinet_principal(credentials, db=None)
+    second = await dependencies.get_current_cabinet_principal(credentials, db=None)
+
+    assert first.user_id == second.user_id == 7
+    assert calls == [7]
+
+
+async def test_cached_inactive_principal_is_rejected(fake_cache, monkeypatch):
+    """Закешированный заблокированный статус даёт 403 без похода в БД."""
+    credentials = _credentials(8)
+    token_id = principal_cache.get_token_id(dependencies.get_token_payload(credentials.credentials))
+    await principal_cache.store_principal(_principal(8, status='blocked'), token_id)
+
+    async def fail_get_user_by_id(db, user_id):
+        raise AssertionError('DB must not be queried')
+
+    monkeypatch.setattr(dependencies, 'get_user_by_id', fail_get_user_by_id)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await dependencies.get_current_cabinet_principal(credentials, db=None)
+
+    assert exc_info.value.status_code == 403
+
+
+async def test_status_change_invalidates_principal_after_commit(fake_cache):
+    """Коммит с изменением статуса пользователя сбрасывает его кеш."""
+    await principal_cache.store_principal(_principal(1), 'token')
+    engine = create_engine('sqlite://')
+    User.__table__.create(engine)
+
+    with Session(engine) as session:
+        session.add(User(id=1, telegram_id=100, status='active', language='ru'))
+        session.commit()
+        await asyncio.sleep(0)
+        await principal_cache.store_principal(_principal(1), 'token')
+
+        user = session.get(User, 1)
+        user.status = 'blocked'
+        session.commit()
+
+    await asyncio.sleep(0)
+    assert await principal_cache.get_cached_principal(1, 'token') is None
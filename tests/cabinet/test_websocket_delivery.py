@@ -0,0 +1,91 @@
+"""
+Тесты доставки WebSocket-уведомлений кабинета.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.cabinet.routes.websocket import CabinetConnectionManager
+
+
+class _FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.sent: list[dict] = []
+        self.closed_code: int | None = None
+        self._delay = delay
+
+    async def send_text(self, data: str) -> None:
+        if self._delay:
+            await asyncio.sleep(self._delay)
+        self.sent.append(json.loads(data))
+
+    async def close(self, code: int = 1000, reason: str = '') -> None:
+        self.closed_code = code
+
+
+@pytest.fixture
+def small_queue(monkeypatch):
+    monkeypatch.setattr('app.cabinet.routes.websocket.settings.CABINET_WS_SEND_QUEUE_SIZE', 2)
+    monkeypatch.setattr('app.cabinet.routes.websocket.settings.CABINET_WS_SEND_TIMEOUT_SECONDS', 5.0)
+
+
+async def test_send_to_user_and_admins(small_queue):
+    """Сообщения доходят до всех подключений пользователя и до админов."""
+    manager = CabinetConnectionManager()
+    user_ws, second_ws, admin_ws = _FakeWebSocket(), _FakeWebSocket(), _FakeWebSocket()
+
+    await manager.connect(user_ws, 1, is_admin=False)
+    await manager.connect(second_ws, 1, is_admin=False)
+    await manager.connect(admin_ws, 2, is_admin=True)
+
+    await manager.send_to_user(1, {'type': 'balance.topup'})
+    await manager.send_to_admins({'type': 'ticket.new'})
+    await asyncio.sleep(0.01)
+
+    assert user_ws.sent == [{'type': 'balance.topup'}]
+    assert second_ws.sent == [{'type': 'balance.topup'}]
+    assert admin_ws.sent == [{'type': 'ticket.new'}]
+    assert manager.get_local_presence() == {1: 2, 2: 1}
+
+    for ws, user_id in ((user_ws, 1), (second_ws, 1), (admin_ws, 2)):
+        await manager.disconnect(ws, user_id)
+    assert manager.get_local_presence() == {}
+
+
+async def test_slow_consumer_is_evicted_without_blocking_others(small_queue):
+    """Переполненная очередь медленного клиента приводит к его отключению."""
+    manager = CabinetConnectionManager()
+    slow_ws, fast_ws = _FakeWebSocket(delay=1.0), _FakeWebSocket()
+
+    await manager.connect(slow_ws, 1, is_admin=True)
+    await manager.connect(fast_ws, 2, is_admin=True)
+
+    for index in range(5):
+        await manager.send_to_admins({'n': index})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+
+    assert [message['n'] for message in fast_ws.sent] == [0, 1, 2, 3, 4]
+    assert slow_ws.closed_code == CabinetConnectionManager.SLOW_CONSUMER_CLOSE_CODE
+    assert manager.get_local_presence() == {2: 1}
+    assert manager.evicted_count == 1
+
+    await manager.disconnect(fast_ws, 2)
+
+
+async def test_presence_counts(small_queue):
+    """Сводка присутствия считает пользователей и подключения."""
+    manager = CabinetConnectionManager()
+    ws = _FakeWebSocket()
+    await manager.connect(ws, 7, is_admin=False)
+
+    counts = await manager.get_presence_counts()
+
+    assert counts['users'] == 1
+    assert counts['connections'] == 1
+    assert await manager.is_user_online(7)
+    assert not await manager.is_user_online(8)
+
+    await manager.disconnect(ws, 7)
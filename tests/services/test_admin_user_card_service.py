@@ -0,0 +1,178 @@
+"""Тесты загрузчика карточки пользователя для админки."""
+
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services import admin_user_card_service as card_module
+from app.services.admin_user_card_service import (
+    AdminUserCardService,
+    PanelUserSnapshot,
+    ReferralSummary,
+    UserCardStats,
+)
+
+
+def _user(**overrides) -> SimpleNamespace:
+    params = {
+        'id': 7,
+        'remnawave_uuid': 'uuid-7',
+        'telegram_id': 700,
+        'email': None,
+        'subscription': None,
+        'created_at': datetime.now(UTC) - timedelta(days=3),
+    }
+    params.update(overrides)
+    return SimpleNamespace(**params)
+
+
+@pytest.fixture
+def service(monkeypatch) -> AdminUserCardService:
+    monkeypatch.setattr(card_module.settings, 'ADMIN_USER_CARD_CACHE_TTL_SECONDS', 30)
+    service = AdminUserCardService()
+    referrer = SimpleNamespace(id=1, full_name='Referrer')
+    monkeypatch.setattr(service, '_load_user', AsyncMock(return_value=(_user(), referrer)))
+    monkeypatch.setattr(service, '_load_stats', AsyncMock(return_value=UserCardStats(transactions_count=5)))
+    return service
+
+
+@pytest.mark.asyncio
+async def test_stats_are_cached_until_invalidated(service) -> None:
+    db = AsyncMock()
+
+    first = await service.load(db, 7)
+    second = await service.load(db, 7)
+
+    assert first.stats.transactions_count == 5
+    assert second.referrer.full_name == 'Referrer'
+    assert second.registration_days == 3
+    assert service._load_stats.await_count == 1
+    assert service._load_user.await_count == 2
+
+    service.invalidate(7)
+    await service.load(db, 7)
+    assert service._load_stats.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_missing_user_returns_none(service) -> None:
+    service._load_user.return_value = None
+
+    assert await service.load(AsyncMock(), 7) is None
+    service._load_stats.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_top_referrals_are_loaded_only_when_requested(service, monkeypatch) -> None:
+    top = [ReferralSummary(user_id=8, full_name='Referral', earned_kopeks=500, is_active=True)]
+    load_top = AsyncMock(return_value=top)
+    monkeypatch.setattr(service, '_load_top_referrals', load_top)
+
+    assert (await service.load(AsyncMock(), 7)).top_referrals == []
+    load_top.assert_not_awaited()
+
+    service._load_stats.return_value = UserCardStats(referrals_count=3)
+    service.invalidate(7)
+    card = await service.load(AsyncMock(), 7, top_referrals=5)
+
+    assert card.top_referrals == top
+    load_top.assert_awaited_once()
+    assert load_top.await_args.args[1:] == (7, 5)
+
+
+@pytest.mark.asyncio
+async def test_panel_snapshot_is_cached_until_invalidated(service, monkeypatch) -> None:
+    fetch = AsyncMock(return_value=PanelUserSnapshot(subscription_url='https://sub', used_traffic_bytes=10))
+    monkeypatch.setattr(service, '_fetch_panel_snapshot', fetch)
+
+    snapshot = await service.get_panel_snapshot(7, 'uuid-7', 700, None)
+    assert await service.get_panel_snapshot(7, 'uuid-7', 700, None) is snapshot
+    fetch.assert_awaited_once_with(7, 'uuid-7', 700, None)
+
+    # Действие админки над пользователем: лимиты и трафик перечитываются из панели
+    service.invalidate(7)
+    await service.get_panel_snapshot(7, 'uuid-7', 700, None)
+    assert fetch.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_panel_errors_are_not_cached(service, monkeypatch) -> None:
+    fetch = AsyncMock(side_effect=[RuntimeError('panel is down'), PanelUserSnapshot()])
+    monkeypatch.setattr(service, '_fetch_panel_snapshot', fetch)
+
+    assert await service.get_panel_snapshot(7, None, 700, None) is None
+    assert await service.get_panel_snapshot(7, None, 700, None) == PanelUserSnapshot()
+
+
+@pytest.mark.asyncio
+async def test_load_stats_sums_referral_earnings_separately_from_transactions() -> None:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.database.models import (
+        AdvertisingCampaign,
+        AdvertisingCampaignRegistration,
+        ReferralEarning,
+        Subscription,
+        Transaction,
+        TransactionType,
+        User,
+    )
+
+    engine = create_engine('sqlite://')
+    User.metadata.create_all(
+        engine,
+        tables=[
+            model.__table__
+            for model in (
+                User,
+                Subscription,
+                Transaction,
+                ReferralEarning,
+                AdvertisingCampaign,
+                AdvertisingCampaignRegistration,
+            )
+        ],
+    )
+
+    now = datetime.now(UTC)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                User(id=1, telegram_id=10, referral_code='refA'),
+                User(id=2, telegram_id=20, referral_code='refB', referred_by_id=1),
+                User(id=3, telegram_id=30, referral_code='refC', referred_by_id=1),
+            ]
+        )
+        session.add_all(
+            [
+                # Комиссия зачисляется на баланс как пополнение
+                Transaction(user_id=1, type=TransactionType.DEPOSIT.value, amount_kopeks=3000),
+                Transaction(user_id=1, type=TransactionType.REFERRAL_REWARD.value, amount_kopeks=700),
+                Transaction(user_id=1, type=TransactionType.SUBSCRIPTION_PAYMENT.value, amount_kopeks=10000),
+                ReferralEarning(user_id=1, referral_id=2, amount_kopeks=3000, reason='referral_commission'),
+                ReferralEarning(
+                    user_id=1,
+                    referral_id=3,
+                    amount_kopeks=2000,
+                    reason='referral_commission',
+                    created_at=now - timedelta(days=60),
+                ),
+            ]
+        )
+        session.commit()
+
+        db = SimpleNamespace(execute=AsyncMock(side_effect=session.execute))
+        stats = await AdminUserCardService._load_stats(db, 1)
+
+    assert stats == UserCardStats(
+        transactions_count=3,
+        total_spent_kopeks=10000,
+        purchase_count=1,
+        referrals_count=2,
+        referral_earnings_kopeks=5000,
+        referral_month_earnings_kopeks=3000,
+        referral_reward_kopeks=700,
+    )
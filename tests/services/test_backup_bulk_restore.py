@@ -0,0 +1,157 @@
+"""
+Тесты пакетного восстановления бекапов.
+"""
+
+import gzip
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from app.database.models import PromoGroup, server_squad_promo_groups
+from app.services import backup_service as backup_module
+from app.services.backup_service import BackupService
+
+
+def _make_session(dialect_name: str) -> MagicMock:
+    session = MagicMock()
+    session.get_bind.return_value = SimpleNamespace(dialect=SimpleNamespace(name=dialect_name))
+    session.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def _begin_nested():
+        yield
+
+    session.begin_nested = _begin_nested
+    return session
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr('app.services.backup_service.settings.BACKUP_LOCATION', str(tmp_path / 'backups'))
+    return BackupService()
+
+
+def test_upsert_statement_uses_on_conflict_update(service):
+    """Для таблиц с PK строится INSERT ... ON CONFLICT DO UPDATE по не-ключевым колонкам."""
+    stmt = service._build_upsert_statement(
+        PromoGroup.__table__,
+        ['id'],
+        ('id', 'name'),
+        update_existing=True,
+        is_postgres=True,
+        values=[{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}],
+    )
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert 'ON CONFLICT (id) DO UPDATE SET name = excluded.name' in sql
+    assert sql.count('VALUES') == 1
+
+
+def test_association_statement_ignores_existing_rows(service):
+    """Связи вставляются с ON CONFLICT DO NOTHING."""
+    stmt = service._build_upsert_statement(
+        server_squad_promo_groups,
+        ['server_squad_id', 'promo_group_id'],
+        ('promo_group_id', 'server_squad_id'),
+        update_existing=False,
+        is_postgres=True,
+    )
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert 'ON CONFLICT (server_squad_id, promo_group_id) DO NOTHING' in sql
+
+
+def test_apply_fk_remaps_nulls_missing_references():
+    """Отсутствующие тарифы заменяются на NULL одной операцией над чанком."""
+    rows = [{'id': 1, 'tariff_id': 5}, {'id': 2, 'tariff_id': 7}, {'id': 3, 'tariff_id': None}]
+
+    BackupService._apply_fk_remaps('subscriptions', rows, {'tariff_id': {5}})
+
+    assert [row['tariff_id'] for row in rows] == [5, None, None]
+
+
+async def test_bulk_upsert_sqlite_uses_executemany(service):
+    """На SQLite весь чанк уходит одним executemany, дубликаты PK схлопываются."""
+    session = _make_session('sqlite')
+    rows = [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'id': 1, 'name': 'c'}]
+
+    restored = await service._bulk_upsert_chunk(session, PromoGroup.__table__, 'promo_groups', rows)
+
+    assert restored == 2
+    session.execute.assert_awaited_once()
+    _, params = session.execute.await_args.args
+    assert params == [{'id': 1, 'name': 'c'}, {'id': 2, 'name': 'b'}]
+
+
+async def test_bulk_upsert_falls_back_to_rows_on_conflict(service):
+    """При конфликте уникального ключа пакет разбирается построчно, проблемная строка пропускается."""
+    session = _make_session('postgresql')
+    error = IntegrityError('stmt', {}, Exception('duplicate'))
+    session.execute.side_effect = [error, None, error]
+    rows = [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'a'}]
+
+    restored = await service._bulk_upsert_chunk(session, PromoGroup.__table__, 'promo_groups', rows)
+
+    assert restored == 1
+    assert session.execute.await_count == 3
+
+
+def _write_ndjson_dump(dump_dir, chunks: list[list[dict]], rows: int) -> None:
+    entry_chunks = []
+    for index, records in enumerate(chunks):
+        name = f'promo_groups_{index}.ndjson.gz'
+        with gzip.open(dump_dir / name, 'wt', encoding='utf-8') as chunk_file:
+            chunk_file.writelines(json.dumps(record) + '\n' for record in records)
+        entry_chunks.append({'path': name})
+    manifest = {'tables': [{'table': 'promo_groups', 'rows': rows, 'chunks': entry_chunks}], 'associations': []}
+    (dump_dir / 'manifest.json').write_text(json.dumps(manifest), encoding='utf-8')
+
+
+async def test_ndjson_restore_reads_chunks_while_restoring(service, tmp_path, monkeypatch):
+    """Чанки NDJSON читаются по одному во время восстановления таблицы, а не все заранее."""
+    _write_ndjson_dump(tmp_path, [[{'id': 1}, {'id': 2}], [{'id': 3}]], rows=3)
+    reads = []
+    read_chunk = backup_module._read_ndjson_chunk
+    monkeypatch.setattr(
+        backup_module, '_read_ndjson_chunk', lambda path, sha: reads.append(path.name) or read_chunk(path, sha)
+    )
+
+    seen = []
+
+    async def restore_payload(backup_data, association_data, metadata, clear_existing):
+        assert reads == []
+        async for chunk in backup_data['promo_groups']:
+            seen.append((len(reads), [record['id'] for record in chunk]))
+
+    monkeypatch.setattr(service, '_restore_database_payload', restore_payload)
+    await service._restore_postgres_ndjson(tmp_path, clear_existing=False)
+
+    assert seen == [(1, [1, 2]), (2, [3])]
+
+
+async def test_ndjson_restore_rejects_row_count_mismatch(tmp_path):
+    _write_ndjson_dump(tmp_path, [[{'id': 1}]], rows=2)
+    manifest = json.loads((tmp_path / 'manifest.json').read_text(encoding='utf-8'))
+    records = backup_module._TableRecords.from_manifest(tmp_path, manifest['tables'][0])
+
+    with pytest.raises(ValueError, match='promo_groups'):
+        async for _ in records:
+            pass
+
+
+async def test_bulk_upsert_counts_only_written_rows(service):
+    """Связи, пропущенные ON CONFLICT DO NOTHING, не считаются восстановленными."""
+    session = _make_session('postgresql')
+    session.execute.return_value = SimpleNamespace(rowcount=1)
+    rows = [{'server_squad_id': 1, 'promo_group_id': 1}, {'server_squad_id': 1, 'promo_group_id': 2}]
+
+    restored = await service._bulk_upsert_chunk(
+        session, server_squad_promo_groups, 'server_squad_promo_groups', rows, update_existing=False
+    )
+
+    assert restored == 1
@@ -0,0 +1,60 @@
+"""
+Тесты потокового NDJSON-экспорта бекапов.
+"""
+
+import gzip
+import json
+from datetime import UTC, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.services.backup_service import _read_ndjson_chunk, _serialize_backup_value, _TableChunkWriter
+
+
+def test_serialize_backup_value_matches_legacy_rules():
+    """Значения приводятся к тем же представлениям, что и в ORM-экспорте."""
+    moment = datetime(2024, 1, 1, 12, 0, tzinfo=UTC)
+
+    assert _serialize_backup_value(moment) == moment.isoformat()
+    assert _serialize_backup_value(Decimal('10.50')) == 10.5
+    assert _serialize_backup_value(float('nan')) == 0.0
+    assert _serialize_backup_value({'a': 1}) == '{"a": 1}'
+    assert _serialize_backup_value([]) is None
+    assert _serialize_backup_value(True) is True
+
+
+def test_chunk_writer_splits_rows_and_records_checksums(tmp_path):
+    """Строки режутся на чанки заданного размера, манифест содержит счётчики и sha256."""
+    writer = _TableChunkWriter(tmp_path, 'users', ['id', 'name'], chunk_rows=2)
+    writer.write_rows([(1, 'a'), (2, 'b')])
+    writer.write_rows([(3, 'c')])
+    entry = writer.close()
+
+    assert entry['rows'] == 3
+    assert [chunk['rows'] for chunk in entry['chunks']] == [2, 1]
+
+    restored = []
+    for chunk in entry['chunks']:
+        restored.extend(_read_ndjson_chunk(tmp_path / chunk['path'], chunk['sha256']))
+
+    assert restored == [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'id': 3, 'name': 'c'}]
+
+
+def test_chunk_writer_empty_table_has_no_chunks(tmp_path):
+    """Для пустой таблицы файлы не создаются."""
+    writer = _TableChunkWriter(tmp_path, 'tickets', ['id'], chunk_rows=10)
+    entry = writer.close()
+
+    assert entry == {'table': 'tickets', 'columns': ['id'], 'rows': 0, 'chunks': []}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_read_chunk_rejects_checksum_mismatch(tmp_path):
+    """Повреждённый чанк не принимается при восстановлении."""
+    chunk_path = tmp_path / 'users.00000.ndjson.gz'
+    with gzip.open(chunk_path, 'wt', encoding='utf-8') as chunk_file:
+        chunk_file.write(json.dumps({'id': 1}) + '\n')
+
+    with pytest.raises(ValueError, match='Контрольная сумма'):
+        _read_ndjson_chunk(chunk_path, '0' * 64)
@@ -0,0 +1,164 @@
+"""
+Тесты лидерборда конкурсов в sorted set-ах Redis.
+"""
+
+import random
+
+import pytest
+
+from app.services import contest_leaderboard as leaderboard_module
+from app.services.contest_leaderboard import (
+    ContestEventScore,
+    ContestLeaderboardStore,
+    LeaderboardEntry,
+    decode_score,
+    encode_score,
+)
+
+
+class _FakeSortedSets:
+    """Минимальная реализация команд sorted set, которые читает лидерборд."""
+
+    def __init__(self, sets):
+        self.sets = sets
+
+    def _ordered(self, key):
+        # Redis упорядочивает равные счёты по члену лексикографически
+        return sorted(self.sets.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    async def zrevrange(self, key, start, end, withscores=False):
+        rows = self._ordered(key)[::-1]
+        return rows[start:] if end == -1 else rows[start : end + 1]
+
+    async def zrangebyscore(self, key, low, high, withscores=False):
+        rows = [row for row in self._ordered(key) if low <= row[1] <= high]
+        return rows if withscores else [member for member, _ in rows]
+
+
+@pytest.fixture
+def store(monkeypatch):
+    entries = [(1, 3, 500), (2, 3, 500), (10, 3, 500), (4, 5, 0), (5, 3, 900), (6, 1, 0)]
+    sets = {'contest_lb:7': {str(member): float(encode_score(count, amount)) for member, count, amount in entries}}
+    monkeypatch.setattr(leaderboard_module.cache, 'redis_client', _FakeSortedSets(sets))
+    return ContestLeaderboardStore()
+
+
+def test_score_orders_like_sql_leaderboard():
+    rng = random.Random(42)
+    rows = [(rng.randint(0, 50), rng.randint(0, 10**9)) for _ in range(500)]
+
+    by_score = sorted(rows, key=lambda row: encode_score(*row), reverse=True)
+
+    assert by_score == sorted(rows, key=lambda row: (-row[0], -row[1]))
+    assert all(decode_score(encode_score(*row)) == row for row in rows)
+
+
+async def test_top_includes_ties_at_boundary_by_member_id(store):
+    top = await store.top(7, limit=3)
+
+    assert top == [LeaderboardEntry(4, 5, 0), LeaderboardEntry(5, 3, 900), LeaderboardEntry(1, 3, 500)]
+    assert [entry.member_id for entry in await store.top(7)] == [4, 5, 1, 2, 10, 6]
+
+
+class _FakeLeaderboardRedis:
+    """Строки, хеши и sorted set-ы с эмуляцией скриптов лидерборда."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = str(value)
+
+    def pipeline(self, transaction=True):
+        fake = self
+
+        class _Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def zadd(self, key, mapping):
+                self.calls.append(lambda: fake.data.setdefault(key, {}).update(mapping))
+
+            def hset(self, key, mapping):
+                self.calls.append(lambda: fake.data.setdefault(key, {}).update(mapping))
+
+            def expire(self, key, seconds):
+                pass
+
+            async def execute(self):
+                for call in self.calls:
+                    call()
+
+        return _Pipeline()
+
+    async def eval(self, script, numkeys, *args):
+        keys, argv = args[:numkeys], args[numkeys:]
+        if script == leaderboard_module._PUBLISH_SCRIPT:
+            if self.data.get(keys[4]) != argv[0]:
+                return 0
+            for key in keys[1:5]:
+                self.data.pop(key, None)
+            for index in range(5, 8):
+                if keys[index] in self.data:
+                    self.data[keys[index - 4]] = self.data.pop(keys[index])
+            self.data[keys[0]] = '1'
+            return 1
+        if script == leaderboard_module._RECORD_SCRIPT:
+            if keys[0] not in self.data:
+                self.data.pop(keys[3], None)
+                return 0
+            events = self.data.setdefault(keys[2], {})
+            amount = int(argv[2])
+            previous = events.get(argv[0])
+            delta = amount - previous if previous is not None else argv[3] + amount
+            scores = self.data.setdefault(keys[1], {})
+            scores[argv[1]] = scores.get(argv[1], 0) + delta
+            events[argv[0]] = amount
+            return 1
+        raise AssertionError('unexpected script')
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = _FakeLeaderboardRedis()
+    monkeypatch.setattr(leaderboard_module.cache, 'redis_client', fake)
+    monkeypatch.setattr(leaderboard_module.cache, '_connected', True)
+    return fake
+
+
+async def test_event_already_in_rebuild_is_not_counted_twice(redis):
+    store = ContestLeaderboardStore()
+    events = [ContestEventScore(1, 5, 300), ContestEventScore(2, 5, 200)]
+
+    async def loader():
+        return events, []
+
+    assert await store.ensure(7, loader)
+    # Зачёт события, которое уже попало в пересборку, и обновление его суммы
+    await store.record_event(7, 2, 5, 200)
+    await store.record_event(7, 2, 5, 250)
+    await store.record_event(7, 3, 5, 0)
+
+    assert decode_score(redis.data['contest_lb:7']['5']) == (3, 550)
+
+
+async def test_rebuild_is_dropped_when_event_is_recorded_during_load(redis):
+    store = ContestLeaderboardStore()
+
+    async def loader():
+        # Событие зачтено, пока пересборка читала БД: неизвестно, попало ли оно в выборку
+        await store.record_event(7, 3, 5, 100)
+        return [ContestEventScore(1, 5, 300)], []
+
+    assert not await store.ensure(7, loader)
+    assert 'contest_lb:7:ready' not in redis.data
+    assert 'contest_lb:7' not in redis.data
+
+    async def fresh_loader():
+        return [ContestEventScore(1, 5, 300), ContestEventScore(3, 5, 100)], []
+
+    assert await store.ensure(7, fresh_loader)
+    assert decode_score(redis.data['contest_lb:7']['5']) == (2, 400)
@@ -0,0 +1,85 @@
+"""Тесты срока хранения журналов мониторинга и кеша типов событий."""
+
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.database.models import MonitoringLog, SupportAuditLog
+from app.services import log_retention_service as retention_module
+from app.services.monitoring_service import MonitoringService
+
+
+def _engine(conn) -> SimpleNamespace:
+    @asynccontextmanager
+    async def begin():
+        yield conn
+
+    return SimpleNamespace(begin=begin)
+
+
+def _sqlite_conn(rowcounts: list[int]) -> SimpleNamespace:
+    results = [SimpleNamespace(rowcount=count) for count in rowcounts]
+    return SimpleNamespace(dialect=SimpleNamespace(name='sqlite'), execute=AsyncMock(side_effect=results))
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_in_batches_until_short_batch(monkeypatch) -> None:
+    conn = _sqlite_conn([2, 2, 1])
+    monkeypatch.setattr(retention_module, 'engine', _engine(conn))
+
+    result = await retention_module.purge_logs_before(MonitoringLog, datetime.now(UTC), batch_size=2)
+
+    assert result.deleted_rows == 5
+    assert result.dropped_partitions == []
+    assert conn.execute.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_zero_retention_keeps_audit_log(monkeypatch) -> None:
+    conn = _sqlite_conn([])
+    monkeypatch.setattr(retention_module, 'engine', _engine(conn))
+    monkeypatch.setattr(retention_module.settings, 'SUPPORT_AUDIT_LOGS_RETENTION_DAYS', 0)
+
+    result = await retention_module.maintain_log_table(SupportAuditLog)
+
+    assert result.table == 'support_audit_logs'
+    assert result.deleted_rows == 0
+    conn.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_event_types_are_cached_and_extended_on_write() -> None:
+    service = MonitoringService()
+    rows = MagicMock()
+    rows.fetchall.return_value = [('monitoring_cycle_completed',), ('expired_subscriptions_processed',)]
+    db = AsyncMock()
+    db.add = MagicMock()
+    db.execute.return_value = rows
+
+    assert await service.get_monitoring_event_types(db) == [
+        'expired_subscriptions_processed',
+        'monitoring_cycle_completed',
+    ]
+    await service._log_monitoring_event(db, 'manual_check_subscriptions', 'Проверка')
+    assert 'manual_check_subscriptions' in await service.get_monitoring_event_types(db)
+    assert db.execute.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_log_maintenance_runs_once_a_day(monkeypatch) -> None:
+    from app.services import monitoring_service as monitoring_module
+
+    maintain = AsyncMock(return_value=[retention_module.LogRetentionResult(table='monitoring_logs', deleted_rows=3)])
+    monkeypatch.setattr(monitoring_module, 'maintain_log_tables', maintain)
+    service = MonitoringService()
+    service._event_types = {'monitoring_cycle_completed'}
+
+    await service._maintain_log_tables()
+    await service._maintain_log_tables()
+
+    maintain.assert_awaited_once()
+    # Удалённые строки могли унести типы событий — список перечитается из БД
+    assert service._event_types is None
@@ -0,0 +1,96 @@
+"""
+Тесты индекса чеков NaloGO и пакетной отправки очереди.
+"""
+
+import asyncio
+from collections import defaultdict
+from datetime import UTC, date, datetime
+from unittest.mock import AsyncMock
+
+from app.services import nalogo_queue_service as queue_module
+from app.services.nalogo_queue_service import NalogoQueueService
+from app.services.nalogo_service import IncomeIndex, NaloGoService
+
+
+def _income(receipt_uuid, amount, operation_time, name=None):
+    return {'approvedReceiptUuid': receipt_uuid, 'totalAmount': amount, 'operationTime': operation_time, 'name': name}
+
+
+def _service(pages):
+    service = NaloGoService.__new__(NaloGoService)
+    service.configured = True
+    service._income_indexes = {}
+    service._income_index_locks = defaultdict(asyncio.Lock)
+    service.get_incomes = AsyncMock(side_effect=pages)
+    return service
+
+
+def test_index_matches_nearest_unclaimed_income_once():
+    paid_at = datetime(2025, 1, 10, 12, 0, tzinfo=UTC)
+    index = IncomeIndex(
+        [
+            _income('far', '100.00', '2025-01-10T12:30:00+00:00'),
+            _income('near', '100.00', '2025-01-10T12:04:00+00:00'),
+            _income('other-amount', '100.01', '2025-01-10T12:00:00+00:00'),
+            _income('other-name', '100.00', '2025-01-10T12:01:00+00:00', name='Пополнение (ID 2)'),
+        ]
+    )
+
+    assert index.find(10000, paid_at, 600, name='Пополнение (ID 1)') == 'near'
+    assert index.find(10000, paid_at, 600, name='Пополнение (ID 1)') is None
+    assert index.find(10000, paid_at, 600) == 'other-name'
+
+
+async def test_income_index_is_paginated_and_cached():
+    """Чеки за день выгружаются полностью один раз, последующие проверки идут по кешу."""
+    first_page = [_income(f'r{i}', '50', '2025-01-10T08:00:00+03:00') for i in range(100)]
+    last_page = [_income('late', '250', '2025-01-10T23:55:00+00:00')]
+    service = _service([first_page, last_page])
+
+    found = await service.find_duplicate_receipt(250.0, datetime(2025, 1, 10, 23, 50, tzinfo=UTC))
+    again = await service.find_duplicate_receipt(50.0, datetime(2025, 1, 10, 5, 0, tzinfo=UTC))
+
+    assert found == 'late'
+    assert again == 'r0'
+    assert service.get_incomes.await_count == 2
+    assert service.get_incomes.await_args_list[1].kwargs['offset'] == 100
+    assert service.get_incomes.await_args_list[0].kwargs['from_date'] == date(2025, 1, 9)
+
+
+async def test_failed_receipt_drops_cached_index_and_failed_fetch_is_not_cached():
+    first = [_income('r1', '50', '2025-01-10T08:00:00+00:00')]
+    retry = [*first, _income('created-on-timeout', '250', '2025-01-10T12:00:00+00:00')]
+    service = _service([None, first, retry])
+    paid_at = datetime(2025, 1, 10, 12, 0, tzinfo=UTC)
+
+    assert await service.find_duplicate_receipt(250.0, paid_at) is None
+    assert await service.find_duplicate_receipt(250.0, paid_at) is None
+    assert service.get_incomes.await_count == 2
+
+    # create_receipt упал после отправки запроса: чек мог появиться в налоговой
+    service.invalidate_income_index(paid_at)
+
+    assert await service.find_duplicate_receipt(250.0, paid_at) == 'created-on-timeout'
+    assert service.get_incomes.await_count == 3
+
+
+async def test_queue_stops_after_failure_and_returns_unsent_receipts(monkeypatch):
+    monkeypatch.setattr(queue_module.asyncio, 'sleep', AsyncMock())
+    monkeypatch.setattr(queue_module.cache, 'delete', AsyncMock())
+    monkeypatch.setattr(queue_module.settings, 'NALOGO_QUEUE_CONCURRENCY', 1)
+
+    queue = [{'payment_id': f'p{i}', 'amount': 10.0, 'amount_kopeks': 1000, 'attempts': 0} for i in range(4)]
+    nalogo = AsyncMock()
+    nalogo.get_queue_length.side_effect = lambda: len(queue)
+    nalogo.pop_receipt_from_queue.side_effect = lambda: queue.pop(0) if queue else None
+    nalogo.return_receipt_to_queue.side_effect = lambda receipt: queue.insert(0, receipt)
+    nalogo.create_receipt.side_effect = ['uuid-0', None]
+
+    service = NalogoQueueService(nalogo)
+    service._send_admin_notification = AsyncMock()
+    await service._process_pending_receipts()
+
+    assert nalogo.create_receipt.await_count == 2
+    nalogo.requeue_receipt.assert_awaited_once()
+    assert [receipt['payment_id'] for receipt in queue] == ['p2', 'p3']
+    nalogo.find_duplicate_receipt.assert_not_awaited()
@@ -0,0 +1,111 @@
+"""
+Тесты очереди платёжных callback-ов.
+"""
+
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from app.services import payment_webhook_inbox
+from app.services.payment_webhook_inbox import PaymentWebhookInbox, get_external_id
+
+
+class _FakeSession:
+    def __init__(self):
+        self.execute = AsyncMock()
+        self.commit = AsyncMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+def _event(attempts: int = 1):
+    return SimpleNamespace(
+        id=1,
+        provider='yookassa',
+        method_name='process_yookassa_webhook',
+        payload={'event': 'payment.succeeded', 'object': {'id': 'pay-1'}},
+        attempts=attempts,
+        received_at=datetime.now(UTC),
+    )
+
+
+def _inbox(service) -> PaymentWebhookInbox:
+    return PaymentWebhookInbox(service, worker_count=2, batch_size=10, max_attempts=3, retention_hours=1)
+
+
+def test_external_id_includes_payment_status():
+    """Разные статусы одного платежа не считаются повтором."""
+    waiting = {'event': 'payment.waiting_for_capture', 'object': {'id': 'pay-1'}}
+    succeeded = {'event': 'payment.succeeded', 'object': {'id': 'pay-1'}}
+
+    assert get_external_id('yookassa', succeeded) == 'pay-1:payment.succeeded'
+    assert get_external_id('yookassa', waiting) != get_external_id('yookassa', succeeded)
+    assert get_external_id('cryptobot', {'payload': {'invoice_id': 5}, 'update_type': 'invoice_paid'}) == (
+        '5:invoice_paid'
+    )
+    assert get_external_id('mulenpay', {'amount': 1}).startswith('sha256:')
+
+
+async def test_settle_commits_handler_then_marks_event_processed(monkeypatch):
+    sessions = []
+
+    def session_factory():
+        session = _FakeSession()
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(payment_webhook_inbox, 'AsyncSessionLocal', session_factory)
+    service = SimpleNamespace(process_yookassa_webhook=AsyncMock(return_value=True))
+    inbox = _inbox(service)
+
+    await inbox._settle(_event())
+
+    assert len(sessions) == 2
+    service.process_yookassa_webhook.assert_awaited_once_with(sessions[0], _event().payload)
+    sessions[0].commit.assert_awaited_once()
+    sessions[0].execute.assert_not_awaited()
+    # Отметка захвачена этим воркером: строку, перехваченную после истечения блокировки, не трогает
+    mark_sql = str(sessions[1].execute.await_args.args[0].compile(compile_kwargs={'literal_binds': True}))
+    assert "status = 'processing'" in mark_sql
+    assert 'attempts = 1' in mark_sql
+    sessions[1].commit.assert_awaited_once()
+    assert inbox.get_stats()['providers']['yookassa']['settled'] == 1
+
+
+async def test_settle_commits_handler_state_when_callback_not_settled(monkeypatch):
+    sessions = []
+
+    def session_factory():
+        session = _FakeSession()
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(payment_webhook_inbox, 'AsyncSessionLocal', session_factory)
+    service = SimpleNamespace(process_yookassa_webhook=AsyncMock(return_value=False))
+    inbox = _inbox(service)
+    inbox._reschedule = AsyncMock()
+
+    await inbox._settle(_event())
+
+    assert len(sessions) == 1
+    sessions[0].commit.assert_awaited_once()
+    inbox._reschedule.assert_awaited_once()
+
+
+async def test_settle_reschedules_until_attempts_exhausted(monkeypatch):
+    monkeypatch.setattr(payment_webhook_inbox, 'AsyncSessionLocal', _FakeSession)
+    service = SimpleNamespace(process_yookassa_webhook=AsyncMock(return_value=False))
+    inbox = _inbox(service)
+    inbox._reschedule = AsyncMock()
+
+    await inbox._settle(_event(attempts=1))
+    await inbox._settle(_event(attempts=3))
+
+    stats = inbox.get_stats()['providers']['yookassa']
+    assert stats['retried'] == 1
+    assert stats['rejected'] == 1
+    assert inbox._reschedule.await_count == 2
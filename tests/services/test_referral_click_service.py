@@ -0,0 +1,85 @@
+"""Тесты журнала переходов по реферальным ссылкам."""
+
+from datetime import UTC, date, datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.database.partitions import _add_months, drop_partitions_before, ensure_monthly_partitions, partition_name
+from app.services.referral_click_service import ReferralClickRecorder, clean_referral_code
+
+
+def _recorder(**overrides) -> ReferralClickRecorder:
+    params = {'batch_size': 2, 'flush_interval': 5.0, 'max_buffer_size': 3}
+    params.update(overrides)
+    return ReferralClickRecorder(**params)
+
+
+def test_clean_referral_code() -> None:
+    assert clean_referral_code('ref_refABC') == 'refABC'
+    assert clean_referral_code('refABC') == 'refABC'
+    assert clean_referral_code('campaign_1') == 'campaign_1'
+
+
+def test_record_keeps_only_referral_payloads() -> None:
+    recorder = _recorder()
+
+    recorder.record(1, 'campaign_1', 'start')
+    recorder.record(None, 'refABC', 'start')
+    recorder.record(2, ' ref_refABC ', 'channel_check')
+
+    assert recorder.pending == 1
+    event = recorder._buffer[0]
+    assert event['telegram_id'] == 2
+    assert event['code'] == 'refABC'
+    assert event['payload'] == 'ref_refABC'
+    assert event['source'] == 'channel_check'
+
+
+def test_record_drops_oldest_when_buffer_is_full() -> None:
+    recorder = _recorder()
+
+    for telegram_id in range(1, 6):
+        recorder.record(telegram_id, 'refABC', 'start')
+
+    assert recorder.pending == 3
+    assert recorder.dropped == 2
+    assert [event['telegram_id'] for event in recorder._buffer] == [3, 4, 5]
+    assert recorder._wakeup.is_set()
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_batches_and_keeps_failed_batch() -> None:
+    recorder = _recorder(max_buffer_size=10)
+    for telegram_id in range(1, 6):
+        recorder.record(telegram_id, 'refABC', 'start')
+
+    recorder._insert = AsyncMock(side_effect=[None, RuntimeError('db is down')])
+
+    written = await recorder.flush()
+
+    assert written == 2
+    assert recorder._insert.await_count == 2
+    # Неудачная пачка вернулась в начало буфера в исходном порядке
+    assert [event['telegram_id'] for event in recorder._buffer] == [3, 4, 5]
+
+    recorder._insert = AsyncMock()
+    assert await recorder.flush() == 3
+    assert recorder.pending == 0
+
+
+def test_partition_month_math() -> None:
+    assert partition_name('referral_click_events', date(2025, 3, 1)) == 'referral_click_events_p202503'
+    assert _add_months(date(2025, 11, 1), 2) == date(2026, 1, 1)
+    assert _add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+@pytest.mark.asyncio
+async def test_partition_maintenance_is_noop_outside_postgres() -> None:
+    conn = SimpleNamespace(dialect=SimpleNamespace(name='sqlite'), execute=AsyncMock(), scalar=AsyncMock())
+
+    assert await ensure_monthly_partitions(conn, 'referral_click_events') == []
+    assert await drop_partitions_before(conn, 'referral_click_events', datetime.now(UTC)) is None
+    conn.execute.assert_not_awaited()
+    conn.scalar.assert_not_awaited()
@@ -145,9 +145,148 @@ async def test_analyze_today(temp_log_file, sample_log_content):
     from unittest.mock import AsyncMock
 
     mock_db = AsyncMock()
+    # Журнал переходов пуст — анализ идёт по логам
+    mock_db.scalar.return_value = None
 
     report = await service.analyze_today(mock_db)
 
     # Проверяем что период установлен корректно
     today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
     assert report.analysis_period_start.date() == today.date()
+
+
+def test_scan_referral_clicks_starts_from_indexed_day(tmp_path, monkeypatch):
+    """Анализ за день читает файл с контрольной точки индекса и понимает оба формата логов."""
+    from app.services import referral_diagnostics_service as diagnostics_module
+    from app.utils import log_reader
+
+    monkeypatch.setattr(log_reader, 'INDEX_STEP_BYTES', 512)
+    lines = []
+    for day in (10, 11, 12):
+        for minute in range(30):
+            lines.append(f'2025-01-{day} 10:{minute:02d}:00 [info] [app.handlers.start] шум {minute}')
+        lines.append(
+            f"2025-01-{day} 11:00:00 [info] [app.middlewares.channel_checker] 💾 Сохранен start payload '' "
+            f'для пользователя (FSM) payload=ref_refDAY{day} telegram_id={day}00'
+        )
+    lines.append(
+        "2025-01-11 12:00:00,123 - app.handlers.start - INFO - 💾 Сохранен start payload 'refOLD' для пользователя 77"
+    )
+    log_path = tmp_path / 'bot.log'
+    log_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    clicks, total_lines, lines_in_period = diagnostics_module.scan_referral_clicks(
+        log_path, datetime(2025, 1, 11, tzinfo=UTC), datetime(2025, 1, 12, tzinfo=UTC)
+    )
+
+    assert [(click.telegram_id, click.clean_code) for click in clicks] == [(1100, 'refDAY11')]
+    assert lines_in_period == 31
+    assert total_lines < 62
+
+    clicks, _, _ = diagnostics_module.scan_referral_clicks(
+        log_path, datetime(2000, 1, 1, tzinfo=UTC), datetime(2100, 1, 1, tzinfo=UTC), skip_date_filter=True
+    )
+    assert [click.telegram_id for click in clicks] == [1000, 1100, 1200, 77]
+
+
+def test_scan_referral_clicks_reads_log_time_in_local_timezone(tmp_path, monkeypatch):
+    """Записи лога пишутся во времени TIMEZONE: период и время кликов переводятся из него в UTC."""
+    from zoneinfo import ZoneInfo
+
+    from app.services import referral_diagnostics_service as diagnostics_module
+
+    monkeypatch.setattr(diagnostics_module, 'get_local_timezone', lambda: ZoneInfo('Asia/Tokyo'))
+    log_path = tmp_path / 'bot.log'
+    log_path.write_text(
+        "2025-01-11 02:00:00 [info] [app.handlers.start] 💾 Сохранен start payload 'refEARLY' для пользователя 1\n"
+        "2025-01-11 04:00:00 [info] [app.handlers.start] 💾 Сохранен start payload 'refLATE' для пользователя 2\n",
+        encoding='utf-8',
+    )
+
+    # 18:00 UTC 10 января — это 03:00 11 января по Токио
+    clicks, _, lines_in_period = diagnostics_module.scan_referral_clicks(
+        log_path, datetime(2025, 1, 10, 18, tzinfo=UTC), datetime(2025, 1, 11, 18, tzinfo=UTC)
+    )
+
+    assert [click.telegram_id for click in clicks] == [2]
+    assert clicks[0].timestamp == datetime(2025, 1, 10, 19, tzinfo=UTC)
+    assert lines_in_period == 1
+
+
+@pytest.mark.asyncio
+async def test_find_lost_referrals_uses_single_query():
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, MagicMock
+
+    from app.services.referral_diagnostics_service import ReferralClick
+
+    click_time = datetime(2025, 1, 10, 12, tzinfo=UTC)
+    referrer = SimpleNamespace(id=1, telegram_id=10, referral_code='refA', full_name='Реферер', referred_by_id=None)
+    registered = SimpleNamespace(
+        id=2,
+        telegram_id=20,
+        referral_code='refB',
+        username='u',
+        full_name='Пользователь',
+        referred_by_id=None,
+        created_at=click_time + timedelta(minutes=1),
+    )
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = [referrer, registered]
+    db = AsyncMock()
+    db.execute.return_value = result
+
+    clicks = [
+        ReferralClick(click_time, 20, 'ref_refA', 'refA', ''),
+        ReferralClick(click_time, 30, 'refA', 'refA', ''),
+    ]
+    lost = await ReferralDiagnosticsService(log_path='unused.log')._find_lost_referrals(db, clicks)
+
+    assert db.execute.await_count == 1
+    assert [(item.telegram_id, item.registered, item.expected_referrer_id) for item in lost] == [
+        (20, True, 1),
+        (30, False, 1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_click_events_keep_lost_referral_who_clicked_again_after_registering():
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.database.models import ReferralClickEvent, User
+
+    engine = create_engine('sqlite://')
+    User.metadata.create_all(engine, tables=[User.__table__, ReferralClickEvent.__table__])
+
+    click_time = datetime(2025, 1, 10, 12, tzinfo=UTC)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                User(id=1, telegram_id=10, referral_code='refA', created_at=click_time - timedelta(days=30)),
+                User(id=2, telegram_id=20, referral_code='refB', created_at=click_time + timedelta(minutes=1)),
+            ]
+        )
+        # Повторный переход по ссылке уже после регистрации без реферера
+        session.add_all(
+            [
+                ReferralClickEvent(
+                    created_at=created_at, telegram_id=20, code='refA', payload='ref_refA', source='start'
+                )
+                for created_at in (click_time, click_time + timedelta(days=1))
+            ]
+        )
+        session.commit()
+
+        db = SimpleNamespace(execute=AsyncMock(side_effect=session.execute))
+        report = await ReferralDiagnosticsService(log_path='unused.log')._analyze_click_events(
+            db, click_time - timedelta(days=1), click_time + timedelta(days=2)
+        )
+
+    assert report.total_ref_clicks == 2
+    assert [(item.telegram_id, item.click_time, item.expected_referrer_id) for item in report.lost_referrals] == [
+        (20, click_time, 1)
+    ]
@@ -0,0 +1,127 @@
+"""
+Тесты очереди входящих вебхуков RemnaWave.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import remnawave_webhook_inbox
+from app.services.remnawave_webhook_inbox import (
+    _MAX_ATTEMPTS,
+    InboxEvent,
+    RemnaWaveWebhookInbox,
+    coalesce_events,
+    extract_user_key,
+    get_event_key,
+)
+
+
+class _FakeSession:
+    def __init__(self):
+        self.commit = AsyncMock()
+        self.rollback = AsyncMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class _FakeWebhookService:
+    def __init__(self):
+        self.calls = []
+
+    def is_admin_event(self, event_name):
+        return event_name.startswith('node.')
+
+    async def process_event(self, db, event_name, data):
+        self.calls.append((event_name, data.get('status'), db is None))
+        return True
+
+
+def _event(event_id, event_name, user_key='uuid:a', **data):
+    return InboxEvent(id=event_id, event_name=event_name, user_key=user_key, data=data)
+
+
+def test_extract_user_key_prefers_uuid():
+    assert extract_user_key({'uuid': 'abc', 'telegramId': 1}) == 'uuid:abc'
+    assert extract_user_key({'user': {'uuid': 'nested'}}) == 'uuid:nested'
+    assert extract_user_key({'telegramId': 42}) == 'tg:42'
+    assert extract_user_key({'nodeUuid': 'n'}) is None
+    assert get_event_key(b'body') == get_event_key(b'body') != get_event_key(b'other')
+
+
+def test_coalesce_keeps_latest_snapshot_and_notification_order():
+    """Из нескольких user.modified остаётся последний, уведомления сохраняют порядок."""
+    events = [
+        _event(1, 'user.modified', status='ACTIVE'),
+        _event(2, 'user.disabled', status='DISABLED'),
+        _event(3, 'user.modified', status='DISABLED'),
+        _event(4, 'user.modified', user_key='uuid:b', status='ACTIVE'),
+        _event(5, 'user.modified', status='ACTIVE'),
+        _event(6, 'node.connection_lost', user_key=None),
+    ]
+
+    sequences, coalesced = coalesce_events(events)
+
+    assert sorted(coalesced) == [1, 3]
+    by_first_id = {sequence[0].id: [event.id for event in sequence] for sequence in sequences}
+    assert by_first_id == {2: [2, 5], 4: [4], 6: [6]}
+
+
+def test_coalesce_drops_repeated_identical_events():
+    events = [
+        _event(1, 'user.expires_in_24_hours', status='ACTIVE'),
+        _event(2, 'user.expires_in_24_hours', status='ACTIVE'),
+    ]
+
+    sequences, coalesced = coalesce_events(events)
+
+    assert [[event.id for event in sequence] for sequence in sequences] == [[1]]
+    assert coalesced == [2]
+
+
+async def test_process_batch_applies_each_user_sequence_once(monkeypatch):
+    """Пачка обрабатывается по пользователям, итог сохраняется одним вызовом."""
+    monkeypatch.setattr(remnawave_webhook_inbox, 'AsyncSessionLocal', _FakeSession)
+    service = _FakeWebhookService()
+    inbox = RemnaWaveWebhookInbox(service, worker_count=2, batch_size=10, retention_hours=1)
+    inbox._store_outcome = AsyncMock()
+
+    await inbox._process_batch(
+        [
+            _event(1, 'user.modified', status='ACTIVE'),
+            _event(2, 'user.modified', status='LIMITED'),
+            _event(3, 'node.connection_lost', user_key=None),
+        ]
+    )
+
+    assert sorted(service.calls) == [('node.connection_lost', None, True), ('user.modified', 'LIMITED', False)]
+    outcome = inbox._store_outcome.await_args.args[0]
+    assert sorted(outcome.processed) == [2, 3]
+    assert outcome.coalesced == [1]
+    assert inbox.get_stats()['coalesced'] == 1
+
+
+async def test_claim_fails_rows_abandoned_too_many_times(monkeypatch):
+    """Строка, воркер которой раз за разом умирает, не перехватывается бесконечно."""
+    session = _FakeSession()
+    claimed_row = SimpleNamespace(id=2, event_name='user.modified', user_key='uuid:a', payload={}, attempts=2)
+    session.execute = AsyncMock(side_effect=[SimpleNamespace(rowcount=1), SimpleNamespace(all=lambda: [claimed_row])])
+    monkeypatch.setattr(remnawave_webhook_inbox, 'AsyncSessionLocal', lambda: session)
+    inbox = RemnaWaveWebhookInbox(_FakeWebhookService(), worker_count=1, batch_size=10, retention_hours=1)
+
+    claimed = await inbox._claim_batch()
+
+    exhaust_sql, claim_sql = (
+        str(call.args[0].compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+        for call in session.execute.await_args_list
+    )
+    assert f'attempts >= {_MAX_ATTEMPTS}' in exhaust_sql
+    assert "status='failed'" in exhaust_sql
+    assert f'attempts < {_MAX_ATTEMPTS}' in claim_sql
+    assert [(event.id, event.attempts) for event in claimed] == [(2, 2)]
+    assert inbox.get_stats()['failed'] == 1
@@ -0,0 +1,113 @@
+"""
+Тесты пакетного расчёта цен продления.
+"""
+
+import random
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app import config
+from app.config import settings
+from app.database.models import PromoGroup
+from app.services import subscription_service as subscription_service_module
+from app.services.renewal_quotes import prepare_renewal_quotes, quote_renewals
+from app.services.server_squad_catalog import ServerSquadCatalog
+from app.services.subscription_service import SubscriptionService
+
+
+_SQUADS = ('nl', 'de', 'fi', 'us', 'missing')
+
+
+def _catalog_db():
+    squads = [
+        SimpleNamespace(
+            id=index,
+            squad_uuid=squad_uuid,
+            display_name=squad_uuid,
+            price_kopeks=price,
+            is_available=squad_uuid != 'fi',
+            is_full=False,
+            allowed_promo_groups=[SimpleNamespace(id=group_id) for group_id in groups],
+        )
+        for index, (squad_uuid, price, groups) in enumerate(
+            [('nl', 10000, (1, 2)), ('de', 15000, (1,)), ('fi', 9000, (1, 2)), ('us', 25000, (2,))],
+            start=1,
+        )
+    ]
+    result = MagicMock()
+    result.scalars.return_value.unique.return_value.all.return_value = squads
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+def _user(group):
+    return SimpleNamespace(
+        get_primary_promo_group=lambda: group,
+        get_promo_discount=lambda category, period_days: (
+            group.get_discount_percent(category, period_days) if group else 0
+        ),
+    )
+
+
+def _random_subscriptions(rng, groups, count):
+    return [
+        SimpleNamespace(
+            id=subscription_id,
+            connected_squads=rng.sample(_SQUADS, rng.randint(0, len(_SQUADS))),
+            device_limit=rng.choice([None, 1, 2, 3, 5, 10]),
+            traffic_limit_gb=rng.choice([None, 0, 10, 50, 100, 500, 1000]),
+            user=_user(rng.choice(groups)),
+        )
+        for subscription_id in range(1, count + 1)
+    ]
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('traffic_mode', ['selectable', 'fixed'])
+async def test_batch_quotes_match_single_renewal_price(monkeypatch, seed, traffic_mode):
+    """Пакетный расчёт совпадает с calculate_renewal_price на случайных подписках."""
+    rng = random.Random(seed)
+    groups = [
+        None,
+        PromoGroup(
+            id=1,
+            name='base',
+            server_discount_percent=rng.randint(0, 100),
+            traffic_discount_percent=rng.randint(0, 100),
+            device_discount_percent=rng.randint(0, 100),
+            period_discounts={30: rng.randint(0, 100)},
+            is_default=False,
+        ),
+        PromoGroup(
+            id=2,
+            name='vip',
+            server_discount_percent=rng.randint(0, 100),
+            traffic_discount_percent=0,
+            device_discount_percent=rng.randint(0, 100),
+            period_discounts={},
+            is_default=False,
+        ),
+    ]
+    monkeypatch.setitem(config.PERIOD_PRICES, 30, rng.randint(0, 100000))
+    monkeypatch.setattr(settings, 'TRAFFIC_SELECTION_MODE', traffic_mode)
+    monkeypatch.setattr(settings, 'DEFAULT_DEVICE_LIMIT', rng.randint(1, 3))
+    monkeypatch.setattr(settings, 'PRICE_PER_DEVICE', rng.randint(0, 20000))
+    monkeypatch.setattr(settings, 'DEVICES_SELECTION_ENABLED', rng.random() < 0.5)
+
+    catalog = ServerSquadCatalog()
+    monkeypatch.setattr(subscription_service_module, 'server_squad_catalog', catalog)
+    db = _catalog_db()
+    subscriptions = _random_subscriptions(rng, groups, 50)
+
+    snapshot, items = await prepare_renewal_quotes(db, subscriptions, 30, catalog=catalog)
+    quotes = quote_renewals(snapshot, items)
+
+    service = SubscriptionService.__new__(SubscriptionService)
+    expected = {
+        subscription.id: await service.calculate_renewal_price(subscription, 30, db) for subscription in subscriptions
+    }
+    assert quotes == expected
+    db.execute.assert_awaited_once()
@@ -0,0 +1,89 @@
+"""
+Тесты каталога серверов для расчёта цен.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+
+from app.database.models import ServerSquad
+from app.services.server_squad_catalog import ServerSquadCatalog, server_squad_catalog
+
+
+def _squad(squad_id, squad_uuid, price, *, is_available=True, max_users=None, current_users=0, groups=(1,)):
+    return SimpleNamespace(
+        id=squad_id,
+        squad_uuid=squad_uuid,
+        display_name=squad_uuid,
+        price_kopeks=price,
+        is_available=is_available,
+        is_full=max_users is not None and current_users >= max_users,
+        allowed_promo_groups=[SimpleNamespace(id=group_id) for group_id in groups],
+    )
+
+
+def _db(*squads):
+    result = MagicMock()
+    result.scalars.return_value.unique.return_value.all.return_value = list(squads)
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+async def test_quote_prices_only_sellable_squads():
+    catalog = ServerSquadCatalog()
+    db = _db(
+        _squad(1, 'nl', 10000),
+        _squad(2, 'de', 20000, is_available=False),
+        _squad(3, 'fi', 30000, max_users=5, current_users=5),
+        _squad(4, 'us', 40000, groups=(2,)),
+    )
+
+    await catalog.ensure_fresh(db)
+    quote = catalog.quote(['nl', 'de', 'fi', 'us', 'missing'], promo_group_id=1)
+
+    assert quote.total_kopeks == 10000
+    assert quote.prices == [10000, 0, 0, 0, 0]
+    assert quote.unavailable == ['de', 'fi', 'us', 'missing']
+    assert catalog.quote(['us'], promo_group_id=2).total_kopeks == 40000
+    assert catalog.get_by_id(4).price_kopeks == 40000
+
+
+async def test_repeated_quotes_do_not_touch_database():
+    """Пока снимок свежий, повторные расчёты не ходят в БД."""
+    catalog = ServerSquadCatalog()
+    db = _db(_squad(1, 'nl', 10000))
+
+    for _ in range(3):
+        await catalog.ensure_fresh(db)
+    quotes = catalog.quote_many([(['nl'], None), (['nl', 'nl'], 1)])
+
+    db.execute.assert_awaited_once()
+    assert [quote.total_kopeks for quote in quotes] == [10000, 20000]
+    assert catalog.version == 1
+
+    catalog.invalidate()
+    await catalog.ensure_fresh(db)
+    assert db.execute.await_count == 2
+    assert catalog.version == 2
+
+
+def test_committed_squad_changes_invalidate_catalog():
+    engine = create_engine('sqlite://')
+    ServerSquad.__table__.create(engine)
+
+    with Session(engine) as session:
+        session.add(ServerSquad(id=1, squad_uuid='nl', display_name='NL', price_kopeks=100))
+        server_squad_catalog._stale = False
+        session.commit()
+        assert server_squad_catalog._stale is True
+
+        server_squad_catalog._stale = False
+        session.execute(
+            update(ServerSquad).where(ServerSquad.id == 1).values(current_users=ServerSquad.current_users + 1)
+        )
+        assert server_squad_catalog._stale is False
+        session.commit()
+        assert server_squad_catalog._stale is True
@@ -0,0 +1,109 @@
+"""
+Тесты рассылки изменений настроек между процессами.
+"""
+
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services import settings_broadcast
+from app.services.settings_broadcast import SettingChange, SettingsBroadcaster, queue_setting_change
+from app.services.system_settings_service import BotConfigurationService
+
+
+def _message(version, origin, *changes):
+    body = {'origin': origin, 'changes': [{'key': key, 'raw_value': raw, 'reset': False} for key, raw in changes]}
+    return f'{version}|{json.dumps(body)}'
+
+
+def test_derived_values_follow_settings_version(monkeypatch):
+    monkeypatch.setattr(settings, 'ADMIN_IDS', '1, 2')
+    version = settings.get_settings_version()
+
+    assert settings.is_admin(2)
+    assert settings.get_admin_ids() == [1, 2]
+
+    monkeypatch.setattr(settings, 'ADMIN_IDS', '3')
+
+    assert settings.get_settings_version() == version + 1
+    assert not settings.is_admin(2)
+    assert settings.is_admin(3)
+
+
+async def test_handle_message_applies_in_order_and_reloads_on_gap(monkeypatch):
+    apply_remote_changes = MagicMock()
+    reload = AsyncMock()
+    monkeypatch.setattr(BotConfigurationService, 'apply_remote_changes', apply_remote_changes)
+    monkeypatch.setattr(BotConfigurationService, 'reload', reload)
+    broadcaster = SettingsBroadcaster()
+
+    await broadcaster.handle_message(_message(1, 'other', ('SUPPORT_USERNAME', '@help')))
+    await broadcaster.handle_message(_message(2, broadcaster.instance_id, ('SUPPORT_USERNAME', '@own')))
+    await broadcaster.handle_message(_message(2, 'other', ('SUPPORT_USERNAME', '@stale')))
+
+    apply_remote_changes.assert_called_once_with([SettingChange('SUPPORT_USERNAME', '@help')])
+    reload.assert_not_awaited()
+
+    await broadcaster.handle_message(_message(5, 'other', ('SUPPORT_USERNAME', '@late')))
+
+    reload.assert_awaited_once()
+    assert apply_remote_changes.call_count == 1
+    assert broadcaster.version == 5
+
+
+def test_apply_remote_changes_updates_settings(monkeypatch):
+    BotConfigurationService.initialize_definitions()
+    monkeypatch.setattr(BotConfigurationService, '_overrides_raw', {})
+    monkeypatch.setattr(settings, 'SUPPORT_TICKET_SLA_MINUTES', settings.SUPPORT_TICKET_SLA_MINUTES)
+
+    BotConfigurationService.apply_remote_changes([SettingChange('SUPPORT_TICKET_SLA_MINUTES', '17')])
+    assert settings.SUPPORT_TICKET_SLA_MINUTES == 17
+
+    BotConfigurationService.apply_remote_changes([SettingChange('SUPPORT_TICKET_SLA_MINUTES', None, reset=True)])
+    original = BotConfigurationService.get_original_value('SUPPORT_TICKET_SLA_MINUTES')
+    assert original == settings.SUPPORT_TICKET_SLA_MINUTES
+    assert 'SUPPORT_TICKET_SLA_MINUTES' not in BotConfigurationService._overrides_raw
+
+
+def test_changes_are_published_only_after_commit(monkeypatch):
+    published = []
+    monkeypatch.setattr(settings_broadcast.settings_broadcaster, 'schedule_publish', published.append)
+    engine = create_engine('sqlite://')
+
+    with Session(engine) as session:
+        session.connection()
+        queue_setting_change(session, SettingChange('SUPPORT_USERNAME', '@rolled_back'))
+        session.rollback()
+        queue_setting_change(session, SettingChange('SUPPORT_USERNAME', '@help'))
+        assert published == []
+        session.commit()
+
+    assert published == [[SettingChange('SUPPORT_USERNAME', '@help')]]
+
+
+async def test_failed_publish_is_retried_and_then_leaves_version_gap(monkeypatch):
+    monkeypatch.setattr(settings_broadcast, '_PUBLISH_RETRY_SECONDS', 0)
+    monkeypatch.setattr(settings_broadcast, 'logger', MagicMock())
+    broadcaster = SettingsBroadcaster()
+    broadcaster._redis = MagicMock()
+    broadcaster._redis.eval = AsyncMock(side_effect=[ConnectionError('down'), 7])
+    change = SettingChange('SUPPORT_USERNAME', '@help')
+
+    await broadcaster.publish([change])
+    assert broadcaster._redis.eval.await_count == 2
+    assert broadcaster._redis.eval.await_args.args[-1] == 1
+
+    broadcaster._redis.eval = AsyncMock(side_effect=ConnectionError('down'))
+    await broadcaster.publish([change])
+    assert broadcaster._redis.eval.await_count == settings_broadcast._PUBLISH_ATTEMPTS
+
+    # Следующая публикация увеличивает версию на 2, чтобы остальные перечитали настройки из БД
+    broadcaster._redis.eval = AsyncMock(return_value=9)
+    await broadcaster.publish([])
+    assert broadcaster._redis.eval.await_args.args[-1] == 2
+
+    await broadcaster.publish([change])
+    assert broadcaster._redis.eval.await_args.args[-1] == 1
@@ -0,0 +1,83 @@
+"""
+Тесты суточной проверки трафика по агрегатам нод.
+"""
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.config import settings
+from app.services.traffic_monitoring_service import TrafficMonitoringServiceV2
+
+
+GB = 1024**3
+
+
+def _user(uuid, node='node-1'):
+    return SimpleNamespace(
+        uuid=uuid,
+        telegram_id=None,
+        username=uuid,
+        user_traffic=SimpleNamespace(last_connected_node_uuid=node),
+    )
+
+
+@pytest.fixture
+def api():
+    api = MagicMock()
+    api.get_all_nodes = AsyncMock(return_value=[SimpleNamespace(uuid='node-1'), SimpleNamespace(uuid='node-2')])
+    api.get_bandwidth_stats_node_users_legacy = AsyncMock(
+        side_effect=lambda node_uuid, start, end: {
+            'node-1': [
+                {'userUuid': 'heavy', 'nodeUuid': 'node-1', 'total': 30 * GB},
+                {'userUuid': 'light', 'nodeUuid': 'node-1', 'total': 1 * GB},
+                {'userUuid': 'unknown', 'nodeUuid': 'node-1', 'total': 500 * GB},
+            ],
+            'node-2': [
+                {'userUuid': 'heavy', 'nodeUuid': 'node-2', 'total': 25 * GB},
+                {'userUuid': 'ignored', 'nodeUuid': 'node-2', 'total': 80 * GB},
+            ],
+        }[node_uuid]
+    )
+    api.get_bandwidth_stats_user = AsyncMock(return_value=[{'total': 60 * GB}])
+    return api
+
+
+@pytest.fixture
+def service(monkeypatch, api):
+    monkeypatch.setattr(settings, 'TRAFFIC_DAILY_CHECK_ENABLED', True)
+    monkeypatch.setattr(settings, 'TRAFFIC_DAILY_THRESHOLD_GB', 50.0)
+    monkeypatch.setattr(settings, 'TRAFFIC_MONITORED_NODES', '')
+    monkeypatch.setattr(settings, 'TRAFFIC_IGNORED_NODES', 'node-2')
+
+    @asynccontextmanager
+    async def get_api_client():
+        yield api
+
+    service = TrafficMonitoringServiceV2()
+    service.remnawave_service = MagicMock(get_api_client=get_api_client)
+    service._load_nodes_cache = AsyncMock()
+    service._send_violation_notifications = AsyncMock()
+    service.get_all_users_with_traffic = AsyncMock(
+        return_value=[_user('heavy'), _user('light'), _user('ignored', node='node-2'), _user(None)]
+    )
+    return service
+
+
+async def test_daily_check_sums_node_aggregates(service, api):
+    violations = await service.run_daily_check(bot=None)
+
+    assert [(v.user_uuid, v.used_traffic_gb) for v in violations] == [('heavy', 55.0)]
+    assert api.get_bandwidth_stats_node_users_legacy.await_count == 2
+    api.get_bandwidth_stats_user.assert_not_awaited()
+
+
+async def test_daily_check_falls_back_to_per_user_stats(service, api):
+    api.get_bandwidth_stats_node_users_legacy.side_effect = RuntimeError('legacy endpoint removed')
+
+    violations = await service.run_daily_check(bot=None)
+
+    assert [v.user_uuid for v in violations] == ['heavy', 'light']
+    assert api.get_bandwidth_stats_user.await_count == 3
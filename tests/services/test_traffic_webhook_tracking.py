@@ -0,0 +1,77 @@
+"""
+Тесты учёта трафика по вебхукам Remnawave.
+"""
+
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.config import settings
+from app.services import traffic_monitoring_service as traffic_module
+from app.services.traffic_monitoring_service import TrafficMonitoringServiceV2
+
+
+GB = 1024**3
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, 'TRAFFIC_FAST_CHECK_ENABLED', True)
+    monkeypatch.setattr(settings, 'TRAFFIC_FAST_CHECK_INTERVAL_MINUTES', 10)
+    monkeypatch.setattr(settings, 'TRAFFIC_FAST_CHECK_THRESHOLD_GB', 5.0)
+    monkeypatch.setattr(settings, 'TRAFFIC_WEBHOOK_TRACKING_ENABLED', True)
+    monkeypatch.setattr(settings, 'TRAFFIC_RECONCILE_INTERVAL_MINUTES', 60)
+    monkeypatch.setattr(settings, 'TRAFFIC_EXCLUDED_USER_UUIDS', '')
+    monkeypatch.setattr(settings, 'TRAFFIC_MONITORED_NODES', '')
+    monkeypatch.setattr(settings, 'TRAFFIC_IGNORED_NODES', '')
+    monkeypatch.setattr(settings, 'REMNAWAVE_WEBHOOK_ENABLED', True)
+    monkeypatch.setattr(settings, 'REMNAWAVE_WEBHOOK_SECRET', 's' * 32)
+    # Redis недоступен — окна хранятся в памяти процесса
+    monkeypatch.setattr(traffic_module.cache, 'get', AsyncMock(return_value=None))
+    monkeypatch.setattr(traffic_module.cache, 'set', AsyncMock(return_value=False))
+
+    service = TrafficMonitoringServiceV2()
+    service._nodes_cache = {'node-1': 'NL'}
+    service._send_violation_notifications = AsyncMock()
+    return service
+
+
+def _event(used_gb, node='node-1'):
+    return {'uuid': 'user-1', 'userTraffic': {'usedTrafficBytes': int(used_gb * GB), 'lastConnectedNodeUuid': node}}
+
+
+async def test_webhook_delta_within_window_triggers_notification(service):
+    assert await service.track_webhook_event(_event(10), bot=None) is None
+    assert await service.track_webhook_event(_event(13), bot=None) is None
+
+    violation = await service.track_webhook_event(_event(16), bot=None)
+
+    assert violation.used_traffic_gb == 6.0
+    assert violation.last_node_name == 'NL'
+    service._send_violation_notifications.assert_awaited_once_with([violation], None)
+
+
+async def test_window_restarts_after_interval_and_traffic_reset(service):
+    await service.track_webhook_event(_event(10), bot=None)
+    used, started_at = service._memory_live_windows['user-1']
+    service._memory_live_windows['user-1'] = (used, started_at - timedelta(minutes=11))
+
+    assert await service.track_webhook_event(_event(20), bot=None) is None
+    assert service._memory_live_windows['user-1'][0] == 20 * GB
+
+    assert await service.track_webhook_event(_event(0), bot=None) is None
+    assert service._memory_live_windows['user-1'][0] == 0
+    service._send_violation_notifications.assert_not_awaited()
+
+
+async def test_polling_becomes_reconciliation_with_scaled_threshold(service, monkeypatch):
+    assert service.get_poll_interval_seconds() == 3600
+    assert service.get_poll_threshold_gb() == 30.0
+
+    monkeypatch.setattr(settings, 'TRAFFIC_WEBHOOK_TRACKING_ENABLED', False)
+
+    assert service.get_poll_interval_seconds() == 600
+    assert service.get_poll_threshold_gb() == 5.0
+    assert await service.track_webhook_event(_event(100), bot=None) is None
+    assert service._memory_live_windows == {}
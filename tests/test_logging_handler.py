@@ -0,0 +1,91 @@
+"""Тесты сводок ошибок TelegramNotifierProcessor."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.logging_handler import TelegramNotifierProcessor, build_digest
+
+
+def _event(message: str, logger_name: str = 'app.services.test', **extra) -> dict:
+    return {'level': 'error', 'logger': logger_name, 'event': message, **extra}
+
+
+def _raise_and_log(notifier: TelegramNotifierProcessor, message: str) -> None:
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        notifier(None, 'error', _event(message, exc_info=True))
+
+
+@pytest.fixture
+def send_digest(monkeypatch):
+    send = AsyncMock(return_value=True)
+    monkeypatch.setattr('app.middlewares.global_error.send_error_digest_to_admin_chat', send)
+    return send
+
+
+@pytest.mark.asyncio
+async def test_events_are_grouped_into_one_digest(send_digest) -> None:
+    notifier = TelegramNotifierProcessor(max_fingerprints=2)
+    notifier._bot = MagicMock()
+
+    for _ in range(3):
+        _raise_and_log(notifier, 'db failed')
+    notifier(None, 'error', _event('other', user_id=42))
+    notifier(None, 'error', _event('third'))
+    notifier(None, 'warning', {'level': 'warning', 'event': 'ignored'})
+    notifier(None, 'error', _event('notified', _admin_notified=True))
+
+    assert notifier.pending_events == 4
+    assert notifier.events_dropped == 1
+
+    assert await notifier.flush() is True
+    send_digest.assert_awaited_once()
+    caption, report = send_digest.await_args.args[1:]
+    assert '<b>Событий:</b> 5, <b>видов:</b> 2' in caption
+    assert '3× <code>ValueError</code> db failed' in caption
+    assert '<b>Не вошло в сводку:</b> 1' in caption
+    assert report.count('raise ValueError') == 1
+    assert 'Context: User: 42' in report
+
+    assert notifier.pending_events == 0
+    assert await notifier.flush() is False
+    assert notifier.digests_sent == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_cap_defers_digest_and_keeps_aggregating(send_digest) -> None:
+    notifier = TelegramNotifierProcessor(max_messages_per_minute=1)
+    notifier._bot = MagicMock()
+
+    notifier(None, 'error', _event('first'))
+    assert await notifier.flush() is True
+
+    notifier(None, 'error', _event('second'))
+    notifier(None, 'error', _event('second'))
+    assert await notifier.flush() is False
+    assert notifier.digests_deferred == 1
+    assert notifier.pending_events == 2
+    assert send_digest.await_count == 1
+
+
+def test_events_before_bot_are_passed_through() -> None:
+    notifier = TelegramNotifierProcessor()
+    event = _event('early')
+
+    assert notifier(None, 'error', event) is event
+    assert notifier.pending_events == 0
+
+
+def test_caption_fits_telegram_limit() -> None:
+    notifier = TelegramNotifierProcessor(max_fingerprints=100)
+    notifier._bot = MagicMock()
+    for number in range(60):
+        notifier(None, 'error', _event(f'<error {number}> ' + 'x' * 100))
+
+    caption, _ = build_digest(list(notifier._pending.values()))
+
+    assert len(caption) <= 1024
+    assert '&lt;error 0&gt;' in caption
+    assert '... и ещё' in caption
@@ -0,0 +1,126 @@
+"""Тесты очереди логов из app.utils.log_handlers."""
+
+import io
+import logging
+import queue
+
+import structlog
+
+from app.utils.log_handlers import ExcludePaymentFilter, LogSink, PaymentLogFilter, QueueLogHandler, QueueLogListener
+
+
+PRE_CHAIN = [
+    structlog.contextvars.merge_contextvars,
+    structlog.stdlib.add_log_level,
+    structlog.stdlib.add_logger_name,
+]
+
+
+class _CountingFormatter(structlog.stdlib.ProcessorFormatter):
+    def __init__(self) -> None:
+        super().__init__(
+            foreign_pre_chain=PRE_CHAIN,
+            processors=[
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                structlog.processors.KeyValueRenderer(key_order=['level', 'logger', 'event']),
+            ],
+        )
+        self.calls = 0
+
+    def format(self, record: logging.LogRecord) -> str:
+        self.calls += 1
+        return super().format(record)
+
+
+def _logger(handler: QueueLogHandler, name: str) -> logging.Logger:
+    logger = logging.getLogger(f'tests.log_queue.{name}')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def test_records_are_rendered_once_and_routed_by_level(tmp_path) -> None:
+    """Файловые приёмники получают общий текст, контекст берётся из потока вызова."""
+    log_queue = queue.Queue(maxsize=100)
+    handler = QueueLogHandler(log_queue, PRE_CHAIN)
+    formatter = _CountingFormatter()
+    console = io.StringIO()
+    listener = QueueLogListener(
+        log_queue,
+        handler,
+        [
+            LogSink(formatter, path=tmp_path / 'bot.log', filters=(ExcludePaymentFilter(),)),
+            LogSink(formatter, path=tmp_path / 'info.log', min_level=logging.INFO, max_level=logging.INFO),
+            LogSink(formatter, path=tmp_path / 'error.log', min_level=logging.ERROR),
+            LogSink(formatter, path=tmp_path / 'payments.log', filters=(PaymentLogFilter(),)),
+            LogSink(formatter, stream=console, min_level=logging.WARNING),
+        ],
+    )
+    listener.start()
+
+    structlog.contextvars.bind_contextvars(request_id='r-1')
+    try:
+        _logger(handler, 'main').info('started %s', 'ok')
+        _logger(handler, 'main').error('failed')
+    finally:
+        structlog.contextvars.clear_contextvars()
+    payments = logging.getLogger('app.payments.tests')
+    payments.handlers = [handler]
+    payments.propagate = False
+    payments.warning('payment')
+    listener.stop()
+
+    bot_log = (tmp_path / 'bot.log').read_text(encoding='utf-8')
+    assert "event='started ok'" in bot_log
+    assert "request_id='r-1'" in bot_log
+    assert 'payment' not in bot_log
+    assert 'failed' not in (tmp_path / 'info.log').read_text(encoding='utf-8')
+    assert 'failed' in (tmp_path / 'error.log').read_text(encoding='utf-8')
+    assert (tmp_path / 'payments.log').read_text(encoding='utf-8').count('\n') == 1
+    assert 'failed' in console.getvalue()
+    assert formatter.calls == 3
+
+
+def test_overflow_is_counted_and_reported(tmp_path) -> None:
+    log_queue = queue.Queue(maxsize=2)
+    handler = QueueLogHandler(log_queue, PRE_CHAIN)
+    listener = QueueLogListener(log_queue, handler, [LogSink(_CountingFormatter(), path=tmp_path / 'bot.log')])
+    logger = _logger(handler, 'overflow')
+
+    for number in range(5):
+        logger.info('record %s', number)
+    listener.start()
+    listener.flush()
+    listener.stop()
+
+    lines = (tmp_path / 'bot.log').read_text(encoding='utf-8').splitlines()
+    assert listener.records_dropped == 3
+    assert len(lines) == 3
+    assert 'пропущено записей: 3' in lines[-1]
+
+
+def test_detach_files_swaps_file_without_losing_records(tmp_path) -> None:
+    """После отцепления старые записи лежат в .rotating, новые — в свежем файле."""
+    log_queue = queue.Queue(maxsize=100)
+    handler = QueueLogHandler(log_queue, PRE_CHAIN)
+    path = tmp_path / 'bot.log'
+    listener = QueueLogListener(
+        log_queue,
+        handler,
+        [LogSink(_CountingFormatter(), path=path), LogSink(_CountingFormatter(), path=tmp_path / 'x.log')],
+    )
+    logger = _logger(handler, 'rotation')
+    listener.start()
+
+    logger.info('before')
+    listener.flush()
+    detached = listener.detach_files('.rotating')
+    logger.info('after')
+    listener.stop()
+
+    rotating = tmp_path / 'bot.log.rotating'
+    assert detached == {path: rotating, tmp_path / 'x.log': tmp_path / 'x.log.rotating'}
+    assert 'before' in rotating.read_text(encoding='utf-8')
+    assert 'after' not in rotating.read_text(encoding='utf-8')
+    assert 'after' in path.read_text(encoding='utf-8')
@@ -0,0 +1,93 @@
+"""Тесты чтения системного лога: хвост, индекс по времени и поиск."""
+
+import gzip
+from datetime import datetime, timedelta
+
+from app.utils import log_reader
+from app.utils.log_reader import iter_gzip, read_tail, search_log
+
+
+START = datetime(2025, 1, 10, 12, 0, 0)
+
+
+def _write_log(path, count):
+    lines = []
+    for i in range(count):
+        stamp = (START + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S')
+        level = 'error' if i % 10 == 0 else 'info'
+        lines.append(f'{stamp} [{level}] [app.services.s{i % 3}] событие {i} key=value\n')
+        if level == 'error':
+            lines.append('Traceback (most recent call last):\nValueError: сбой\n')
+    path.write_text(''.join(lines), encoding='utf-8')
+
+
+def test_read_tail_returns_last_chars_only(tmp_path):
+    path = tmp_path / 'bot.log'
+    _write_log(path, 50)
+    content = path.read_text(encoding='utf-8')
+
+    tail = read_tail(path, 120)
+
+    assert tail.text == content[-120:]
+    assert tail.truncated
+    assert tail.size_bytes == path.stat().st_size
+    assert not read_tail(path, len(content) * 2).truncated
+
+
+def test_read_tail_counts_characters_of_whole_file(tmp_path):
+    path = tmp_path / 'bot.log'
+    _write_log(path, 50)
+
+    assert read_tail(path, 120).size_chars == len(path.read_text(encoding='utf-8'))
+
+    with path.open('a', encoding='utf-8') as handle:
+        handle.write('2025-01-10 13:00:00 [info] [app] дописано\nнезавершённая')
+    content = path.read_text(encoding='utf-8')
+    tail = read_tail(path, 120)
+    assert tail.size_chars == len(content)
+    assert tail.size_chars < tail.size_bytes
+
+
+def test_search_filters_and_paginates_with_cursor(tmp_path):
+    path = tmp_path / 'bot.log'
+    _write_log(path, 100)
+
+    first = search_log(path, levels={'error'}, logger_prefix='app.services.s0', limit=2)
+    second = search_log(path, levels={'error'}, logger_prefix='app.services.s0', limit=2, cursor=first.next_cursor)
+
+    found = [record.text.splitlines()[0].split(' событие ')[1].split()[0] for record in first.items + second.items]
+    assert found == ['0', '30', '60', '90']
+    assert first.items[0].text.endswith('ValueError: сбой')
+    last = search_log(path, levels={'error'}, logger_prefix='app.services.s0', limit=2, cursor=second.next_cursor)
+    assert (last.items, last.next_cursor) == ([], None)
+    assert [record.level for record in search_log(path, text='СОБЫТИЕ 42 ').items] == ['info']
+
+
+def test_time_range_search_starts_from_sparse_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_reader, 'INDEX_STEP_BYTES', 512)
+    path = tmp_path / 'bot.log'
+    _write_log(path, 300)
+
+    since = START + timedelta(seconds=200)
+    result = search_log(path, since=since, until=since + timedelta(seconds=4))
+
+    assert [record.timestamp for record in result.items] == [since + timedelta(seconds=i) for i in range(5)]
+    index = log_reader._indexes[str(path)]
+    assert len(index.offsets) > 10
+    assert 0 < index.start_offset(since) < result.items[0].offset
+
+    # Дописанные строки попадают в индекс без перестроения
+    indexed_until = index.indexed_until
+    with path.open('a', encoding='utf-8') as handle:
+        handle.write('2025-01-10 13:00:00 [info] [app.late] поздняя запись\n')
+    late = search_log(path, since=datetime(2025, 1, 10, 13, 0, 0))
+    assert [record.logger for record in late.items] == ['app.late']
+    assert log_reader._indexes[str(path)] is index
+    assert index.indexed_until > indexed_until
+
+
+def test_iter_gzip_streams_whole_file(tmp_path):
+    path = tmp_path / 'bot.log'
+    _write_log(path, 20)
+
+    assert gzip.decompress(b''.join(iter_gzip(path))) == path.read_bytes()
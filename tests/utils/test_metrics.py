@@ -0,0 +1,128 @@
+"""Тесты метрик Prometheus: реестр, middleware бота и маршрут /metrics."""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.middlewares.metrics import TimedMiddleware
+from app.utils import metrics as metrics_module
+from app.utils.metrics import MetricsRegistry, normalize_endpoint
+from app.webserver.metrics import HTTPMetricsMiddleware, create_metrics_router
+
+
+def test_render_counter_histogram_and_gauge() -> None:
+    registry = MetricsRegistry(enabled=True)
+    requests = registry.counter('test_requests_total', 'Запросы', ('path',))
+    latency = registry.histogram('test_latency_seconds', 'Задержка', buckets=(0.1, 1.0))
+    registry.gauge_callback('test_queue_depth', 'Очередь', ('shard',), lambda: [(('0',), 3)])
+
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value)
+
+    text = registry.render()
+
+    assert '# TYPE test_requests_total counter' in text
+    assert 'test_requests_total{path="/a\\"b"} 3.0' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{le="1.0"} 3' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count 4' in text
+    assert 'test_queue_depth{shard="0"} 3.0' in text
+
+
+def test_disabled_registry_records_nothing() -> None:
+    registry = MetricsRegistry(enabled=False)
+    requests = registry.counter('test_requests_total', 'Запросы')
+    latency = registry.histogram('test_latency_seconds', 'Задержка')
+
+    requests.inc()
+    latency.observe(1.0)
+
+    assert requests.value() == 0.0
+    assert latency.count() == 0
+
+
+def test_failing_gauge_callback_is_skipped() -> None:
+    registry = MetricsRegistry(enabled=True)
+
+    def broken():
+        raise RuntimeError('pool is gone')
+
+    registry.gauge_callback('test_broken', 'Сломанный', (), broken)
+
+    assert 'test_broken' not in registry.render()
+
+
+def test_normalize_endpoint_hides_identifiers() -> None:
+    assert normalize_endpoint('/api/users/3f2c1a9e-0b1d-4c5e-9f00-1234567890ab/actions/enable') == (
+        '/api/users/{id}/actions/enable'
+    )
+    assert normalize_endpoint('/api/users/by-username/johndoe') == '/api/users/by-username/{id}'
+    assert normalize_endpoint('/api/users/by-telegram-id/12345') == '/api/users/by-telegram-id/{id}'
+    assert normalize_endpoint('/api/sub/abcdef/info') == '/api/sub/{id}/info'
+    assert normalize_endpoint('/api/system/stats/nodes') == '/api/system/stats/nodes'
+
+
+@pytest.mark.asyncio
+async def test_timed_middleware_excludes_inner_chain(monkeypatch) -> None:
+    monkeypatch.setattr(metrics_module.metrics, 'enabled', True)
+
+    class SlowOuterMiddleware:
+        async def __call__(self, handler, event, data):
+            return await handler(event, data)
+
+    async def slow_handler(event, data):
+        await asyncio.sleep(0.05)
+        return 'handled'
+
+    middleware = TimedMiddleware(SlowOuterMiddleware(), 'message')
+    assert await middleware(slow_handler, SimpleNamespace(), {}) == 'handled'
+
+    state = metrics_module.MIDDLEWARE_DURATION._values[('SlowOuterMiddleware', 'message')]
+    assert state.count == 1
+    assert state.sum < 0.04
+
+
+@pytest.mark.asyncio
+async def test_metrics_route_requires_token_and_records_route_template(monkeypatch) -> None:
+    monkeypatch.setattr(metrics_module.metrics, 'enabled', True)
+    monkeypatch.setattr(metrics_module.settings, 'METRICS_TOKEN', 'scrape-secret')
+
+    app = FastAPI()
+    app.add_middleware(HTTPMetricsMiddleware)
+    app.include_router(create_metrics_router())
+
+    @app.get('/items/{item_id}')
+    async def read_item(item_id: int) -> dict:
+        return {'id': item_id}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        assert (await client.get('/items/42')).status_code == 200
+        assert (await client.get('/metrics')).status_code == 401
+
+        response = await client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert 'bot_http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 1' in (
+        response.text
+    )
+
+
+@pytest.mark.asyncio
+async def test_metrics_route_is_closed_without_configured_token(monkeypatch) -> None:
+    monkeypatch.setattr(metrics_module.settings, 'METRICS_TOKEN', None)
+
+    app = FastAPI()
+    app.include_router(create_metrics_router())
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        assert (await client.get('/metrics')).status_code == 401
+        assert (await client.get('/metrics', headers={'Authorization': 'Bearer '})).status_code == 401
@@ -0,0 +1,61 @@
+"""Тесты скользящих окон из app.utils.rate_limiter."""
+
+from app.utils.rate_limiter import MemoryRateLimitBackend, RateLimitPolicy
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+POLICY = RateLimitPolicy('test', limit=2, window_seconds=10)
+
+
+async def test_hit_allows_limit_within_sliding_window() -> None:
+    """Третье событие в окне отклоняется, место освобождается по мере сдвига окна."""
+    clock = _Clock()
+    backend = MemoryRateLimitBackend(max_keys=10, clock=clock)
+
+    assert (await backend.apply(POLICY, 'user', 'hit')).allowed
+    clock.now += 4
+    assert (await backend.apply(POLICY, 'user', 'hit')).allowed
+
+    denied = await backend.apply(POLICY, 'user', 'hit')
+    assert not denied.allowed
+    assert denied.retry_after == 6
+
+    clock.now += 6
+    assert (await backend.apply(POLICY, 'user', 'hit')).allowed
+    assert not (await backend.apply(POLICY, 'user', 'peek')).allowed
+
+
+async def test_record_counts_without_check_and_peek_does_not_count() -> None:
+    clock = _Clock()
+    backend = MemoryRateLimitBackend(max_keys=10, clock=clock)
+
+    for _ in range(3):
+        await backend.apply(POLICY, 'user', 'record')
+
+    result = await backend.apply(POLICY, 'user', 'peek')
+    assert not result.allowed
+    assert result.count == POLICY.limit
+    assert (await backend.apply(POLICY, 'other', 'peek')).allowed
+    assert len(backend) == 1
+
+
+async def test_keys_are_bounded_and_expired_windows_evicted() -> None:
+    """Ключей не больше max_keys, истёкшие окна удаляются при следующих записях."""
+    clock = _Clock()
+    backend = MemoryRateLimitBackend(max_keys=3, clock=clock)
+
+    for user_id in range(5):
+        await backend.apply(POLICY, str(user_id), 'hit')
+    assert len(backend) == 3
+    assert (await backend.apply(POLICY, '0', 'peek')).count == 0
+
+    clock.now += POLICY.window_seconds + 1
+    await backend.apply(POLICY, 'fresh', 'hit')
+    assert len(backend) == 1
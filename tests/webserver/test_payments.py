@@ -504,3 +504,58 @@ async def test_cryptobot_invalid_signature(monkeypatch: pytest.MonkeyPatch) -> N
     response = await route.endpoint(request)
 
     assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_yookassa_webhook_enqueued_to_inbox(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'YOOKASSA_ENABLED', True, raising=False)
+
+    process_mock = AsyncMock(return_value=True)
+    service = SimpleNamespace(process_yookassa_webhook=process_mock)
+    inbox = SimpleNamespace(is_running=True, enqueue=AsyncMock(return_value=True))
+
+    router = create_payment_router(DummyBot(), service, inbox=inbox)
+    assert router is not None
+
+    route = _get_route(router, settings.YOOKASSA_WEBHOOK_PATH)
+    webhook_payload = {'event': 'payment.succeeded', 'object': {'id': 'pay-1'}}
+    request = _build_request(
+        settings.YOOKASSA_WEBHOOK_PATH,
+        body=json.dumps(webhook_payload).encode('utf-8'),
+        headers={},
+    )
+
+    response = await route.endpoint(request)
+
+    assert response.status_code == 200
+    inbox.enqueue.assert_awaited_once_with('yookassa', 'process_yookassa_webhook', webhook_payload)
+    process_mock.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_yookassa_webhook_processed_inline_when_inbox_fails(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'YOOKASSA_ENABLED', True, raising=False)
+
+    async def fake_get_db():
+        yield SimpleNamespace()
+
+    monkeypatch.setattr('app.webserver.payments.get_db', fake_get_db)
+
+    process_mock = AsyncMock(return_value=True)
+    service = SimpleNamespace(process_yookassa_webhook=process_mock)
+    inbox = SimpleNamespace(is_running=True, enqueue=AsyncMock(side_effect=RuntimeError('db down')))
+
+    router = create_payment_router(DummyBot(), service, inbox=inbox)
+    assert router is not None
+
+    route = _get_route(router, settings.YOOKASSA_WEBHOOK_PATH)
+    request = _build_request(
+        settings.YOOKASSA_WEBHOOK_PATH,
+        body=json.dumps({'event': 'payment.succeeded'}).encode('utf-8'),
+        headers={},
+    )
+
+    response = await route.endpoint(request)
+
+    assert response.status_code == 200
+    process_mock.assert_awaited_once()
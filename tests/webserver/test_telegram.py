@@ -1,8 +1,10 @@
+import asyncio
 import json
 from typing import Any
 from unittest.mock import AsyncMock
 
 import pytest
+from aiogram.types import Update
 from fastapi import HTTPException
 from starlette.requests import Request
 
@@ -334,3 +336,96 @@ async def test_health_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
     assert payload['webhook_configured'] is True
     assert payload['queue_maxsize'] == 42
     assert payload['workers'] == 2
+
+
+def _message_update(update_id: int, chat_id: int) -> Update:
+    return Update.model_validate(
+        {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': 1715700000,
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': str(update_id),
+            },
+        }
+    )
+
+
+async def _wait_for(predicate) -> None:
+    while not predicate():
+        await asyncio.sleep(0.001)
+
+
+@pytest.mark.anyio
+async def test_processor_keeps_chat_order_and_isolates_slow_chat() -> None:
+    processed: list[tuple[int, int]] = []
+    slow_started = asyncio.Event()
+    release_slow = asyncio.Event()
+
+    processor = TelegramWebhookProcessor(
+        bot=AsyncMock(),
+        dispatcher=AsyncMock(),
+        queue_maxsize=64,
+        worker_count=4,
+        enqueue_timeout=0.0,
+        shutdown_timeout=1.0,
+    )
+    chat_ids = list(range(1, 200))
+    slow_chat = chat_ids[0]
+    slow_shard = processor.get_shard_index(_message_update(0, slow_chat))
+    fast_chat = next(chat for chat in chat_ids if processor.get_shard_index(_message_update(0, chat)) != slow_shard)
+
+    async def feed_update(bot, update) -> None:
+        chat_id = update.message.chat.id
+        if chat_id == slow_chat and update.update_id == 1:
+            slow_started.set()
+            await release_slow.wait()
+        processed.append((chat_id, update.update_id))
+
+    processor._dispatcher.feed_update = feed_update
+    await processor.start()
+
+    for update_id in range(1, 4):
+        await processor.enqueue(_message_update(update_id, slow_chat))
+    await slow_started.wait()
+    for update_id in range(10, 13):
+        await processor.enqueue(_message_update(update_id, fast_chat))
+
+    await asyncio.wait_for(_wait_for(lambda: len(processed) == 3), timeout=1.0)
+    assert processed == [(fast_chat, 10), (fast_chat, 11), (fast_chat, 12)]
+
+    release_slow.set()
+    await processor.wait_until_drained(timeout=1.0)
+    assert [item for item in processed if item[0] == slow_chat] == [(slow_chat, 1), (slow_chat, 2), (slow_chat, 3)]
+
+    stats = processor.get_stats()
+    assert sum(shard['processed'] for shard in stats['shards']) == 6
+    assert stats['total_depth'] == 0
+
+    await processor.stop()
+
+
+def test_shard_index_is_stable_for_callback_and_message() -> None:
+    processor = TelegramWebhookProcessor(
+        bot=AsyncMock(),
+        dispatcher=AsyncMock(),
+        queue_maxsize=16,
+        worker_count=8,
+        enqueue_timeout=0.0,
+        shutdown_timeout=1.0,
+    )
+    callback = Update.model_validate(
+        {
+            'update_id': 2,
+            'callback_query': {
+                'id': 'cb',
+                'chat_instance': 'ci',
+                'data': 'pay',
+                'from': {'id': 4242, 'is_bot': False, 'first_name': 'U'},
+            },
+        }
+    )
+
+    assert processor.get_shard_index(callback) == processor.get_shard_index(_message_update(1, 4242))
+    assert {processor.get_shard_index(_message_update(1, chat)) for chat in range(1000)} == set(range(8))
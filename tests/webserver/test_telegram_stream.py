@@ -0,0 +1,214 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from starlette.requests import Request
+
+from app.config import settings
+from app.webserver import telegram_stream
+from app.webserver.telegram import create_telegram_router
+from app.webserver.telegram_stream import TelegramStreamIngress
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.keys: dict[str, object] = {}
+        self.acked: list[bytes] = []
+
+    async def exists(self, key: str) -> int:
+        return int(key in self.keys)
+
+    async def set(
+        self, key: str, value: object, ex: int | None = None, px: int | None = None, nx: bool = False
+    ) -> bool:
+        if nx and key in self.keys:
+            return False
+        self.keys[key] = value
+        return True
+
+    async def incr(self, key: str) -> int:
+        self.keys[key] = int(self.keys.get(key, 0)) + 1
+        return self.keys[key]
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        return key in self.keys
+
+    async def release(self, keys: list[str], args: list[str]) -> int:
+        if self.keys.get(keys[0]) == args[0]:
+            del self.keys[keys[0]]
+            return 1
+        return 0
+
+    async def xack(self, stream: str, group: str, *ids: bytes) -> int:
+        self.acked.extend(ids)
+        return len(ids)
+
+
+def _ingress(dispatcher: AsyncMock) -> TelegramStreamIngress:
+    ingress = TelegramStreamIngress(
+        bot=AsyncMock(),
+        dispatcher=dispatcher,
+        redis_url='redis://localhost:6379/0',
+        stream_key='telegram:updates',
+        group='bot-workers',
+        maxlen=1000,
+        batch_size=10,
+        claim_idle_seconds=60,
+        dedup_ttl_seconds=3600,
+        shutdown_timeout=1.0,
+        consumer_name='test',
+    )
+    ingress._redis = _FakeRedis()
+    ingress._release_lease_script = ingress._redis.release
+    return ingress
+
+
+def _entry(entry_id: bytes, update_id: int, chat_id: int) -> tuple[bytes, dict[bytes, bytes]]:
+    payload = {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 1715700000,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': str(update_id),
+        },
+    }
+    return entry_id, {b'update_id': str(update_id).encode(), b'payload': json.dumps(payload).encode()}
+
+
+@pytest.mark.anyio
+async def test_stream_entries_processed_in_chat_order_and_acked() -> None:
+    processed: list[tuple[int, int]] = []
+    dispatcher = AsyncMock()
+
+    async def feed_update(bot, update) -> None:
+        processed.append((update.message.chat.id, update.update_id))
+
+    dispatcher.feed_update = feed_update
+    ingress = _ingress(dispatcher)
+
+    await ingress._process_entries(
+        [_entry(b'1-0', 1, 10), _entry(b'2-0', 2, 20), _entry(b'3-0', 3, 10), (b'4-0', {b'update_id': b'x'})]
+    )
+
+    assert [item for item in processed if item[0] == 10] == [(10, 1), (10, 3)]
+    assert sorted(ingress._redis.acked) == [b'1-0', b'2-0', b'3-0', b'4-0']
+
+
+@pytest.mark.anyio
+async def test_stream_skips_already_processed_update() -> None:
+    dispatcher = AsyncMock()
+    dispatcher.feed_update = AsyncMock()
+    ingress = _ingress(dispatcher)
+
+    await ingress._process_entries([_entry(b'1-0', 7, 10)])
+    # Запись перехвачена у упавшего воркера после обработки, но до подтверждения
+    await ingress._process_entries([_entry(b'1-0', 7, 10)])
+
+    dispatcher.feed_update.assert_awaited_once()
+    assert ingress._duplicates == 1
+
+
+@pytest.mark.anyio
+async def test_failed_update_stays_pending_and_holds_back_its_chat(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(telegram_stream, 'logger', MagicMock())
+    processed: list[int] = []
+    dispatcher = AsyncMock()
+
+    async def feed_update(bot, update) -> None:
+        if update.update_id == 1:
+            raise RuntimeError('handler failed')
+        processed.append(update.update_id)
+
+    dispatcher.feed_update = feed_update
+    ingress = _ingress(dispatcher)
+
+    await ingress._process_entries([_entry(b'1-0', 1, 10), _entry(b'2-0', 2, 10), _entry(b'3-0', 3, 20)])
+
+    assert processed == [3]
+    assert ingress._redis.acked == [b'3-0']
+    assert 'telegram:updates:done:1' not in ingress._redis.keys
+    assert not any(key.startswith('telegram:updates:lease:') for key in ingress._redis.keys)
+
+
+@pytest.mark.anyio
+async def test_update_is_dropped_after_max_attempts(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(telegram_stream, 'logger', MagicMock())
+    dispatcher = AsyncMock()
+    dispatcher.feed_update = AsyncMock(side_effect=RuntimeError('poison'))
+    ingress = _ingress(dispatcher)
+
+    for _ in range(5):
+        await ingress._process_entries([_entry(b'1-0', 1, 10)])
+
+    assert ingress._redis.acked == [b'1-0']
+    assert dispatcher.feed_update.await_count == 5
+
+
+@pytest.mark.anyio
+async def test_claimed_and_fresh_entries_of_one_chat_do_not_overlap() -> None:
+    active = 0
+    overlaps = 0
+    dispatcher = AsyncMock()
+
+    async def feed_update(bot, update) -> None:
+        nonlocal active, overlaps
+        active += 1
+        overlaps += active > 1
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    dispatcher.feed_update = feed_update
+    ingress = _ingress(dispatcher)
+
+    await asyncio.gather(
+        ingress._process_entries([_entry(b'1-0', 1, 10)]),
+        ingress._process_entries([_entry(b'2-0', 2, 10)]),
+    )
+
+    assert overlaps == 0
+    assert sorted(ingress._redis.acked) == [b'1-0', b'2-0']
+    assert ingress._partition_locks == {}
+
+
+@pytest.mark.anyio
+async def test_chat_leased_by_other_replica_is_left_pending() -> None:
+    dispatcher = AsyncMock()
+    dispatcher.feed_update = AsyncMock()
+    ingress = _ingress(dispatcher)
+    ingress._claim_idle_ms = 100
+    ingress._redis.keys['telegram:updates:lease:10'] = 'other-replica'
+
+    await ingress._process_entries([_entry(b'1-0', 1, 10)])
+
+    dispatcher.feed_update.assert_not_awaited()
+    assert ingress._redis.acked == []
+
+
+@pytest.mark.anyio
+async def test_webhook_publishes_to_stream(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'WEBHOOK_PATH', '/telegram-webhook', raising=False)
+    monkeypatch.setattr(settings, 'WEBHOOK_SECRET_TOKEN', '', raising=False)
+    dispatcher = AsyncMock()
+    dispatcher.feed_update = AsyncMock()
+    ingress = AsyncMock()
+    ingress.publish = AsyncMock(return_value=True)
+
+    router = create_telegram_router(AsyncMock(), dispatcher, ingress=ingress)
+    route = next(r for r in router.routes if getattr(r, 'path', '') == '/telegram-webhook')
+
+    body = json.dumps({'update_id': 55}).encode()
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    request = Request(
+        {'type': 'http', 'method': 'POST', 'path': '/telegram-webhook', 'headers': []},
+        receive,
+    )
+    response = await route.endpoint(request)
+
+    assert response.status_code == 200
+    ingress.publish.assert_awaited_once_with(55, {'update_id': 55})
+    dispatcher.feed_update.assert_not_called()